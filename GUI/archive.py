@@ -0,0 +1,478 @@
+"""Module that contains the trace archive, which indexes saved sweeps for post-processing. Saved trace and capture files (See tracedata.writeTrace() and capture.writeCapture()) are imported once into an archive directory, which contains an SQLite index of each sweep's time, RF chain, frequency range, and detections, and the amplitudes of the sweeps as binary payloads.
+Sweeps with the same X axis share one payload file of float64 rows, which is memory-mapped when read, so slicing one frequency bin across many sweeps only reads that bin of each sweep instead of loading every sweep into memory. Rows of sweeps replaced by re-importing a modified file are recorded as free and reused by later imports, so the payloads do not grow each time a file is re-imported.
+Run 'python archive.py ARCHIVE index DIRECTORY' to import the files in a directory or zip file, then 'python archive.py ARCHIVE query' or 'python archive.py ARCHIVE slice FREQUENCY' to search the archive.
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from detection import detect
+from tracedata import Trace, frequencyAxis
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start REAL NOT NULL,
+    stop REAL NOT NULL,
+    points INTEGER NOT NULL,
+    xunit TEXT NOT NULL,
+    axis TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (start, stop, points, xunit, axis)
+);
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    grp INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    chain TEXT NOT NULL,
+    start REAL NOT NULL,
+    stop REAL NOT NULL,
+    points INTEGER NOT NULL,
+    detections INTEGER,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS sweeps_timestamp ON sweeps (timestamp);
+CREATE INDEX IF NOT EXISTS sweeps_chain ON sweeps (chain, timestamp);
+CREATE TABLE IF NOT EXISTS detections (
+    sweep INTEGER NOT NULL,
+    frequency REAL NOT NULL,
+    level REAL NOT NULL,
+    bandwidth REAL NOT NULL,
+    snr REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_frequency ON detections (frequency);
+CREATE INDEX IF NOT EXISTS detections_sweep ON detections (sweep);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    sweeps INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS free (
+    grp INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (grp, row)
+);
+"""
+INDEX_FILE = 'index.db'
+PAYLOAD_DTYPE = np.dtype('<f8')
+TRACE_EXTENSIONS = ('.csv', '.txt')
+
+def timeString(timestamp):
+    """Converts a datetime to the string stored in the index, which sorts in time order.
+    """
+    return timestamp.isoformat(timespec='microseconds')
+
+def parseTraceFile(f, name, mtime=None):
+    """Parses a saved trace or capture file.
+
+    Args:
+        f (file): Text file object to read from.
+        name (string): File name, used to detect the delimiter ('.txt' is tab delimited) and the RF chain of files saved without a Chain header.
+        mtime (float, optional): Modification time of the file, used as the time of acquisition of files saved without a Timestamp header. Defaults to None.
+
+    Raises:
+        ValueError: If the file does not contain a DATA section.
+
+    Returns:
+        list: Instances of Trace, one per sweep in the file.
+    """
+    delimiter = '\t' if '.txt' in name else ','
+    header = {}
+    for line in f:
+        line = line.rstrip('\r\n')
+        if line == 'DATA':
+            break
+        key, _, value = line.partition(delimiter)
+        header.setdefault(key, value)
+    else:
+        raise ValueError(f'{name} does not contain a DATA section.')
+
+    chain = header.pop('Chain', None) or os.path.basename(name).split('-')[0]
+    if 'Trigger Time' in header:
+        # Capture file, with a row of sweep timestamps followed by one column per sweep
+        columns = next(f).rstrip('\r\n').split(delimiter)
+        xunit, timestamps = columns[0], [datetime.fromisoformat(value) for value in columns[1:]]
+        data = np.loadtxt(f, delimiter=delimiter, ndmin=2)
+        parameters = {key: value for key, value in header.items() if key not in ('Trigger Time', 'Trigger', 'Pre-Trigger Sweeps', 'Post-Trigger Sweeps')}
+        return [Trace(data[:, index + 1], data[0, 0], data[-1, 0], timestamp, parameters, chain, xunit, data[:, 0]) for index, timestamp in enumerate(timestamps)]
+
+    if 'Timestamp' in header:
+        timestamp = datetime.fromisoformat(header.pop('Timestamp'))
+    elif mtime is not None:
+        timestamp = datetime.fromtimestamp(mtime)
+    else:
+        timestamp = datetime.now()
+    data = np.loadtxt(f, delimiter=delimiter, ndmin=2)
+    xunit = header.get('X Axis Units', 'Hz') or 'Hz'
+    return [Trace(data[:, 1], data[0, 0], data[-1, 0], timestamp, header, chain, xunit, data[:, 0])]
+
+class TraceArchive():
+    def __init__(self, directory, detection=None):
+        """Opens or creates a trace archive.
+
+        Args:
+            directory (string): Directory of the archive, created if it does not exist.
+            detection (dict, optional): [detection] section of the loaded configuration (See defaultconfig.py), used to detect signals in each imported sweep. Defaults to None, which does not run detection, so those sweeps match neither detected=True nor detected=False.
+        """
+        self.directory = directory
+        self.detection = detection
+        self.fileName = os.path.join(directory, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.payloads = {}          # Group ID mapped to (count, memmap) of its payload
+        os.makedirs(directory, exist_ok=True)
+        with self.connect() as db:
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f'{self.fileName} was created by a newer version (schema {version}).')
+            db.executescript(SCHEMA)
+            if 0 < version < 2:
+                self._collectFree(db)
+            db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    @contextmanager
+    def connect(self):
+        """Opens a connection which commits on success and is always closed. Connections are not shared between threads.
+        """
+        db = sqlite3.connect(self.fileName, timeout=10.0)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute('PRAGMA journal_mode = WAL')
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def payloadPath(self, group):
+        return os.path.join(self.directory, f'group-{group}.f64')
+
+    def axisPath(self, axis):
+        return os.path.join(self.directory, f'axis-{axis}.npy')
+
+    def _group(self, db, trace):
+        """Returns the ID and sweep count of the group of a trace's X axis, creating it if needed. X axes which are not evenly spaced are stored in an axis file named by their hash.
+        """
+        xdata = trace.frequency
+        axis = ''
+        if not np.array_equal(xdata, frequencyAxis(trace.start, trace.stop, trace.points)):
+            axis = hashlib.sha1(np.ascontiguousarray(xdata, dtype=PAYLOAD_DTYPE).tobytes()).hexdigest()
+            if not os.path.exists(self.axisPath(axis)):
+                np.save(self.axisPath(axis), np.asarray(xdata, dtype=PAYLOAD_DTYPE))
+        key = (trace.start, trace.stop, trace.points, trace.xunit, axis)
+        db.execute('INSERT OR IGNORE INTO groups (start, stop, points, xunit, axis) VALUES (?, ?, ?, ?, ?)', key)
+        row = db.execute('SELECT id, count FROM groups WHERE start = ? AND stop = ? AND points = ? AND xunit = ? AND axis = ?', key).fetchone()
+        return row['id'], row['count']
+
+    def _collectFree(self, db):
+        """Records the payload rows which are not indexed by any sweep as free, e.g. the rows of sweeps replaced by archives created before rows were reused.
+        """
+        for group, count in db.execute('SELECT id, count FROM groups').fetchall():
+            used = {row for row, in db.execute('SELECT row FROM sweeps WHERE grp = ?', (group,))}
+            db.executemany('INSERT OR IGNORE INTO free (grp, row) VALUES (?, ?)', [(group, row) for row in range(count) if row not in used])
+
+    def _add(self, db, trace, source=None, reusable=None):
+        group, count = self._group(db, trace)
+        rows = reusable.get(group) if reusable is not None else None
+        if rows:
+            row = rows.pop()
+            db.execute('DELETE FROM free WHERE grp = ? AND row = ?', (group, row))
+        else:
+            # Bytes left after the last row by an import which failed before its rows were indexed are overwritten. The file is not truncated since it may be memory-mapped.
+            row = count
+        path = self.payloadPath(group)
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+            f.seek(row * trace.points * PAYLOAD_DTYPE.itemsize)
+            f.write(np.ascontiguousarray(trace.amplitude, dtype=PAYLOAD_DTYPE).tobytes())
+        detections = None
+        if self.detection is not None:
+            cfg = self.detection
+            detections = detect(trace, cfg['threshold'], cfg['window'], cfg['percentile'], cfg['merge_gap'], cfg['min_width'])
+        cursor = db.execute('INSERT INTO sweeps (grp, row, timestamp, chain, start, stop, points, detections, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (group, row, timeString(trace.timestamp), trace.chain, trace.start, trace.stop, trace.points, None if detections is None else len(detections), source))
+        if detections:
+            db.executemany('INSERT INTO detections (sweep, frequency, level, bandwidth, snr) VALUES (?, ?, ?, ?, ?)',
+                           [(cursor.lastrowid, detection.frequency, detection.level, detection.bandwidth, detection.snr) for detection in detections])
+        if row == count:
+            db.execute('UPDATE groups SET count = ? WHERE id = ?', (count + 1, group))
+        return cursor.lastrowid
+
+    def add(self, trace, source=None):
+        """Adds a trace to the archive.
+
+        Args:
+            trace (Trace): Trace to add.
+            source (string, optional): File the trace was imported from. Defaults to None.
+
+        Returns:
+            int: ID of the sweep in the archive.
+        """
+        with self.lock, self.connect() as db:
+            return self._add(db, trace, source)
+
+    def importTraces(self, traces, source, mtime):
+        """Adds the traces of a file in one transaction and records the file as imported, replacing the sweeps of an earlier import of the file. The payload rows of the replaced sweeps are recorded as free. Rows freed by earlier transactions are reused by the added traces with the same X axis, while the rows freed here are only reused by later imports, so the replaced sweeps are intact if this transaction is rolled back. Re-importing a file therefore takes at most twice the rows of its sweeps.
+
+        Args:
+            traces (list): Instances of Trace.
+            source (string): Path of the file.
+            mtime (float): Modification time of the file.
+        """
+        with self.lock, self.connect() as db:
+            reusable = {}
+            for group, row in db.execute('SELECT grp, row FROM free ORDER BY grp, row DESC'):
+                reusable.setdefault(group, []).append(row)
+            db.execute('INSERT OR IGNORE INTO free (grp, row) SELECT grp, row FROM sweeps WHERE source = ?', (source,))
+            db.execute('DELETE FROM detections WHERE sweep IN (SELECT id FROM sweeps WHERE source = ?)', (source,))
+            db.execute('DELETE FROM sweeps WHERE source = ?', (source,))
+            for trace in traces:
+                self._add(db, trace, source, reusable)
+            db.execute('INSERT OR REPLACE INTO sources (path, mtime, sweeps) VALUES (?, ?, ?)', (source, mtime, len(traces)))
+
+    def imported(self):
+        """Returns the modification time of each imported file at the time it was imported.
+
+        Returns:
+            dict: Paths mapped to modification times.
+        """
+        with self.connect() as db:
+            return {row['path']: row['mtime'] for row in db.execute('SELECT path, mtime FROM sources')}
+
+    def importPath(self, path):
+        """Imports the trace and capture files in a directory (recursively), in a zip file, or a single file. Files which were already imported and have not been modified since are skipped. Files which cannot be parsed are logged and skipped.
+
+        Args:
+            path (string): Directory, zip file, or trace file.
+
+        Returns:
+            int: Number of sweeps imported.
+        """
+        imported = self.imported()
+        sweeps = 0
+        for source, mtime, opener in self._files(path):
+            if imported.get(source) == mtime:
+                continue
+            try:
+                with opener() as f:
+                    traces = parseTraceFile(f, source, mtime)
+                self.importTraces(traces, source, mtime)
+                sweeps += len(traces)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}. Could not import {source}.')
+        return sweeps
+
+    def _files(self, path):
+        """Yields (source, mtime, opener) of each trace file in path, where opener returns a text file object.
+        """
+        if zipfile.is_zipfile(path):
+            archive = zipfile.ZipFile(path)
+            for info in archive.infolist():
+                if info.filename.lower().endswith(TRACE_EXTENSIONS):
+                    mtime = datetime(*info.date_time).timestamp()
+                    yield f'{os.path.abspath(path)}/{info.filename}', mtime, lambda info=info: io.TextIOWrapper(archive.open(info), encoding='utf-8')
+            archive.close()
+        elif os.path.isdir(path):
+            for directory, _, fileNames in os.walk(path):
+                for fileName in sorted(fileNames):
+                    if fileName.lower().endswith(TRACE_EXTENSIONS):
+                        yield from self._files(os.path.join(directory, fileName))
+        else:
+            path = os.path.abspath(path)
+            yield path, os.path.getmtime(path), lambda: open(path, 'r', encoding='utf-8')
+
+    def query(self, start=None, end=None, chain=None, fmin=None, fmax=None, detected=None, signal=None, limit=None):
+        """Returns the sweeps which match every given filter, from oldest to newest.
+
+        Args:
+            start (datetime, optional): Earliest time of acquisition. Defaults to None.
+            end (datetime, optional): Latest time of acquisition. Defaults to None.
+            chain (string, optional): Name of the RF chain. Defaults to None.
+            fmin (float, optional): Only sweeps whose X axis overlaps [fmin, fmax]. Defaults to None.
+            fmax (float, optional): Only sweeps whose X axis overlaps [fmin, fmax]. Defaults to None.
+            detected (bool, optional): Only sweeps with (True) or without (False) detections. Defaults to None.
+            signal (tuple, optional): (low, high) X axis range in which a sweep must have a detection. Defaults to None.
+            limit (int, optional): Maximum number of sweeps to return. Defaults to None.
+
+        Returns:
+            list: Dictionaries with the 'id', 'grp', 'row', 'timestamp', 'chain', 'start', 'stop', 'points', 'detections', and 'source' of each sweep.
+        """
+        clauses, args = [], []
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            args.append(timeString(start))
+        if end is not None:
+            clauses.append('timestamp <= ?')
+            args.append(timeString(end))
+        if chain is not None:
+            clauses.append('chain = ?')
+            args.append(chain)
+        if fmin is not None:
+            clauses.append('MAX(start, stop) >= ?')
+            args.append(fmin)
+        if fmax is not None:
+            clauses.append('MIN(start, stop) <= ?')
+            args.append(fmax)
+        if detected is not None:
+            clauses.append('detections > 0' if detected else 'detections = 0')
+        if signal is not None:
+            clauses.append('id IN (SELECT sweep FROM detections WHERE frequency BETWEEN ? AND ?)')
+            args.extend(signal)
+        sql = 'SELECT * FROM sweeps'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY timestamp, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        with self.connect() as db:
+            return [dict(row) for row in db.execute(sql, args)]
+
+    def detections(self, sweep):
+        """Returns the detections of a sweep as dictionaries with its 'frequency', 'level', 'bandwidth', and 'snr'.
+        """
+        with self.connect() as db:
+            return [dict(row) for row in db.execute('SELECT frequency, level, bandwidth, snr FROM detections WHERE sweep = ? ORDER BY frequency', (sweep,))]
+
+    def payload(self, group):
+        """Returns the memory-mapped amplitudes of a group as a read-only array with one row per sweep. Rows are only read from disk when they are accessed.
+
+        Args:
+            group (int): Group ID.
+
+        Returns:
+            numpy.memmap: Array of shape (sweeps, points).
+        """
+        with self.connect() as db:
+            row = db.execute('SELECT points, count FROM groups WHERE id = ?', (group,)).fetchone()
+        if row is None:
+            raise KeyError(f'Group {group} is not in the archive.')
+        with self.lock:
+            count, array = self.payloads.get(group, (None, None))
+            if count != row['count']:
+                array = np.memmap(self.payloadPath(group), dtype=PAYLOAD_DTYPE, mode='r', shape=(row['count'], row['points']))
+                self.payloads[group] = (row['count'], array)
+            return array
+
+    def axis(self, group):
+        """Returns the X axis of a group.
+        """
+        with self.connect() as db:
+            row = db.execute('SELECT start, stop, points, axis FROM groups WHERE id = ?', (group,)).fetchone()
+        if row is None:
+            raise KeyError(f'Group {group} is not in the archive.')
+        if row['axis']:
+            return np.load(self.axisPath(row['axis']), mmap_mode='r')
+        return frequencyAxis(row['start'], row['stop'], row['points'])
+
+    def trace(self, record):
+        """Returns a sweep returned by query() as a Trace. The amplitudes are copied from the payload.
+        """
+        with self.connect() as db:
+            xunit = db.execute('SELECT xunit FROM groups WHERE id = ?', (record['grp'],)).fetchone()['xunit']
+        return Trace(self.payload(record['grp'])[record['row']], record['start'], record['stop'], datetime.fromisoformat(record['timestamp']), {}, record['chain'], xunit, self.axis(record['grp']))
+
+    def slice(self, frequency, **filters):
+        """Returns the amplitude of the bin nearest to a frequency in every matching sweep whose X axis contains the frequency. Only that bin of each sweep is read from the payloads.
+
+        Args:
+            frequency (float): X axis value of the bin.
+            filters: Keyword arguments of query().
+
+        Returns:
+            tuple: List of the sweeps (See query()), numpy.ndarray of the X axis value of the bin nearest to the frequency in each sweep, and numpy.ndarray of the amplitudes.
+        """
+        filters.setdefault('fmin', frequency)
+        filters.setdefault('fmax', frequency)
+        records = self.query(**filters)
+        xvalues = np.empty(len(records))
+        amplitudes = np.empty(len(records))
+        byGroup = {}
+        for index, record in enumerate(records):
+            byGroup.setdefault(record['grp'], []).append(index)
+        for group, indices in byGroup.items():
+            axis = self.axis(group)
+            column = int(np.argmin(np.abs(axis - frequency)))
+            rows = np.array([records[index]['row'] for index in indices])
+            xvalues[indices] = axis[column]
+            amplitudes[indices] = self.payload(group)[rows, column]
+        return records, xvalues, amplitudes
+
+def parseTime(value):
+    """Parses an ISO 8601 time argument of the command line interface.
+    """
+    return datetime.fromisoformat(value)
+
+def parseRange(value):
+    """Parses a 'low:high' X axis range argument of the command line interface.
+    """
+    low, high = value.split(':')
+    return float(low), float(high)
+
+def main():
+    import defaultconfig
+    parser = argparse.ArgumentParser(description='Index saved trace and capture files and search them by time, RF chain, frequency range, and detections.')
+    parser.add_argument('archive', help='Directory of the archive, created if it does not exist.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    index = commands.add_parser('index', help='Import the trace and capture files in directories, zip files, or files. Unmodified files are only imported once.')
+    index.add_argument('paths', nargs='+', help='Directories, zip files, or trace files.')
+    index.add_argument('--no-detection', action='store_true', help='Do not detect signals in the imported sweeps.')
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--start', type=parseTime, default=None, help='Earliest time of acquisition, e.g. 2025-01-23T08:00.')
+    filters.add_argument('--end', type=parseTime, default=None, help='Latest time of acquisition.')
+    filters.add_argument('--chain', default=None, help='RF chain, e.g. DFS1.')
+    filters.add_argument('--detected', action='store_true', default=None, help='Only sweeps with detections.')
+    filters.add_argument('--undetected', action='store_false', dest='detected', help='Only sweeps without detections.')
+    filters.add_argument('--signal', type=parseRange, default=None, help='Only sweeps with a detection in the range low:high (Hz).')
+    filters.add_argument('--limit', type=int, default=None, help='Maximum number of sweeps.')
+    query = commands.add_parser('query', parents=[filters], help='Print the matching sweeps.')
+    query.add_argument('--fmin', type=float, default=None, help='Only sweeps whose X axis overlaps [fmin, fmax].')
+    query.add_argument('--fmax', type=float, default=None, help='Only sweeps whose X axis overlaps [fmin, fmax].')
+    query.add_argument('--detections', action='store_true', help='Also print the detections of each sweep.')
+    _slice = commands.add_parser('slice', parents=[filters], help='Print the amplitude of one frequency bin in every matching sweep as csv.')
+    _slice.add_argument('frequency', type=float, help='Frequency (Hz) of the bin.')
+    _slice.add_argument('--output', default=None, help='csv file to write to. Defaults to standard output.')
+    args = parser.parse_args()
+
+    cfg, missingHeaders, missingKeys, cfg_error = defaultconfig.loadConfig()
+    detection = None if args.command == 'index' and args.no_detection else cfg['detection']
+    archive = TraceArchive(args.archive, detection)
+    match args.command:
+        case 'index':
+            for path in args.paths:
+                if not os.path.exists(path):
+                    parser.error(f'{path} does not exist.')
+                print(f'Imported {archive.importPath(path)} sweeps from {path}')
+        case 'query':
+            records = archive.query(args.start, args.end, args.chain, args.fmin, args.fmax, args.detected, args.signal, args.limit)
+            for record in records:
+                print(f"{record['timestamp']}  {record['chain']:<8} {record['start']:>14.6g} {record['stop']:>14.6g} {record['points']:>7}  {record['detections'] if record['detections'] is not None else '-':>4}  {record['source'] or ''}")
+                if args.detections:
+                    for detection in archive.detections(record['id']):
+                        print(f"    {detection['frequency']:.6g} Hz  {detection['level']:.2f} dBm  SNR {detection['snr']:.2f} dB  BW {detection['bandwidth']:.6g}")
+            print(f'{len(records)} sweeps')
+        case 'slice':
+            records, xvalues, amplitudes = archive.slice(args.frequency, start=args.start, end=args.end, chain=args.chain, detected=args.detected, signal=args.signal, limit=args.limit)
+            f = open(args.output, 'w', newline='') if args.output else sys.stdout
+            try:
+                writer = csv.writer(f)
+                writer.writerow(('Timestamp', 'Chain', 'Frequency', 'Amplitude'))
+                for record, xvalue, amplitude in zip(records, xvalues, amplitudes):
+                    writer.writerow((record['timestamp'], record['chain'], xvalue, amplitude))
+            finally:
+                if f is not sys.stdout:
+                    f.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+"""Module that contains the asyncio core of the front end: one event loop in a background thread which runs the display loops as tasks, and the bridge used by those tasks to update the Tk interface from the Tk thread.
+Blocking device IO (pyvisa and pyserial) runs in a single-thread executor per device, so calls to a device are serialized and a waiting task does not occupy a thread. While no device is being polled the loop is idle.
+"""
+
+import asyncio
+import functools
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from frontendio import MotorIO
+from opcodes import opcodes
+
+BRIDGE_INTERVAL = 20        # Milliseconds between checks of the Tk bridge queue
+POLL_INTERVAL = 0.01        # Seconds between reads while waiting for a serial response
+BUSY_POLL_DELAY = 0.05      # Seconds between checks of the Operation Status Register while the analyzer is busy
+
+class AsyncCore():
+    def __init__(self, name='AsyncCore'):
+        """Event loop which runs in a daemon thread. Coroutines are submitted from any thread with submit() or run().
+
+        Args:
+            name (string, optional): Name of the loop thread. Defaults to 'AsyncCore'.
+        """
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.tasks = set()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        """Starts the loop thread. Does nothing if it is already running.
+        """
+        if not self.thread.is_alive():
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Cancels every task submitted with submit() and stops the loop.
+        """
+        def _stop():
+            for task in self.tasks:
+                task.cancel()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(_stop)
+
+    def submit(self, coroutine, name=None):
+        """Runs a coroutine as a task on the loop. Exceptions which end the task are logged. Can be called from any thread.
+
+        Args:
+            coroutine (coroutine): Coroutine to run, e.g. SpecAn.analyzerDisplayTask().
+            name (string, optional): Name of the task. Defaults to None.
+
+        Returns:
+            concurrent.futures.Future: Result of the coroutine.
+        """
+        async def _task():
+            task = asyncio.current_task()
+            if name is not None:
+                task.set_name(name)
+            self.tasks.add(task)
+            try:
+                return await coroutine
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}. Task {task.get_name()} stopped.')
+                raise
+            finally:
+                self.tasks.discard(task)
+        return asyncio.run_coroutine_threadsafe(_task(), self.loop)
+
+    def run(self, coroutine, timeout=None):
+        """Runs a coroutine on the loop and waits for its result. Must not be called from the loop thread.
+
+        Args:
+            coroutine (coroutine): Coroutine to run.
+            timeout (float, optional): Maximum time in seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            Any: Result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def call(self, function, *args, **kwargs):
+        """Runs a function on the loop thread and waits for its result, e.g. to start an AsyncIOScheduler, which must be started from its event loop. Must not be called from the loop thread.
+
+        Returns:
+            Any: Result of the function.
+        """
+        async def _call():
+            return function(*args, **kwargs)
+        return self.run(_call())
+
+    def signal(self, event):
+        """Sets an asyncio.Event from any thread, e.g. to wake a task waiting in waitFor().
+        """
+        self.loop.call_soon_threadsafe(event.set)
+
+    async def waitFor(self, event, timeout):
+        """Waits until an event is set or the timeout expires, then clears the event.
+
+        Args:
+            event (asyncio.Event): Event to wait for.
+            timeout (float): Maximum time in seconds to wait.
+
+        Returns:
+            bool: True if the event was set.
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            event.clear()
+
+class TkBridge():
+    def __init__(self, root, interval=BRIDGE_INTERVAL):
+        """Runs functions posted from other threads on the Tk thread, since tkinter widgets must only be used from the thread which created them. The queue is checked every interval milliseconds with root.after().
+
+        Args:
+            root (tkinter.Tk): Root window.
+            interval (int, optional): Milliseconds between checks of the queue. Defaults to BRIDGE_INTERVAL.
+        """
+        self.root = root
+        self.interval = interval
+        self.queue = queue.SimpleQueue()
+        self.root.after(self.interval, self._drain)
+
+    def _drain(self):
+        while True:
+            try:
+                function, args, kwargs, future = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None and not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                if future is not None:
+                    future.set_exception(e)
+                else:
+                    logging.error(f'{type(e).__name__}: {e}')
+            else:
+                if future is not None:
+                    future.set_result(result)
+        self.root.after(self.interval, self._drain)
+
+    def post(self, function, *args, **kwargs):
+        """Queues a function to run on the Tk thread without waiting for it. Can be called from any thread.
+        """
+        self.queue.put((function, args, kwargs, None))
+
+    def call(self, function, *args, **kwargs):
+        """Runs a function on the Tk thread and returns an awaitable of its result, so a task waits for the interface to be updated before continuing. Must be awaited on the loop of AsyncCore, not on the Tk thread.
+
+        Returns:
+            asyncio.Future: Result of the function.
+        """
+        future = Future()
+        self.queue.put((function, args, kwargs, future))
+        return asyncio.wrap_future(future)
+
+class AsyncDevice():
+    def __init__(self, core, name, lock=None):
+        """Runs the blocking IO methods of a device in a single-thread executor, so calls to the device are serialized and tasks wait for them without blocking the loop. Tasks are excluded from each other by an asyncio.Lock, and code on other threads by the device lock.
+
+        Args:
+            core (AsyncCore): Core whose loop awaits the calls.
+            name (string): Name of the device, used for the executor thread.
+            lock (threading.RLock, optional): Lock shared with code which uses the device from other threads. It is held for the duration of each call, or for a block of calls with locked(). Defaults to None.
+        """
+        self.core = core
+        self.name = name
+        self.lock = lock
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix=name)
+        self.taskLock = None        # asyncio.Lock created on the loop by _taskLock()
+        self.owner = None           # Task which holds the block of locked()
+
+    def _taskLock(self):
+        if self.taskLock is None:
+            self.taskLock = asyncio.Lock()
+        return self.taskLock
+
+    def _locked(self, function, args, kwargs):
+        if self.lock is None:
+            return function(*args, **kwargs)
+        with self.lock:
+            return function(*args, **kwargs)
+
+    async def call(self, function, *args, **kwargs):
+        """Runs a blocking function in the device's executor with the device lock held and returns its result. Waits while another task holds the block of locked().
+        """
+        call = functools.partial(self._locked, function, args, kwargs)
+        if self.owner is not None and self.owner is asyncio.current_task():
+            return await self.core.loop.run_in_executor(self.executor, call)
+        async with self._taskLock():
+            return await self.core.loop.run_in_executor(self.executor, call)
+
+    @asynccontextmanager
+    async def locked(self):
+        """Holds the device across several calls and awaits, e.g. between writing a query and reading its response. Other tasks wait on the asyncio.Lock of the device until the block exits, and the device lock is held so other threads wait as well. The device lock is acquired and released by the executor thread, which also makes every call inside the block, so it can be reentrant. Blocks can be nested within the same task, but not across tasks, e.g. with asyncio.gather().
+        """
+        task = asyncio.current_task()
+        if self.owner is task:
+            yield
+            return
+        async with self._taskLock():
+            self.owner = task
+            try:
+                if self.lock is None:
+                    yield
+                    return
+                await self.core.loop.run_in_executor(self.executor, self.lock.acquire)
+                try:
+                    yield
+                finally:
+                    await self.core.loop.run_in_executor(self.executor, self.lock.release)
+            finally:
+                self.owner = None
+
+class AsyncVisa(AsyncDevice):
+    def __init__(self, core, Vi, lock=None):
+        """Asynchronous adapter of VisaIO. pyvisa calls block, so each call runs in the executor.
+
+        Args:
+            core (AsyncCore): Core whose loop awaits the calls.
+            Vi (VisaIO): Object of VisaIO.
+            lock (threading.RLock, optional): VISA lock. Defaults to None.
+        """
+        super().__init__(core, 'AsyncVisa', lock)
+        self.Vi = Vi
+
+    async def isBusy(self, mask=0b00011011):
+        """Returns whether the analyzer is calibrating, settling, sweeping, or measuring according to its Operation Status Register.
+        """
+        return bool(await self.call(self.Vi.getOperationRegister) & mask)
+
+    async def acquireWhenReady(self, function, *args, running=None, delay=BUSY_POLL_DELAY):
+        """Waits until the analyzer is not busy, then calls a blocking acquisition function in the executor, e.g. tracedata.acquireTrace(). The lock is held from the check of the Operation Status Register until the acquisition returns, and released while waiting so other threads can use the analyzer.
+
+        Args:
+            function (function): Blocking function which acquires a sweep.
+            *args: Arguments of the function.
+            running (callable, optional): Called before each check, waiting stops if it returns False, e.g. when sweeping is stopped. Defaults to None (wait until the analyzer is not busy).
+            delay (float, optional): Time in seconds between checks. Defaults to BUSY_POLL_DELAY.
+
+        Returns:
+            any: Result of the function, or None if waiting was stopped.
+        """
+        while running is None or running():
+            async with self.locked():
+                if not await self.isBusy():
+                    return await self.call(function, *args)
+            await asyncio.sleep(delay)
+        return None
+
+class AsyncMotor(AsyncDevice):
+    def __init__(self, core, Motor, lock=None):
+        """Asynchronous adapter of MotorIO. Unlike MotorIO.query(), query() waits for the response with asyncio.sleep() so no thread is occupied while the controller responds.
+
+        Args:
+            core (AsyncCore): Core whose loop awaits the calls.
+            Motor (MotorIO): Object of MotorIO.
+            lock (threading.RLock, optional): Motor lock. Defaults to None.
+        """
+        super().__init__(core, 'AsyncMotor', lock)
+        self.Motor = Motor
+
+    async def write(self, msg):
+        await self.call(self.Motor.write, msg)
+
+    async def query(self, msg, timeout=5.0):
+        """Writes a message to the motor controller and waits for a response, like MotorIO.query().
+
+        Args:
+            msg (string): Message to send.
+            timeout (float, optional): Amount of time in seconds to wait for a response. Defaults to 5.0.
+
+        Raises:
+            TimeoutError: If no response is read after 'timeout' seconds.
+
+        Returns:
+            string: Response decoded in utf-8.
+        """
+        async with self.locked():
+            await self.call(self.Motor.write, msg)
+            await asyncio.sleep(0.1)
+            deadline = self.core.loop.time() + timeout
+            while self.core.loop.time() < deadline:
+                buffer = await self.call(self.Motor.read)
+                if buffer:
+                    return buffer
+                await asyncio.sleep(POLL_INTERVAL)
+        raise TimeoutError('Timeout expired before motor query response.')
+
+    async def queryBearing(self, home, countsPerDegree):
+        """Queries the encoders of both axes and returns the azimuth and elevation in degrees.
+
+        Args:
+            home (tuple): Encoder counts of the home position of the X and Y axes (See [calibration]).
+            countsPerDegree (tuple): Encoder counts per degree of the X and Y axes.
+
+        Raises:
+            ValueError: If an encoder query does not return one count (See MotorIO.parseEncoder()).
+
+        Returns:
+            tuple: Azimuth and elevation in degrees, rounded to 4 decimals.
+        """
+        async with self.locked():
+            xEnc = MotorIO.parseEncoder(await self.query('PRINT P6144'))
+            yEnc = MotorIO.parseEncoder(await self.query('PRINT P6160'))
+        return round((xEnc - home[0]) / countsPerDegree[0], 4), round((yEnc - home[1]) / countsPerDegree[1], 4)
+
+class AsyncPLC(AsyncDevice):
+    def __init__(self, core, PLC, lock=None):
+        """Asynchronous adapter of SerialIO for the PLC.
+
+        Args:
+            core (AsyncCore): Core whose loop awaits the calls.
+            PLC (SerialIO): Object of SerialIO connected to the PLC.
+            lock (threading.RLock, optional): PLC lock. Defaults to None.
+        """
+        super().__init__(core, 'AsyncPLC', lock)
+        self.PLC = PLC
+
+    async def selectChain(self, opcode, timeout=None, interval=None):
+        """Writes a selection opcode and polls opcodes.QUERY_STATUS until the PLC reports the opcode as its status, like SerialIO.selectChain() but waiting between queries with asyncio.sleep().
+
+        Args:
+            opcode (int): Opcode to write, e.g. opcodes.DFS_CHAIN1.value.
+            timeout (float, optional): Maximum time in seconds to wait for confirmation. Defaults to PLC.TIMEOUT.
+            interval (float, optional): Time in seconds between status queries. Defaults to PLC.WRITE_DELAY.
+
+        Returns:
+            bool: True if the PLC confirmed the selection within the timeout.
+        """
+        if timeout is None:
+            timeout = self.PLC.TIMEOUT
+        if interval is None:
+            interval = self.PLC.WRITE_DELAY
+        await self.call(self.PLC.write, opcode)
+        deadline = self.core.loop.time() + timeout
+        while self.core.loop.time() < deadline:
+            await asyncio.sleep(interval)
+            await self.call(self.PLC.read)
+            if self.PLC.status == opcode:
+                return True
+            await self.call(self.PLC.write, opcodes.QUERY_STATUS.value, log=False)
+        await self.call(self.PLC.read)
+        return self.PLC.status == opcode
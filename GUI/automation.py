@@ -0,0 +1,116 @@
+"""Module that contains helpers for the automation task scheduler which are shared by the front end and the headless service.
+"""
+
+import logging
+import threading
+
+from opcodes import *
+from parameters import *
+from tracedata import *
+
+def createScheduler(cfg, loop=None):
+    """Imports apscheduler and constructs a scheduler from the [automation] configuration. apscheduler is imported here so it is not loaded until the scheduler is needed.
+    If an event loop is passed, the scheduler runs its timer on that loop instead of in a thread of its own (See asynccore.AsyncCore). Jobs run in the thread pool executor in either case.
+
+    Args:
+        cfg (dict): Loaded configuration (See defaultconfig.py).
+        loop (asyncio.AbstractEventLoop, optional): Event loop of an AsyncIOScheduler. Defaults to None, which constructs a BackgroundScheduler.
+
+    Returns:
+        BaseScheduler: The task scheduler, which has not been started. An AsyncIOScheduler must be started from its event loop.
+    """
+    from apscheduler.executors.pool import ThreadPoolExecutor
+    executors = {
+        'default': ThreadPoolExecutor(cfg['automation']['thread_max_workers']),
+    }
+    job_defaults = {
+        'coalesce': cfg['automation']['coalesce'],
+        'max_instances': cfg['automation']['job_max_instances']
+    }
+    if loop is not None:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        return AsyncIOScheduler(event_loop=loop, executors=executors, job_defaults=job_defaults)
+    from apscheduler.schedulers.background import BackgroundScheduler
+    return BackgroundScheduler(executors=executors, job_defaults=job_defaults)
+
+def sweepChains(Vi, PLC, visaLock, plcLock, cfg, filePath, acquisition='trace', binary=True, correction=None, history=None, writer=None, wait=False):
+    """Selects each RF chain in the [chains] configuration with the PLC, applies its analyzer preset, acquires a sweep, and saves it as csv. The analyzer preset is applied while the PLC switches and settles, so the time to reconfigure the analyzer overlaps with waiting for the PLC to confirm the selection.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        PLC (SerialIO): Object of SerialIO with an open connection to the PLC.
+        visaLock (threading.Lock): Lock held while communicating with the analyzer.
+        plcLock (threading.Lock): Lock held while selecting a chain with the PLC, so the status queries of other tasks (e.g. the PLC supervisor) are not written between the selection and its confirmation.
+        cfg (dict): [chains] section of the loaded configuration (See defaultconfig.py).
+        filePath (string): Directory to save to.
+        acquisition (string, optional): Passed to acquireTrace(). Defaults to 'trace'.
+        binary (bool, optional): Passed to acquireTrace(). Defaults to True.
+        correction (GainCorrection, optional): Gain correction applied to each trace. Defaults to None.
+        history (TraceHistory, optional): History each trace is appended to. Defaults to None.
+        writer (TraceWriter, optional): Writer which saves each trace in the background. Defaults to None, which saves each trace before sweeping the next chain.
+        wait (bool, optional): Waits until the writer has written the traces before returning, so only the files which were written are returned, e.g. for a campaign run. Defaults to False.
+
+    Returns:
+        list: Paths of the saved files.
+    """
+    def _select(opcode, result):
+        try:
+            with plcLock:
+                result['confirmed'] = PLC.selectChain(opcode, cfg['timeout'], cfg['status_interval'])
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+            result['confirmed'] = False
+
+    saved = []
+    futures = []
+    for chain in cfg['sequence']:
+        try:
+            opcode = chainOpcode(chain)
+        except ValueError as e:
+            logging.error(f'{e}')
+            continue
+        result = {}
+        plcThread = threading.Thread(target=_select, args=(opcode.value, result), daemon=True)
+        plcThread.start()
+        try:
+            preset = cfg['presets'].get(chain, {})
+            if preset:
+                with visaLock:
+                    applyPreset(Vi, preset)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Could not apply the preset of chain {chain}.')
+            plcThread.join()
+            continue
+        plcThread.join()
+        if not result['confirmed']:
+            logging.error(f'PLC did not confirm selection of chain {chain} within {cfg["timeout"]} s.')
+            continue
+
+        try:
+            with visaLock:
+                trace = acquireTrace(Vi, chain, acquisition, binary)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Could not acquire chain {chain}.')
+            continue
+        if correction is not None:
+            trace = correction.correct(trace)
+        if history is not None:
+            history.append(trace)
+        if writer is not None:
+            fileName, future = writer.submit(trace, filePath)
+            futures.append(future)
+        else:
+            fileName = uniqueTracePath(filePath, chain)
+            writeTrace(open(fileName, 'w'), trace)
+        logging.info(f'Saved chain {chain} to {fileName}')
+        saved.append(fileName)
+
+    if cfg['sleep_after']:
+        try:
+            with plcLock:
+                PLC.selectChain(opcodes.SLEEP.value, cfg['timeout'], cfg['status_interval'])
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+    if writer is not None and wait:
+        saved = writer.wait(futures)
+    return saved
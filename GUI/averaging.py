@@ -0,0 +1,254 @@
+"""Module that contains software trace accumulators. Each accumulator is updated incrementally with every acquired sweep at O(1) cost per point, so several of them (e.g. max hold and average) can run on the same stream of traces without changing the trace type on the analyzer.
+All amplitudes are in dB (dBm or any other logarithmic unit), averages are computed in the linear power domain.
+"""
+
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+def dbToLinear(amplitude):
+    return np.power(10.0, np.asarray(amplitude) / 10.0)
+
+def linearToDb(power):
+    with np.errstate(divide='ignore'):
+        return 10.0 * np.log10(power)
+
+class Accumulator(ABC):
+    def __init__(self):
+        """Base class of software trace accumulators. Subclasses implement update() and result().
+        """
+        self.count = 0
+
+    @abstractmethod
+    def update(self, amplitude):
+        """Accumulates one sweep.
+
+        Args:
+            amplitude (numpy.ndarray): Amplitude values of the sweep in dB.
+        """
+
+    @abstractmethod
+    def result(self):
+        """Returns the accumulated trace in dB, or None if no sweeps have been accumulated.
+        """
+
+    def reset(self):
+        self.count = 0
+
+class RunningMean(Accumulator):
+    def __init__(self):
+        """Mean of every sweep since the last reset, averaged in the linear power domain.
+        """
+        super().__init__()
+        self.mean = None
+
+    def update(self, amplitude):
+        power = dbToLinear(amplitude)
+        self.count += 1
+        if self.mean is None:
+            self.mean = power
+        else:
+            self.mean += (power - self.mean) / self.count
+
+    def result(self):
+        if self.mean is None:
+            return None
+        return linearToDb(self.mean)
+
+    def reset(self):
+        super().reset()
+        self.mean = None
+
+class ExponentialAverage(Accumulator):
+    def __init__(self, alpha):
+        """Exponentially weighted moving average in the linear power domain.
+
+        Args:
+            alpha (float): Weight of the newest sweep, between 0 and 1.
+        """
+        super().__init__()
+        self.alpha = alpha
+        self.mean = None
+
+    def update(self, amplitude):
+        power = dbToLinear(amplitude)
+        self.count += 1
+        if self.mean is None:
+            self.mean = power
+        else:
+            self.mean += self.alpha * (power - self.mean)
+
+    def result(self):
+        if self.mean is None:
+            return None
+        return linearToDb(self.mean)
+
+    def reset(self):
+        super().reset()
+        self.mean = None
+
+class MaxHold(Accumulator):
+    def __init__(self):
+        """Maximum of every sweep since the last reset.
+        """
+        super().__init__()
+        self.hold = None
+
+    def update(self, amplitude):
+        self.count += 1
+        if self.hold is None:
+            self.hold = np.array(amplitude, dtype=np.float64)
+        else:
+            np.maximum(self.hold, amplitude, out=self.hold)
+
+    def result(self):
+        if self.hold is None:
+            return None
+        return self.hold.copy()
+
+    def reset(self):
+        super().reset()
+        self.hold = None
+
+class MinHold(MaxHold):
+    def __init__(self):
+        """Minimum of every sweep since the last reset.
+        """
+        super().__init__()
+
+    def update(self, amplitude):
+        self.count += 1
+        if self.hold is None:
+            self.hold = np.array(amplitude, dtype=np.float64)
+        else:
+            np.minimum(self.hold, amplitude, out=self.hold)
+
+class PercentileSketch(Accumulator):
+    # Number of points whose cumulative histogram is computed at once by result(), which bounds its temporary memory to CHUNK_POINTS x bins
+    CHUNK_POINTS = 4096
+
+    def __init__(self, percentile, lower, upper, resolution, maxCells=16777216):
+        """Per-point histogram of every sweep since the last reset, used to estimate a percentile (e.g. 50 for the median) of each point. Amplitudes outside of lower and upper are counted in the first and last bin, respectively.
+
+        Args:
+            percentile (float): Percentile between 0 and 100 returned by result().
+            lower (float): Lower edge of the histogram in dB.
+            upper (float): Upper edge of the histogram in dB.
+            resolution (float): Width of each histogram bin in dB.
+            maxCells (int, optional): Maximum number of histogram cells (points x bins), 4 bytes each. Defaults to 16777216 (64 MiB).
+        """
+        super().__init__()
+        self.percentile = percentile
+        self.lower = lower
+        self.resolution = resolution
+        self.bins = int(np.ceil((upper - lower) / resolution))
+        self.maxCells = maxCells
+        self.counts = None
+
+    def update(self, amplitude):
+        """Accumulates one sweep.
+
+        Args:
+            amplitude (numpy.ndarray): Amplitude values of the sweep in dB.
+
+        Raises:
+            ValueError: If the histogram of a sweep with this many points would exceed maxCells.
+        """
+        amplitude = np.asarray(amplitude)
+        if self.counts is None:
+            if amplitude.size * self.bins > self.maxCells:
+                raise ValueError(f'Histogram of {amplitude.size} points and {self.bins} bins exceeds {self.maxCells} cells. Increase percentile_resolution, narrow percentile_min and percentile_max, or raise percentile_max_cells under [averaging].')
+            self.counts = np.zeros((amplitude.size, self.bins), dtype=np.uint32)
+            self.rows = np.arange(amplitude.size)
+        index = ((amplitude - self.lower) / self.resolution).astype(np.intp)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.counts[self.rows, index] += 1
+        self.count += 1
+
+    def result(self, percentile=None):
+        """Returns the estimated percentile of each point in dB, at the center of the histogram bin which contains it.
+
+        Args:
+            percentile (float, optional): Percentile between 0 and 100. Defaults to self.percentile.
+        """
+        if self.counts is None:
+            return None
+        if percentile is None:
+            percentile = self.percentile
+        rank = max(1, int(np.ceil(percentile / 100 * self.count)))
+        index = np.empty(len(self.counts), dtype=np.intp)
+        for start in range(0, len(self.counts), self.CHUNK_POINTS):
+            chunk = self.counts[start:start + self.CHUNK_POINTS]
+            index[start:start + len(chunk)] = np.argmax(np.cumsum(chunk, axis=1, dtype=np.uint32) >= rank, axis=1)
+        return self.lower + (index + 0.5) * self.resolution
+
+    def reset(self):
+        super().reset()
+        self.counts = None
+
+class TraceAccumulator():
+    def __init__(self, accumulators):
+        """Feeds every acquired trace to a set of accumulators. All accumulators are reset when the X axis of the trace changes (start, stop, number of points, or unit), since sweeps with different axes cannot be combined. An accumulator which cannot accumulate a trace (e.g. a PercentileSketch whose histogram would be too large) is logged and disabled.
+
+        Args:
+            accumulators (dict): Names mapped to instances of Accumulator.
+        """
+        self.accumulators = accumulators
+        self.enabled = {name: False for name in accumulators}
+        self.axis = None
+        self.lock = threading.Lock()
+
+    def update(self, trace):
+        """Accumulates a trace in every enabled accumulator.
+
+        Args:
+            trace (Trace): Acquired trace.
+        """
+        axis = (trace.start, trace.stop, trace.points, trace.xunit)
+        with self.lock:
+            if axis != self.axis:
+                self.axis = axis
+                for accumulator in self.accumulators.values():
+                    accumulator.reset()
+            for name, accumulator in self.accumulators.items():
+                if self.enabled[name]:
+                    try:
+                        accumulator.update(trace.amplitude)
+                    except ValueError as e:
+                        logging.error(f'{type(e).__name__}: {e} {name} was disabled.')
+                        self.enabled[name] = False
+                        accumulator.reset()
+
+    def results(self):
+        """Returns the result of every enabled accumulator.
+
+        Returns:
+            dict: Names mapped to the accumulated trace in dB. Accumulators without a result are not included.
+        """
+        with self.lock:
+            _results = {}
+            for name, accumulator in self.accumulators.items():
+                if self.enabled[name]:
+                    result = accumulator.result()
+                    if result is not None:
+                        _results[name] = result
+            return _results
+
+    def setEnabled(self, name, enabled):
+        """Enables or disables an accumulator. Disabled accumulators are reset so they start from the next sweep when enabled again.
+
+        Args:
+            name (string): Name of the accumulator.
+            enabled (bool): True to enable, False to disable.
+        """
+        with self.lock:
+            self.enabled[name] = enabled
+            if not enabled:
+                self.accumulators[name].reset()
+
+    def reset(self):
+        with self.lock:
+            for accumulator in self.accumulators.values():
+                accumulator.reset()
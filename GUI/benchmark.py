@@ -0,0 +1,364 @@
+"""Module that contains the acquisition benchmark suite. Each benchmark repeats a front end code path against local stand-ins: the simulated analyzer over pyvisa-py, and in-process serial ports of the motor controller and PLC (See simulator.py), so no instruments are required.
+The device IO is driven through the same functions as the front end: the asynchronous adapters of asynccore.py on an AsyncCore, parameters.setParameters(), and writer.TraceWriter. Only the drawing, which needs the Tk window in main.py, is repeated here on an Agg canvas with the same matplotlib calls.
+Run 'python benchmark.py' to write the results to JSON and compare them against the stored baseline. The exit status is 1 if any metric regressed by more than its tolerance, so the suite can be run before merging changes to the acquisition path. Run 'python benchmark.py --update-baseline' to store the results as the new baseline.
+"""
+
+# PRIVATE LIBRARIES
+from loggingsetup import *
+import defaultconfig
+from frontendio import *
+from opcodes import *
+from parameters import *
+from tracedata import *
+from asynccore import AsyncCore, AsyncVisa, AsyncMotor, AsyncPLC
+from lockprofiler import ProfiledLock
+from writer import TraceWriter
+from simulator import SimulatorServer, SimulatedMotor, SimulatedPLC
+
+# OTHER MODULES
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+def metric(value, unit, better, description):
+    """Returns a benchmark result in the format written to the results file.
+
+    Args:
+        value (float): Measured value.
+        unit (string): Unit of the value.
+        better (string): 'higher' if larger values are better (rates), or 'lower' (latencies).
+        description (string): What was measured.
+    """
+    return {'value': value, 'unit': unit, 'better': better, 'description': description}
+
+def timeRepeated(function, iterations, warmup=1):
+    """Calls a function repeatedly and returns the duration of each call. Warm-up calls are not timed, so caches and connections are established before timing starts.
+
+    Args:
+        function (function): Function to call without arguments.
+        iterations (int): Number of timed calls.
+        warmup (int, optional): Number of untimed calls made first. Defaults to 1.
+
+    Returns:
+        list: Duration of each timed call in seconds.
+    """
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(iterations):
+        timer = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - timer)
+    return durations
+
+class Benchmark():
+    def __init__(self, cfg, iterations=None):
+        """Starts the simulated analyzer and connects the IO objects to the stand-ins.
+
+        Args:
+            cfg (dict): Loaded configuration (See defaultconfig.py).
+            iterations (int, optional): Number of timed repetitions of each measurement. Defaults to the [benchmark] configuration.
+        """
+        self.cfg = cfg
+        self.iterations = cfg['benchmark']['iterations'] if iterations is None else iterations
+        self.acquisition = cfg['analyzer']['acquisition']
+        self.binary = cfg['analyzer']['data_format'] == 'real32'
+        self.visaLock = ProfiledLock('visaLock')
+        self.motorLock = ProfiledLock('motorLock')
+        self.plcLock = ProfiledLock('plcLock')
+        self.traceHistory = TraceHistory(cfg['trace']['history_length'])
+
+        simulatorCfg = dict(cfg['simulator'], time_scale=cfg['benchmark']['time_scale'], latency=cfg['simulator']['latency'], seed=0)
+        self.server = SimulatorServer(simulatorCfg, port=0)
+        self.server.startThread()
+        self.Vi = VisaIO()
+        self.Vi.openResourceManager('@py')
+        if self.Vi.connectToRsrc(self.server.resourceName) == RETURN_ERROR:
+            raise ConnectionError(f'Could not connect to the simulator at {self.server.resourceName}.')
+        with self.visaLock:
+            self.Vi.resetAnalyzerState()
+            if self.acquisition == 'trace':
+                self.Vi.setTraceFormat(self.binary)
+            applyParameters(self.Vi)
+
+        self.Motor = MotorIO(0, 0)
+        self.Motor.ser = SimulatedMotor(cfg['simulator']['motor_latency'], cfg['calibration']['x_enc_home'], cfg['calibration']['y_enc_home'])
+        self.PLC = SerialIO()
+        self.PLC.serial = SimulatedPLC(cfg['simulator']['plc_latency'], cfg['simulator']['plc_switch_time'])
+
+        self.core = AsyncCore('BenchmarkCore').start()
+        self.visa = AsyncVisa(self.core, self.Vi, self.visaLock)
+        self.motor = AsyncMotor(self.core, self.Motor, self.motorLock)
+        self.plc = AsyncPLC(self.core, self.PLC, self.plcLock)
+
+    def close(self):
+        """Closes the analyzer session and stops the core and the simulator.
+        """
+        try:
+            self.Vi.closeSession()
+        finally:
+            self.core.stop()
+            self.server.shutdown()
+            self.server.server_close()
+
+    def analyzerLoop(self, points):
+        """Measures the sweep rate of the body of SpecAn.analyzerDisplayTask() (AsyncVisa.acquireWhenReady() with acquireTrace(), as SpecAn.acquire() calls it, the trace history, and plotting) at a number of sweep points. ANALYZER_LOOP_DELAY is not included.
+
+        Args:
+            points (int): Number of sweep points.
+
+        Returns:
+            dict: Metrics of the sweep rate and the acquisition latency.
+        """
+        with self.visaLock:
+            applyPreset(self.Vi, {'points': points})
+        fig = Figure()
+        ax = fig.add_subplot()
+        canvas = FigureCanvasAgg(fig)
+        lines = []
+        acquisitions = []
+
+        async def _acquire():
+            timer = time.perf_counter()
+            trace = await self.visa.acquireWhenReady(acquireTrace, self.Vi, 'SLEEP', self.acquisition, self.binary)
+            acquisitions.append(time.perf_counter() - timer)
+            return trace
+
+        def _sweep():
+            trace = self.core.run(_acquire())
+            self.traceHistory.append(trace)
+            if lines:
+                lines.pop(0).remove()
+            lines.extend(ax.plot(trace.frequency, trace.amplitude))
+            ax.grid(visible=True)
+            canvas.draw()
+
+        durations = timeRepeated(_sweep, self.iterations)
+        acquisition = statistics.median(acquisitions[1:])
+        return {
+            f'analyzer_loop_{points}': metric(1.0 / statistics.median(durations), 'sweeps/s', 'higher', f'Sweeps per second of the analyzer display loop at {points} points'),
+            f'acquire_trace_{points}': metric(acquisition, 's', 'lower', f'Latency of AsyncVisa.acquireWhenReady() with acquireTrace() at {points} points'),
+        }
+
+    def setAnalyzerValue(self):
+        """Measures the latency of setParameters() with one parameter, which applies it and queries every parameter as SpecAn.setAnalyzerValue() does. The argument is cleared afterwards so later benchmarks do not write it.
+        """
+        frequencies = [1e9, 2e9]
+
+        def _apply():
+            frequencies.reverse()
+            with self.visaLock:
+                setParameters(self.Vi, centerfreq=frequencies[0])
+
+        try:
+            durations = timeRepeated(_apply, self.iterations)
+        finally:
+            clearArguments([KEYWORDS['centerfreq']])
+        return {'set_analyzer_value': metric(statistics.median(durations), 's', 'lower', 'Latency of applying a parameter and querying every parameter')}
+
+    def saveTrace(self, points=None):
+        """Measures the rate of saving a trace to csv with TraceWriter.save(), as saveTrace() in main.py does, waiting for each trace to be written with TraceWriter.flush(). The trace is generated with a fixed number of points and seed instead of taken from the analyzer loop, so the result does not depend on the point counts benchmarked there. Files are written to a temporary directory which is removed afterwards.
+
+        Args:
+            points (int, optional): Number of points of the saved trace. Defaults to save_points of the [benchmark] configuration.
+        """
+        if points is None:
+            points = self.cfg['benchmark']['save_points']
+        amplitude = np.random.default_rng(0).normal(-100.0, 1.0, points).astype(np.float32)
+        trace = Trace(amplitude, 1e9, 2e9, datetime(2025, 1, 1), {'Sweep Points': str(points)}, 'DFS1')
+        sizes = []
+        writer = TraceWriter(self.cfg['writer']).start()
+        with tempfile.TemporaryDirectory() as directory:
+            def _save():
+                path = writer.save(trace, directory)
+                if not writer.flush():
+                    raise TimeoutError(f'{path} was not written.')
+                sizes.append(os.path.getsize(path))
+
+            try:
+                durations = timeRepeated(_save, self.iterations)
+            finally:
+                writer.close()
+        median = statistics.median(durations)
+        return {
+            f'save_trace_{points}': metric(1.0 / median, 'traces/s', 'higher', f'Traces saved per second at {points} points'),
+            f'save_trace_throughput_{points}': metric(statistics.median(sizes) / median / 1e6, 'MB/s', 'higher', f'Bytes written per second at {points} points'),
+        }
+
+    def motorQuery(self):
+        """Measures the round trip of AsyncMotor.query() with an encoder query.
+        """
+        def _query():
+            self.core.run(self.motor.query('PRINT P6144'))
+
+        durations = timeRepeated(_query, self.iterations)
+        return {'motor_query': metric(statistics.median(durations), 's', 'lower', 'Round trip of AsyncMotor.query()')}
+
+    def encoderRefresh(self):
+        """Measures the refresh rate of the body of AziElePlot.bearingDisplayTask() (AsyncMotor.queryBearing() and drawing both arrows). MOTOR_LOOP_DELAY is not included.
+        """
+        calibration = self.cfg['calibration']
+        home = (calibration['x_enc_home'], calibration['y_enc_home'])
+        countsPerDegree = (calibration['x_countsperrotation'] / 360, calibration['y_countsperrotation'] / 360)
+        fig = Figure()
+        azAxis, elAxis = fig.subplots(1, 2, subplot_kw=dict(projection='polar'))
+        canvas = FigureCanvasAgg(fig)
+        arrows = {}
+
+        def _refresh():
+            xPos, yPos = self.core.run(self.motor.queryBearing(home, countsPerDegree))
+            for axis, angle in ((azAxis, xPos), (elAxis, yPos)):
+                if axis in arrows:
+                    arrows[axis].remove()
+                arrows[axis] = axis.arrow(angle/180.*np.pi, 0, 0, 0.8, alpha = 1, width = 0.03, edgecolor = 'blue', facecolor = 'blue', lw = 3, zorder = 5)
+                canvas.draw()
+
+        durations = timeRepeated(_refresh, self.iterations)
+        return {'encoder_refresh': metric(1.0 / statistics.median(durations), 'updates/s', 'higher', 'Position updates per second of the bearing display loop')}
+
+    def chainSwitch(self):
+        """Measures the time for AsyncPLC.selectChain() to select a chain and receive confirmation from the PLC, alternating between the first two chains of the [chains] sequence.
+        """
+        chains = self.cfg['chains']
+        sequence = (chains['sequence'] * 2)[:2]
+        selections = [chainOpcode(name).value for name in sequence]
+
+        def _select():
+            selections.reverse()
+            if not self.core.run(self.plc.selectChain(selections[0], chains['timeout'], chains['status_interval'])):
+                raise TimeoutError(f'PLC did not confirm selection of {chainName(selections[0])}.')
+
+        durations = timeRepeated(_select, self.iterations)
+        return {'chain_switch': metric(statistics.median(durations), 's', 'lower', f'Time to select and confirm an RF chain with status_interval {chains["status_interval"]} s')}
+
+    def run(self, points=None):
+        """Runs every benchmark.
+
+        Args:
+            points (list, optional): Sweep point counts of the analyzer loop benchmark. Defaults to the [benchmark] configuration.
+
+        Returns:
+            dict: Metric names and their results (See metric()).
+        """
+        if points is None:
+            points = self.cfg['benchmark']['points']
+        results = {}
+        for count in points:
+            logging.info(f'Benchmarking analyzer loop at {count} points')
+            results.update(self.analyzerLoop(count))
+        for name, function in (('setAnalyzerValue', self.setAnalyzerValue), ('saveTrace', self.saveTrace), ('AsyncMotor.query', self.motorQuery), ('encoder refresh', self.encoderRefresh), ('chain switch', self.chainSwitch)):
+            logging.info(f'Benchmarking {name}')
+            results.update(function())
+        return results
+
+def environment(cfg, iterations):
+    """Returns a description of the machine and stand-in settings, stored with the results so baselines from different machines are not compared unknowingly.
+    """
+    import pyvisa
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pyvisa': pyvisa.__version__,
+        'iterations': iterations,
+        'time_scale': cfg['benchmark']['time_scale'],
+        'latency': cfg['simulator']['latency'],
+        'motor_latency': cfg['simulator']['motor_latency'],
+        'plc_latency': cfg['simulator']['plc_latency'],
+        'plc_switch_time': cfg['simulator']['plc_switch_time'],
+    }
+
+def compare(results, baseline, tolerance):
+    """Compares results against a baseline. A metric regresses if it is worse than the baseline value by more than its tolerance, e.g. a rate below (1 - tolerance) * baseline or a latency above (1 + tolerance) * baseline.
+
+    Args:
+        results (dict): Metrics returned by Benchmark.run().
+        baseline (dict): Metrics of the baseline. A metric with the key 'tolerance' overrides the tolerance argument.
+        tolerance (float): Allowed fractional regression.
+
+    Returns:
+        list: (name, baseline value, value, fractional change, status) of each metric, where status is 'ok', 'regressed', or 'new' if the metric is not in the baseline.
+    """
+    comparison = []
+    for name, result in results.items():
+        if name not in baseline:
+            comparison.append((name, None, result['value'], None, 'new'))
+            continue
+        reference = baseline[name]['value']
+        allowed = baseline[name].get('tolerance', tolerance)
+        change = (result['value'] - reference) / reference if reference else 0.0
+        if result['better'] == 'higher':
+            regressed = result['value'] < reference * (1 - allowed)
+        else:
+            regressed = result['value'] > reference * (1 + allowed)
+        comparison.append((name, reference, result['value'], change, 'regressed' if regressed else 'ok'))
+    return comparison
+
+def main():
+    cfg, missingHeaders, missingKeys, cfg_error = defaultconfig.loadConfig()
+    if missingHeaders or missingKeys or cfg_error is not None:
+        logging.warning('Error loading config.toml, loading default configuration.')
+
+    parser = argparse.ArgumentParser(description='Benchmark the acquisition path against the simulated analyzer, motor controller, and PLC, and compare the results against a stored baseline.')
+    parser.add_argument('--points', type=int, nargs='+', default=cfg['benchmark']['points'], help='Sweep point counts of the analyzer loop benchmark.')
+    parser.add_argument('--iterations', type=int, default=cfg['benchmark']['iterations'], help='Timed repetitions of each measurement.')
+    parser.add_argument('--results', default=defaultconfig.configPath(cfg['benchmark']['results']), help='File to write the results to.')
+    parser.add_argument('--baseline', default=defaultconfig.configPath(cfg['benchmark']['baseline']), help='Baseline file to compare the results against.')
+    parser.add_argument('--tolerance', type=float, default=cfg['benchmark']['tolerance'], help='Allowed fractional regression of each metric.')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline instead of comparing.')
+    parser.add_argument('--verbose', action='store_true', help='Log progress and IO of the stand-ins.')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    benchmark = Benchmark(cfg, args.iterations)
+    try:
+        results = benchmark.run(args.points)
+    finally:
+        benchmark.close()
+    output = {'environment': environment(cfg, args.iterations), 'metrics': results}
+    with open(args.results, 'w') as f:
+        json.dump(output, f, indent=4)
+    print(f'Wrote results to {args.results}')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=4)
+        print(f'Stored results as the baseline in {args.baseline}')
+        baseline = {}
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['metrics']
+    else:
+        logging.warning(f'Baseline {args.baseline} does not exist, run with --update-baseline to store one.')
+        baseline = {}
+
+    regressions = 0
+    print(f'{"Metric":<32}{"Baseline":>14}{"Result":>14}{"Change":>10}  Status')
+    for name, reference, value, change, status in compare(results, baseline, args.tolerance):
+        unit = results[name]['unit']
+        _reference = f'{reference:.4g}' if reference is not None else '-'
+        _change = f'{change:+.1%}' if change is not None else '-'
+        print(f'{name:<32}{_reference:>14}{value:>10.4g} {unit:<5}{_change:>8}  {status}')
+        if status == 'regressed':
+            regressions += 1
+    if regressions:
+        logging.error(f'{regressions} metrics regressed by more than their tolerance.')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""Module that contains automation campaigns. A campaign is one recurring job (a cron or interval trigger with start and end bounds) instead of one date job per sweep, so a multi-month campaign at a 5 minute cadence is a single job in the task scheduler.
+Each run is identified by its scheduled run time and recorded in a job store (See jobstore.JobStore), so an active campaign can be resumed after a restart without repeating completed runs, with runs missed while the program was closed handled by the campaign's misfire policy.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+TRIGGERS = ('cron', 'interval')
+MISFIRE_POLICIES = ('skip', 'run_once')
+_SECOND = timedelta(seconds=1)
+LOOKBACK = (timedelta(hours=1), timedelta(days=1), timedelta(days=32), timedelta(days=367))    # Windows searched in order for the previous run time
+
+class Campaign():
+    def __init__(self, name, mode='scheduled', trigger='cron', start=None, end=None, crontab='0 0 * * *', interval=60.0, jitter=0, misfire='run_once', filePath=None, lastRun=None):
+        """Definition of a recurring automation job.
+
+        Args:
+            name (string): Unique name of the campaign, also used as the scheduler job id.
+            mode (string, optional): Automation mode of each run, 'scheduled', 'survey', or 'chains' (See Automation.mode). Defaults to 'scheduled'.
+            trigger (string, optional): 'cron' to run at the times of crontab or 'interval' to run every interval minutes. Defaults to 'cron'.
+            start (datetime, optional): Time of the first run, or None to start immediately. An interval campaign without a start is anchored at the time it is constructed, so its run times (and the ids of its runs in the job store) do not move each time its trigger is created. Defaults to None.
+            end (datetime, optional): Time after which the campaign does not run, or None to run until stopped. Defaults to None.
+            crontab (string, optional): Cron expression in the format 'minute hour day month day_of_week'. Days of the week should be given as names (mon-sun). Defaults to '0 0 * * *' (daily at midnight).
+            interval (float, optional): Minutes between runs of an interval campaign. Defaults to 60.0.
+            jitter (int, optional): Maximum random delay in seconds added to each run, which spreads runs of campaigns with the same cadence. Defaults to 0.
+            misfire (string, optional): 'skip' to ignore runs missed while the program was closed or the scheduler was busy, or 'run_once' to run once as soon as possible for any number of missed runs. Defaults to 'run_once'.
+            filePath (string, optional): Directory to save to. Defaults to None.
+            lastRun (datetime, optional): Scheduled time of the last completed run, or None if the campaign has not completed a run. Defaults to None.
+
+        Raises:
+            ValueError: If the trigger, misfire policy, or cron expression is invalid.
+        """
+        if trigger not in TRIGGERS:
+            raise ValueError(f'Unknown trigger: {trigger}')
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f'Unknown misfire policy: {misfire}')
+        if trigger == 'cron' and len(crontab.split()) != 5:
+            raise ValueError(f'Cron expression must have 5 fields: {crontab}')
+        if trigger == 'interval' and interval <= 0:
+            raise ValueError(f'Interval must be positive: {interval}')
+        self.name = name
+        self.mode = mode
+        self.trigger = trigger
+        if trigger == 'interval' and start is None:
+            start = datetime.now().replace(microsecond=0)
+        self.start = start
+        self.end = end
+        self.crontab = crontab
+        self.interval = interval
+        self.jitter = jitter
+        self.misfire = misfire
+        self.filePath = filePath
+        self.lastRun = lastRun
+
+    def createTrigger(self, jitter=True):
+        """Imports apscheduler and constructs the trigger of the campaign.
+
+        Args:
+            jitter (bool, optional): If False, the trigger is constructed without jitter so its fire times are deterministic. Defaults to True.
+
+        Returns:
+            BaseTrigger: CronTrigger or IntervalTrigger.
+        """
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+        _jitter = self.jitter if jitter and self.jitter > 0 else None
+        if self.trigger == 'interval':
+            return IntervalTrigger(minutes=self.interval, start_date=self.start, end_date=self.end, jitter=_jitter)
+        minute, hour, day, month, dayOfWeek = self.crontab.split()
+        return CronTrigger(minute=minute, hour=hour, day=day, month=month, day_of_week=dayOfWeek, start_date=self.start, end_date=self.end, jitter=_jitter)
+
+    def nextRuns(self, count, now=None):
+        """Returns the next run times of the campaign (without jitter), e.g. to preview a campaign before it is scheduled.
+
+        Args:
+            count (int): Maximum number of run times.
+            now (datetime, optional): Time to start from. Defaults to the current time.
+
+        Returns:
+            list: Run times as datetimes, fewer than count if the campaign ends first.
+        """
+        trigger = self.createTrigger(jitter=False)
+        now = localTime(now)
+        runs = []
+        previous = None
+        while len(runs) < count:
+            previous = trigger.get_next_fire_time(previous, now if previous is None else previous)
+            if previous is None:
+                break
+            runs.append(previous)
+        return runs
+
+    def previousRun(self, now=None):
+        """Returns the latest scheduled run time (without jitter) at or before now. Since jitter only delays a run, this is the scheduled time of a run which is executing now.
+
+        Args:
+            now (datetime, optional): Current time. Defaults to the current time.
+
+        Returns:
+            datetime: Previous run time, or None if the campaign has not started or the previous run is more than a year ago.
+        """
+        trigger = self.createTrigger(jitter=False)
+        now = localTime(now)
+        for lookback in LOOKBACK:
+            previous = None
+            fireTime = trigger.get_next_fire_time(None, now - lookback)
+            while fireTime is not None and fireTime <= now:
+                previous = fireTime
+                fireTime = trigger.get_next_fire_time(fireTime, fireTime + _SECOND)
+            if previous is not None:
+                return previous
+        return None
+
+    def missedRun(self, now=None):
+        """Returns the latest run time after the last completed run if it is before now, in which case the run was missed (e.g. while the program was closed or the run was interrupted).
+
+        Args:
+            now (datetime, optional): Current time. Defaults to the current time.
+
+        Returns:
+            datetime: Latest missed run time, or None if no run was missed or the campaign has never completed a run.
+        """
+        if self.lastRun is None:
+            return None
+        previous = self.previousRun(now)
+        if previous is not None and previous > localTime(self.lastRun):
+            return previous
+        return None
+
+    def jobOptions(self, misfireGraceTime):
+        """Returns the keyword arguments of BaseScheduler.add_job() which implement the misfire policy.
+
+        Args:
+            misfireGraceTime (int): Seconds after a run time during which a late run (e.g. while the thread pool is busy) still executes.
+        """
+        if self.misfire == 'skip':
+            return {'misfire_grace_time': misfireGraceTime, 'coalesce': False}
+        return {'misfire_grace_time': None, 'coalesce': True}
+
+    def asDict(self):
+        """Returns the campaign as a JSON-serializable dictionary (See Campaign.fromDict()).
+        """
+        def _isoformat(value):
+            return value.isoformat() if value is not None else None
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'start': _isoformat(self.start),
+            'end': _isoformat(self.end),
+            'crontab': self.crontab,
+            'interval': self.interval,
+            'jitter': self.jitter,
+            'misfire': self.misfire,
+            'filePath': self.filePath,
+            'lastRun': _isoformat(self.lastRun),
+        }
+
+    @classmethod
+    def fromDict(cls, _dict):
+        """Constructs a campaign from a dictionary returned by Campaign.asDict().
+        """
+        _dict = dict(_dict)
+        for key in ('start', 'end', 'lastRun'):
+            if _dict.get(key) is not None:
+                _dict[key] = datetime.fromisoformat(_dict[key])
+        return cls(**_dict)
+
+    def __str__(self):
+        if self.trigger == 'interval':
+            cadence = f'every {self.interval:g} min'
+        else:
+            cadence = f'cron {self.crontab}'
+        start = self.start.strftime('%Y-%m-%d %H:%M') if self.start is not None else 'now'
+        end = self.end.strftime('%Y-%m-%d %H:%M') if self.end is not None else 'stopped'
+        return f'{self.name}: {self.mode} {cadence} from {start} until {end}'
+
+    def __repr__(self):
+        return f'Campaign({self.asDict()})'
+
+def localTime(value=None):
+    """Returns value (or the current time if None) as a timezone-aware datetime. Naive datetimes are assumed to be local time.
+    """
+    if value is None:
+        value = datetime.now()
+    return value.astimezone()
+
+def dailyCampaign(name, mode, startDate, endDate, time, filePath=None, **kwargs):
+    """Constructs a campaign which runs once per day at the same time, equivalent to the date list previously generated by the automation dialog.
+
+    Args:
+        name (string): Unique name of the campaign.
+        mode (string): Automation mode of each run.
+        startDate (date): First day of the campaign.
+        endDate (date): Last day of the campaign.
+        time (time): Time of day of each run.
+        filePath (string, optional): Directory to save to. Defaults to None.
+        kwargs: Passed to Campaign (e.g. jitter, misfire).
+
+    Returns:
+        Campaign: Daily cron campaign.
+    """
+    start = datetime.combine(startDate, datetime.min.time())
+    end = datetime.combine(endDate, datetime.max.time()).replace(microsecond=0)
+    return Campaign(name, mode, 'cron', start, end, crontab=f'{time.minute} {time.hour} * * *', filePath=filePath, **kwargs)
+
+def scheduleCampaign(scheduler, campaign, target, misfireGraceTime=60, store=None, now=None):
+    """Adds a campaign to the task scheduler. If its misfire policy is 'run_once' and a run was missed since its last completed run (e.g. while the program was closed), a catch-up run for the latest missed run time is also added immediately.
+    Each run is recorded in the store by its scheduled run time. Runs which the store has already completed are skipped, so a catch-up run does not repeat a run completed by another process.
+
+    Args:
+        scheduler (BaseScheduler): Task scheduler.
+        campaign (Campaign): Campaign to schedule.
+        target (function): Function called with campaign.filePath at each run. Returns once the files are written with the saved file path, or a list of the paths which were written, and raises an exception or returns None if the run failed.
+        misfireGraceTime (int, optional): Passed to Campaign.jobOptions(). Defaults to 60.
+        store (JobStore, optional): Store that records each run. Defaults to None.
+        now (datetime, optional): Current time. Defaults to the current time.
+    """
+    def _run(scheduled=None):
+        if scheduled is None:
+            scheduled = campaign.previousRun() or localTime().replace(microsecond=0)
+        runId = None
+        if store is not None:
+            runId = store.startRun(campaign.name, scheduled)
+            if runId is None:
+                logging.info(f'Campaign {campaign.name} run at {scheduled} is already complete, skipping')
+                return
+        try:
+            result = target(campaign.filePath)
+            files = [] if result is None else [result] if isinstance(result, str) else list(result)
+            if not files:
+                raise RuntimeError('No files were saved.')
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Campaign {campaign.name} run at {scheduled} failed.')
+            if store is not None:
+                store.finishRun(runId, 'failed', error=f'{type(e).__name__}: {e}')
+        else:
+            if campaign.lastRun is None or scheduled > localTime(campaign.lastRun):
+                campaign.lastRun = scheduled
+            if store is not None:
+                store.finishRun(runId, 'completed', files)
+        finally:
+            if store is not None:
+                upcoming = campaign.nextRuns(1)
+                if upcoming:
+                    store.planRun(campaign.name, upcoming[0])
+
+    scheduler.add_job(_run, trigger=campaign.createTrigger(), id=campaign.name, name=str(campaign), replace_existing=True, **campaign.jobOptions(misfireGraceTime))
+    if store is not None:
+        upcoming = campaign.nextRuns(1, now)
+        if upcoming:
+            store.planRun(campaign.name, upcoming[0])
+    missed = campaign.missedRun(now)
+    if missed is not None:
+        if campaign.misfire == 'run_once':
+            logging.info(f'Campaign {campaign.name} missed a run at {missed}, running once now')
+            scheduler.add_job(_run, args=(missed,), trigger='date', run_date=localTime(now), id=campaign.name + '-catchup', name=f'{campaign} (catch-up)', replace_existing=True, misfire_grace_time=None)
+        else:
+            logging.info(f'Campaign {campaign.name} missed a run at {missed}, skipped by misfire policy')
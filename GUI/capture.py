@@ -0,0 +1,353 @@
+"""Module that contains triggered capture. Acquired traces are kept in a pre-trigger history and are only written to disk when a trigger rule fires, in which case the pre-trigger sweeps, the triggering sweep, and the following post-trigger sweeps are saved together in one record.
+TriggeredCapture is fed with each trace and its detections (See detection.Detector), so it runs in the detector's worker thread instead of the analyzer loop. Records are formatted and written by the background trace writer (See writer.TraceWriter) so the detector is not delayed by file IO.
+"""
+
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+
+from averaging import dbToLinear, linearToDb
+
+class TriggerRule(ABC):
+    def __init__(self):
+        """Base class of capture trigger rules. Subclasses implement check().
+        """
+        pass
+
+    @abstractmethod
+    def check(self, trace, detections):
+        """Checks whether a trace should trigger a capture.
+
+        Args:
+            trace (Trace): Acquired trace.
+            detections (list): Instances of Detection found in the trace.
+
+        Returns:
+            string: Description of why the rule fired, or None if it did not.
+        """
+
+    def reset(self):
+        pass
+
+class BandThreshold(TriggerRule):
+    def __init__(self, start, stop, level):
+        """Fires if any point between start and stop is above level.
+
+        Args:
+            start (float): Lower edge of the band in Hz.
+            stop (float): Upper edge of the band in Hz.
+            level (float): Threshold in dBm.
+        """
+        super().__init__()
+        self.start = start
+        self.stop = stop
+        self.level = level
+
+    def check(self, trace, detections):
+        if trace.xunit != 'Hz':
+            return None
+        lower, upper = np.searchsorted(trace.frequency, (self.start, self.stop))
+        if lower >= upper:
+            return None
+        peak = trace.amplitude[lower:upper].max()
+        if peak > self.level:
+            return f'{peak:.2f} dBm above {self.level} dBm between {self.start:.6g} and {self.stop:.6g} Hz'
+        return None
+
+class DeltaOverBaseline(TriggerRule):
+    def __init__(self, delta, alpha, triggeredAlpha, hysteresis):
+        """Fires if any point is more than delta above a baseline. The baseline is an exponential average (in linear power) of every sweep, and is reset when the X axis changes.
+        A point which fired is latched and cannot fire again until it falls more than hysteresis below the threshold. Latched points are averaged into the baseline with the smaller weight triggeredAlpha, so a persistent signal is absorbed into the baseline and stops firing while a short burst barely raises it.
+
+        Args:
+            delta (float): Threshold above the baseline in dB.
+            alpha (float): Weight of the newest sweep in the baseline, between 0 and 1.
+            triggeredAlpha (float): Weight of the newest sweep in the baseline at latched points, between 0 and 1.
+            hysteresis (float): Amount in dB below the threshold a latched point must fall to fire again.
+        """
+        super().__init__()
+        self.delta = delta
+        self.alpha = alpha
+        self.triggeredAlpha = triggeredAlpha
+        self.hysteresis = hysteresis
+        self.baseline = None
+        self.latched = None
+        self.axis = None
+
+    def check(self, trace, detections):
+        axis = (trace.start, trace.stop, trace.points, trace.xunit)
+        power = dbToLinear(trace.amplitude)
+        if axis != self.axis or self.baseline is None:
+            self.axis = axis
+            self.baseline = power
+            self.latched = np.zeros(trace.points, dtype=bool)
+            return None
+        excess = trace.amplitude - linearToDb(self.baseline)
+        above = excess > self.delta
+        fired = above & ~self.latched
+        self.latched = above | (self.latched & (excess > self.delta - self.hysteresis))
+        self.baseline += np.where(self.latched, self.triggeredAlpha, self.alpha) * (power - self.baseline)
+        if fired.any():
+            index = int(np.argmax(np.where(fired, excess, -np.inf)))
+            return f'{excess[index]:.2f} dB over baseline at {trace.frequency[index]:.6g} {trace.xunit}'
+        return None
+
+    def reset(self):
+        self.baseline = None
+        self.latched = None
+        self.axis = None
+
+class NewPeak(TriggerRule):
+    def __init__(self, tolerance):
+        """Fires if a detection is not within tolerance of any detection in the previous sweep.
+
+        Args:
+            tolerance (float): Maximum difference in X axis units between two detections of the same signal.
+        """
+        super().__init__()
+        self.tolerance = tolerance
+        self.previous = None
+
+    def check(self, trace, detections):
+        current = np.array([detection.frequency for detection in detections])
+        previous = self.previous
+        self.previous = current
+        if previous is None or current.size == 0:
+            return None
+        if previous.size == 0:
+            return f'New peak at {current[0]:.6g} {trace.xunit}'
+        distance = np.abs(current[:, np.newaxis] - previous[np.newaxis, :]).min(axis=1)
+        new = np.flatnonzero(distance > self.tolerance)
+        if new.size:
+            return f'New peak at {current[new[0]]:.6g} {trace.xunit}'
+        return None
+
+    def reset(self):
+        self.previous = None
+
+def createRules(cfg):
+    """Generates trigger rules from the [capture] configuration.
+
+    Args:
+        cfg (dict): [capture] section of the loaded configuration (See defaultconfig.py).
+
+    Returns:
+        list: Instances of TriggerRule.
+    """
+    rules = [BandThreshold(*band) for band in cfg['bands']]
+    if cfg['delta'] > 0:
+        rules.append(DeltaOverBaseline(cfg['delta'], cfg['baseline_alpha'], cfg['triggered_alpha'], cfg['hysteresis']))
+    if cfg['new_peak']:
+        rules.append(NewPeak(cfg['new_peak_tolerance']))
+    return rules
+
+def sameAxis(a, b):
+    """Returns True if two traces have the same X axis, so they can be saved in one record.
+
+    Args:
+        a (Trace): First trace.
+        b (Trace): Second trace.
+    """
+    if (a.start, a.stop, a.points, a.xunit) != (b.start, b.stop, b.points, b.xunit):
+        return False
+    if a.xdata is None and b.xdata is None:
+        return True
+    return np.array_equal(a.frequency, b.frequency)
+
+class CaptureRecord():
+    def __init__(self, traces, reasons, triggerIndex):
+        """Sweeps saved together when a trigger rule fires.
+
+        Args:
+            traces (list): Instances of Trace in order of acquisition.
+            reasons (list): Descriptions returned by the trigger rules.
+            triggerIndex (int): Index of the triggering trace in traces.
+        """
+        self.traces = traces
+        self.reasons = reasons
+        self.triggerIndex = triggerIndex
+
+    @property
+    def trigger(self):
+        return self.traces[self.triggerIndex]
+
+    @property
+    def chain(self):
+        return self.trigger.chain
+
+def formatCapture(record, delimiter=','):
+    """Formats a captured record as written by writeCapture(). The header contains the trigger time, the reasons it fired, and the parameter snapshot of the triggering trace, followed by one row per X axis value with one column per sweep. Sweeps whose X axis differs from the triggering sweep's cannot share its rows, so they are left out and counted in the header.
+
+    Args:
+        record (CaptureRecord): Record to format.
+        delimiter (string, optional): Delimiter between values. Defaults to ','.
+
+    Returns:
+        string: Contents of the capture file.
+    """
+    trigger = record.trigger
+    traces = [trace for trace in record.traces if trace is trigger or sameAxis(trace, trigger)]
+    triggerIndex = traces.index(trigger)
+    lines = ['Trigger Time' + delimiter + trigger.timestamp.isoformat()]
+    lines.extend('Trigger' + delimiter + reason for reason in record.reasons)
+    lines.append('Pre-Trigger Sweeps' + delimiter + str(triggerIndex))
+    lines.append('Post-Trigger Sweeps' + delimiter + str(len(traces) - triggerIndex - 1))
+    if len(traces) < len(record.traces):
+        lines.append('Skipped Sweeps' + delimiter + str(len(record.traces) - len(traces)))
+    lines.extend(name + delimiter + value for name, value in trigger.parameters.items())
+    lines.append('DATA')
+    lines.append(delimiter.join([trigger.xunit] + [trace.timestamp.isoformat() for trace in traces]))
+    data = np.column_stack([trigger.frequency] + [trace.amplitude for trace in traces])
+    lines.extend(delimiter.join(str(value) for value in row) for row in data)
+    return '\n'.join(lines) + '\n'
+
+def writeCapture(f, traces, reasons, triggerIndex):
+    """Writes a captured record to the file object f and closes it (See formatCapture()). The file is tab delimited if its name contains '.txt', otherwise it is comma delimited.
+
+    Args:
+        f (file): File object to write to.
+        traces (list): Instances of Trace in order of acquisition.
+        reasons (list): Descriptions returned by the trigger rules.
+        triggerIndex (int): Index of the triggering trace in traces.
+    """
+    if '.txt' in f.name:
+        delimiter = '\t'
+    else:
+        delimiter = ','
+    f.write(formatCapture(CaptureRecord(traces, reasons, triggerIndex), delimiter))
+    f.close()
+
+def uniqueCapturePath(filePath, chain, timestamp):
+    """Generates a capture file path in the format [chain]-capture-[date]-[time]-[index].csv. The index is iterated until an unused file name is found.
+
+    Args:
+        filePath (string): Directory to save to.
+        chain (string): Name of the selected RF chain.
+        timestamp (datetime): Time of the trigger.
+
+    Returns:
+        string: Path to an unused file.
+    """
+    x = 0
+    while True:
+        fileName = chain + '-capture-' + timestamp.strftime('%Y-%m-%d-%H%M%S') + '-' + str(x) + '.csv'
+        fileJoined = os.path.join(filePath, fileName)
+        if not os.path.exists(fileJoined):
+            return fileJoined
+        x += 1
+
+class TriggeredCapture():
+    def __init__(self, cfg, writer=None):
+        """Keeps a pre-trigger history of traces and saves a record when a trigger rule fires. Further triggers during the post-trigger sweeps extend the same record, up to max_sweeps sweeps. When the X axis changes, the record being captured is saved and the history is cleared since sweeps with different axes cannot be saved in one record.
+
+        Args:
+            cfg (dict): [capture] section of the loaded configuration (See defaultconfig.py).
+            writer (TraceWriter, optional): Writer which formats and saves each record in the background. Defaults to None, which saves each record in the calling thread.
+        """
+        self.cfg = cfg
+        self.writer = writer
+        self.rules = createRules(cfg)
+        self.history = deque(maxlen=cfg['pre_trigger'])
+        self.record = None              # Traces of the record being captured, or None if not triggered
+        self.reasons = []
+        self.triggerIndex = 0
+        self.remaining = 0              # Number of post-trigger sweeps left in the record
+        self.latest = None              # Latest trace, whose X axis every trace in the history and record shares
+        self.filePath = None            # Directory to save records to, or None if disarmed
+        self.captures = 0
+        self.lock = threading.Lock()
+
+    def arm(self, filePath):
+        """Starts checking traces against the trigger rules.
+
+        Args:
+            filePath (string): Directory to save records to.
+        """
+        with self.lock:
+            self.filePath = filePath
+            self.reset()
+        logging.info(f'Triggered capture armed with {len(self.rules)} rules, saving to {filePath}')
+
+    def disarm(self):
+        """Stops checking traces. A record being captured is saved with the post-trigger sweeps acquired so far.
+        """
+        with self.lock:
+            if self.record is not None:
+                self.save()
+            self.filePath = None
+            self.reset()
+        logging.info(f'Triggered capture disarmed after {self.captures} captures')
+
+    @property
+    def armed(self):
+        return self.filePath is not None
+
+    def reset(self):
+        self.history.clear()
+        self.record = None
+        self.reasons = []
+        self.remaining = 0
+        self.latest = None
+        for rule in self.rules:
+            rule.reset()
+
+    def update(self, trace, detections):
+        """Checks a trace against the trigger rules and adds it to the pre-trigger history or the record being captured. Can be used as the callback of detection.Detector.
+
+        Args:
+            trace (Trace): Acquired trace.
+            detections (list): Instances of Detection found in the trace.
+        """
+        with self.lock:
+            if not self.armed:
+                return
+            if self.latest is None or not sameAxis(trace, self.latest):
+                if self.record is not None:
+                    self.save()
+                self.reset()
+            self.latest = trace
+
+            reasons = [reason for reason in (rule.check(trace, detections) for rule in self.rules) if reason is not None]
+            if self.record is None:
+                if reasons:
+                    self.record = list(self.history) + [trace]
+                    self.triggerIndex = len(self.history)
+                    self.reasons = reasons
+                    self.remaining = self.cfg['post_trigger']
+                    self.history.clear()
+                    logging.info(f'Capture triggered: {"; ".join(reasons)}')
+                else:
+                    self.history.append(trace)
+                    return
+            else:
+                self.record.append(trace)
+                if reasons:
+                    self.remaining = self.cfg['post_trigger']
+                else:
+                    self.remaining -= 1
+            if self.remaining <= 0 or len(self.record) >= self.cfg['max_sweeps']:
+                self.save()
+
+    def save(self):
+        """Queues the record being captured to be written by the writer, or writes it if there is no writer. Should be called with self.lock held.
+        """
+        record = CaptureRecord(self.record, self.reasons, self.triggerIndex)
+        self.record = None
+        self.reasons = []
+        self.remaining = 0
+        trigger = record.trigger
+        try:
+            fileName = uniqueCapturePath(self.filePath, trigger.chain, trigger.timestamp)
+            f = open(fileName, 'w')     # Creates the file so uniqueCapturePath() does not return it again before it is written
+            if self.writer is not None:
+                self.writer.save(record, f=f, formatter=formatCapture)
+            else:
+                writeCapture(f, record.traces, record.reasons, record.triggerIndex)
+            self.captures += 1
+            logging.info(f'Saved {len(record.traces)} sweeps to {fileName}')
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
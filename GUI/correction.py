@@ -0,0 +1,126 @@
+"""Module that contains gain correction of traces. The measured gain (S21) of each RF chain is interpolated onto the frequency axis of a trace and subtracted, so the amplitude is referred to the input of the chain instead of the analyzer.
+Interpolated gains are cached per chain and frequency axis, so repeated sweeps with the same settings only cost one array subtraction.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from touchstone import loadTouchstone, cascade, stability
+from tracedata import Trace
+
+class GainCorrection():
+    def __init__(self, chains, maxsize=32):
+        """Subtracts the gain of the selected RF chain from traces.
+
+        Args:
+            chains (dict): Chain names (See opcodes.chainName()) mapped to a list of Touchstone files, from input to output, which are cascaded to calculate the response of the chain. Relative paths are relative to the directory of this file.
+            maxsize (int, optional): Maximum number of cached interpolated gains. Defaults to 32.
+        """
+        self.chains = {chain: [Path(__file__).parent / path for path in files] for chain, files in chains.items()}
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.networks = {}
+        self.lock = threading.Lock()
+
+    def network(self, chain):
+        """Returns the cascaded response of a chain, calculating it if its files have not been loaded before.
+
+        Args:
+            chain (string): Name of the RF chain.
+
+        Returns:
+            Touchstone: Cascaded network of the chain.
+        """
+        with self.lock:
+            if chain in self.networks:
+                return self.networks[chain]
+        network = cascade([loadTouchstone(path) for path in self.chains[chain]])
+        with self.lock:
+            self.networks[chain] = network
+        return network
+
+    def checkChains(self):
+        """Calculates the response of every chain and logs its gain range, and a warning for chains which are not unconditionally stable over the measured frequencies (mu <= 1).
+        """
+        for chain in self.chains:
+            try:
+                network = self.network(chain)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}. Could not load the response of chain {chain}.')
+                continue
+            gain = network.gain()
+            k, delta, mu, muPrime = stability(network.s)
+            logging.info(f'Chain {chain}: {network.name}, gain {gain.min():.2f} to {gain.max():.2f} dB from {network.frequency[0]:.6g} to {network.frequency[-1]:.6g} Hz')
+            unstable = network.frequency[mu <= 1]
+            if unstable.size:
+                logging.warning(f'Chain {chain} is potentially unstable at {unstable.size} points from {unstable[0]:.6g} to {unstable[-1]:.6g} Hz (minimum mu {mu.min():.3f})')
+
+    def gain(self, chain, frequency):
+        """Returns the gain of a chain in dB interpolated onto frequency. Frequencies outside of the measured range use the gain at the nearest measured frequency.
+
+        Args:
+            chain (string): Name of the RF chain.
+            frequency (numpy.ndarray): Frequencies in Hz.
+
+        Returns:
+            numpy.ndarray: Gain in dB at each frequency.
+        """
+        network = self.network(chain)
+        return np.interp(frequency, network.frequency, network.gain())
+
+    def cachedGain(self, chain, trace):
+        """Returns the gain of a chain on the X axis of a trace, from the cache if the chain and axis have been used before.
+
+        Args:
+            chain (string): Name of the RF chain.
+            trace (Trace): Trace whose X axis the gain is interpolated onto.
+
+        Returns:
+            numpy.ndarray: Read-only gain in dB at each point of the trace.
+        """
+        if trace.xdata is None:
+            key = (chain, trace.start, trace.stop, trace.points)
+        else:
+            key = (chain, hash(trace.xdata.tobytes()))
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        gain = self.gain(chain, trace.frequency)
+        gain.flags.writeable = False
+        with self.lock:
+            self.cache[key] = gain
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return gain
+
+    def correct(self, trace):
+        """Returns a copy of the trace with the gain of its chain subtracted. Zero span traces and traces of chains without Touchstone files are returned unchanged.
+
+        Args:
+            trace (Trace): Acquired trace.
+
+        Returns:
+            Trace: Corrected trace.
+        """
+        if trace.xunit != 'Hz' or trace.chain not in self.chains:
+            return trace
+        try:
+            gain = self.cachedGain(trace.chain, trace)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Trace was not corrected.')
+            return trace
+        parameters = dict(trace.parameters)
+        parameters['Gain Correction'] = ' + '.join(path.name for path in self.chains[trace.chain])
+        return Trace(trace.amplitude - gain, trace.start, trace.stop, timestamp=trace.timestamp, parameters=parameters, chain=trace.chain, xunit=trace.xunit, xdata=trace.xdata)
+
+    def clear(self):
+        """Clears the cached chain responses and interpolated gains so modified Touchstone files are loaded again.
+        """
+        with self.lock:
+            self.cache.clear()
+            self.networks.clear()
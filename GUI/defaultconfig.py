@@ -18,6 +18,174 @@ config = """
 thread_max_workers = 20
 coalesce = true
 job_max_instances = 5
+# SQLite database that stores automation campaigns and a record of each run, so active campaigns resume after a restart.
+job_store = "automation.db"
+# Seconds after its run time that a late run still executes for campaigns which skip missed runs.
+misfire_grace_time = 60
+
+[chains]
+# RF chains swept in order by the Chains automation mode (DFS1 to DFS16, EMS1 to EMS16).
+sequence = ["DFS1", "EMS1"]
+# Seconds between PLC status queries while waiting for a chain selection to be confirmed, and the maximum time to wait. The PLC firmware needs at least 1.2 s between writes.
+status_interval = 1.2
+timeout = 10.0
+# Return the PLC to SLEEP after sweeping every chain.
+sleep_after = true
+
+# Analyzer parameters applied before sweeping each chain, using the keyword names of parameters.KEYWORDS (e.g. startfreq, rbw, atten). Chains without a preset are swept with the current settings.
+[chains.presets.DFS1]
+startfreq = 5.15e9
+stopfreq = 5.85e9
+
+[chains.presets.EMS1]
+startfreq = 1e9
+stopfreq = 12e9
+
+[service]
+# Address of the headless acquisition service (service.py). Only bind to localhost unless the network is trusted.
+host = "127.0.0.1"
+port = 8450
+# Job store of the service, separate from the front end's so both can run on the same machine.
+job_store = "service_automation.db"
+
+[analyzer]
+# "trace" fetches amplitude only with :TRACe:DATA? TRACE1 and generates the frequency axis from the start/stop frequency and sweep points.
+# "san" fetches interleaved frequency and amplitude pairs with :READ:SAN?.
+acquisition = "trace"
+# Trace data format for "trace" acquisition, "real32" (binary) or "ascii".
+data_format = "real32"
+# VISA library passed to pyvisa.ResourceManager(). "" uses NI-VISA, "@py" uses pyvisa-py, which is required to connect to the simulator.
+visa_backend = ""
+# Sessions stay open when a different resource is selected. Idle sessions are checked with *OPC? every health_interval seconds and closed if they do not respond. 0 disables health checks.
+health_interval = 30.0
+# Additional analyzers swept in parallel with the analyzer selected in Options > Configure..., e.g. one per band or RF chain. The preset of the chain in [chains.presets] is written to each analyzer when it is bound.
+# additional = [{resource = "TCPIP0::192.168.0.2::5025::SOCKET", chain = "EMS1"}]
+additional = []
+
+[supervisor]
+# Reconnect the analyzer, motor controller, and PLC after a disconnect (supervisor.py). Each connected device is checked every check_interval seconds.
+enabled = true
+check_interval = 5.0
+# Delay in seconds before the first reconnection attempt, multiplied by backoff_factor after each failed attempt up to backoff_max.
+backoff_initial = 1.0
+backoff_factor = 2.0
+backoff_max = 60.0
+# Refuse to reconnect to a device whose identity (*IDN?, PLC firmware version, or motor controller prompt) differs from the first connection, e.g. a different analyzer at the same address.
+verify_identity = true
+
+[discovery]
+# Serial ports and VISA resources are enumerated in the background every interval seconds, so Options > Configure... opens without waiting. 0 only enumerates on startup and when Refresh All is pressed.
+interval = 10.0
+# USB vendor ID, product ID, and optionally serial number of the motor controller and PLC, which are connected on startup when their port is found, e.g. {vid = 0x0403, pid = 0x6001, serial_number = "A10K3B2C"}. List them with python -m serial.tools.list_ports -v. A vid of 0 disables identification.
+motor = {vid = 0, pid = 0, serial_number = ""}
+plc = {vid = 0, pid = 0, serial_number = ""}
+
+[averaging]
+# Weight of the newest sweep in the exponential average, between 0 and 1.
+exponential_alpha = 0.1
+# Range and bin width in dB of the histogram used to estimate the median of each point.
+percentile_min = -170.0
+percentile_max = 30.0
+percentile_resolution = 0.5
+# Maximum number of histogram cells (sweep points x bins), 4 bytes each. The median is disabled for sweeps which would exceed it.
+percentile_max_cells = 16777216
+
+[trace]
+# Number of acquired traces kept in memory for saving and analysis.
+history_length = 32
+
+[writer]
+# Traces are saved by a background writer thread (writer.py), so a slow disk or network share does not stall acquisition.
+# Maximum number of traces waiting to be written. When the queue is full, saving waits for the writer.
+queue_size = 256
+# Maximum number of queued traces written in one batch.
+batch_size = 32
+# Size in bytes of the write buffer of each file.
+buffer_size = 1048576
+# "always" syncs each file to disk after it is written, "batch" syncs the files of a batch after the whole batch is written, and "never" leaves syncing to the operating system.
+fsync = "batch"
+# Maximum time in seconds a campaign run waits for its traces to be written. A run whose traces are not written is recorded as failed.
+wait_timeout = 60.0
+
+[detection]
+# Detect signals in every acquired sweep.
+enabled = true
+# Minimum amplitude above the estimated noise floor in dB.
+threshold = 10.0
+# Number of sweep points in each block used to estimate the noise floor, and the percentile of each block (50 is the median).
+window = 64
+percentile = 50.0
+# Regions above the threshold separated by this many points or fewer are merged into one detection.
+merge_gap = 2
+# Minimum number of points above the threshold.
+min_width = 1
+# Maximum number of sweeps waiting for detection. When the queue is full, acquisition waits for the detector so no sweep is skipped.
+queue_size = 8
+# Number of detections kept in memory.
+history_length = 1000
+
+[capture]
+# Triggered capture saves sweeps only when a rule fires (Auto-Sweep Configuration > Triggered). Requires [detection] to be enabled.
+# Number of sweeps saved before and after the triggering sweep. Triggers during the post-trigger sweeps extend the record up to max_sweeps.
+pre_trigger = 5
+post_trigger = 5
+max_sweeps = 100
+# Fires if any point in a band is above a level, as a list of [start (Hz), stop (Hz), level (dBm)].
+bands = []
+# Fires if any point is more than delta dB above the average of previous sweeps. 0 disables this rule.
+delta = 15.0
+# Weight of the newest sweep in the baseline average, between 0 and 1.
+baseline_alpha = 0.05
+# Weight of the newest sweep in the baseline at points which fired, so a persistent signal is absorbed into the baseline while a short burst barely raises it.
+triggered_alpha = 0.01
+# A point which fired fires again only once it falls this many dB below delta over the baseline.
+hysteresis = 3.0
+# Fires if a detection is more than new_peak_tolerance (Hz) away from every detection in the previous sweep.
+new_peak = true
+new_peak_tolerance = 1e6
+
+[pulse]
+# Pulse analysis of zero span sweeps (Freq > Pulse Analysis).
+# Pulse edges are detected at this many dB below the peak of each sweep (6 dB is the half voltage point).
+threshold = 6.0
+# Sweeps whose peak is less than this many dB above their median are treated as noise.
+min_snr = 10.0
+# A new burst starts when the time between pulses is more than this many times the median PRI.
+burst_gap = 2.0
+# Append a row per sweep to pulses-[date].csv in the automation file path.
+log = true
+
+[survey]
+# Wideband survey (Options > Wideband survey, or the Survey automation mode) split into segments no wider than max_span (Hz).
+start = 1e9
+stop = 50e9
+max_span = 1e9
+# Fraction of the segment span added to each side so neighbouring segments overlap.
+overlap = 0.01
+# Default settings of each segment. 0 is auto for rbw, vbw, and points (unchanged), negative is auto for atten.
+points = 10001
+rbw = 0.0
+vbw = 0.0
+atten = -1.0
+# Per-band settings as a list of [start (Hz), stop (Hz), rbw, vbw, atten], used by segments whose center is in the band.
+bands = []
+
+[correction]
+# Subtract the measured gain (S21) of the selected RF chain from each sweep so amplitudes are referred to the chain input.
+enabled = false
+
+[correction.chains]
+# Touchstone files of each RF chain (DFS1, EMS1, etc.) from input to output, relative to the GUI folder. Multiple files are cascaded.
+DFS1 = ["../MATLAB/RF-DFS-RevC-6G.s2p"]
+EMS1 = ["../MATLAB/RF-DFS-RevC-12G.s2p"]
+
+[waterfall]
+# Waterfall display of the most recent sweeps below the spectrum plot.
+enabled = true
+# Number of sweeps displayed. Memory use is 2 * rows * sweep points * 4 bytes.
+rows = 200
+# Any matplotlib colormap name.
+colormap = "viridis"
 
 [calibration]
 # Encoder home is the encoder position when the dish is parked (azimuth at true north, elevation straight up).
@@ -27,6 +195,55 @@ y_enc_home = 239092664
 x_countsperrotation = 45936033
 y_countsperrotation = 45936033
 
+[simulator]
+# Simulated spectrum analyzer (simulator.py), connect to TCPIP0::[host]::[port]::SOCKET with visa_backend = "@py".
+host = "127.0.0.1"
+port = 5025
+# Sweep points after *RST, and the maximum returned by :SENS:SWE:POIN? MAX.
+points = 1001
+max_points = 100001
+# Noise floor in dBm/Hz at 10 dB attenuation.
+noise_density = -150.0
+# Multiplier of the simulated sweep time (auto sweep time is approximately 2.5 * span / RBW^2). 0 makes sweeps complete immediately.
+time_scale = 1.0
+# Delay in seconds before each query response, to emulate instrument and network latency.
+latency = 0.0
+# Synthetic signals as [frequency (Hz), level (dBm), bandwidth (Hz), pulse width (s), PRI (s)]. Pulse width and PRI of 0 are continuous.
+signals = [
+    [5.5e9, -40.0, 1e6, 1e-6, 1e-3],
+    [2.4e9, -60.0, 20e6, 0.0, 0.0],
+    [9.4e9, -50.0, 1e3, 0.0, 0.0],
+]
+# Seed of the noise generator, or -1 for a random seed.
+seed = -1
+# Delay in seconds before responses of the in-process motor controller and PLC stand-ins (SimulatedMotor, SimulatedPLC), and the time for the PLC relays to switch chains.
+motor_latency = 0.005
+plc_latency = 0.005
+plc_switch_time = 0.1
+
+[instrumentation]
+# Record the latency, bytes transferred, and lock wait time of each VISA, motor, and PLC operation from startup. Recording can also be enabled from Options > I/O statistics...
+enabled = false
+# Profile the wait and hold time, owner, and acquisition order of the front end's locks from startup, and warn about holds longer than leak_threshold seconds and lock-order inversions. Profiling can also be enabled from Options > Lock profile...
+lock_profiling = false
+leak_threshold = 10.0
+
+[benchmark]
+# Acquisition benchmark suite (benchmark.py), run against the simulated analyzer, motor controller, and PLC.
+# Sweep point counts at which the analyzer display loop is measured.
+points = [101, 1001, 10001, 100001]
+# Number of points of the trace saved by the trace saving benchmark, which does not depend on points.
+save_points = 100001
+# Timed repetitions of each measurement, after one untimed warm-up.
+iterations = 20
+# Multiplier of the simulated sweep time during the benchmark. 0 measures only the software and transfer time of each sweep.
+time_scale = 0.0
+# Results file, and the stored baseline that results are compared against.
+results = "benchmark_results.json"
+baseline = "benchmark_baseline.json"
+# Allowed fractional regression of each metric from the baseline (0.25 = 25% slower). A "tolerance" key in a metric of the baseline file overrides this.
+tolerance = 0.25
+
 [theme]
 ttk = "clearlooks"
 select_background = "#00ff00"
@@ -35,6 +252,17 @@ terminal_font = ['Courier', 11]
 font = ['Arial', 12]
 """
 
+def configPath(fileName):
+    """Resolves a file name from the configuration against the directory of config.toml (the directory of this file), so the same file is used regardless of the working directory the program is started from.
+
+    Args:
+        fileName (string): Relative or absolute path. Absolute paths are returned unchanged.
+
+    Returns:
+        string: Absolute path.
+    """
+    return str(Path(__file__).parent.absolute() / fileName)
+
 def generateConfig():
     try:
         f = open(Path(__file__).parent.absolute() / 'config.toml', "w")
@@ -46,4 +274,30 @@ def generateConfig():
     else:
         logging.info('Generating config.toml')
 
-cfg = tomllib.loads(config)
\ No newline at end of file
+def loadConfig():
+    """Loads config.toml from the directory of this file and checks it for every header and key in the default configuration.
+
+    Returns:
+        tuple: (cfg, missingHeaders, missingKeys, error). cfg is the default configuration if config.toml could not be loaded or is missing a header or key. error is None if config.toml was loaded without an exception.
+    """
+    missingHeaders = []
+    missingKeys = []
+    error = None
+    try:
+        with open(Path(__file__).parent.absolute() / 'config.toml', "rb") as file:
+            loaded = tomllib.load(file)
+
+        for header in cfg:
+            if str(header) not in loaded:
+                missingHeaders.append(header)
+                continue
+            for key in cfg[header]:
+                if str(key) not in loaded[header]:
+                    missingKeys.append(header + '.' + key)
+    except Exception as e:
+        error = e
+    if missingHeaders or missingKeys or error is not None:
+        return cfg, missingHeaders, missingKeys, error
+    return loaded, missingHeaders, missingKeys, error
+
+cfg = tomllib.loads(config)
@@ -0,0 +1,229 @@
+"""Module that contains the signal detection stage. Each acquired trace is compared against an estimate of its noise floor, bins which exceed the threshold are merged into regions, and each region is reported as a Detection with its peak frequency, level, bandwidth, and SNR.
+All processing is vectorized with NumPy so the detector keeps up with continuous sweeping. Detection runs in a worker thread (See Detector) so it does not delay the analyzer loop unless it falls behind, in which case the loop waits for it instead of skipping sweeps.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from instrumentation import stats
+
+class Detection():
+    def __init__(self, frequency, level, bandwidth, snr, noise, timestamp, azimuth=None, elevation=None, chain='SLEEP'):
+        """Signal detected in a single trace.
+
+        Args:
+            frequency (float): X axis value of the peak (Hz, or s for zero span).
+            level (float): Amplitude of the peak in dBm.
+            bandwidth (float): Width of the region above the threshold, in X axis units.
+            snr (float): Peak amplitude above the estimated noise floor in dB.
+            noise (float): Estimated noise floor at the peak in dBm.
+            timestamp (datetime): Time of acquisition of the trace.
+            azimuth (float, optional): Antenna azimuth in degrees at the time of detection. Defaults to None.
+            elevation (float, optional): Antenna elevation in degrees at the time of detection. Defaults to None.
+            chain (string, optional): Name of the selected RF chain. Defaults to 'SLEEP'.
+        """
+        self.frequency = frequency
+        self.level = level
+        self.bandwidth = bandwidth
+        self.snr = snr
+        self.noise = noise
+        self.timestamp = timestamp
+        self.azimuth = azimuth
+        self.elevation = elevation
+        self.chain = chain
+
+    def asDict(self):
+        """Returns the detection as a JSON-serializable dictionary.
+        """
+        return {
+            'frequency': self.frequency,
+            'level': self.level,
+            'bandwidth': self.bandwidth,
+            'snr': self.snr,
+            'noise': self.noise,
+            'timestamp': self.timestamp.isoformat(),
+            'azimuth': self.azimuth,
+            'elevation': self.elevation,
+            'chain': self.chain,
+        }
+
+    def __repr__(self):
+        return f'Detection({self.frequency:.6g}, {self.level:.2f} dBm, BW {self.bandwidth:.6g}, SNR {self.snr:.2f} dB, {self.chain})'
+
+def noiseFloor(amplitude, window, percentile=50):
+    """Estimates the noise floor of a trace. The trace is split into blocks of window points, the percentile of each block is calculated, and the result is linearly interpolated between the block centers. Narrow signals only occupy a few bins of each block so they do not raise the estimate.
+
+    Args:
+        amplitude (numpy.ndarray): Amplitude values of the trace in dB.
+        window (int): Number of points in each block.
+        percentile (float, optional): Percentile of each block between 0 and 100. Defaults to 50 (median).
+
+    Returns:
+        numpy.ndarray: Noise floor estimate of each point in dB.
+    """
+    points = amplitude.size
+    window = max(1, min(window, points))
+    blocks = points // window
+    if blocks < 2:
+        return np.full(points, np.percentile(amplitude, percentile))
+    # The last block absorbs the remainder so every point is used
+    head = amplitude[:(blocks - 1) * window].reshape(blocks - 1, window)
+    levels = np.append(np.percentile(head, percentile, axis=1), np.percentile(amplitude[(blocks - 1) * window:], percentile))
+    centers = np.append(np.arange(blocks - 1) * window + (window - 1) / 2, ((blocks - 1) * window + points - 1) / 2)
+    return np.interp(np.arange(points), centers, levels)
+
+def findRegions(mask, mergeGap=0):
+    """Finds runs of True in a boolean array. Runs separated by mergeGap or fewer False values are merged.
+
+    Args:
+        mask (numpy.ndarray): Boolean array.
+        mergeGap (int, optional): Maximum number of bins between two runs for them to be merged. Defaults to 0.
+
+    Returns:
+        tuple: (starts, stops) arrays of the first index and one past the last index of each run.
+    """
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if starts.size > 1 and mergeGap > 0:
+        keep = (starts[1:] - stops[:-1]) > mergeGap
+        starts = np.concatenate((starts[:1], starts[1:][keep]))
+        stops = np.concatenate((stops[:-1][keep], stops[-1:]))
+    return starts, stops
+
+def regionPeaks(amplitude, starts, stops):
+    """Finds the index of the maximum amplitude in each region without a Python loop over the regions.
+
+    Args:
+        amplitude (numpy.ndarray): Amplitude values of the trace.
+        starts (numpy.ndarray): First index of each region.
+        stops (numpy.ndarray): One past the last index of each region.
+
+    Returns:
+        numpy.ndarray: Index of the peak of each region.
+    """
+    if starts.size == 0:
+        return starts
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    # Index of every bin in every region, and the region it belongs to
+    index = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    labels = np.repeat(np.arange(starts.size), lengths)
+    order = np.lexsort((amplitude[index], labels))
+    return index[order[np.cumsum(lengths) - 1]]
+
+def detect(trace, threshold, window, percentile=50, mergeGap=0, minWidth=1, azimuth=None, elevation=None):
+    """Detects signals in a trace.
+
+    Args:
+        trace (Trace): Acquired trace.
+        threshold (float): Minimum amplitude above the noise floor in dB.
+        window (int): Block size used to estimate the noise floor (See noiseFloor()).
+        percentile (float, optional): Percentile used to estimate the noise floor. Defaults to 50.
+        mergeGap (int, optional): Regions separated by this many bins or fewer are merged. Defaults to 0.
+        minWidth (int, optional): Minimum number of bins in a region. Defaults to 1.
+        azimuth (float, optional): Antenna azimuth in degrees. Defaults to None.
+        elevation (float, optional): Antenna elevation in degrees. Defaults to None.
+
+    Returns:
+        list: Instances of Detection, ordered by frequency.
+    """
+    amplitude = trace.amplitude
+    floor = noiseFloor(amplitude, window, percentile)
+    starts, stops = findRegions(amplitude - floor > threshold, mergeGap)
+    wide = (stops - starts) >= minWidth
+    starts, stops = starts[wide], stops[wide]
+    peaks = regionPeaks(amplitude, starts, stops)
+
+    xdata = trace.frequency
+    binWidth = (trace.stop - trace.start) / (trace.points - 1) if trace.points > 1 else 0.0
+    levels = amplitude[peaks]
+    noise = floor[peaks]
+    return [Detection(float(xdata[peak]), float(level), float(width * binWidth), float(level - noiseLevel), float(noiseLevel), trace.timestamp, azimuth, elevation, trace.chain)
+            for peak, level, noiseLevel, width in zip(peaks, levels, noise, stops - starts)]
+
+class Detector():
+    def __init__(self, cfg, callback=None):
+        """Runs detect() on submitted traces in a worker thread. Traces are passed through a bounded queue; if detection falls behind, submit() waits for space in the queue so every trace is detected in order, e.g. so the pre- and post-trigger sweeps of a TriggeredCapture have no gaps. The number of traces which waited and the total time they waited are counted in self.blocked and self.blockedTime.
+
+        Args:
+            cfg (dict): [detection] section of the loaded configuration (See defaultconfig.py).
+            callback (callable, optional): Called from the worker thread with the trace and its list of detections. Defaults to None.
+        """
+        self.cfg = cfg
+        self.callback = callback
+        self.queue = queue.Queue(maxsize=cfg['queue_size'])
+        self.detections = deque(maxlen=cfg['history_length'])
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.blocked = 0            # Number of traces which waited for space in the queue
+        self.blockedTime = 0.0      # Total time in seconds spent waiting for space in the queue
+        self.thread = None
+
+    def start(self):
+        """Starts the worker thread if it is not running.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, trace, azimuth=None, elevation=None):
+        """Queues a trace for detection. If the queue is full, waits for the worker thread to make space.
+
+        Args:
+            trace (Trace): Acquired trace.
+            azimuth (float, optional): Antenna azimuth in degrees at the time of acquisition. Defaults to None.
+            elevation (float, optional): Antenna elevation in degrees at the time of acquisition. Defaults to None.
+
+        Raises:
+            RuntimeError: If the worker thread is not running, since the trace would never be detected.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            raise RuntimeError('Detector is not running.')
+        item = (trace, azimuth, elevation)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            timer = time.perf_counter()
+            with stats.measure('Detector.submit'):
+                self.queue.put(item)
+            with self.lock:
+                self.blocked += 1
+                self.blockedTime += time.perf_counter() - timer
+
+    def run(self):
+        """Worker thread. Runs detect() on each queued trace and stores the results.
+        """
+        while True:
+            trace, azimuth, elevation = self.queue.get()
+            try:
+                detections = detect(trace, self.cfg['threshold'], self.cfg['window'], self.cfg['percentile'], self.cfg['merge_gap'], self.cfg['min_width'], azimuth, elevation)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+                continue
+            with self.lock:
+                self.processed += 1
+                self.detections.extend(detections)
+            for detection in detections:
+                logging.verbose(f'{detection}')
+            if self.callback is not None:
+                try:
+                    self.callback(trace, detections)
+                except Exception as e:
+                    logging.error(f'{type(e).__name__}: {e}')
+
+    def list(self):
+        """Returns a list of the stored detections from oldest to newest.
+        """
+        with self.lock:
+            return list(self.detections)
+
+    def clear(self):
+        with self.lock:
+            self.detections.clear()
@@ -0,0 +1,127 @@
+"""Module that contains the device discovery service, which enumerates serial ports and VISA resources in the background and caches the result, so the Configure dialog opens without waiting for the enumeration.
+The motor controller and PLC are identified by the USB vendor ID, product ID, and serial number of their port (See the [discovery] configuration), so they are found by FrontEnd.initDevice() regardless of the port name they are assigned, e.g. /dev/ttyUSB10 or COM12.
+"""
+
+import asyncio
+import logging
+import time
+
+import serial.tools.list_ports
+
+ROLES = ('motor', 'plc')
+
+def portName(label):
+    """Returns the port name of a combobox label returned by DeviceDiscovery.portLabels(), or by str() of a pyserial ListPortInfo.
+
+    Args:
+        label (string): Port label in the format 'device - description', e.g. '/dev/ttyUSB10 - FT232R USB UART'.
+
+    Returns:
+        string: Port name, e.g. '/dev/ttyUSB10'.
+    """
+    return label.split(' - ', 1)[0].strip()
+
+def matches(port, usbId):
+    """Returns whether a port has the USB identifiers of a device.
+
+    Args:
+        port (serial.tools.list_ports_common.ListPortInfo): Enumerated port.
+        usbId (dict): 'vid' and 'pid' of the device and optionally its 'serial_number'. An empty serial number matches any.
+
+    Returns:
+        bool: True if the identifiers match.
+    """
+    if not usbId.get('vid'):
+        return False
+    if port.vid != usbId['vid'] or port.pid != usbId.get('pid'):
+        return False
+    serialNumber = usbId.get('serial_number', '')
+    return not serialNumber or port.serial_number == serialNumber
+
+class DeviceDiscovery():
+    def __init__(self, core, Vi, cfg, onChange=None):
+        """Cache of the serial ports and VISA resources, refreshed every interval seconds by run().
+
+        Args:
+            core (AsyncCore): Core which runs the discovery task (See run()).
+            Vi (VisaIO): Object of VisaIO whose resource manager lists the VISA resources.
+            cfg (dict): [discovery] section of the loaded configuration (See defaultconfig.py).
+            onChange (callable, optional): Called on the loop thread with this object after an enumeration which changed the ports or resources. Defaults to None.
+        """
+        self.core = core
+        self.Vi = Vi
+        self.interval = cfg['interval']
+        self.usbIds = {role: cfg[role] for role in ROLES}
+        self.onChange = onChange
+        self.ports = []             # ListPortInfo of each serial port
+        self.resources = ()         # VISA resource names
+        self.updated = None         # time.monotonic() of the last enumeration
+        self.wakeEvent = asyncio.Event()
+
+    def enumerate(self):
+        """Lists the serial ports and VISA resources. Blocks for the duration of the enumeration, which can take several seconds.
+
+        Returns:
+            tuple: List of ListPortInfo and tuple of resource names.
+        """
+        ports = sorted(serial.tools.list_ports.comports(), key=lambda port: port.device)
+        try:
+            resources = tuple(self.Vi.listResources())
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+            resources = self.resources
+        return ports, resources
+
+    async def refresh(self):
+        """Enumerates the serial ports and VISA resources in the default executor and updates the cache.
+
+        Returns:
+            bool: True if the ports or resources changed.
+        """
+        ports, resources = await self.core.loop.run_in_executor(None, self.enumerate)
+        changed = [port.device for port in ports] != [port.device for port in self.ports] or resources != self.resources
+        self.ports, self.resources = ports, resources
+        self.updated = time.monotonic()
+        if changed:
+            logging.debug(f'Discovered serial ports {[port.device for port in ports]} and VISA resources {resources}')
+            if self.onChange is not None:
+                try:
+                    self.onChange(self)
+                except Exception as e:
+                    logging.error(f'{type(e).__name__}: {e}')
+        return changed
+
+    def refreshNow(self):
+        """Wakes run() to enumerate immediately, e.g. when Refresh All is pressed. Can be called from any thread.
+        """
+        self.core.signal(self.wakeEvent)
+
+    async def run(self):
+        """Discovery task. Enumerates on startup, then every interval seconds and when woken by refreshNow(). An interval of 0 only enumerates when woken.
+        """
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+            await self.core.waitFor(self.wakeEvent, self.interval or None)
+
+    def portLabels(self):
+        """Returns a label for each cached serial port, in the format 'device - description'.
+        """
+        return [str(port) for port in self.ports]
+
+    def identify(self, role):
+        """Returns the port of a device identified by its USB identifiers in the cached enumeration.
+
+        Args:
+            role (string): 'motor' or 'plc'.
+
+        Returns:
+            string: Port name, or None if the identifiers are not configured, or no port or more than one port matches.
+        """
+        found = [port.device for port in self.ports if matches(port, self.usbIds[role])]
+        if len(found) > 1:
+            logging.warning(f'Found more than one port for the {role}: {found}. Set its serial_number under [discovery] to select one.')
+            return None
+        return found[0] if found else None
@@ -4,6 +4,8 @@
 # MISC LIBRARIES
 import sys
 import logging
+import re
+import numpy as np
 from data import *
 from opcodes import *
 import threading
@@ -21,13 +23,19 @@ import serial.tools.list_ports
 import time
 from timestamp import *
 
+# INSTRUMENTATION
+from instrumentation import stats, timed
+from lockprofiler import ProfiledLock
+from sessionpool import SessionPool
+
 # VISA
-import pyvisa as visa
-from pyvisa import constants
+# pyvisa is imported by VisaIO.openResourceManager() so that the front end does not load the VISA library on startup.
 
 # CONSTANTS
 RETURN_ERROR = 1
 RETURN_SUCCESS = 0
+STATUS_REPLY = re.compile(r'\d+')              # Response of the PLC to opcodes.QUERY_STATUS
+FIRMWARE_REPLY = re.compile(r'\d+(\.\d+)*')    # Response of the PLC to opcodes.GET_FW_VERSION, a number or dotted version
 
 class MotorIO: 
     def __init__(self, Azimuth, Elevation, userAzi = 0, userEle = 0, Azi_bound = [0,360], Ele_bound = [-90,10] ): 
@@ -44,7 +52,7 @@ class MotorIO:
         self.OpenSerial()
 
         # THREADING LOCK
-        self.serialLock = threading.RLock()
+        self.serialLock = ProfiledLock('MotorIO.serialLock')
 
         # commands 
         self.commandToSend  = ""
@@ -265,6 +273,7 @@ class MotorIO:
         with self.serialLock:
             self.ser.close()
 
+    @timed('MotorIO.write')
     def write(self, msg, log=False):
         """Write a message to the serial object and append it with a CRLF if not present.
 
@@ -275,12 +284,15 @@ class MotorIO:
         msg = str(msg)
         if msg[-1] != '\n':
             msg = msg + '\r\n'
+        data = msg.encode('utf-8')
         with self.serialLock:
-            self.ser.write(msg.encode('utf-8'))
+            self.ser.write(data)
+        stats.recordBytes(sent=len(data))
         
         if log:
             logging.motor(f'>>> {msg}')
 
+    @timed('MotorIO.read')
     def read(self, log=False):
         """Reads the amount of bytes in the serial input buffer and returns it.
 
@@ -291,11 +303,14 @@ class MotorIO:
             string: Bytes read from the input buffer decoded in utf-8 format.
         """
         with self.serialLock:
-            buffer = self.ser.read(self.ser.in_waiting).decode('utf-8')
+            data = self.ser.read(self.ser.in_waiting)
+        stats.recordBytes(received=len(data))
+        buffer = data.decode('utf-8')
         if log:
             logging.motor(f'{buffer}')
         return buffer
 
+    @timed('MotorIO.query')
     def query(self, msg, timeout=5.0, log=False):
         """Writes a message to the serial object at self.ser and awaits a response.
 
@@ -319,6 +334,18 @@ class MotorIO:
             if buffer:
                 return buffer
         raise TimeoutError('Timeout expired before motor query response.')
+
+    @staticmethod
+    def parseEncoder(response):
+        """Returns the encoder count in the response to a PRINT query, without the echoed command and program prompt.
+
+        Raises:
+            ValueError: If the response does not contain exactly one line besides the echo and prompt.
+        """
+        lines = [line for line in response.splitlines() if line and 'P00' not in line and 'PRINT' not in line]
+        if len(lines) != 1:
+            raise ValueError(f'Encoder query expected 1 line and returned {len(lines)}: {lines}')
+        return int(lines[0])
     
     def flushInput(self):
         """Flush the input buffer, discarding all its contents.
@@ -338,8 +365,9 @@ class SerialIO:
         """Contains methods for serial communication, this class contains its own threading lock on IO methods. The attribute 'serial' can be used to directly manipulate the instance of serial.Serial().
         """
         self.serial = serial.Serial()
-        self.serialLock = threading.RLock()
+        self.serialLock = ProfiledLock('SerialIO.serialLock')
         self.TIMEOUT = 5.0                        # Default timeout between read and write commands in query call.
+        self.WRITE_DELAY = 1.2                    # Minimum time in seconds between writes, or the PLC will not parse them correctly.
         self.status = 0                           # Status message returned from the PLC which is used to synchronize front end buttons
 
     def threadHandler(self, target, args=(), kwargs={}):
@@ -377,6 +405,7 @@ class SerialIO:
         with self.serialLock:
             self.serial.close()
 
+    @timed('SerialIO.query')
     def query(self, msg, converter='bin', delay=None, queryStatus=True):
         """Writes message to the serial object at self.serial and logs the response after 'delay' seconds at level SERIAL. Due to the delay this should only be called by the thread handler to prevent blocking.
 
@@ -392,7 +421,7 @@ class SerialIO:
         self.write(msg, converter=converter)
 
         timer = time.time()
-        while time.time() - timer < 1.2:
+        while time.time() - timer < self.WRITE_DELAY:
             self.read()
         if queryStatus:     # Delay is required between writes or the PLC will not parse it correctly
             self.threadHandler(self.queryStatus)
@@ -400,6 +429,7 @@ class SerialIO:
         while time.time() - timer < delay:
             self.read()
 
+    @timed('SerialIO.queryStatus')
     def queryStatus(self, delay=None):
         """Writes opcodes.QUERY_STATUS to the serial object at self.serial and logs the response after 'delay' seconds at level SERIAL. Due to the delay this should only be called by the thread handler to prevent blocking.
 
@@ -414,6 +444,98 @@ class SerialIO:
             self.read()
 
 
+    def readReply(self, opcode, pattern, timeout=2.0):
+        """Reads the lines already received like read(), e.g. the confirmation of an earlier selection, then writes an opcode and returns the first line of the response which fully matches pattern. Other lines are logged at level SERIAL.
+        Since the status and the firmware version can both be numbers, the lines received before the opcode is written are drained so a late status is not taken as the reply.
+
+        Args:
+            opcode (int): Opcode to write, e.g. opcodes.QUERY_STATUS.value.
+            pattern (re.Pattern): Pattern of the reply, e.g. STATUS_REPLY.
+            timeout (float, optional): Maximum time in seconds to wait for the reply. Defaults to 2.0.
+
+        Raises:
+            TimeoutError: If the PLC does not reply within the timeout.
+
+        Returns:
+            string: Line of the reply without whitespace.
+        """
+        with self.serialLock:
+            self.read()
+            self.write(opcode, log=False)
+            buffer = ''
+            timer = time.time()
+            while time.time() - timer < timeout:
+                data = self.serial.read(self.serial.in_waiting)
+                stats.recordBytes(received=len(data))
+                *lines, buffer = (buffer + data.decode('utf-8')).split('\n')
+                for line in lines:
+                    line = line.strip()
+                    if pattern.fullmatch(line):
+                        return line
+                    if line:
+                        logging.serial(line)
+                time.sleep(0.01)
+        raise TimeoutError(f'PLC did not reply to {opcodes(opcode).name}.')
+
+    @timed('SerialIO.getStatus')
+    def getStatus(self, timeout=2.0):
+        """Writes opcodes.QUERY_STATUS and returns the status, which also updates self.status. The PLC replies to this opcode in every state, so it is used to check that the PLC is responding.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait for the reply. Defaults to 2.0.
+
+        Raises:
+            TimeoutError: If the PLC does not reply within the timeout.
+
+        Returns:
+            int: Status reported by the PLC.
+        """
+        self.status = int(self.readReply(opcodes.QUERY_STATUS.value, STATUS_REPLY, timeout))
+        return self.status
+
+    @timed('SerialIO.getFirmwareVersion')
+    def getFirmwareVersion(self, timeout=2.0):
+        """Writes opcodes.GET_FW_VERSION and returns the firmware version of the base controller. The PLC does not reply while the base controller is disabled by opcodes.P1_DISABLE.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait for the reply. Defaults to 2.0.
+
+        Raises:
+            TimeoutError: If the PLC does not reply within the timeout.
+
+        Returns:
+            string: Firmware version reported by the PLC.
+        """
+        return self.readReply(opcodes.GET_FW_VERSION.value, FIRMWARE_REPLY, timeout)
+
+    @timed('SerialIO.selectChain')
+    def selectChain(self, opcode, timeout=None, interval=None):
+        """Writes a selection opcode and polls opcodes.QUERY_STATUS until the PLC reports the opcode as its status. Unlike query(), this returns as soon as the selection is confirmed instead of waiting a fixed delay.
+
+        Args:
+            opcode (int): Opcode to write, e.g. opcodes.DFS_CHAIN1.value.
+            timeout (float, optional): Maximum time in seconds to wait for confirmation. Defaults to self.TIMEOUT.
+            interval (float, optional): Time in seconds between status queries. Delay is required between writes or the PLC will not parse them correctly. Defaults to self.WRITE_DELAY.
+
+        Returns:
+            bool: True if the PLC confirmed the selection within the timeout.
+        """
+        if timeout is None:
+            timeout = self.TIMEOUT
+        if interval is None:
+            interval = self.WRITE_DELAY
+        self.write(opcode)
+        timer = time.time()
+        while time.time() - timer < timeout:
+            time.sleep(interval)
+            self.read()
+            if self.status == opcode:
+                return True
+            self.write(opcodes.QUERY_STATUS.value, log=False)
+        self.read()
+        return self.status == opcode
+
+    @timed('SerialIO.write')
     def write(self, msg, converter='bin', log=True):
         """Writes message to the serial object at self.serial appended with a newline character.
 
@@ -421,19 +543,24 @@ class SerialIO:
             msg (string or int): Message to send. If msg is passed as an integer, it will be converted to a string in the format defined by 'converter'.
             converter (str, optional): Format to convert the message to if it is an integer. Can be 'bin' or 'int'. Defaults to 'bin'.
             log (bool, optional): Determines whether or not to log the message sent at level SERIAL in the format '>>> [Message]'. Defaults to True.
+
+        Raises:
+            ValueError: If msg is not a string or an integer, or converter is not 'bin' or 'int'.
         """
         originalmsg = msg
+        if type(msg) == str:
+            if msg[-1] != '\n':
+                msg = msg + '\n'
+        elif type(msg) == int and converter == 'bin':
+            msg = bin(msg)[2:] + '\n'
+        elif type(msg) == int and converter == 'int':
+            msg = str(msg) + '\n'
+        else:
+            raise ValueError(f'Cannot write {repr(msg)} with converter {converter}.')
+        data = msg.encode('utf-8')
         with self.serialLock:
-            if type(msg) == str:
-                if msg[-1] != '\n':
-                    msg = msg + '\n'
-                self.serial.write(msg.encode('utf-8'))
-            elif type(msg) == int and converter == 'bin':
-                msg = bin(msg)[2:] + '\n'
-                self.serial.write(msg.encode('utf-8'))
-            elif type(msg) == int and converter == 'int':
-                msg = str(msg) + '\n'
-                self.serial.write(msg.encode('utf-8'))
+            self.serial.write(data)
+        stats.recordBytes(sent=len(data))
         if log:
             try:
                 logging.serial(f'>>> {opcodes(originalmsg).name}')
@@ -441,18 +568,23 @@ class SerialIO:
                 logging.serial(f'>>> {repr(msg)}')
 
 
+    @timed('SerialIO.readLine')
     def readLine(self):
         """Reads the serial buffer up to a newline character and logs it at level SERIAL.
         """
         with self.serialLock:
-            logging.serial(self.serial.readline().decode('utf-8'))
+            buffer = self.serial.readline()
+            logging.serial(buffer.decode('utf-8'))
+        stats.recordBytes(received=len(buffer))
 
+    @timed('SerialIO.read')
     def read(self):
         """Reads the amount of bytes in the input buffer and logs it at level SERIAL. If a timeout is reached, log the remaining bytes in the serial buffer.
         """
         with self.serialLock:
-            buffer = self.serial.read(self.serial.in_waiting).decode('utf-8')
-            lines = buffer.splitlines()
+            data = self.serial.read(self.serial.in_waiting)
+            stats.recordBytes(received=len(data))
+            lines = data.decode('utf-8').splitlines()
             for i in lines:
                 if i:   # Check if the string is empty
                     try:
@@ -475,19 +607,54 @@ class SerialIO:
 
 
 class VisaIO():
-    def __init__(self):
-        """Opens the VISA resource manager on the default backend (NI-VISA). If the VISA library cannot be found, a path must be passed to pyvisa.highlevel.ResourceManager() constructor
+    def __init__(self, pool=None, lock=None):
+        """Contains methods for VISA communication. The resource manager is not opened until openResourceManager() is called, which should be done off of the main thread since loading the VISA library can take several seconds.
+        Sessions are kept open in a SessionPool, which can be shared by several objects of VisaIO to communicate with several analyzers at once (See SpecAn.bindAnalyzer()).
+
+        Args:
+            pool (SessionPool, optional): Pool of the resource manager and open sessions. Defaults to a new SessionPool().
+            lock (threading.RLock, optional): Lock held by the caller while using this object, registered in the pool as the lock of the connected resource. Defaults to None.
         """
+        self.pool = pool if pool is not None else SessionPool()
+        self.lock = lock
+
+    @property
+    def rm(self):
+        return self.pool.rm
+
+    def openResourceManager(self, backend=''):
+        """Opens the VISA resource manager on the default backend (NI-VISA). If the VISA library cannot be found, a path must be passed to pyvisa.highlevel.ResourceManager() constructor. Does nothing if the resource manager is already open.
+
+        Args:
+            backend (string, optional): VISA library passed to pyvisa.highlevel.ResourceManager(), e.g. '@py' for pyvisa-py. Defaults to '' (NI-VISA).
+
+        Returns:
+            Literal (int): 0 on success, 1 on error.
+        """
+        if self.rm is not None:
+            return RETURN_SUCCESS
         logging.info('Initializing VISA Resource Manager...')
-        self.rm = visa.ResourceManager()
+        self.pool.openResourceManager(backend)
         if self.isError():
             logging.error(f'Could not open a session to the resource manager, error code: {hex(self.rm.last_status)}')
-            return    
-        logging.info(f'Success code {hex(self.rm.last_status)}')
-        return
+            return RETURN_ERROR
+        logging.info(f'Opened resource manager on {self.rm.visalib}')
+        return RETURN_SUCCESS
+
+    def listResources(self):
+        """Lists the resources available to the resource manager.
+
+        Returns:
+            tuple: Resource IDs, or an empty tuple if the resource manager has not been opened yet.
+        """
+        if self.rm is None:
+            logging.info('VISA resource manager is still initializing.')
+            return ()
+        return self.rm.list_resources()
     
+    @timed('VisaIO.connectToRsrc')
     def connectToRsrc(self, inputString):
-        """Opens a session to the resource ID passed from inputString if it is not already connected
+        """Connects to the resource ID passed from inputString if it is not already connected. The session to the previous resource is kept open in the pool, and a session to inputString is reused if the pool has one.
 
         Args:
             inputString (string): Name of the resource ID to attempt to connect to. 
@@ -505,24 +672,28 @@ class VisaIO():
                 return RETURN_SUCCESS                       # If yes --> return
         
         # If a session is not open or the open resource does not match inputString, attempt connection to inputString
-        logging.info(f'Connecting to resource: {inputString}')
-        self.openRsrc = self.rm.open_resource(inputString)
+        if self.rm is None:
+            logging.error('VISA resource manager is not open.')
+            return RETURN_ERROR
+        self.openRsrc = self.pool.open(inputString)
         if self.isError():
             logging.error(f'Could not open a session to {inputString}.')
             logging.error(f'Error Code: {self.rm.last_status}.')
+            self.pool.close(inputString)
             return RETURN_ERROR
+        if self.lock is not None:
+            self.pool.select(inputString, self.lock)
         return RETURN_SUCCESS
     
     def closeSession(self):
-        """If a session is open, closes it.
+        """If a session is open, closes it and removes it from the pool.
         """
-        try:
-            sessionOpen = self.openRsrc.session
-        except:
+        if not self.isSessionOpen():
             logging.info('Session is not open.')
-        if sessionOpen:
-            self.openRsrc.close()
+            return
+        self.pool.close(self.openRsrc.resource_name)
 
+    @timed('VisaIO.identify')
     def identify(self):
         """Issues *IDN? to the open resource and returns a list of its response, split at each comma.
 
@@ -536,6 +707,7 @@ class VisaIO():
             pass
         return buffer
     
+    @timed('VisaIO.resetAnalyzerState')
     def resetAnalyzerState(self):
         """Issues *RST, *WAI, and :INIT CONT OFF to the open resource.
         """
@@ -544,6 +716,77 @@ class VisaIO():
         # Consider issuing sleep time or *OPC? here
         self.openRsrc.write(":INIT:CONT OFF")
 
+    @timed('VisaIO.readSweep')
+    def readSweep(self, binary=False):
+        """Issues :READ:SAN? to the open resource, which initiates a sweep and returns the trace as interleaved X and Y values.
+        The response is read as ASCII, since 32-bit floats cannot represent the frequency of each point. If the trace format was set to binary by setTraceFormat(), it is set to ASCII for the query and restored afterwards.
+
+        Args:
+            binary (bool, optional): Must match the format set by setTraceFormat(). Defaults to False.
+
+        Returns:
+            tuple: (xdata, ydata) lists of the X axis and Y axis values.
+        """
+        if not binary:
+            buffer = self.openRsrc.query_ascii_values(":READ:SAN?")
+            return buffer[::2], buffer[1::2]
+        self.openRsrc.write(":FORM:TRAC:DATA ASC")
+        try:
+            buffer = self.openRsrc.query_ascii_values(":READ:SAN?")
+        finally:
+            self.openRsrc.write(":FORM:TRAC:DATA REAL,32")
+        return buffer[::2], buffer[1::2]
+
+    @timed('VisaIO.setTraceFormat')
+    def setTraceFormat(self, binary=True):
+        """Sets the format of trace data returned by :TRACe:DATA?. Must be called again after *RST since it resets the format to ASCII.
+
+        Args:
+            binary (bool, optional): True for little endian 32-bit floats (REAL,32 with swapped byte order), False for ASCII. Defaults to True.
+        """
+        if binary:
+            self.openRsrc.write(":FORM:TRAC:DATA REAL,32")
+            self.openRsrc.write(":FORM:BORD SWAP")
+        else:
+            self.openRsrc.write(":FORM:TRAC:DATA ASC")
+
+    @timed('VisaIO.readTrace')
+    def readTrace(self, binary=True):
+        """Initiates a sweep, waits for it to complete, and returns the amplitude values of trace 1 with :TRACe:DATA? TRACE1. Unlike readSweep(), the X axis is not transferred.
+
+        Args:
+            binary (bool, optional): Must match the format set by setTraceFormat(). Defaults to True.
+
+        Returns:
+            numpy.ndarray: Amplitude values of each sweep point.
+        """
+        self.openRsrc.write(":INIT:IMM")
+        self.openRsrc.query("*OPC?")
+        if binary:
+            return self.openRsrc.query_binary_values(":TRAC:DATA? TRACE1", datatype='f', is_big_endian=False, container=np.array)
+        return self.openRsrc.query_ascii_values(":TRAC:DATA? TRACE1", container=np.array)
+
+    @timed('VisaIO.writeBatch')
+    def writeBatch(self, commands):
+        """Writes several commands to the open resource in a single message, separated by semicolons. Each command should start with a colon so it is parsed from the root of the command tree.
+
+        Args:
+            commands (list): SCPI commands to write.
+        """
+        if commands:
+            self.openRsrc.write(';'.join(commands))
+
+    @timed('VisaIO.setMaxSweepPoints')
+    def setMaxSweepPoints(self):
+        """Sets the number of sweep points to the maximum supported by the analyzer.
+
+        Returns:
+            int: Number of sweep points.
+        """
+        points = int(float(self.openRsrc.query(":SENS:SWE:POIN? MAX")))
+        self.openRsrc.write(f":SENS:SWE:POIN {points}")
+        return points
+
     def testBufferSize(self):
         # PyVISA reads until a termination is received, not specified bytes like NI-VISA unless resource.read_bytes() is called.
         # As a result, this test may not be necessary but edge cases for the maximum return value of resource.read() must be tested.
@@ -609,12 +852,18 @@ class VisaIO():
         Returns:
             Literal (int): 0 on success or warning (operation succeeded), StatusCode on error.
         """
-        if self.rm.last_status < constants.VI_SUCCESS:
-            return self.rm.last_status
+        from pyvisa import constants, errors
+        try:
+            lastStatus = self.rm.last_status
+        except errors.Error:
+            return RETURN_SUCCESS   # pyvisa-py has no status until an operation on the session completes
+        if lastStatus < constants.VI_SUCCESS:
+            return lastStatus
         else:
             # logging.info(f'Success code: {hex(self.rm.last_status)}')
             return RETURN_SUCCESS
         
+    @timed('VisaIO.queryErrors')
     def queryErrors(self, log=True):
         """Issues ':SYST:ERR?' to the open resource and logs response at level INFO
 
@@ -635,6 +884,7 @@ class VisaIO():
             logging.info(f'{buffer}')
         return buffer
         
+    @timed('VisaIO.queryPowerUpErrors')
     def queryPowerUpErrors(self, log=True):
         """Issues ':SYST:ERR:PUP?' to the open resource and logs response at level INFO
 
@@ -656,6 +906,7 @@ class VisaIO():
             logging.info(f'{buffer}')   # Remove brackets, leading and trailing whitespace, and newline characters
         return buffer
 
+    @timed('VisaIO.getEventRegister')
     def getEventRegister(self):
         """Issues '*ESR?' to the open resource and returns integer response
 
@@ -664,6 +915,7 @@ class VisaIO():
         """
         return self.openRsrc.query_ascii_values("*ESR?")
 
+    @timed('VisaIO.getOperationRegister')
     def getOperationRegister(self):
         """Issues ':STAT:OPER:COND?' to the open resource and returns integer response
 
@@ -675,6 +927,7 @@ class VisaIO():
         buffer = int(buffer[0])
         return buffer
 
+    @timed('VisaIO.getCalCondRegister')
     def getCalCondRegister(self):
         """Issues ':STAT:QUES:CAL:COND?' to the open resource and returns integer response
 
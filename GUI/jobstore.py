@@ -0,0 +1,249 @@
+"""Module that contains the SQLite job store of automation campaigns. The store records each campaign definition, whether the campaigns are active, and every run of a campaign (planned, running, completed, or failed) with the files it saved, so campaigns are resumed after a crash or restart without repeating completed runs.
+Run 'python jobstore.py automation.db' to print the recorded runs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from campaign import Campaign, localTime
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    definition TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign TEXT NOT NULL,
+    scheduled TEXT NOT NULL,
+    state TEXT NOT NULL,
+    started TEXT,
+    finished TEXT,
+    files TEXT,
+    error TEXT,
+    UNIQUE (campaign, scheduled)
+);
+CREATE INDEX IF NOT EXISTS runs_campaign_state ON runs (campaign, state, scheduled);
+"""
+
+def timeString(value=None):
+    """Converts a datetime (or the current time if None) to the string stored in the database. Times are stored in UTC so the strings sort in time order.
+    """
+    return localTime(value).astimezone(timezone.utc).isoformat(timespec='seconds')
+
+class JobStore():
+    def __init__(self, fileName, legacyFile=None):
+        """Opens or creates the job store database.
+
+        Args:
+            fileName (string): Path to the SQLite database.
+            legacyFile (string, optional): Path to a JSON campaign file written by earlier versions. If it exists, its campaigns are imported into an empty database and it is renamed with the suffix '.migrated'. Defaults to None.
+        """
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        with self.connect() as db:
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f'{fileName} was created by a newer version (schema {version}).')
+            db.executescript(SCHEMA)
+            db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        if legacyFile is not None and os.path.exists(legacyFile):
+            self.migrate(legacyFile)
+
+    @contextmanager
+    def connect(self):
+        """Opens a connection which commits on success and is always closed. Connections are not shared between threads.
+        """
+        db = sqlite3.connect(self.fileName, timeout=10.0)
+        try:
+            db.execute('PRAGMA journal_mode = WAL')
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def migrate(self, legacyFile):
+        """Imports campaigns from a JSON campaign file. The time of the last run of each campaign is imported as a completed run so it is not repeated.
+
+        Args:
+            legacyFile (string): Path to the JSON file.
+        """
+        try:
+            with open(legacyFile, 'r') as f:
+                data = json.load(f)
+            campaigns = [Campaign.fromDict(_dict) for _dict in data.get('campaigns', [])]
+        except (OSError, ValueError, TypeError) as e:
+            logging.error(f'{type(e).__name__}: {e}. Could not migrate campaigns from {legacyFile}.')
+            return
+        with self.lock, self.connect() as db:
+            if db.execute('SELECT COUNT(*) FROM campaigns').fetchone()[0]:
+                logging.warning(f'Job store {self.fileName} already contains campaigns, {legacyFile} was not migrated.')
+                return
+            self._saveCampaigns(db, campaigns)
+            self._setActive(db, data.get('active', False))
+            for campaign in campaigns:
+                if campaign.lastRun is not None:
+                    scheduled = campaign.previousRun(campaign.lastRun) or campaign.lastRun
+                    db.execute("INSERT OR IGNORE INTO runs (campaign, scheduled, state, finished, files) VALUES (?, ?, 'completed', ?, '[]')", (campaign.name, timeString(scheduled), timeString(campaign.lastRun)))
+        os.replace(legacyFile, legacyFile + '.migrated')
+        logging.info(f'Migrated {len(campaigns)} campaigns from {legacyFile} to {self.fileName}')
+
+    @property
+    def active(self):
+        """Whether the stored campaigns were scheduled when the program closed and should be resumed.
+        """
+        with self.lock, self.connect() as db:
+            row = db.execute("SELECT value FROM settings WHERE key = 'active'").fetchone()
+        return row is not None and row[0] == '1'
+
+    def recoverInterrupted(self):
+        """Marks runs left in the running state by a crash as failed, so they are run again if they are the latest missed run. Planned runs whose scheduled time passed while the program was not running are also marked as failed, since they would otherwise stay planned. Should only be called on startup by the process which owns the store.
+
+        Returns:
+            int: Number of interrupted and missed runs.
+        """
+        now = timeString()
+        with self.lock, self.connect() as db:
+            interrupted = db.execute("UPDATE runs SET state = 'failed', finished = ?, error = 'Interrupted' WHERE state = 'running'", (now,)).rowcount
+            missed = db.execute("UPDATE runs SET state = 'failed', finished = ?, error = 'Missed' WHERE state = 'planned' AND scheduled < ?", (now, now)).rowcount
+        if interrupted:
+            logging.warning(f'{interrupted} runs in {self.fileName} were interrupted and are marked as failed')
+        if missed:
+            logging.warning(f'{missed} planned runs in {self.fileName} were missed and are marked as failed')
+        return interrupted + missed
+
+    def load(self):
+        """Reads the stored campaigns. The last run of each campaign is set to its latest completed run.
+
+        Returns:
+            list: Instances of Campaign in the order they were added.
+        """
+        with self.lock, self.connect() as db:
+            campaigns = []
+            for name, definition in db.execute('SELECT name, definition FROM campaigns ORDER BY position'):
+                try:
+                    campaign = Campaign.fromDict(json.loads(definition))
+                except (ValueError, TypeError) as e:
+                    logging.error(f'{type(e).__name__}: {e}. Could not load campaign {name}.')
+                    continue
+                row = db.execute("SELECT MAX(scheduled) FROM runs WHERE campaign = ? AND state = 'completed'", (name,)).fetchone()
+                campaign.lastRun = datetime.fromisoformat(row[0]) if row[0] is not None else None
+                campaigns.append(campaign)
+        return campaigns
+
+    def save(self, campaigns=None, active=None):
+        """Writes the campaigns and whether they are active. Runs of removed campaigns are kept.
+
+        Args:
+            campaigns (list, optional): Instances of Campaign which replace the stored campaigns. Defaults to None (unchanged).
+            active (bool, optional): Whether the campaigns are scheduled and should be resumed after a restart. Defaults to None (unchanged).
+        """
+        with self.lock, self.connect() as db:
+            if campaigns is not None:
+                self._saveCampaigns(db, campaigns)
+            if active is not None:
+                self._setActive(db, active)
+
+    def _saveCampaigns(self, db, campaigns):
+        db.execute('DELETE FROM campaigns')
+        db.executemany('INSERT INTO campaigns (name, position, definition) VALUES (?, ?, ?)', [(campaign.name, index, json.dumps(campaign.asDict())) for index, campaign in enumerate(campaigns)])
+
+    def _setActive(self, db, active):
+        db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('active', ?)", ('1' if active else '0',))
+
+    def planRun(self, campaign, scheduled):
+        """Records the next run of a campaign as planned, unless it is already recorded.
+
+        Args:
+            campaign (string): Name of the campaign.
+            scheduled (datetime): Scheduled run time.
+        """
+        with self.lock, self.connect() as db:
+            db.execute("INSERT OR IGNORE INTO runs (campaign, scheduled, state) VALUES (?, ?, 'planned')", (campaign, timeString(scheduled)))
+
+    def startRun(self, campaign, scheduled):
+        """Records a run as running, unless it has already completed.
+
+        Args:
+            campaign (string): Name of the campaign.
+            scheduled (datetime): Scheduled run time, which identifies the run.
+
+        Returns:
+            int: Id of the run, or None if the run has already completed and should be skipped.
+        """
+        with self.lock, self.connect() as db:
+            key = (campaign, timeString(scheduled))
+            row = db.execute('SELECT id, state FROM runs WHERE campaign = ? AND scheduled = ?', key).fetchone()
+            if row is None:
+                return db.execute("INSERT INTO runs (campaign, scheduled, state, started) VALUES (?, ?, 'running', ?)", key + (timeString(),)).lastrowid
+            if row[1] == 'completed':
+                return None
+            db.execute("UPDATE runs SET state = 'running', started = ?, finished = NULL, error = NULL WHERE id = ?", (timeString(), row[0]))
+            return row[0]
+
+    def finishRun(self, runId, state, files=(), error=None):
+        """Records the result of a run.
+
+        Args:
+            runId (int): Id returned by startRun().
+            state (string): 'completed' or 'failed'.
+            files (list, optional): Paths of the files saved by the run. Defaults to ().
+            error (string, optional): Description of the error if the run failed. Defaults to None.
+        """
+        with self.lock, self.connect() as db:
+            db.execute('UPDATE runs SET state = ?, finished = ?, files = ?, error = ? WHERE id = ?', (state, timeString(), json.dumps(list(files)), error, runId))
+
+    def runs(self, campaign=None, limit=100):
+        """Returns the most recent runs, newest first.
+
+        Args:
+            campaign (string, optional): Name of the campaign, or None for every campaign. Defaults to None.
+            limit (int, optional): Maximum number of runs. Defaults to 100.
+
+        Returns:
+            list: Runs as dictionaries with the keys campaign, scheduled, state, started, finished, files, and error.
+        """
+        query = 'SELECT campaign, scheduled, state, started, finished, files, error FROM runs'
+        args = ()
+        if campaign is not None:
+            query += ' WHERE campaign = ?'
+            args = (campaign,)
+        query += ' ORDER BY scheduled DESC LIMIT ?'
+        with self.lock, self.connect() as db:
+            rows = db.execute(query, args + (limit,)).fetchall()
+        keys = ('campaign', 'scheduled', 'state', 'started', 'finished', 'files', 'error')
+        runs = [dict(zip(keys, row)) for row in rows]
+        for run in runs:
+            run['files'] = json.loads(run['files']) if run['files'] else []
+        return runs
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the campaigns and runs recorded in an automation job store.')
+    parser.add_argument('file', help='Path to the job store database.')
+    parser.add_argument('--campaign', default=None, help='Only print runs of this campaign.')
+    parser.add_argument('--limit', type=int, default=50, help='Maximum number of runs to print.')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        parser.error(f'{args.file} does not exist.')
+    store = JobStore(args.file)
+    print(f'Active: {store.active}')
+    for campaign in store.load():
+        print(campaign)
+    for run in store.runs(args.campaign, args.limit):
+        print(f"{run['scheduled']}  {run['campaign']:<16} {run['state']:<10} {', '.join(run['files']) or run['error'] or ''}")
+
+if __name__ == '__main__':
+    main()
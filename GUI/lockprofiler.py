@@ -0,0 +1,302 @@
+"""Module that contains the lock profiler. ProfiledLock wraps the RLocks of the front end and, while profiling is enabled, records the wait and hold time of each lock, the thread that owns it, where it was acquired, and the order in which locks are acquired.
+From these it reports the acquisition sites which hold locks the longest (hot spots), holds which have lasted longer than a threshold or whose thread has exited (leaks), and pairs of locks which have been acquired in both orders (lock-order inversions, which can deadlock).
+Profiling is disabled by default (See the [instrumentation] configuration). While disabled, a ProfiledLock behaves like TimedLock.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from instrumentation import Histogram, TimedLock, stats
+
+class LockStats():
+    def __init__(self):
+        """Statistics of one profiled lock.
+        """
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.contended = 0
+        self.sites = {}         # Acquisition site mapped to [count, total hold time, max hold time]
+
+    def asDict(self):
+        return {
+            'acquisitions': self.hold.count,
+            'contended': self.contended,
+            'wait': self.wait.asDict(),
+            'hold': self.hold.asDict(),
+            'sites': {site: {'count': count, 'total': total, 'max': _max} for site, (count, total, _max) in sorted(self.sites.items(), key=lambda item: -item[1][1])},
+        }
+
+class Hold():
+    def __init__(self, lock, thread, site, since):
+        """Current outermost hold of a lock by a thread.
+        """
+        self.lock = lock
+        self.thread = thread
+        self.site = site
+        self.since = since
+        self.depth = 1
+        self.warned = False
+
+class LockProfiler():
+    def __init__(self):
+        """Registry of profiled locks. The module-level instance 'profiler' is used by every ProfiledLock.
+        """
+        self.enabled = False
+        self.leakThreshold = 10.0
+        self.lock = threading.Lock()
+        self.locks = {}
+        self.holds = {}         # (lock name, id of the lock) mapped to its current Hold, so locks which share a name, e.g. one per serial port, are tracked separately
+        self.order = {}         # (first, second) lock names mapped to the site where second was first acquired while holding first
+        self.inversions = {}    # Sorted pair of lock names mapped to the sites of both orders
+        self.local = threading.local()
+        self.generation = 0     # Incremented when profiling is enabled, which discards the held locks of every thread
+        self.started = time.time()
+
+    def enable(self, enabled=True, leakThreshold=None):
+        """Enables or disables profiling. Locks held when profiling is enabled are not tracked until they are released and acquired again.
+
+        Args:
+            enabled (bool, optional): Defaults to True.
+            leakThreshold (float, optional): Seconds after which a hold is reported as leaked. Defaults to unchanged.
+        """
+        if leakThreshold is not None:
+            self.leakThreshold = leakThreshold
+        with self.lock:
+            if enabled and not self.enabled:
+                # Holds recorded before profiling was last disabled may never be released, so tracking starts over
+                self.holds.clear()
+                self.generation += 1
+            self.enabled = enabled
+
+    def reset(self):
+        """Clears every recorded statistic and the lock order. Current holds are kept.
+        """
+        with self.lock:
+            self.locks.clear()
+            self.order.clear()
+            self.inversions.clear()
+            self.started = time.time()
+
+    def _held(self):
+        """Returns the keys (lock name, id of the lock) of the locks held by the current thread, in the order they were acquired.
+        """
+        if getattr(self.local, 'generation', None) != self.generation:
+            self.local.held = []
+            self.local.generation = self.generation
+        return self.local.held
+
+    def _stats(self, name):
+        lockStats = self.locks.get(name)
+        if lockStats is None:
+            lockStats = self.locks[name] = LockStats()
+        return lockStats
+
+    def acquired(self, lock, wait, contended, site):
+        """Records an acquisition of a lock by the current thread. Called by ProfiledLock after the underlying lock is acquired. Statistics and the lock order are recorded by name, so locks which share a name are reported together.
+        """
+        held = self._held()
+        now = time.perf_counter()
+        thread = threading.current_thread()
+        name = lock.name
+        key = (name, id(lock))
+        with self.lock:
+            hold = self.holds.get(key)
+            if hold is not None and hold.thread is thread:
+                hold.depth += 1         # Reentrant acquisition, timed as part of the outermost hold
+                return
+            lockStats = self._stats(name)
+            lockStats.wait.record(wait)
+            lockStats.contended += contended
+            self.holds[key] = Hold(name, thread, site, now)
+            for other, _ in held:
+                if other == name:
+                    continue
+                pair = (other, name)
+                if pair not in self.order:
+                    self.order[pair] = site
+                    reverse = self.order.get((name, other))
+                    if reverse is not None:
+                        self.inversions[tuple(sorted(pair))] = {f'{other} -> {name}': site, f'{name} -> {other}': reverse}
+                        logging.warning(f'Lock-order inversion: {name} acquired while holding {other} at {site}, and {other} acquired while holding {name} at {reverse}')
+        held.append(key)
+
+    def released(self, lock):
+        """Records a release of a lock by the current thread. Called by ProfiledLock before the underlying lock is released.
+        """
+        now = time.perf_counter()
+        name = lock.name
+        key = (name, id(lock))
+        with self.lock:
+            hold = self.holds.get(key)
+            if hold is None or hold.thread is not threading.current_thread():
+                return      # Acquired before profiling was enabled
+            if hold.depth > 1:
+                hold.depth -= 1
+                return
+            del self.holds[key]
+            duration = now - hold.since
+            lockStats = self._stats(name)
+            lockStats.hold.record(duration)
+            site = lockStats.sites.setdefault(hold.site, [0, 0.0, 0.0])
+            site[0] += 1
+            site[1] += duration
+            site[2] = max(site[2], duration)
+        held = self._held()
+        for index in range(len(held) - 1, -1, -1):
+            if held[index] == key:
+                del held[index]
+                break
+
+    def leaks(self):
+        """Returns the holds which have lasted longer than leakThreshold or whose thread has exited without releasing the lock. Each leak is logged as a warning once.
+
+        Returns:
+            list: Dictionaries with the keys lock, thread, site, held (seconds), depth, and alive.
+        """
+        now = time.perf_counter()
+        leaks = []
+        with self.lock:
+            for hold in self.holds.values():
+                duration = now - hold.since
+                alive = hold.thread.is_alive()
+                if duration < self.leakThreshold and alive:
+                    continue
+                leaks.append({'lock': hold.lock, 'thread': hold.thread.name, 'site': hold.site, 'held': duration, 'depth': hold.depth, 'alive': alive})
+                if not hold.warned:
+                    hold.warned = True
+                    reason = 'which has exited' if not alive else f'for {duration:.1f} s'
+                    logging.warning(f'{hold.lock} is held by thread {hold.thread.name} {reason}, acquired at {hold.site}')
+        return leaks
+
+    def owners(self):
+        """Returns the current owner of each held lock.
+
+        Returns:
+            dict: Lock names mapped to (thread name, acquisition site, seconds held). If several held locks share a name, each is listed as 'name@id' with the hexadecimal id of the lock.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            names = [name for name, _ in self.holds]
+            return {(name if names.count(name) == 1 else f'{name}@{lockId:x}'): (hold.thread.name, hold.site, now - hold.since) for (name, lockId), hold in self.holds.items()}
+
+    def hotSpots(self, count=10):
+        """Returns the acquisition sites with the longest total hold time.
+
+        Args:
+            count (int, optional): Maximum number of sites. Defaults to 10.
+
+        Returns:
+            list: Tuples of (lock, site, acquisitions, total hold time, max hold time).
+        """
+        with self.lock:
+            sites = [(name, site, values[0], values[1], values[2]) for name, lockStats in self.locks.items() for site, values in lockStats.sites.items()]
+        sites.sort(key=lambda site: -site[3])
+        return sites[:count]
+
+    def snapshot(self):
+        """Returns every recorded statistic, the current owners, leaks, and lock-order inversions.
+        """
+        leaks = self.leaks()
+        owners = self.owners()
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'elapsed': time.time() - self.started,
+                'locks': {name: lockStats.asDict() for name, lockStats in sorted(self.locks.items())},
+                'owners': {name: {'thread': thread, 'site': site, 'held': held} for name, (thread, site, held) in owners.items()},
+                'leaks': leaks,
+                'order': [f'{first} -> {second}' for first, second in sorted(self.order)],
+                'inversions': [{'locks': list(pair), 'sites': sites} for pair, sites in self.inversions.items()],
+            }
+
+    def report(self):
+        """Returns a text report of the locks sorted by total wait time, the hot spots, current owners, leaks, and lock-order inversions.
+        """
+        snapshot = self.snapshot()
+        lines = [f'Lock profile over {snapshot["elapsed"]:.1f} s (profiling {"enabled" if snapshot["enabled"] else "disabled"})', '']
+        lines.append(f'{"Lock":<22}{"Acquired":>9}{"Contended":>10}{"Wait total":>12}{"Wait p99":>10}{"Hold total":>12}{"Hold p99":>10}{"Hold max":>10}')
+        for name, lockStats in sorted(snapshot['locks'].items(), key=lambda item: -item[1]['wait']['total']):
+            wait, hold = lockStats['wait'], lockStats['hold']
+            lines.append(f'{name:<22}{lockStats["acquisitions"]:>9}{lockStats["contended"]:>10}{wait["total"]:>11.3f}s{wait["p99"]*1e3:>8.1f}ms{hold["total"]:>11.3f}s{hold["p99"]*1e3:>8.1f}ms{hold["max"]:>9.2f}s')
+        lines += ['', 'Hot spots (longest total hold time):']
+        for name, site, count, total, _max in self.hotSpots():
+            lines.append(f'  {name:<20} {site:<32} {count:>7}x  total {total:.3f} s  max {_max:.3f} s')
+        lines += ['', 'Current owners:']
+        for name, owner in snapshot['owners'].items():
+            lines.append(f'  {name:<20} {owner["thread"]:<24} {owner["site"]:<32} {owner["held"]:.2f} s')
+        if not snapshot['owners']:
+            lines.append('  None')
+        if snapshot['leaks']:
+            lines += ['', f'Leaked holds (longer than {self.leakThreshold:g} s or owner exited):']
+            for leak in snapshot['leaks']:
+                lines.append(f'  {leak["lock"]:<20} {leak["thread"]:<24} {leak["site"]:<32} {leak["held"]:.1f} s{"" if leak["alive"] else " (thread exited)"}')
+        if snapshot['inversions']:
+            lines += ['', 'Lock-order inversions:']
+            for inversion in snapshot['inversions']:
+                for order, site in inversion['sites'].items():
+                    lines.append(f'  {order:<44} at {site}')
+        return '\n'.join(lines)
+
+    def export(self, fileName):
+        """Writes the report to a file, as JSON if the file name ends with '.json' and as text otherwise.
+        """
+        with open(fileName, 'w') as f:
+            if fileName.lower().endswith('.json'):
+                json.dump(self.snapshot(), f, indent=4)
+            else:
+                f.write(self.report())
+
+profiler = LockProfiler()
+
+def callerSite():
+    """Returns the file name and line number of the first caller outside of this module, e.g. 'main.py:1077'.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}'
+
+class ProfiledLock(TimedLock):
+    def __init__(self, name, lock=None):
+        """Lock which is profiled by the module-level LockProfiler while it is enabled. Supports the same acquire(), release(), and context manager use as threading.RLock, and records wait time in the I/O statistics like TimedLock.
+
+        Args:
+            name (string): Name of the lock in the report.
+            lock (threading.RLock, optional): Lock to wrap. Defaults to a new threading.RLock().
+        """
+        super().__init__(name, lock)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not profiler.enabled:
+            return super().acquire(blocking, timeout)
+        site = callerSite()
+        contended = False
+        timer = time.perf_counter()
+        acquired = self.lock.acquire(False)
+        if not acquired and blocking:
+            contended = True
+            acquired = self.lock.acquire(True, timeout)
+        wait = time.perf_counter() - timer
+        if stats.enabled:
+            stats.recordWait(self.name, wait)
+        if acquired:
+            profiler.acquired(self, wait, contended, site)
+        return acquired
+
+    def release(self):
+        if profiler.enabled:
+            profiler.released(self)
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __repr__(self):
+        return f'ProfiledLock({self.name}, {self.lock})'
@@ -10,8 +10,10 @@
  """
 
 import logging
+import time
 
 VERBOSE = logging.DEBUG + 1
+STARTUP_TIME = time.perf_counter()     # Reference time for the startup timeline, taken when this module is first imported
 
 logging.basicConfig(
     level=logging.INFO,
@@ -55,6 +57,14 @@ def loggingLevelHandler(level):
     elif level == 3:
         logging.getLogger().setLevel(logging.DEBUG)
 
+def logStartup(stage):
+    """Logs a startup stage at level INFO along with the time elapsed since this module was first imported.
+
+    Args:
+        stage (string): Description of the startup stage that was just completed.
+    """
+    logging.info(f'Startup: {stage} (+{time.perf_counter() - STARTUP_TIME:.3f} s)')
+
 
 addLoggingLevel("TERMINAL", logging.INFO + 1)
 addLoggingLevel("SERIAL", logging.INFO + 2)
@@ -1,20 +1,37 @@
 # PRIVATE LIBRARIES
+from loggingsetup import *
 import defaultconfig
 from frontendio import *
 from timestamp import *
 from opcodes import *
-from loggingsetup import *
+from parameters import *
+from tracedata import *
+from averaging import *
+from automation import *
+from waterfall import *
+from detection import *
+from capture import *
+from pulse import *
+from sweepplan import *
+from correction import *
+from campaign import *
+from jobstore import *
+from instrumentation import *
+from lockprofiler import *
+from asynccore import *
+from sessionpool import *
+from supervisor import *
+from discovery import *
+from writer import *
 
 # OTHER MODULES
+import asyncio
 import threading
 import sys
 import os
 from datetime import date, datetime
 import datetime as dt
-from pyvisa import attributes
 import numpy as np
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.executors.pool import ThreadPoolExecutor
 import logging
 import decimal
 import traceback
@@ -23,27 +40,28 @@ import tomllib
 from pathlib import Path
 
 # MATPLOTLIB
-import matplotlib.pyplot as plt
+# pyplot is not imported since all figures are embedded in tkinter; matplotlib.figure.Figure avoids loading the pyplot state machine and backend resolution on startup.
 import matplotlib.ticker as ticker
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 # TKINTER
+# Dialog-only dependencies (apscheduler, tkcalendar, tktimepicker, colorchooser) are imported on first use.
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 from tkinter import filedialog
-from tkinter import colorchooser
 from tkinter import font
 from tkinter.ttk import *
 from ttkthemes import ThemedTk
-from tkcalendar import Calendar, DateEntry
-from tktimepicker import SpinTimePickerModern, constants
+
+logStartup('Modules imported')
 
 # CONSTANTS
 IDLE_DELAY = 1.0
 ANALYZER_LOOP_DELAY = 0.5
 MOTOR_LOOP_DELAY = 0.5
-STATUS_MONITOR_DELAY = 0.2
+STATUS_MONITOR_DELAY = 1.0
 RETURN_ERROR = 1
 RETURN_SUCCESS = 0
 ENABLE = 1
@@ -71,24 +89,7 @@ class state:
     CLEANUP = 4
 
 # TOML CONFIGURATION
-try:
-    missingHeaders = []
-    missingKeys = []
-    file = open(Path(__file__).parent.absolute() / 'config.toml', "rb")
-    cfg = tomllib.load(file)
-
-    for header in defaultconfig.cfg:
-        if str(header) not in cfg:
-            missingHeaders.append(header)
-            continue
-        for key in defaultconfig.cfg[header]:
-            if str(key) not in cfg[header]:
-                missingKeys.append(header + '.' + key)
-except Exception as e:
-    cfg_error = e
-finally:
-    if missingHeaders or missingKeys or 'cfg_error' in locals():
-        cfg = defaultconfig.cfg
+cfg, missingHeaders, missingKeys, cfg_error = defaultconfig.loadConfig()
 
 # ENCODER CONSTANTS (HOME AND COUNTS PER DEGREE)
 X_HOME = cfg['calibration']['x_enc_home']
@@ -96,89 +97,63 @@ Y_HOME = cfg['calibration']['y_enc_home']
 X_CPD = cfg['calibration']['x_countsperrotation'] / 360
 Y_CPD = cfg['calibration']['y_countsperrotation'] / 360
 
+# ANALYZER ACQUISITION
+ACQUISITION = cfg['analyzer']['acquisition']
+BINARY_TRACE = cfg['analyzer']['data_format'] == 'real32'
+
 # THREADING EVENTS
-visaLock = threading.RLock()        # For VISA resources
-motorLock = threading.RLock()       # For motor controller
-plcLock = threading.RLock()         # For PLC
-specPlotLock = threading.RLock()    # For matplotlib spectrum plot
-bearingPlotLock = threading.RLock() # For matplotlib antenna direction plot
-autoQueueLock = threading.RLock()   # For list of automated sweep datetimes
+visaLock = ProfiledLock('visaLock')                 # For VISA resources
+motorLock = ProfiledLock('motorLock')               # For motor controller
+plcLock = ProfiledLock('plcLock')                   # For PLC
+specPlotLock = ProfiledLock('specPlotLock')         # For matplotlib spectrum plot
+bearingPlotLock = ProfiledLock('bearingPlotLock')   # For matplotlib antenna direction plot
+autoQueueLock = ProfiledLock('autoQueueLock')       # For list of automation campaigns
+stats.enable(cfg['instrumentation']['enabled'])
+profiler.enable(cfg['instrumentation']['lock_profiling'], cfg['instrumentation']['leak_threshold'])
+
+# ASYNCIO CORE
+core = AsyncCore().start()      # Event loop which runs the display loops, status monitor, and task scheduler
+statusEvent = asyncio.Event()   # Wakes statusTask() (See refreshStatus())
 
 # AUTOMATION PARAMETERS
-executors = {
-    'default': ThreadPoolExecutor(cfg['automation']['thread_max_workers']),
-}
-job_defaults = {
-    'coalesce': cfg['automation']['coalesce'],
-    'max_instances': cfg['automation']['job_max_instances']
-}
 class Automation():
-    def __init__(self, executors=None, job_defaults=None):
-        self.queue = []
+    def __init__(self):
+        """Contains the automation queue and task scheduler. The scheduler is not constructed until initScheduler() is called so that apscheduler is not imported on startup.
+        The queue contains instances of Campaign and is loaded from the job store, so campaigns which were active when the program closed are resumed by initSubsystems().
+        """
+        self.store = JobStore(defaultconfig.configPath(cfg['automation']['job_store']), legacyFile=defaultconfig.configPath('campaigns.json'))
+        self.store.recoverInterrupted()
+        self.queue = self.store.load()
         self.state = state.IDLE
         self.filePath = os.getcwd()
-        self.scheduler = BackgroundScheduler(executors=executors, job_defaults=job_defaults)
-
-automation = Automation(executors=executors, job_defaults=job_defaults)
+        self.scheduler = None
+        self.schedulerLock = ProfiledLock('schedulerLock')
+        self.service = None             # ServiceClient if the front end is attached to the headless service
+        self.mode = 'scheduled'         # Mode of new campaigns: 'scheduled' saves a trace, 'survey' saves a wideband survey, and 'chains' saves a trace of every RF chain at each run. 'triggered' arms SpecAn.capture instead
 
-# SPECTRUM ANALYZER PARAMETERS
-class Parameter:
-    instances = []
-    def __init__(self, name, command, log = True):
-        """Spectrum analyzer parameter and associated SCPI command.
+    def initScheduler(self):
+        """Imports apscheduler, constructs the scheduler from the [automation] configuration on the event loop of the asyncio core, and starts it paused. Does nothing if the scheduler already exists.
 
-        Args:
-            name (string): Full name to be used in trace csv.
-            command (string): SCPI command used to query/set parameter.
-            log (bool): Determines whether or not to save the parameter to trace csv. Defaults to True.
+        Returns:
+            AsyncIOScheduler: The task scheduler.
         """
-        Parameter.instances.append(self)
-        self.name = name
-        self.command = command
-        self.log = log
-        self.arg = None
-        self.widget = None
-        self.value = None
+        with self.schedulerLock:
+            if self.scheduler is not None:
+                return self.scheduler
+            self.scheduler = createScheduler(cfg, core.loop)
+            core.call(self.scheduler.start, paused=True)
+            return self.scheduler
 
-    def update(self, arg = None, widget = None, value=None):
-        """Update the argument/value and tkinter widget associated with the parameter.
+automation = Automation()
 
-        Args:
-            arg (any, optional): Parameter argument. Defaults to None.
-            widget (ttk.Widget or Tkinter_variable, optional): Associated tkinter widget. Defaults to None.
-            value(any, optional): Parameter value. Defaults to None.
-        """
-        if arg is not None:
-            self.arg = arg
-        if widget is not None:
-            self.widget = widget
-        if value is not None:
-            self.value = value
-
-CenterFreq      = Parameter('Center Frequency', ':SENS:FREQ:CENTER', log=False)
-Span            = Parameter('Span', ':SENS:FREQ:SPAN', log=False)
-StartFreq       = Parameter('Start Frequency', ':SENS:FREQ:START')
-StopFreq        = Parameter('Stop Frequency', ':SENS:FREQ:STOP')
-SweepTime       = Parameter('Sweep Time', ':SWE:TIME')
-Rbw             = Parameter('RBW', ':SENS:BANDWIDTH:RESOLUTION')
-Vbw             = Parameter('VBW', ':SENS:BANDWIDTH:VIDEO')
-BwRatio         = Parameter('VBW:3 dB RBW', ':SENS:BANDWIDTH:VIDEO:RATIO', log=False)
-Ref             = Parameter('Ref Level', ':DISP:WINDOW:TRACE:Y:RLEVEL', log=False)
-NumDiv          = Parameter('Number of Divisions', ':DISP:WINDOW:TRACE:Y:NDIV', log=False)
-YScale          = Parameter('Scale/Div', ':DISP:WINDOW:TRACE:Y:PDIV', log=False)
-Atten           = Parameter('Attenuation', ':SENS:POWER:RF:ATTENUATION')
-SpanType        = Parameter('Swept Span', ':SENS:FREQ:SPAN', log=False)
-SweepType       = Parameter('Auto Sweep Time', ':SWE:TIME:AUTO', log=False)
-RbwType         = Parameter('Auto RBW', ':SENS:BAND:RES:AUTO', log=False)
-VbwType         = Parameter('Auto VBW', ':SENS:BAND:VID:AUTO', log=False)
-BwRatioType     = Parameter('Auto VBW:RBW Ratio', ':SENS:BAND:VID:RATIO', log=False)
-RbwFilterShape  = Parameter('RBW Filter', ':SENS:BAND:SHAP')
-RbwFilterType   = Parameter('RBW Filter BW', ':SENS:BAND:TYPE')
-AttenType       = Parameter('Auto Attenuation', ':SENS:POWER:ATT:AUTO', log=False)
-XAxisUnit       = Parameter('X Axis Units', None)
-XAxisUnit.update(value='Hz')
-YAxisUnit       = Parameter('Y Axis Units', ':UNIT:POW')
-TraceType       = Parameter('Trace Type', 'TRACE:TYPE')
+# TRACE HISTORY of the selected analyzer (See SpecAn.boundHistory for bound analyzers)
+traceHistory = TraceHistory(cfg['trace']['history_length'])
+traceWriter = TraceWriter(cfg['writer']).start()    # Saves traces in the background so file IO does not block acquisition or the interface
+
+# GAIN CORRECTION
+gainCorrection = None
+if cfg['correction']['enabled']:
+    gainCorrection = GainCorrection(cfg['correction']['chains'])
 
 # real code starts here
 def isNumber(input):
@@ -294,6 +269,7 @@ class FrontEnd():
         self.Vi = Vi
         self.motor = Motor
         self.PLC = PLC
+        self.plc = AsyncPLC(core, PLC, plcLock)
         # STYLING
         self.SELECT_BACKGROUND = cfg['theme']['select_background']
         self.DEFAULT_BACKGROUND = root.cget('bg')
@@ -348,13 +324,13 @@ class FrontEnd():
         self.initP1Button.grid(row=0, column=0, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
         self.killP1Button = tk.Button(chainFrame, font=FONT, text='DISABLE', command=lambda:self.PLC.threadHandler(self.PLC.query, (opcodes.P1_DISABLE.value,), {'delay': 10.0}))
         self.killP1Button.grid(row=0, column=1, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
-        self.sleepP1Button = tk.Button(chainFrame, font=FONT, text='SLEEP', command=lambda:self.PLC.threadHandler(self.PLC.query, (opcodes.SLEEP.value,)))
+        self.sleepP1Button = tk.Button(chainFrame, font=FONT, text='SLEEP', command=lambda:self.selectChain(opcodes.SLEEP.value))
         self.sleepP1Button.grid(row=1, column=0, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
         self.returnP1Button = tk.Button(chainFrame, font=FONT, text='RETURN', command=lambda:self.PLC.threadHandler(self.PLC.query, (opcodes.RETURN_OPCODES.value,)))
         self.returnP1Button.grid(row=1, column=1, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
-        self.dfs1Button = tk.Button(chainFrame, font=FONT, text='DFS1', command=lambda:self.PLC.threadHandler(self.PLC.query, (opcodes.DFS_CHAIN1.value,)))
+        self.dfs1Button = tk.Button(chainFrame, font=FONT, text='DFS1', command=lambda:self.selectChain(opcodes.DFS_CHAIN1.value))
         self.dfs1Button.grid(row=2, column=0, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
-        self.ems1Button = tk.Button(chainFrame, font=FONT, text='EMS1', command=lambda:self.PLC.threadHandler(self.PLC.query, (opcodes.EMS_CHAIN1.value,)))
+        self.ems1Button = tk.Button(chainFrame, font=FONT, text='EMS1', command=lambda:self.selectChain(opcodes.EMS_CHAIN1.value))
         self.ems1Button.grid(row=2, column=1, sticky=NSEW, padx=BUTTON_PADX, pady=BUTTON_PADY)
         self.PLC_OUTPUTS_LIST = (self.sleepP1Button, self.dfs1Button, self.ems1Button)              # Mutually exclusive buttons for which only one should be selected
         # Mode
@@ -407,8 +383,13 @@ class FrontEnd():
             port (string): Name of the VISA ID or COM port to connect to.
         """
         if device == 'visa':
-            with visaLock:
-                self.Vi.connectToRsrc(port)
+            if port in Spec_An.analyzers:
+                logging.info(f'Unbinding {port} since it is selected as the analyzer.')
+                Spec_An.unbindAnalyzer(port)
+            # The lock of the resource in the pool is also held, so a sweep of the unbound analyzer finishes first
+            with visaLock, self.Vi.pool.lockOf(port):
+                if self.Vi.connectToRsrc(port) == RETURN_SUCCESS:
+                    visaSupervisor.watch(port)
                 self.instrument = port
                 self.scpiApplyConfig(self.timeoutWidget.get(), self.chunkSizeWidget.get())
                 try:
@@ -419,12 +400,28 @@ class FrontEnd():
                     logging.error(f'{type(e).__name__}: {e}')
                     return
         elif device == 'motor':
-            self.motorPort = self.motorSelectBox.get()[:4]
-            self.motor.openSerial(self.motorPort)
+            self.motor.openSerial(port)
+            self.motorPort = port
+            motorSupervisor.watch(self.motorPort)
         elif device == 'plc':
             self.PLC.openSerial(port)
             self.PLC.threadHandler(self.PLC.queryStatus)
             self.plcPort = port
+            plcSupervisor.watch(port)
+
+    def selectChain(self, opcode):
+        """Selects an RF chain with the PLC on the asyncio core without blocking the main thread, and logs an error if the PLC does not confirm the selection.
+
+        Args:
+            opcode (int): Selection opcode, e.g. opcodes.DFS_CHAIN1.value.
+        """
+        async def _select():
+            if not self.PLC.serial.is_open:
+                logging.error('Cannot select RF chain, PLC is not connected.')
+            elif not await self.plc.selectChain(opcode, interval=cfg['chains']['status_interval']):
+                logging.error(f'PLC did not confirm selection of {chainName(opcode)}.')
+            refreshStatus()
+        core.submit(_select(), name='selectChain')
 
     def setStatus(self, widget, text=None, background=None):
         """Sets the text and background of a widget being used as a status indicator
@@ -446,6 +443,8 @@ class FrontEnd():
         if SaveCheck is True:      
             while (self.motor.ser.is_open):
                 self.motor.CloseSerial()
+            core.stop()
+            traceWriter.close()
             root.quit()
             logging.info("Program executed with exit code: 0")
         else:
@@ -466,12 +465,21 @@ class FrontEnd():
         _parent.title('Configure')
 
         def onRefreshPress():
-            """Update the values in the SCPI instrument selection box
+            """Enumerates the serial ports and VISA resources in the background and updates the selection boxes when done
             """
             logging.info('Searching for resources...')
-            self.instrSelectBox['values'] = self.Vi.rm.list_resources()
-            self.motorSelectBox['values'] = list(serial.tools.list_ports.comports())
-            self.plcSelectBox['values'] = list(serial.tools.list_ports.comports())
+            async def _refresh():
+                await discovery.refresh()
+                await bridge.call(fillSelectBoxes)
+            core.submit(_refresh(), name='refreshDevices')
+        def fillSelectBoxes():
+            """Sets the values of the selection boxes to the ports and resources cached by the discovery service
+            """
+            if not _parent.winfo_exists():
+                return
+            self.instrSelectBox['values'] = discovery.resources
+            self.motorSelectBox['values'] = discovery.portLabels()
+            self.plcSelectBox['values'] = discovery.portLabels()
         def onEnableTermPress():
             if self.enableTerm.get():
                 self.selectTermWidget.config(state='readonly')
@@ -480,14 +488,17 @@ class FrontEnd():
         def onDisconnectPress(device):
             match device:
                 case 'visa':
+                    visaSupervisor.unwatch()
                     self.Vi.closeSession()
                     self.instrument = ''
                     self.instrSelectBox.set('')
                 case 'motor':
+                    motorSupervisor.unwatch()
                     self.motor.closeSerial()
                     self.motorPort = ''
                     self.motorSelectBox.set('')
                 case 'plc':
+                    plcSupervisor.unwatch()
                     self.PLC.close()
                     self.plcPort = ''
                     self.plcSelectBox.set('')
@@ -504,11 +515,11 @@ class FrontEnd():
         ttk.Label(
             connectFrame, text = "PLC:", font = ("Times New Roman", 10)).grid(
             column = 0, row = 2, padx = 5, sticky=W) 
-        self.instrSelectBox = ttk.Combobox(connectFrame, values = self.Vi.rm.list_resources(), width=40)
+        self.instrSelectBox = ttk.Combobox(connectFrame, values = discovery.resources, width=40)
         self.instrSelectBox.grid(row = 0, column = 1, padx = 10 , pady = 5)
-        self.motorSelectBox = ttk.Combobox(connectFrame, values = list(serial.tools.list_ports.comports()), width=40)
+        self.motorSelectBox = ttk.Combobox(connectFrame, values = discovery.portLabels(), width=40)
         self.motorSelectBox.grid(row = 1, column = 1, padx = 10, pady = 5)
-        self.plcSelectBox = ttk.Combobox(connectFrame, values = list(serial.tools.list_ports.comports()), width=40)
+        self.plcSelectBox = ttk.Combobox(connectFrame, values = discovery.portLabels(), width=40)
         self.plcSelectBox.grid(row = 2, column = 1, padx = 10, pady = 5)
         instrCloseButton = ttk.Button(connectFrame, text = 'Disconnect', command=lambda: onDisconnectPress(device='visa'))
         instrCloseButton.grid(row = 0, column = 2, padx=5)
@@ -521,8 +532,8 @@ class FrontEnd():
         self.plcSelectBox.set(self.plcPort)
 
         self.instrSelectBox.bind("<<ComboboxSelected>>", lambda event: self.initDevice(event, device='visa', port=self.instrSelectBox.get()))
-        self.motorSelectBox.bind("<<ComboboxSelected>>", lambda event: self.initDevice(event, device='motor', port=self.motorSelectBox.get()[:4]))
-        self.plcSelectBox.bind("<<ComboboxSelected>>", lambda event: self.initDevice(event, device='plc', port=self.plcSelectBox.get()[:4]))
+        self.motorSelectBox.bind("<<ComboboxSelected>>", lambda event: self.initDevice(event, device='motor', port=portName(self.motorSelectBox.get())))
+        self.plcSelectBox.bind("<<ComboboxSelected>>", lambda event: self.initDevice(event, device='plc', port=portName(self.plcSelectBox.get())))
 
         # VISA CONFIGURATION FRAME
         configFrame = ttk.LabelFrame(_parent, borderwidth = 2, text = "VISA Configuration")
@@ -643,6 +654,7 @@ class SpecAn(FrontEnd):
         # FLAGS
         self.contSweepFlag = False
         self.singleSweepFlag = False
+        self.interrupted = False        # Set when continuous sweeping is stopped by an IO error, so it is resumed after the analyzer reconnects (See resumeSession())
         # STATE VARIABLES
         self.loopState = state.IDLE
         # CONSTANTS
@@ -660,6 +672,25 @@ class SpecAn(FrontEnd):
         tkVbwType = BooleanVar()
         tkBwRatioType = BooleanVar()
         tkAttenType = BooleanVar()
+        # SOFTWARE TRACES
+        self.accumulator = TraceAccumulator({
+            'Average': RunningMean(),
+            'Exp. Average': ExponentialAverage(cfg['averaging']['exponential_alpha']),
+            'Max Hold': MaxHold(),
+            'Min Hold': MinHold(),
+            'Median': PercentileSketch(50, cfg['averaging']['percentile_min'], cfg['averaging']['percentile_max'], cfg['averaging']['percentile_resolution'], cfg['averaging']['percentile_max_cells']),
+        })
+        self.softwareLines = {}         # Matplotlib lines of the software traces, updated in place on each sweep
+        # DETECTION
+        self.capture = TriggeredCapture(cfg['capture'], traceWriter)
+        self.detector = None
+        if cfg['detection']['enabled']:
+            self.detector = Detector(cfg['detection'], callback=self.capture.update)
+            self.detector.start()
+        # PULSE ANALYSIS
+        self.tkPulseAnalysis = BooleanVar()
+        self.pulseAnalysis = False      # Value of tkPulseAnalysis, read by processTrace() outside of the main thread
+        self.pulseLog = PulseLog(automation.filePath)
         # PLOT PARAMETERS
         self.color = None
         self.marker = None
@@ -668,17 +699,25 @@ class SpecAn(FrontEnd):
         self.markersize = None
         # VISA OBJECT
         self.Vi = Vi
+        self.visa = AsyncVisa(core, Vi, visaLock)
+        self.wakeEvent = asyncio.Event()     # Set to wake analyzerDisplayTask() early when the state or sweep flags change
+        self.traceLines = None
+        # ADDITIONAL ANALYZERS
+        self.analyzers = {}             # Resource name mapped to (AsyncVisa, chain) of each analyzer bound with bindAnalyzer()
+        self.boundLines = {}            # Resource name mapped to the matplotlib line of each bound analyzer
+        self.boundHistory = {}          # Resource name mapped to the TraceHistory of each bound analyzer, kept apart from traceHistory so saveTrace() and campaigns only save traces of the selected analyzer
         # PARENT
         spectrumFrame = parentWidget
         spectrumFrame.rowconfigure(0, weight=1)     # Allow this row to resize
         spectrumFrame.rowconfigure(1, weight=0)     # Prevent this row from resizing
         spectrumFrame.rowconfigure(2, weight=0)     # Prevent this row from resizing
         spectrumFrame.rowconfigure(3, weight=0)     # Prevent this row from resizing
+        spectrumFrame.rowconfigure(4, weight=0)     # Prevent this row from resizing
         spectrumFrame.columnconfigure(0, weight=1)  # Allow this column to resize
         spectrumFrame.columnconfigure(1, weight=0)  # Prevent this column from resizing
 
         # MATPLOTLIB GRAPH
-        self.fig = plt.figure(linewidth=0, edgecolor="#04253a")
+        self.fig = Figure(linewidth=0, edgecolor="#04253a")
         self.ax = self.fig.add_subplot()
         self.ax.set_title("Spectrum Plot")
         self.ax.set_xlabel("Frequency (Hz)")
@@ -690,6 +729,18 @@ class SpecAn(FrontEnd):
         self.spectrumDisplay = FigureCanvasTkAgg(self.fig, master=spectrumFrame)
         self.spectrumDisplay.get_tk_widget().grid(row = 0, column = 0, sticky=NSEW, rowspan=4)
 
+        # WATERFALL (Separate canvas so it can be blitted without redrawing the spectrum plot)
+        self.waterfall = None
+        if cfg['waterfall']['enabled']:
+            self.waterfallFig = Figure(figsize=(6.4, 2.4), linewidth=0, edgecolor="#04253a")
+            self.waterfallAx = self.waterfallFig.add_subplot()
+            self.waterfallAx.set_ylabel("Sweep")
+            self.waterfallAx.xaxis.set_major_formatter(ticker.EngFormatter(unit=''))
+            self.waterfallFig.set_layout_engine('tight')
+            self.waterfallDisplay = FigureCanvasTkAgg(self.waterfallFig, master=spectrumFrame)
+            self.waterfallDisplay.get_tk_widget().grid(row = 4, column = 0, sticky=NSEW, columnspan=2)
+            self.waterfall = Waterfall(self.waterfallAx, self.waterfallDisplay, cfg['waterfall']['rows'], cfg['waterfall']['colormap'])
+
         # MEASUREMENT COMMANDS
         measurementTab = ttk.Notebook(spectrumFrame)
         self.tab1 = ttk.Frame(measurementTab)
@@ -735,6 +786,13 @@ class SpecAn(FrontEnd):
         self.sweepAutoButton.pack(anchor=W, expand=True, fill=BOTH)
         self.sweepManButton = ttk.Radiobutton(sweepTimeFrame, variable=tkSweepType, text="Manual", value=MANUAL)
         self.sweepManButton.pack(anchor=W, expand=True, fill=BOTH)
+
+        pulseFrame = ttk.LabelFrame(self.tab1, text="Pulse Analysis")
+        pulseFrame.grid(row=5, column=0, sticky=NSEW)
+        self.pulseCheckbutton = ttk.Checkbutton(pulseFrame, text="Analyze Pulses", variable=self.tkPulseAnalysis, command=lambda: self.setPulseAnalysis(self.tkPulseAnalysis.get()))
+        self.pulseCheckbutton.pack(anchor=W, expand=True, fill=BOTH)
+        self.pulseZeroSpanButton = ttk.Button(pulseFrame, text="Zero Span (Max Points)", command=self.setPulseMode)
+        self.pulseZeroSpanButton.pack(anchor=S, expand=True, fill=BOTH)
         
 
 
@@ -811,6 +869,16 @@ class SpecAn(FrontEnd):
         self.traceTypeCombo = ttk.Combobox(traceTypeFrame, values=self.TRACE_TYPE_VALUES)
         self.traceTypeCombo.pack(anchor=W, expand=True, fill=BOTH)
 
+        softwareTraceFrame = ttk.LabelFrame(self.tab3, text='Software Traces')
+        softwareTraceFrame.grid(row=6, column=0, sticky=NSEW)
+        self.tkSoftwareTraces = {}
+        for name in self.accumulator.accumulators:
+            self.tkSoftwareTraces[name] = BooleanVar()
+            checkbutton = ttk.Checkbutton(softwareTraceFrame, text=name, variable=self.tkSoftwareTraces[name], command=lambda name=name: self.accumulator.setEnabled(name, self.tkSoftwareTraces[name].get()))
+            checkbutton.pack(anchor=W, expand=True, fill=BOTH)
+        self.softwareTraceResetButton = ttk.Button(softwareTraceFrame, text='Reset', command=lambda: self.accumulator.reset())
+        self.softwareTraceResetButton.pack(anchor=S, expand=True, fill=BOTH)
+
         # SWEEP BUTTONS
         initButton = ttk.Button(spectrumFrame, text="Initialize", command=lambda:self.setState(state.INIT))
         initButton.grid(row=1, column=1, sticky=NSEW)
@@ -845,9 +913,8 @@ class SpecAn(FrontEnd):
         YAxisUnit.update(widget=self.unitPowerEntry)
         TraceType.update(widget=self.traceTypeCombo)
 
-        # Generate thread to handle live data plot in background
-        analyzerLoop = threading.Thread(target=self.analyzerDisplayLoop, daemon=True)
-        analyzerLoop.start()
+        # Run the live data plot as a task on the asyncio core
+        core.submit(self.analyzerDisplayTask(), name='analyzerDisplay')
 
     def bindWidgets(self):
         """Binds tkinter events to the widgets' respective commands.
@@ -929,6 +996,8 @@ class SpecAn(FrontEnd):
             ymax = float(self.refLevelEntry.get())
             ymin = ymax - float(self.numDivEntry.get()) * float(self.yScaleEntry.get())
             self.ax.set_ylim(ymin, ymax)
+            if self.waterfall is not None:
+                self.waterfall.setColorLimits(ymin, ymax)
         self.ax.margins(0, 0.05)
         self.ax.grid(visible=TRUE, which='major', axis='both', linestyle='-.')
 
@@ -942,7 +1011,7 @@ class SpecAn(FrontEnd):
         thread.start()
 
     def setAnalyzerValue(self, centerfreq=None, span=None, startfreq=None, stopfreq=None, sweeptime=None, rbw=None, vbw=None, bwratio=None, ref=None, numdiv=None, yscale=None, atten=None, spantype=None, sweeptype=None, rbwtype=None, vbwtype=None, bwratiotype=None, rbwfiltershape=None, rbwfiltertype=None, attentype=None, tracetype=None):
-        """Issues command to spectrum analyzer with the value of kwarg as the argument and queries for widget values. If the value is None or if there are no kwargs, query the spectrum analyzer to set widget values instead.
+        """Issues command to spectrum analyzer with the value of kwarg as the argument and queries for widget values. If the value is None or if there are no kwargs, query the spectrum analyzer to set widget values instead. Can be called from any thread, the widgets and plot limits are set on the main thread by showParameters().
         
         Args:
             centerfreq (float, optional): Center frequency in hertz. Defaults to None.
@@ -968,82 +1037,62 @@ class SpecAn(FrontEnd):
         """
         # TODO: Make sure all commands have full functionality
         global visaLock
-        _list = Parameter.instances
-
-        CenterFreq.update(arg=centerfreq)
-        Span.update(arg=span)
-        StartFreq.update(arg=startfreq)
-        StopFreq.update(arg=stopfreq)
-        SweepTime.update(arg=sweeptime)
-        Rbw.update(arg=rbw)
-        Vbw.update(arg=vbw)
-        BwRatio.update(arg=bwratio)
-        Ref.update(arg=ref)
-        NumDiv.update(arg=numdiv)
-        YScale.update(arg=yscale)
-        Atten.update(arg=atten)
-        SpanType.update(arg=spantype)
-        SweepType.update(arg=sweeptype)
-        RbwType.update(arg=rbwtype)
-        VbwType.update(arg=vbwtype)
-        BwRatioType.update(arg=bwratiotype)
+
         if rbwfiltershape is not None:
-            RbwFilterShape.update(arg=self.RBW_FILTER_SHAPE_VAL_ARGS[rbwfiltershape])
+            rbwfiltershape = self.RBW_FILTER_SHAPE_VAL_ARGS[rbwfiltershape]
         if rbwfiltertype is not None:
-            RbwFilterType.update(arg=self.RBW_FILTER_TYPE_VAL_ARGS[rbwfiltertype])
-        AttenType.update(arg=attentype)
-        YAxisUnit.update(arg=None)
+            rbwfiltertype = self.RBW_FILTER_TYPE_VAL_ARGS[rbwfiltertype]
         if tracetype is not None:
-            TraceType.update(arg=self.TRACE_TYPE_VAL_ARGS[tracetype])
-
-        # Sort the list so dictionaries with 'arg': None are placed (and executed) after write commands
-        for index in range(len(_list)):
-            if _list[index].arg is not None:
-                _list.insert(0, _list.pop(index))
-
+            tracetype = self.TRACE_TYPE_VAL_ARGS[tracetype]
 
         # EXECUTE COMMANDS
-        logging.debug(f"setAnalyzerValue generated list of dictionaries '_list' with value {_list}")
         with visaLock:
-            for parameter in _list:
-                if parameter.command is None:
-                    continue
-                # Issue command with argument
-                if parameter.arg is not None:
-                    self.Vi.openRsrc.write(f'{parameter.command} {parameter.arg}')
-                # Set widgets without issuing a parameter to command
-                try:
-                    buffer = self.Vi.openRsrc.query_ascii_values(f'{parameter.command}?') # Default converter is float
-                except:
-                    buffer = self.Vi.openRsrc.query_ascii_values(f'{parameter.command}?', converter='s')
-                logging.verbose(f"Command {parameter.command}? returned {buffer}")
-                parameter.update(value=buffer)
-                clearAndSetWidget(parameter.widget, buffer)
-        # Set plot limits
+            parameters = setParameters(self.Vi, centerfreq=centerfreq, span=span, startfreq=startfreq, stopfreq=stopfreq, sweeptime=sweeptime, rbw=rbw, vbw=vbw, bwratio=bwratio, ref=ref, numdiv=numdiv, yscale=yscale, atten=atten,
+                                       spantype=spantype, sweeptype=sweeptype, rbwtype=rbwtype, vbwtype=vbwtype, bwratiotype=bwratiotype, rbwfiltershape=rbwfiltershape, rbwfiltertype=rbwfiltertype, attentype=attentype, tracetype=tracetype)
+            values = [(parameter.widget, parameter.value) for parameter in parameters if parameter.command is not None]
+        bridge.post(self.showParameters, values)
+
+    def showParameters(self, values):
+        """Sets the widgets to the queried parameter values, then the plot limits from the widgets. Must be called from the main thread (See TkBridge).
+
+        Args:
+            values (list): Tuples of (widget, value) of each parameter.
+        """
+        for widget, value in values:
+            clearAndSetWidget(widget, value)
         with specPlotLock:
             self.setAnalyzerPlotLimits()
-        return
     
     def setState(self, val):
-        """Sets self.loopState to val.
+        """Sets self.loopState to val and wakes analyzerDisplayTask().
 
         Args:
             val (int): Should be a constant in class State (state.IDLE, state.INIT, state.LOOP).
         """
         self.loopState = val
+        core.signal(self.wakeEvent)
+        refreshStatus()
 
-    def analyzerDisplayLoop(self):
-        """Main spectrum analyzer state machine. Initializes spectrum analyzer connection and plots sweeps in the matplotlib canvas.
+    def initAnalyzer(self):
+        """Resets the analyzer, checks for errors and the buffer size, and applies the widget values. Should be called with visaLock held.
         """
-        global visaLock, specPlotLock
-
-        while TRUE:
+        self.Vi.resetAnalyzerState()
+        self.Vi.queryPowerUpErrors()
+        self.Vi.testBufferSize()
+        # Set widget values
+        self.setAnalyzerValue()
+        if ACQUISITION == 'trace':
+            self.Vi.setTraceFormat(BINARY_TRACE)
+
+    async def analyzerDisplayTask(self):
+        """Main spectrum analyzer state machine, run as a task on the asyncio core. Initializes spectrum analyzer connection and plots sweeps in the matplotlib canvas.
+        VISA calls run in the executor of self.visa and the plot is drawn on the main thread through the Tk bridge, so the task does not occupy a thread while waiting.
+        """
+        while True:
             match self.loopState:
                 case state.IDLE:
-                    # Prevent this thread from taking up too much utilization
-                    self.toggleInputs(DISABLE)
-                    time.sleep(IDLE_DELAY)
-                    continue
+                    await bridge.call(self.toggleInputs, DISABLE)
+                    await core.waitFor(self.wakeEvent, IDLE_DELAY)
 
                 case state.INIT:
                     # Maintain this loop to prevent fatal error if the connected device is not a spectrum analyzer.
@@ -1052,66 +1101,289 @@ class SpecAn(FrontEnd):
                         self.loopState = state.IDLE
                         continue
                     try:
-                        visaLock.acquire()
-                        self.Vi.resetAnalyzerState()
-                        self.Vi.queryPowerUpErrors()
-                        self.Vi.testBufferSize()
-                        # Set widget values
-                        self.setAnalyzerValue()
-                        visaLock.release()
+                        await self.visa.call(self.initAnalyzer)
                         self.loopState = state.LOOP
                     except Exception as e:
                         logging.error(f'{type(e).__name__}: {e}')
                         try:
-                            self.Vi.queryErrors()
+                            await self.visa.call(self.Vi.queryErrors)
                         except Exception as e:
                             # logging.error(f'{type(e).__name__}: {e}. Could not query errors from device.')
                             pass
-                        self.toggleInputs(ENABLE)
-                        visaLock.release()
+                        await bridge.call(self.toggleInputs, ENABLE)
                         self.loopState = state.IDLE
 
                 case state.LOOP:
                     # Main analyzer loop
-                    # TODO: variable time.sleep based on analyzer sweep time
+                    # TODO: variable delay based on analyzer sweep time
                     if self.Vi.isSessionOpen() == FALSE:
                         logging.info(f"Lost connection to the analyzer.")
+                        self.interrupted = self.interrupted or self.contSweepFlag
                         self.loopState = state.IDLE
                         continue
-                    self.toggleInputs(ENABLE)
-                    if self.contSweepFlag or self.singleSweepFlag:
-                        visaLock.acquire()
-                        try: # Check if the instrument is busy calibrating, settling, sweeping, or measuring 
-                            if self.Vi.getOperationRegister() & 0b00011011:
-                                continue 
-                        except Exception as e:
-                            logging.fatal(f'{type(e).__name__}: {e}')
-                            logging.fatal("Could not retrieve information from Operation Status Register.")
-                            visaLock.release()
-                            self.contSweepFlag = False
-                            continue
-                        try:
-                            with specPlotLock:
-                                if 'lines' in locals():     # Remove previous plot if it exists
-                                    lines.pop(0).remove()
-                                buffer = self.Vi.openRsrc.query_ascii_values(":READ:SAN?")
-                                xAxis = buffer[::2]
-                                yAxis = buffer[1::2]
-                                lines = self.ax.plot(xAxis, yAxis, color=self.color, marker=self.marker, linestyle=self.linestyle, linewidth=self.linewidth, markersize=self.markersize)
-                                self.ax.grid(visible=True)
-                                self.spectrumDisplay.draw()
-                        except Exception as e:
-                            logging.fatal(f'{type(e).__name__}: {e}')
-                            self.contSweepFlag = False
-                        visaLock.release()
-                        self.singleSweepFlag = False
-                        time.sleep(ANALYZER_LOOP_DELAY)
-                    else:
-                        # Prevent this thread from taking up too much utilization
-                        time.sleep(IDLE_DELAY)
+                    await bridge.call(self.toggleInputs, ENABLE)
+                    if not (self.contSweepFlag or self.singleSweepFlag):
+                        await core.waitFor(self.wakeEvent, IDLE_DELAY)
+                        continue
+                    # Sweep the bound analyzers in parallel with the analyzer selected in Options > Configure...
+                    bound = list(self.analyzers.items())
+                    trace, *boundTraces = await asyncio.gather(self.acquire(), *(self.acquireBound(name, visa, chain) for name, (visa, chain) in bound))
+                    boundTraces = {name: boundTrace for (name, _), boundTrace in zip(bound, boundTraces) if boundTrace is not None}
+                    if trace is not None or boundTraces:
+                        trace = await core.loop.run_in_executor(None, self.processTrace, trace, boundTraces)
+                        await bridge.call(self.plotTrace, trace, boundTraces)
+                    self.singleSweepFlag = False
+                    await core.waitFor(self.wakeEvent, ANALYZER_LOOP_DELAY)
+
+    async def acquire(self):
+        """Waits until the analyzer is not busy calibrating, settling, sweeping, or measuring, then acquires a sweep.
+
+        Returns:
+            Trace: The acquired sweep, or None on error or if sweeping was stopped while waiting.
+        """
+        try:
+            return await self.visa.acquireWhenReady(acquireTrace, self.Vi, Front_End.chainSelect, ACQUISITION, BINARY_TRACE, running=lambda: self.contSweepFlag or self.singleSweepFlag)
+        except Exception as e:
+            logging.fatal(f'{type(e).__name__}: {e}')
+            logging.fatal('Could not acquire a sweep from the analyzer.')
+            self.interrupted = self.contSweepFlag
+            self.contSweepFlag = False
+            return None
+
+    async def acquireBound(self, resourceName, visa, chain):
+        """Waits until a bound analyzer is not busy, then acquires a sweep with its own X axis. The analyzer is unbound if it does not respond.
+
+        Args:
+            resourceName (string): VISA resource name of the analyzer.
+            visa (AsyncVisa): Adapter of the analyzer.
+            chain (string): RF chain connected to the analyzer, or None for the selected chain.
+
+        Returns:
+            Trace: The acquired sweep, or None on error.
+        """
+        try:
+            return await visa.acquireWhenReady(acquireSweep, visa.Vi, chain or Front_End.chainSelect)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Unbinding analyzer {resourceName}.')
+            self.unbindAnalyzer(resourceName)
+            return None
+
+    async def bindAnalyzer(self, resourceName, chain=None):
+        """Connects to an additional analyzer, reusing its session if it is open in the pool, and sweeps it in parallel with the analyzer selected in Options > Configure... while the display is running. The analyzer is reset and the preset of chain in [chains.presets] is written to it.
+
+        Args:
+            resourceName (string): VISA resource name of the analyzer.
+            chain (string, optional): RF chain connected to the analyzer, used to label its traces and select its preset. Defaults to None (the selected chain, and no preset).
+        """
+        if resourceName == getattr(getattr(self.Vi, 'openRsrc', None), 'resource_name', None):
+            logging.error(f'{resourceName} is already the selected analyzer.')
+            return
+        if resourceName in self.analyzers:
+            logging.info(f'{resourceName} is already bound.')
+            return
+        Vi = VisaIO(self.Vi.pool)
+        visa = AsyncVisa(core, Vi, self.Vi.pool.lockOf(resourceName))
+        try:
+            await visa.call(self.initBoundAnalyzer, Vi, resourceName, chain)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}. Could not bind analyzer {resourceName}.')
+            return
+        self.boundHistory[resourceName] = TraceHistory(cfg['trace']['history_length'])
+        self.analyzers[resourceName] = (visa, chain)
+        logging.info(f'Bound analyzer {resourceName}' + (f' to {chain}.' if chain else '.'))
+
+    def initBoundAnalyzer(self, Vi, resourceName, chain):
+        """Connects to a bound analyzer, resets it, and writes the preset of its chain. Should be called with the lock of the analyzer held.
+        """
+        if Vi.connectToRsrc(resourceName) == RETURN_ERROR:
+            raise ConnectionError(f'Could not connect to {resourceName}.')
+        Vi.resetAnalyzerState()
+        preset = cfg['chains']['presets'].get(chain) if chain else None
+        if preset:
+            writePreset(Vi, preset)
+
+    def unbindAnalyzer(self, resourceName):
+        """Stops sweeping a bound analyzer and removes its trace. The session stays open in the pool so the analyzer can be bound again without reconnecting.
+        """
+        if self.analyzers.pop(resourceName, None) is None:
+            return
+        self.boundHistory.pop(resourceName, None)
+        logging.info(f'Unbound analyzer {resourceName}.')
+
+        def _remove():
+            with specPlotLock:
+                line = self.boundLines.pop(resourceName, None)
+                if line is not None:
+                    line.remove()
+                    self.updateLegend()
+                    self.spectrumDisplay.draw_idle()
+        bridge.post(_remove)
+
+    def saveSession(self):
+        """Returns the settings and sweep state of the analyzer when its connection is lost, to be restored by restoreSession() after it reconnects (See VisaSupervisor).
+
+        Returns:
+            dict: 'preset' of the last queried parameter values and whether the analyzer was 'sweeping' continuously.
+        """
+        return {'preset': parameterPreset(), 'sweeping': self.contSweepFlag or self.interrupted}
+
+    def restoreSession(self, session):
+        """Resets the reconnected analyzer and writes the parameters saved by saveSession(), then queries them to update the widgets. Should be called with visaLock held.
+
+        Args:
+            session (dict): State returned by saveSession().
+        """
+        self.Vi.resetAnalyzerState()
+        writePreset(self.Vi, session['preset'])
+        self.setAnalyzerValue()
+        if ACQUISITION == 'trace':
+            self.Vi.setTraceFormat(BINARY_TRACE)
+
+    def resumeSession(self, session):
+        """Resumes continuous sweeping after the analyzer reconnects if it was sweeping when the connection was lost.
+
+        Args:
+            session (dict): State returned by saveSession().
+        """
+        self.interrupted = False
+        if session['sweeping']:
+            logging.info('Resuming spectrum display.')
+            self.contSweepFlag = True
+            self.setState(state.LOOP)
+
+    def processTrace(self, trace, bound=None):
+        """Applies the gain correction to a trace and passes it to the trace history, detector, software traces, and pulse analysis. Traces of bound analyzers are corrected and appended to the history of their analyzer in self.boundHistory only.
+
+        Args:
+            trace (Trace): Trace read from the analyzer, or None.
+            bound (dict, optional): Resource names of bound analyzers mapped to their traces, which are replaced by the corrected traces. Defaults to None.
+
+        Returns:
+            Trace: Corrected trace, or None.
+        """
+        for resourceName, boundTrace in (bound or {}).items():
+            if gainCorrection is not None:
+                bound[resourceName] = boundTrace = gainCorrection.correct(boundTrace)
+            history = self.boundHistory.get(resourceName)
+            if history is not None:     # Not unbound while the trace was acquired
+                history.append(boundTrace)
+        if trace is None:
+            return None
+        if gainCorrection is not None:
+            trace = gainCorrection.correct(trace)
+        traceHistory.append(trace)
+        if self.detector is not None:
+            self.detector.submit(trace, Azi_Ele.azimuth, Azi_Ele.elevation)
+        self.accumulator.update(trace)
+        if self.pulseAnalysis and trace.xunit == 's':
+            self.analyzePulses(trace)
+        return trace
+
+    def plotTrace(self, trace, bound=None):
+        """Replaces the plotted traces and redraws the spectrum plot. Must be called from the main thread (See TkBridge).
+
+        Args:
+            trace (Trace): Trace to plot, or None.
+            bound (dict, optional): Resource names of bound analyzers mapped to their traces. The X axis is widened to include every bound trace. Defaults to None.
+        """
+        with specPlotLock, stats.measure('SpecAn.plot'):
+            if trace is not None:
+                if self.traceLines is not None:     # Remove previous plot if it exists
+                    self.traceLines.pop(0).remove()
+                self.traceLines = self.ax.plot(trace.frequency, trace.amplitude, color=self.color, marker=self.marker, linestyle=self.linestyle, linewidth=self.linewidth, markersize=self.markersize)
+                self.plotSoftwareTraces(trace.frequency)
+            for resourceName, boundTrace in (bound or {}).items():
+                if resourceName not in self.analyzers:
+                    continue        # Unbound while the trace was acquired
+                xdata = boundTrace.frequency
+                if resourceName in self.boundLines:
+                    self.boundLines[resourceName].set_data(xdata, boundTrace.amplitude)
+                else:
+                    self.boundLines[resourceName], = self.ax.plot(xdata, boundTrace.amplitude, label=f'{resourceName} ({boundTrace.chain})', linewidth=1)
+                xmin, xmax = self.ax.get_xlim()
+                self.ax.set_xlim(min(xmin, xdata[0]), max(xmax, xdata[-1]))
+            self.updateLegend()
+            self.ax.grid(visible=True)
+            self.spectrumDisplay.draw()
+            if self.waterfall is not None and trace is not None:
+                self.waterfall.update(trace)
+
+    def setPulseMode(self):
+        """Sets the analyzer to zero span at the maximum number of sweep points on the asyncio core and enables pulse analysis. Called from the main thread.
+        """
+        if self.Vi.isSessionOpen() == FALSE:
+            logging.error("Cannot set zero span, session to the analyzer is not open.")
+            return
+
+        def _set():
+            points = self.Vi.setMaxSweepPoints()
+            self.setAnalyzerValue(span=0)
+            return points
+
+        async def _pulseMode():
+            try:
+                points = await self.visa.call(_set)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+                return
+            await bridge.call(self.setPulseAnalysis, True)
+            logging.info(f"Zero span pulse analysis enabled with {points} sweep points.")
+        core.submit(_pulseMode(), name='pulseMode')
+
+    def setPulseAnalysis(self, enabled):
+        """Enables or disables pulse analysis of zero span sweeps. Must be called from the main thread.
+
+        Args:
+            enabled (bool): True to analyze pulses.
+        """
+        self.tkPulseAnalysis.set(enabled)
+        self.pulseAnalysis = enabled
+
+    def analyzePulses(self, trace):
+        """Extracts pulse descriptors from a zero span trace. If any pulses were found, logs them and appends them to the pulse log if enabled in config.toml.
+
+        Args:
+            trace (Trace): Zero span trace.
+        """
+        try:
+            report = analyzePulses(trace, cfg['pulse']['threshold'], cfg['pulse']['min_snr'], cfg['pulse']['burst_gap'])
+            if not report.count:
+                return
+            logging.info(f'{report}')
+            if cfg['pulse']['log']:
+                self.pulseLog.filePath = automation.filePath
+                self.pulseLog.write(report)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+
+    def plotSoftwareTraces(self, xdata):
+        """Plots the result of each enabled software trace accumulator, updating existing lines in place. Lines of disabled accumulators are removed. Should be called with specPlotLock held.
+
+        Args:
+            xdata (numpy.ndarray): X axis values of the accumulated traces.
+        """
+        results = self.accumulator.results()
+        for name in list(self.softwareLines):
+            if name not in results:
+                self.softwareLines.pop(name).remove()
+        for name, ydata in results.items():
+            if name in self.softwareLines:
+                self.softwareLines[name].set_data(xdata, ydata)
+            else:
+                self.softwareLines[name], = self.ax.plot(xdata, ydata, label=name, linewidth=1)
+        self.updateLegend()
+
+    def updateLegend(self):
+        """Shows a legend of the software traces and bound analyzers, or removes it if there are none. Should be called with specPlotLock held.
+        """
+        handles = list(self.softwareLines.values()) + list(self.boundLines.values())
+        if handles:
+            self.ax.legend(handles=handles, loc='upper right')
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
 
     def toggleAnalyzerDisplay(self):
-        """sets contSweepFlag != contSweepFlag to control analyzerDisplayLoop()
+        """sets contSweepFlag != contSweepFlag to control analyzerDisplayTask()
         """
         if self.Vi.isSessionOpen() == FALSE:
             logging.error("Cannot initiate sweep, session to the analyzer is not open.")
@@ -1124,9 +1396,11 @@ class SpecAn(FrontEnd):
         else:
             logging.info("Disabling spectrum display.")
             self.contSweepFlag = False
+        self.interrupted = False
+        core.signal(self.wakeEvent)
 
     def singleSweep(self):
-        """Sets singleSweepFlag TRUE and contSweepFlag FALSE to control analyzerDisplayLoop()
+        """Sets singleSweepFlag TRUE and contSweepFlag FALSE to control analyzerDisplayTask()
         """
         if self.Vi.isSessionOpen() == FALSE:
             logging.error("Cannot initiate sweep, session to the analyzer is not open.")
@@ -1135,6 +1409,8 @@ class SpecAn(FrontEnd):
         
         self.contSweepFlag = False
         self.singleSweepFlag = True
+        self.interrupted = False
+        core.signal(self.wakeEvent)
 
     def setPlotThreadHandler(self, color=None, marker=None, linestyle=None, linewidth=None, markersize=None):
         """Generates thread to issue setPlotParam.
@@ -1160,6 +1436,7 @@ class SpecAn(FrontEnd):
             markersize (float, optional): Argument passed to matplotlib.pyplot.plot. Defaults to None.
         """
         global specPlotLock
+        from tkinter import colorchooser
 
         if color is None:
             if self.color is not None:
@@ -1183,6 +1460,8 @@ class AziElePlot(FrontEnd):
     def __init__(self, Motor, parentWidget):
         # MOTOR INSTANCE
         self.Motor = Motor
+        self.motor = AsyncMotor(core, Motor, motorLock)
+        self.wakeEvent = asyncio.Event()     # Set to wake bearingDisplayTask() early when the state changes
 
         # PARENT
         self.parent = parentWidget
@@ -1193,10 +1472,13 @@ class AziElePlot(FrontEnd):
         self.loopState = state.IDLE
         self.axis0 = False              # Keeps track of drive x and y states so they can be accessed by the main thread to update status buttons in class FrontEnd
         self.axis1 = False
+        self.interrupted = False        # Set when the bearing loop is stopped by an IO error, so it is resumed after the motor controller reconnects (See resumeSession())
 
         # VARIABLES
         self.azArrow = None
         self.elArrow = None
+        self.azimuth = None             # Last antenna position in degrees, attached to detections made by the spectrum analyzer
+        self.elevation = None
 
         # STYLE
         font = 'Courier 14'
@@ -1204,7 +1486,8 @@ class AziElePlot(FrontEnd):
         pady = 2
 
         # PLOT
-        fig, (self.azAxis, self.elAxis) = plt.subplots(1, 2, subplot_kw=dict(projection='polar'))
+        fig = Figure()
+        self.azAxis, self.elAxis = fig.subplots(1, 2, subplot_kw=dict(projection='polar'))
         fig.set_size_inches(fig.get_size_inches()[0], fig.get_size_inches()[1] * 0.8)      # Sets to minimum height since two plots can appear large in the root window
         self.azAxis.set_title("Azimuth", va='bottom', y=1.1)
         self.elAxis.set_title("Elevation", va='bottom', y=1.1)
@@ -1271,15 +1554,14 @@ class AziElePlot(FrontEnd):
         self.drawArrow(self.azAxis, 0)
         self.drawArrow(self.elAxis, 90)
 
-        # Generate thread to handle live data plot in background
-        motorLoop = threading.Thread(target=self.bearingDisplayLoop, daemon=True)
-        motorLoop.start()
+        # Run the live data plot as a task on the asyncio core
+        core.submit(self.bearingDisplayTask(), name='bearingDisplay')
 
     def drawArrow(self, axis, angle):
         """Draws arrow on the matplotlib axis from the origin at the angle specified. Intended for polar plots only.
 
         Args:
-            axis (plt.subplots): Matplotlib axis
+            axis (matplotlib.axes.Axes): Matplotlib axis
             angle (float): Angle in degrees
         """
         # Remove previous plot if it exists, then draw new arrow
@@ -1297,7 +1579,8 @@ class AziElePlot(FrontEnd):
                     pass
                 self.elArrow = axis.arrow(angle/180.*np.pi, 0, 0, 0.8, alpha = 1, width = 0.03, edgecolor = 'blue', facecolor = 'blue', lw = 3, zorder = 5)
 
-        self.bearingDisplay.draw()
+        with stats.measure('AziElePlot.draw'):
+            self.bearingDisplay.draw()
 
     def threadHandler(self, target, *event, **kwargs):
         """Generates a new thread to handle IO routines without blocking main thread. For most operations, this should be used instead of calling target methods directly.
@@ -1371,102 +1654,80 @@ class AziElePlot(FrontEnd):
                 widget.configure(state='disable')
 
     def setState(self, val):
-        """Sets self.loopState to val.
+        """Sets self.loopState to val and wakes bearingDisplayTask().
 
         Args:
-            val (int): Should be a constant in class State (state.IDLE, state.INIT, state.LOOP).
+            val (int): Should be a constant in class State (state.IDLE, state.INIT, state.LOOP, state.CLEANUP).
         """
         self.loopState = val
+        core.signal(self.wakeEvent)
+        refreshStatus()
 
-    def bearingDisplayLoop(self):
-        """Main motor bearing state machine. Initializes motor, drives, prog, etc. and plots direction in the matplotlib canvas.
+    async def bearingDisplayTask(self):
+        """Main motor bearing state machine, run as a task on the asyncio core. Initializes motor, drives, prog, etc. and plots direction in the matplotlib canvas.
+        Motor calls run in the executor of self.motor and the plot is drawn on the main thread through the Tk bridge.
         """
-        while TRUE:
+        while True:
             match self.loopState:
                 case state.IDLE:
-                    # Prevent this thread from taking up too much utilization
-                    self.toggleInputs(DISABLE)
-                    time.sleep(IDLE_DELAY)
-                    continue
-            
+                    await bridge.call(self.toggleInputs, DISABLE)
+                    await core.waitFor(self.wakeEvent, IDLE_DELAY)
+
                 case state.CLEANUP:
                     try:
-                        motorLock.acquire()
-                        self.Motor.write('DRIVE OFF X Y')
-                        self.queryDriveStates()
+                        async with self.motor.locked():
+                            await self.motor.write('DRIVE OFF X Y')
+                            await self.motor.call(self.queryDriveStates)
                     except Exception as e:
-                        motorLock.release()
                         logging.error(f'{type(e).__name__}: {e}')
                     self.loopState = state.IDLE
 
                 case state.INIT:
-                    self.toggleInputs(DISABLE)
+                    await bridge.call(self.toggleInputs, DISABLE)
                     try:
-                        motorLock.acquire()
-                        self.Motor.write('\n')
-                        # Check program state and maybe output somewhere or automatically set to prog0
-                        prog = self.Motor.query('Prog 0')
-                        if 'P00' not in prog:
-                            raise NotImplementedError(f'Unexpected response from motor controller: {prog}')
-                        
-                        self.Motor.write('DRIVE ON X Y')
-                        self.queryDriveStates()
-                        if self.axis0 == False or self.axis1 == False:
-                            raise NotImplementedError('One or more drives did not respond to enable command.')
+                        async with self.motor.locked():
+                            await self.motor.write('\n')
+                            # Check program state and maybe output somewhere or automatically set to prog0
+                            prog = await self.motor.query('Prog 0')
+                            if 'P00' not in prog:
+                                raise NotImplementedError(f'Unexpected response from motor controller: {prog}')
+
+                            await self.motor.write('DRIVE ON X Y')
+                            await self.motor.call(self.queryDriveStates)
+                            if self.axis0 == False or self.axis1 == False:
+                                raise NotImplementedError('One or more drives did not respond to enable command.')
 
                         self.loopState = state.LOOP
                     except Exception as e:
                         logging.error(f'{type(e).__name__}: {e}')
                         # Check drive states and output to the buttons on the left hand panel. Enable buttons to allow user to toggle drives
                         self.loopState = state.IDLE
-                    finally:
-                        motorLock.release()
 
                 case state.LOOP:
                     try:
-                        motorLock.acquire()
-                        # Check bit 516 (In motion) to determine whether or not to allow inputs
-                        # TODO: Find out why bit 516 returns 0 even when moving
-                        # response = self.Motor.query('PRINT P516').splitlines()
-                        # for i in response:
-                        #     match i:
-                        #         case '0':
-                        #             self.toggleInputs(ENABLE)
-                        #         case '1':
-                        #             self.toggleInputs(DISABLE)
+                        # TODO: Check bit 516 (In motion) to determine whether or not to allow inputs. Bit 516 returns 0 even when moving
                         # query P6144 (x) and P6160 (y) for encoder position
-                        response = self.Motor.query('PRINT P6144').splitlines()
-                        for i in response:
-                            if 'P00' in i or 'PRINT' in i:
-                                response.remove(i)
-                        if len(response) > 1:
-                            raise ValueError(f'Encoder query expected 1 line and returned {len(response)}: {response}')
-                        xEnc = int(response[0])
-
-                        response = self.Motor.query('PRINT P6160').splitlines()
-                        for i in response:
-                            if 'P00' in i or 'PRINT' in i:
-                                response.remove(i)
-                        if len(response) > 1:
-                            raise ValueError(f'Encoder query expected 1 line and returned {len(response)}: {response}')
-                        yEnc = int(response[0])
-
-                        # Calculate position in degrees
-                        xPos = round((xEnc - X_HOME) / X_CPD, 4)
-                        yPos = round((yEnc - Y_HOME) / Y_CPD, 4)
-                        # Draw arrows on respective axes
-                        self.drawArrow(self.azAxis, xPos)
-                        self.drawArrow(self.elAxis, yPos)
-                        # Set readout widgets
-                        self.azLabel.configure(text = f'{xPos}{u'\N{DEGREE SIGN}'}')
-                        self.elLabel.configure(text = f'{yPos}{u'\N{DEGREE SIGN}'}')
-                        # TODO: Check if motors are moving and enable/disable inputs
+                        xPos, yPos = await self.motor.queryBearing((X_HOME, Y_HOME), (X_CPD, Y_CPD))
+                        self.azimuth, self.elevation = xPos, yPos
+                        await bridge.call(self.showBearing, xPos, yPos)
                     except Exception as e:
                         logging.error(f'{type(e).__name__}: {e}')
+                        self.interrupted = True
                         self.loopState = state.IDLE
-                    finally:
-                        motorLock.release()
-                        time.sleep(MOTOR_LOOP_DELAY)
+                    await core.waitFor(self.wakeEvent, MOTOR_LOOP_DELAY)
+
+    def showBearing(self, xPos, yPos):
+        """Draws the arrows and sets the readout widgets of the azimuth and elevation. Must be called from the main thread (See TkBridge).
+
+        Args:
+            xPos (float): Azimuth in degrees.
+            yPos (float): Elevation in degrees.
+        """
+        self.drawArrow(self.azAxis, xPos)
+        self.drawArrow(self.elAxis, yPos)
+        self.azLabel.configure(text = f'{xPos}{u'\N{DEGREE SIGN}'}')
+        self.elLabel.configure(text = f'{yPos}{u'\N{DEGREE SIGN}'}')
+        # TODO: Check if motors are moving and enable/disable inputs
 
     def queryDriveStates(self):
         """Query drives x and y from the motor controller. Sets self.axis0 and self.axis1 to True or False if the drive is enabled or disabled, respectively.
@@ -1478,107 +1739,184 @@ class AziElePlot(FrontEnd):
             # Check if drive responded correctly here and set status buttons.
             drive = self.Motor.query('DRIVE X')
             if 'ON' in drive:
-                self.axis0 = True   # set attribute for statusMonitor
+                self.axis0 = True   # set attribute for updateStatus
             elif 'OFF' in drive:
                 self.axis0 = False
             else:
                 raise NotImplementedError(f'Unexpected response from AXIS0: {drive}')
             drive = self.Motor.query('DRIVE Y')
             if 'ON' in drive:
-                self.axis1 = True   # set attribute for statusMonitor
+                self.axis1 = True   # set attribute for updateStatus
             elif 'OFF' in drive:
                 self.axis0 = False
             else:
                 raise NotImplementedError(f'Unexpected response from AXIS1: {drive}')
 
-# Thread target to monitor IO connection status
-def statusMonitor(FrontEnd, Vi, Motor, PLC, Azi_Ele):
-    """Thread target to monitor IO connection statuses and reflect their state in FrontEnd buttons.
+    def saveSession(self):
+        """Returns the loop and drive states when the connection to the motor controller is lost, to be restored by restoreSession() after it reconnects (See MotorSupervisor).
+
+        Returns:
+            dict: Whether the bearing 'loop' was running and the 'drives' (axis0, axis1) states.
+        """
+        return {'loop': self.loopState == state.LOOP or self.interrupted, 'drives': (self.axis0, self.axis1)}
+
+    def restoreSession(self, session):
+        """Selects program 0 on the reconnected motor controller and enables the drives if either was enabled when the connection was lost. Should be called with motorLock held.
+
+        Args:
+            session (dict): State returned by saveSession().
+
+        Raises:
+            NotImplementedError: If the motor controller does not select program 0.
+        """
+        prog = self.Motor.query('Prog 0')
+        if 'P00' not in prog:
+            raise NotImplementedError(f'Unexpected response from motor controller: {prog}')
+        if any(session['drives']):
+            self.Motor.write('DRIVE ON X Y')
+        self.queryDriveStates()
+
+    def resumeSession(self, session):
+        """Resumes the bearing loop after the motor controller reconnects if it was running when the connection was lost.
+
+        Args:
+            session (dict): State returned by saveSession().
+        """
+        self.interrupted = False
+        if session['loop']:
+            logging.info('Resuming bearing display.')
+            self.setState(state.LOOP)
+
+def updateStatus(FrontEnd, Vi, Motor, PLC, Azi_Ele):
+    """Reflects IO connection statuses in FrontEnd buttons. Must be called from the main thread (See statusTask()).
     """
-    global autoState
-    while True:
-        # VISA
+    # VISA
+    if visaSupervisor.reconnecting:
+        FrontEnd.setStatus(FrontEnd.visaStatus, text='Reconnecting')
+    else:
         try:
             Vi.openRsrc.session
             FrontEnd.setStatus(FrontEnd.visaStatus, text='Connected')
         except:
             FrontEnd.setStatus(FrontEnd.visaStatus, text='NC')
 
-        # MOTOR
-        if Motor.ser.is_open:
-            FrontEnd.setStatus(FrontEnd.motorStatus, text='Connected')
-        else: 
-            FrontEnd.setStatus(FrontEnd.motorStatus, text='NC')
-        match Azi_Ele.loopState:
-            case state.IDLE:
-                for button in FrontEnd.MODE_BUTTONS_LIST:
-                    if button is FrontEnd.standbyButton:
-                        background=FrontEnd.SELECT_BACKGROUND
-                    else:
-                        background=FrontEnd.DEFAULT_BACKGROUND
-                    FrontEnd.setStatus(button, background=background)
-            case state.INIT:
-                for button in FrontEnd.MODE_BUTTONS_LIST:
-                    FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
-            case state.LOOP:
-                for button in FrontEnd.MODE_BUTTONS_LIST:
-                    if button is FrontEnd.manualButton:
-                        background=FrontEnd.SELECT_BACKGROUND
-                    else:
-                        background=FrontEnd.DEFAULT_BACKGROUND
-                    FrontEnd.setStatus(button, background=background)
-        match Azi_Ele.axis0:
-            case True:
-                FrontEnd.setStatus(FrontEnd.azStatus, text='ENABLED')
-            case False:
-                FrontEnd.setStatus(FrontEnd.azStatus, text='STOPPED')
-        match Azi_Ele.axis1:
-            case True:
-                FrontEnd.setStatus(FrontEnd.elStatus, text='ENABLED')
-            case False:
-                FrontEnd.setStatus(FrontEnd.elStatus, text='STOPPED')
-
-        # PLC
-        if PLC.serial.is_open:
-            FrontEnd.setStatus(FrontEnd.plcStatus, text='Connected')
-        else: 
-            FrontEnd.setStatus(FrontEnd.plcStatus, text='NC')
-        match PLC.status:
-            case opcodes.SLEEP.value:
-                for button in FrontEnd.PLC_OUTPUTS_LIST:
-                    FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
-                FrontEnd.setStatus(FrontEnd.sleepP1Button, background=FrontEnd.SELECT_BACKGROUND)
-                FrontEnd.chainSelect = 'SLEEP'
-            case opcodes.P1_INIT.value:
-                FrontEnd.setStatus(FrontEnd.initP1Button, background=FrontEnd.SELECT_BACKGROUND)
-            case opcodes.P1_DISABLE.value:
-                for button in FrontEnd.PLC_OUTPUTS_LIST:
-                    FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
-                FrontEnd.setStatus(FrontEnd.initP1Button, background=FrontEnd.DEFAULT_BACKGROUND)
-                FrontEnd.chainSelect = 'SLEEP'
-            case opcodes.DFS_CHAIN1.value:
-                for button in FrontEnd.PLC_OUTPUTS_LIST:
-                    FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
-                FrontEnd.setStatus(FrontEnd.dfs1Button, background=FrontEnd.SELECT_BACKGROUND)
-                FrontEnd.chainSelect = 'DFS1'
-            case opcodes.EMS_CHAIN1.value:
-                for button in FrontEnd.PLC_OUTPUTS_LIST:
-                    FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
-                FrontEnd.setStatus(FrontEnd.ems1Button, background=FrontEnd.SELECT_BACKGROUND)
-                FrontEnd.chainSelect = 'EMS1'
-                
-        match automation.state:
-            case state.IDLE:
-                FrontEnd.setStatus(FrontEnd.autoStartStopButton, background=FrontEnd.DEFAULT_BACKGROUND)
-            case state.AUTO:
-                FrontEnd.setStatus(FrontEnd.autoStartStopButton, background=FrontEnd.SELECT_BACKGROUND)
-                
-        time.sleep(STATUS_MONITOR_DELAY)
+    # MOTOR
+    if motorSupervisor.reconnecting:
+        FrontEnd.setStatus(FrontEnd.motorStatus, text='Reconnecting')
+    elif Motor.ser.is_open:
+        FrontEnd.setStatus(FrontEnd.motorStatus, text='Connected')
+    else: 
+        FrontEnd.setStatus(FrontEnd.motorStatus, text='NC')
+    match Azi_Ele.loopState:
+        case state.IDLE:
+            for button in FrontEnd.MODE_BUTTONS_LIST:
+                if button is FrontEnd.standbyButton:
+                    background=FrontEnd.SELECT_BACKGROUND
+                else:
+                    background=FrontEnd.DEFAULT_BACKGROUND
+                FrontEnd.setStatus(button, background=background)
+        case state.INIT:
+            for button in FrontEnd.MODE_BUTTONS_LIST:
+                FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
+        case state.LOOP:
+            for button in FrontEnd.MODE_BUTTONS_LIST:
+                if button is FrontEnd.manualButton:
+                    background=FrontEnd.SELECT_BACKGROUND
+                else:
+                    background=FrontEnd.DEFAULT_BACKGROUND
+                FrontEnd.setStatus(button, background=background)
+    match Azi_Ele.axis0:
+        case True:
+            FrontEnd.setStatus(FrontEnd.azStatus, text='ENABLED')
+        case False:
+            FrontEnd.setStatus(FrontEnd.azStatus, text='STOPPED')
+    match Azi_Ele.axis1:
+        case True:
+            FrontEnd.setStatus(FrontEnd.elStatus, text='ENABLED')
+        case False:
+            FrontEnd.setStatus(FrontEnd.elStatus, text='STOPPED')
+
+    # PLC
+    if plcSupervisor.reconnecting:
+        FrontEnd.setStatus(FrontEnd.plcStatus, text='Reconnecting')
+    elif PLC.serial.is_open:
+        FrontEnd.setStatus(FrontEnd.plcStatus, text='Connected')
+    else: 
+        FrontEnd.setStatus(FrontEnd.plcStatus, text='NC')
+    match PLC.status:
+        case opcodes.SLEEP.value:
+            for button in FrontEnd.PLC_OUTPUTS_LIST:
+                FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
+            FrontEnd.setStatus(FrontEnd.sleepP1Button, background=FrontEnd.SELECT_BACKGROUND)
+            FrontEnd.chainSelect = 'SLEEP'
+        case opcodes.P1_INIT.value:
+            FrontEnd.setStatus(FrontEnd.initP1Button, background=FrontEnd.SELECT_BACKGROUND)
+        case opcodes.P1_DISABLE.value:
+            for button in FrontEnd.PLC_OUTPUTS_LIST:
+                FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
+            FrontEnd.setStatus(FrontEnd.initP1Button, background=FrontEnd.DEFAULT_BACKGROUND)
+            FrontEnd.chainSelect = 'SLEEP'
+        case _ if chainName(PLC.status) != 'SLEEP':
+            chain = chainName(PLC.status)
+            for button in FrontEnd.PLC_OUTPUTS_LIST:
+                FrontEnd.setStatus(button, background=FrontEnd.DEFAULT_BACKGROUND)
+            chainButton = getattr(FrontEnd, chain.lower() + 'Button', None)     # Only chains with a button are highlighted
+            if chainButton is not None:
+                FrontEnd.setStatus(chainButton, background=FrontEnd.SELECT_BACKGROUND)
+            FrontEnd.chainSelect = chain
+            
+    match automation.state:
+        case state.IDLE:
+            FrontEnd.setStatus(FrontEnd.autoStartStopButton, background=FrontEnd.DEFAULT_BACKGROUND)
+        case state.AUTO:
+            FrontEnd.setStatus(FrontEnd.autoStartStopButton, background=FrontEnd.SELECT_BACKGROUND)
+
+    if profiler.enabled:
+        profiler.leaks()    # Logs a warning for each lock held longer than the leak threshold
+
+def refreshStatus():
+    """Wakes statusTask() to update the status buttons immediately, e.g. after a display loop changes state. Can be called from any thread.
+    """
+    core.signal(statusEvent)
+
+async def statusTask(FrontEnd, Vi, Motor, PLC, Azi_Ele):
+    """Task on the asyncio core which updates the status buttons when woken by refreshStatus(), and every STATUS_MONITOR_DELAY seconds for changes which do not wake it.
+    """
+    while True:
+        await bridge.call(updateStatus, FrontEnd, Vi, Motor, PLC, Azi_Ele)
+        await core.waitFor(statusEvent, STATUS_MONITOR_DELAY)
+
+async def sessionHealthTask(pool):
+    """Task on the asyncio core which checks the idle sessions of the pool every healthInterval seconds (See SessionPool.check()).
+    """
+    while True:
+        await asyncio.sleep(pool.healthInterval)
+        await core.loop.run_in_executor(None, pool.check)
+
+def bindDiscoveredDevices(discovery):
+    """Called by the discovery service when the serial ports change. Connects the motor controller and PLC when a port with their USB identifiers is found and they have not been connected yet, and moves a device which is reconnecting to its new port if it was assigned a different one.
+
+    Args:
+        discovery (DeviceDiscovery): Discovery service with the new enumeration.
+    """
+    for role, supervisor, currentPort in (('motor', motorSupervisor, Front_End.motorPort), ('plc', plcSupervisor, Front_End.plcPort)):
+        port = discovery.identify(role)
+        if port is None or port == supervisor.target:
+            continue
+        if supervisor.reconnecting:
+            logging.info(f'Found {supervisor.name} at {port}, reconnecting to the new port.')
+            setattr(Front_End, f'{role}Port', port)
+            supervisor.retarget(port)
+        elif not currentPort:
+            logging.info(f'Found {supervisor.name} at {port}, connecting.')
+            bridge.post(Front_End.initDevice, None, role, port)
 
 # Root tkinter interface (contains Front_End and standard output console)
 root = ThemedTk(theme=cfg['theme']['ttk'])
 root.title('RF-DFS')
 isNumWrapper = root.register(isNumber)
+bridge = TkBridge(root)     # Runs interface updates from tasks on the asyncio core in the main thread
+logStartup('Root window created')
 
 # Change combobox highlight colors to match entry
 dummy = ttk.Entry()
@@ -1721,58 +2059,268 @@ def openSaveDialog(type):
             with specPlotLock:
                 Spec_An.fig.savefig(filename)
 
-def saveTrace(f=None, filePath=None):
-    """Saves trace as csv to the file object passed in f or the filePath string. If filePath points to an existing file, an iterating integer is appended to the file name until an unused name is found.
+def saveTrace(f=None, filePath=None, wait=False):
+    """Queues the most recently acquired trace to be saved as csv by the trace writer to the file object passed in f or the filePath string. If filePath points to an existing file, an iterating integer is appended to the file name until an unused name is found.
 
     Args:
         f (file, optional): File object to save to. Defaults to None.
         filePath (string, optional): File path to save to if f is None. Defaults to None.
+        wait (bool, optional): Waits until the trace is written, e.g. for a campaign run. Defaults to False.
 
     Raises:
         AttributeError: If both f and filePath is None
+        Exception: If wait is True and the trace could not be written (See TraceWriter.write()).
+
+    Returns:
+        string: Name of the saved file, or None if no sweep has been acquired.
     """
-    if f is None:
-        if filePath is None:
-            raise AttributeError('saveTrace did not receive any arguments.')
-        x=0
-        fileExists = True
-        fileJoined = ''
-        while fileExists:
-            fileName = Front_End.chainSelect + '-' + datetime.now().strftime('%Y-%m-%d') + '-' + str(x) +'.csv'
-            fileJoined = os.path.join(filePath, fileName)
-            fileExists = os.path.exists(fileJoined)
-            x += 1
-        f = open(fileJoined, 'w')
-
-    with specPlotLock:
-        data = Spec_An.ax.lines[0].get_data()
-        xdata = data[0]
-        ydata = data[1]
-        buffer = ''
-    if '.txt' in f.name:
-        delimiter = '\t'
-    else:
-        delimiter = ','
+    if f is None and filePath is None:
+        raise AttributeError('saveTrace did not receive any arguments.')
+    trace = traceHistory.latest()
+    if trace is None:
+        logging.error('Cannot save trace, no sweep has been acquired.')
+        if f is not None:
+            f.close()
+        return
+    if wait:
+        return traceWriter.write(trace, filePath, f)
+    return traceWriter.save(trace, filePath, f)
 
-    for parameter in Parameter.instances:
-        if parameter.log == False:
-            continue
-        if isinstance(parameter.value, (list,)):
+def saveSurvey(filePath, show=False, wait=False):
+    """Acquires a wideband survey planned from the [survey] configuration, appends it to the trace history, and saves it as csv.
+
+    Args:
+        filePath (string): Directory to save to.
+        show (bool, optional): If True, plots the survey in a new window. Defaults to False.
+        wait (bool, optional): Waits until the survey is written, e.g. for a campaign run. Defaults to False.
+
+    Raises:
+        Exception: If wait is True and the survey could not be written (See TraceWriter.write()).
+
+    Returns:
+        string: Name of the saved file, or None if the survey failed.
+    """
+    if Vi.isSessionOpen() == FALSE:
+        logging.error('Cannot run survey, session to the analyzer is not open.')
+        return
+    try:
+        with visaLock:
+            Vi.setTraceFormat(BINARY_TRACE)
             try:
-                value = parameter.value[0].strip("[]{}()#* \n\t")
-            except:
-                value = str(parameter.value).strip("[]{}()#* \n\t")
-        else:
-            value = str(parameter.value).strip("[]{}()#* \n\t")
+                trace = runSurvey(Vi, planFromConfig(cfg['survey']), Front_End.chainSelect, BINARY_TRACE)
+            finally:
+                if ACQUISITION != 'trace':
+                    Vi.setTraceFormat(False)
+    except Exception as e:
+        logging.error(f'{type(e).__name__}: {e}')
+        return
+    if gainCorrection is not None:
+        trace = gainCorrection.correct(trace)
+    traceHistory.append(trace)
+    fileName = traceWriter.write(trace, filePath) if wait else traceWriter.save(trace, filePath)
+    logging.info(f'Saved survey of {trace.points} points to {fileName}')
+    if show:
+        root.after(0, lambda: showTraceWindow(trace, 'Wideband Survey'))
+    return fileName
+
+def saveChains(filePath, wait=False):
+    """Sweeps each RF chain in the [chains] configuration, selecting it with the PLC and applying its analyzer preset, and saves one csv per chain. The spectrum analyzer widgets are refreshed afterwards since the presets change the analyzer settings.
+
+    Args:
+        filePath (string): Directory to save to.
+        wait (bool, optional): Waits until the chains are written and returns only the files which were, e.g. for a campaign run. Defaults to False.
+
+    Returns:
+        list: Names of the saved files.
+    """
+    if Vi.isSessionOpen() == FALSE:
+        logging.error('Cannot sweep chains, session to the analyzer is not open.')
+        return []
+    if not Relay.serial.is_open:
+        logging.error('Cannot sweep chains, PLC is not connected.')
+        return []
+    saved = []
+    try:
+        saved = sweepChains(Vi, Relay, visaLock, plcLock, cfg['chains'], filePath, ACQUISITION, BINARY_TRACE, gainCorrection, traceHistory, traceWriter, wait)
+        logging.info(f'Saved {len(saved)} of {len(cfg["chains"]["sequence"])} chains')
+    except Exception as e:
+        logging.error(f'{type(e).__name__}: {e}')
+    finally:
+        Spec_An.setAnalyzerValue()
+    return saved
+
+def campaignTarget(mode):
+    """Returns the function called at each run of a campaign in the given mode (See Automation.mode).
+
+    Args:
+        mode (string): 'scheduled', 'survey', or 'chains'.
+
+    Returns:
+        function: Function which takes the directory to save to and returns once the files are written.
+    """
+    match mode:
+        case 'survey':
+            return lambda filePath: saveSurvey(filePath, wait=True)
+        case 'chains':
+            return lambda filePath: saveChains(filePath, wait=True)
+        case _:
+            return lambda filePath: saveTrace(None, filePath, wait=True)
+
+def showTraceWindow(trace, title):
+    """Plots a trace in a new window.
+
+    Args:
+        trace (Trace): Trace to plot.
+        title (string): Window and plot title.
+    """
+    _parent = Toplevel()
+    _parent.title(title)
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.set_title(title)
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("Power Spectral Density (dBm/RBW)")
+    ax.xaxis.set_major_formatter(ticker.EngFormatter(unit=''))
+    ax.plot(trace.frequency, trace.amplitude, linewidth=0.5)
+    ax.grid(visible=True, which='major', axis='both', linestyle='-.')
+    canvas = FigureCanvasTkAgg(fig, master=_parent)
+    canvas.get_tk_widget().pack(expand=True, fill=BOTH)
+    canvas.draw()
+
+def openStatsWindow():
+    """Opens a window with the latency, bytes transferred, and lock wait time of each instrumented operation, and the queue depth and backpressure of the trace writer, refreshed every second. Recording can be enabled, reset, and exported to csv or JSON from the window.
+    """
+    _parent = Toplevel()
+    _parent.title('I/O statistics')
+    _recordVar = IntVar(value=int(stats.enabled))
+    columns = ('count', 'mean', 'p50', 'p90', 'p99', 'max', 'total', 'sent', 'received', 'errors')
+    headings = ('Count', 'Mean (ms)', 'P50 (ms)', 'P90 (ms)', 'P99 (ms)', 'Max (ms)', 'Total (s)', 'Sent (B)', 'Received (B)', 'Errors')
 
-        buffer = buffer + parameter.name + delimiter + value + '\n'
+    def onRecordPress():
+        stats.enable(bool(_recordVar.get()))
 
-    buffer = buffer + 'DATA\n'
-    for index in range(len(data[0])):
-        buffer = buffer + str(xdata[index]) + delimiter + str(ydata[index]) + '\n'
+    def onExportPress():
+        fileName = filedialog.asksaveasfilename(parent=_parent, initialdir=os.getcwd(), filetypes=(('Comma separated variables', '*.csv'), ('JSON', '*.json')), defaultextension='.csv')
+        if fileName:
+            try:
+                stats.export(fileName)
+                logging.info(f'Exported I/O statistics to {fileName}')
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
 
-    f.write(buffer)
-    f.close()
+    def refresh():
+        if not _parent.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        for kind, name, count, mean, p50, p90, p99, _max, total, sent, received, errors in stats.rows():
+            label = name if kind == 'operation' else f'{name} (wait)'
+            tree.insert('', END, text=label, values=(count, f'{mean*1e3:.3f}', f'{p50*1e3:.3f}', f'{p90*1e3:.3f}', f'{p99*1e3:.3f}', f'{_max*1e3:.3f}', f'{total:.3f}', sent, received, errors))
+        writer = traceWriter.metrics()
+        writerLabel.configure(text=f"Trace writer: {writer['depth']}/{writer['capacity']} queued (max {writer['maxDepth']}), {writer['written']} written, {writer['errors']} errors, {writer['blocked']} saves blocked for {writer['blockedTime']:.3f} s")
+        _parent.after(1000, refresh)
+
+    buttonFrame = ttk.Frame(_parent)
+    buttonFrame.pack(side=TOP, fill=X)
+    ttk.Checkbutton(buttonFrame, text='Record', variable=_recordVar, command=onRecordPress).pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(buttonFrame, text='Reset', command=stats.reset).pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(buttonFrame, text='Export...', command=onExportPress).pack(side=LEFT, padx=5, pady=5)
+    writerLabel = ttk.Label(_parent)
+    writerLabel.pack(side=BOTTOM, fill=X, padx=5, pady=5)
+    tree = ttk.Treeview(_parent, columns=columns)
+    tree.heading('#0', text='Operation')
+    tree.column('#0', width=220)
+    for column, heading in zip(columns, headings):
+        tree.heading(column, text=heading)
+        tree.column(column, width=85, anchor=E)
+    tree.pack(expand=True, fill=BOTH)
+    refresh()
+
+def openAnalyzersWindow():
+    """Opens a window to bind additional analyzers, which are swept in parallel with the selected analyzer, and to see the sessions open in the pool. Refreshed every second.
+    """
+    _parent = Toplevel()
+    _parent.title('Analyzers')
+    columns = ('chain', 'state')
+
+    def onBindPress():
+        resourceName = resourceBox.get()
+        if not resourceName:
+            return
+        core.submit(Spec_An.bindAnalyzer(resourceName, chainBox.get() or None), name='bindAnalyzer')
+
+    def onUnbindPress():
+        for item in tree.selection():
+            Spec_An.unbindAnalyzer(item)
+
+    def refresh():
+        if not _parent.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        selected = getattr(getattr(Vi, 'openRsrc', None), 'resource_name', None)
+        for resourceName in Vi.pool.names():
+            if resourceName == selected:
+                chain, _state = Front_End.chainSelect, 'Selected'
+            elif resourceName in Spec_An.analyzers:
+                chain, _state = Spec_An.analyzers[resourceName][1] or Front_End.chainSelect, 'Bound'
+            else:
+                chain, _state = '', 'Open'
+            tree.insert('', END, iid=resourceName, text=resourceName, values=(chain, _state))
+        _parent.after(1000, refresh)
+
+    bindFrame = ttk.Frame(_parent)
+    bindFrame.pack(side=TOP, fill=X)
+    resourceBox = ttk.Combobox(bindFrame, values=discovery.resources, width=40)
+    resourceBox.pack(side=LEFT, padx=5, pady=5)
+    chainBox = ttk.Combobox(bindFrame, values=[''] + list(cfg['chains']['presets']), width=10)
+    chainBox.pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(bindFrame, text='Bind', command=onBindPress).pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(bindFrame, text='Unbind', command=onUnbindPress).pack(side=LEFT, padx=5, pady=5)
+    tree = ttk.Treeview(_parent, columns=columns)
+    tree.heading('#0', text='Resource')
+    tree.column('#0', width=320)
+    tree.heading('chain', text='Chain')
+    tree.column('chain', width=80)
+    tree.heading('state', text='State')
+    tree.column('state', width=80)
+    tree.pack(expand=True, fill=BOTH)
+    refresh()
+
+def openLockProfileWindow():
+    """Opens a window with the lock profile report (See LockProfiler.report()), refreshed every second. Profiling can be enabled, reset, and exported to text or JSON from the window.
+    """
+    _parent = Toplevel()
+    _parent.title('Lock profile')
+    _profileVar = IntVar(value=int(profiler.enabled))
+
+    def onProfilePress():
+        profiler.enable(bool(_profileVar.get()))
+
+    def onExportPress():
+        fileName = filedialog.asksaveasfilename(parent=_parent, initialdir=os.getcwd(), filetypes=(('Text Files', '*.txt'), ('JSON', '*.json')), defaultextension='.txt')
+        if fileName:
+            try:
+                profiler.export(fileName)
+                logging.info(f'Exported lock profile to {fileName}')
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+
+    def refresh():
+        if not _parent.winfo_exists():
+            return
+        text.configure(state=NORMAL)
+        text.delete('1.0', END)
+        text.insert(END, profiler.report())
+        text.configure(state=DISABLED)
+        _parent.after(1000, refresh)
+
+    buttonFrame = ttk.Frame(_parent)
+    buttonFrame.pack(side=TOP, fill=X)
+    ttk.Checkbutton(buttonFrame, text='Profile locks', variable=_profileVar, command=onProfilePress).pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(buttonFrame, text='Reset', command=profiler.reset).pack(side=LEFT, padx=5, pady=5)
+    ttk.Button(buttonFrame, text='Export...', command=onExportPress).pack(side=LEFT, padx=5, pady=5)
+    text = tk.Text(_parent, width=110, height=30, font=cfg['theme']['terminal_font'], wrap=NONE)
+    text.pack(expand=True, fill=BOTH)
+    refresh()
 
 def generateConfigDialog():
     """Opens confirmation message if the user wants to generate a new config file.
@@ -1785,17 +2333,26 @@ def generateConfigDialog():
         defaultconfig.generateConfig()
 
 def generateAutoDialog():
-    """Opens a dialog that allows the user to modify the automation queue and file path.
+    """Opens a dialog that allows the user to modify the automation queue and file path. Each generated campaign runs daily at the selected time or every N minutes from the selected time, between the start and end dates.
     """
-    _listVar = StringVar(value=automation.queue)
+    from tkcalendar import DateEntry
+    from tktimepicker import SpinTimePickerModern, constants
+
+    _listVar = StringVar(value=[str(campaign) for campaign in automation.queue])
+    _modeVar = StringVar(value=automation.mode)
+    _repeatVar = StringVar(value='cron')
+    _intervalVar = StringVar(value='60')
+    _jitterVar = StringVar(value='0')
+    _catchUpVar = IntVar(value=1)
 
     if automation.state != state.IDLE:
         logging.info('Cannot edit queue while task scheduler is active.')
         return
 
-    def addDateTime():
-        removeDateTime()
-
+    def addCampaign():
+        if automation.mode == 'triggered':
+            logging.error('Triggered mode does not use the automation queue.')
+            return
         _startDate = startDatePicker.get_date()
         _endDate = endDatePicker.get_date()
 
@@ -1803,20 +2360,36 @@ def generateAutoDialog():
         _timeString = f'{_timePicker[0]}:{_timePicker[1]} {_timePicker[2]}'
         _time = datetime.strptime(_timeString, '%I:%M %p')
 
-        _delta = _endDate - _startDate
-        for i in range(_delta.days + 1):
-            _date = datetime.combine(_startDate + dt.timedelta(days=i), _time.time())
-            with autoQueueLock:
-                automation.queue.append(_date)
-        _listVar.set(automation.queue)
+        with autoQueueLock:
+            names = [campaign.name for campaign in automation.queue]
+            index = len(automation.queue)
+            while f'{automation.mode}-{index}' in names:
+                index += 1
+            _name = f'{automation.mode}-{index}'
+            _misfire = 'run_once' if _catchUpVar.get() else 'skip'
+            try:
+                _jitter = int(_jitterVar.get())
+                if _repeatVar.get() == 'interval':
+                    _start = datetime.combine(_startDate, _time.time())
+                    _end = datetime.combine(_endDate, dt.time.max).replace(microsecond=0)
+                    campaign = Campaign(_name, automation.mode, 'interval', _start, _end, interval=float(_intervalVar.get()), jitter=_jitter, misfire=_misfire, filePath=automation.filePath)
+                else:
+                    campaign = dailyCampaign(_name, automation.mode, _startDate, _endDate, _time.time(), automation.filePath, jitter=_jitter, misfire=_misfire)
+            except ValueError as e:
+                logging.error(f'{type(e).__name__}: {e}')
+                return
+            automation.queue.append(campaign)
+            automation.store.save(automation.queue)
+            _listVar.set([str(campaign) for campaign in automation.queue])
 
         for i in range(0,len(automation.queue),2):
             queueListbox.itemconfigure(i, background='#f0f0ff')
     
-    def removeDateTime():
+    def removeCampaigns():
         with autoQueueLock:
             automation.queue.clear()
-            _listVar.set(automation.queue)
+            automation.store.save(automation.queue)
+            _listVar.set([])
 
     def pickFilePath():
         dir = filedialog.askdirectory()
@@ -1826,6 +2399,10 @@ def generateAutoDialog():
             automation.filePath = dir
         clearAndSetWidget(pathEntry, dir)
 
+    def setMode():
+        with autoQueueLock:
+            automation.mode = _modeVar.get()
+
     _parent = Toplevel()
     _parent.title('Auto-Sweep Configuration')
     _parent.resizable(False, False)
@@ -1855,20 +2432,114 @@ def generateAutoDialog():
     timePicker = SpinTimePickerModern(_parent)
     timePicker.grid(row=2, column=0, padx=ROOT_PADX, pady=ROOT_PADY, sticky=NSEW, columnspan=2)
     timePicker.addAll(constants.HOURS12)
-    addButton = ttk.Button(_parent, text="Generate", command=addDateTime)
-    addButton.grid(row=3, column=0, columnspan=1, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
-    removeButton = ttk.Button(_parent, text="Clear", command=removeDateTime)
-    removeButton.grid(row=3, column=1, columnspan=1, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
-
-    queueListbox = tk.Listbox(_parent, listvariable=_listVar, width=35)
-    queueListbox.grid(row=0, column=2, rowspan=4, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
+    repeatFrame = tk.Frame(_parent)
+    repeatFrame.grid(row=3, column=0, padx=ROOT_PADX, pady=ROOT_PADY, columnspan=2, sticky=NSEW)
+    repeatLabel = tk.Label(repeatFrame, text='Repeat')
+    repeatLabel.grid(row=0, column=0, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    repeatDaily = ttk.Radiobutton(repeatFrame, text='Daily', variable=_repeatVar, value='cron')
+    repeatDaily.grid(row=0, column=1, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    repeatInterval = ttk.Radiobutton(repeatFrame, text='Every (min)', variable=_repeatVar, value='interval')
+    repeatInterval.grid(row=0, column=2, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    intervalEntry = ttk.Entry(repeatFrame, textvariable=_intervalVar, width=6, validate='key', validatecommand=(isNumWrapper, '%P'))
+    intervalEntry.grid(row=0, column=3, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    jitterLabel = tk.Label(repeatFrame, text='Jitter (s)')
+    jitterLabel.grid(row=1, column=0, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    jitterEntry = ttk.Entry(repeatFrame, textvariable=_jitterVar, width=6, validate='key', validatecommand=(isNumWrapper, '%P'))
+    jitterEntry.grid(row=1, column=1, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    catchUpCheckbutton = ttk.Checkbutton(repeatFrame, text='Run once if missed', variable=_catchUpVar)
+    catchUpCheckbutton.grid(row=1, column=2, columnspan=2, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    addButton = ttk.Button(_parent, text="Generate", command=addCampaign)
+    addButton.grid(row=5, column=0, columnspan=1, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
+    removeButton = ttk.Button(_parent, text="Clear", command=removeCampaigns)
+    removeButton.grid(row=5, column=1, columnspan=1, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
+
+    modeFrame = tk.Frame(_parent)
+    modeFrame.grid(row=4, column=0, padx=ROOT_PADX, pady=ROOT_PADY, columnspan=2, sticky=NSEW)
+    modeLabel = tk.Label(modeFrame, text='Mode')
+    modeLabel.grid(row=0, column=0, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    modeScheduled = ttk.Radiobutton(modeFrame, text='Scheduled', variable=_modeVar, value='scheduled', command=setMode)
+    modeScheduled.grid(row=0, column=1, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    modeTriggered = ttk.Radiobutton(modeFrame, text='Triggered', variable=_modeVar, value='triggered', command=setMode)
+    modeTriggered.grid(row=0, column=2, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    modeSurvey = ttk.Radiobutton(modeFrame, text='Survey', variable=_modeVar, value='survey', command=setMode)
+    modeSurvey.grid(row=0, column=3, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+    modeChains = ttk.Radiobutton(modeFrame, text='Chains', variable=_modeVar, value='chains', command=setMode)
+    modeChains.grid(row=0, column=4, padx=ROOT_PADX, pady=ROOT_PADY, sticky=W)
+
+    queueListbox = tk.Listbox(_parent, listvariable=_listVar, width=60)
+    queueListbox.grid(row=0, column=2, rowspan=6, sticky=NSEW, padx=ROOT_PADX, pady=ROOT_PADY)
 
     for i in range(0,len(automation.queue),2):
         queueListbox.itemconfigure(i, background='#f0f0ff')
 
+def attachServiceDialog():
+    """Opens a dialog that asks for the address of a running headless service (service.py) and attaches to it. While attached, automation jobs are scheduled on the service instead of the front end.
+    """
+    from tkinter import simpledialog
+    from service import ServiceClient
+
+    if automation.state != state.IDLE:
+        logging.info('Cannot attach to a service while task scheduler is active.')
+        return
+    address = simpledialog.askstring(title='Attach to service', prompt='Service address (host:port):', initialvalue=f"{cfg['service']['host']}:{cfg['service']['port']}")
+    if not address:
+        return
+    host, _, port = address.rpartition(':')
+    try:
+        client = ServiceClient(host, int(port))
+        status = client.status()
+    except Exception as e:
+        logging.error(f'{type(e).__name__}: {e}')
+        return
+    automation.service = client
+    logging.info(f'Attached to service at {client.url}: {status}')
+
+def detachService():
+    """Detaches from the headless service. Jobs already scheduled on the service are not removed.
+    """
+    if automation.service is None:
+        return
+    logging.info(f'Detached from service at {automation.service.url}')
+    automation.service = None
+    automation.state = state.IDLE
+
 def autoStartStop():
-    """If the automation scheduler is active, pauses it and removes all jobs. If it is paused, add all jobs in automation.queue and resume.
+    """If the automation scheduler is active, pauses it and removes all jobs. If it is paused, add a job for each campaign in automation.queue and resume. Whether the campaigns are active is saved so they are resumed after a restart.
+    In triggered mode, arms or disarms triggered capture on the spectrum analyzer instead and starts continuous sweeping if it is not running.
+    Otherwise, if the front end is attached to the headless service, jobs are added to and removed from the service's scheduler instead.
     """
+    if automation.mode == 'triggered':
+        match automation.state:
+            case state.IDLE:
+                if Spec_An.detector is None:
+                    logging.error('Triggered capture requires detection to be enabled in config.toml.')
+                    return
+                Spec_An.capture.arm(automation.filePath)
+                if not Spec_An.contSweepFlag:
+                    Spec_An.toggleAnalyzerDisplay()
+                automation.state = state.AUTO
+            case state.AUTO:
+                Spec_An.capture.disarm()
+                automation.state = state.IDLE
+        return
+
+    if automation.service is not None:
+        try:
+            match automation.state:
+                case state.IDLE:
+                    if automation.queue == []:
+                        logging.error('Automation queue is empty')
+                        return
+                    jobs = automation.service.schedule([campaign.asDict() for campaign in automation.queue], automation.filePath)
+                    logging.info(f'Scheduled {len(jobs)} jobs on service at {automation.service.url}')
+                    automation.state = state.AUTO
+                case state.AUTO:
+                    automation.service.unschedule()
+                    automation.state = state.IDLE
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+        return
+
     match automation.state:
         case state.IDLE:
             if automation.queue == []:
@@ -1877,14 +2548,22 @@ def autoStartStop():
             # if the scheduler isn't paused when adding more than 2 jobs it breaks most of the time
             # changing trigger from date to interval fixes it?
             # also commenting out the sys.stdout/err redirectors fixes it and i have no idea why
-            for taskDateTime in automation.queue:
-                automation.scheduler.add_job(saveTrace, args=(None, automation.filePath), trigger='date', run_date = taskDateTime)
+            automation.initScheduler()
+            for campaign in automation.queue:
+                if campaign.filePath is None:
+                    campaign.filePath = automation.filePath
+                try:
+                    scheduleCampaign(automation.scheduler, campaign, campaignTarget(campaign.mode), cfg['automation']['misfire_grace_time'], automation.store)
+                except Exception as e:
+                    logging.error(f'{type(e).__name__}: {e}. Could not schedule campaign {campaign.name}.')
+            automation.store.save(automation.queue, active=True)
             automation.scheduler.resume()
             automation.state = state.AUTO
         case state.AUTO:
             automation.scheduler.pause()
             for job in automation.scheduler.get_jobs():
                 job.remove()
+            automation.store.save(active=False)
 
             automation.state = state.IDLE
 
@@ -1896,7 +2575,7 @@ sys.stdout.write = redirector
 sys.stderr.write = redirector
 
 # Check for initialization errors and print in the newly generated terminal window
-if 'cfg_error' in globals():
+if cfg_error is not None:
     logging.warning(f'{type(cfg_error).__name__}: {cfg_error}')
 if missingHeaders:
     for header in missingHeaders:
@@ -1904,21 +2583,62 @@ if missingHeaders:
 if missingKeys:
     for key in missingKeys:
         logging.error(f'Missing key [{key}] in config.toml')
-if missingHeaders or missingKeys or 'cfg_error' in globals():
+if missingHeaders or missingKeys or cfg_error is not None:
     logging.warning(f'Error loading config.toml, loading default configuration.')
 
-# Generate objects within root window
-Vi = VisaIO()
+def initSubsystems(Vi):
+    """Thread target that initializes subsystems which are not required to draw the root window (VISA resource manager, additional analyzers, device discovery, RF chain responses, and task scheduler) and logs the startup timeline.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO whose resource manager should be opened.
+    """
+    try:
+        Vi.openResourceManager(cfg['analyzer']['visa_backend'])
+        logStartup('VISA resource manager initialized')
+        for analyzer in cfg['analyzer']['additional']:
+            core.submit(Spec_An.bindAnalyzer(analyzer['resource'], analyzer.get('chain')), name='bindAnalyzer')
+        if Vi.pool.healthInterval > 0:
+            core.submit(sessionHealthTask(Vi.pool), name='sessionHealth')
+    except Exception as e:
+        logging.error(f'{type(e).__name__}: {e}')
+    core.submit(discovery.run(), name='deviceDiscovery')
+    if gainCorrection is not None:
+        gainCorrection.checkChains()
+        logStartup('RF chain responses calculated')
+    try:
+        automation.initScheduler()
+        logStartup('Task scheduler initialized')
+        if automation.store.active and automation.queue:
+            logging.info(f'Resuming {len(automation.queue)} campaigns from {automation.store.fileName}')
+            autoStartStop()
+    except Exception as e:
+        logging.error(f'{type(e).__name__}: {e}')
+    logStartup('Startup complete')
+
+# Generate objects within root window. The VISA resource manager is opened in initSubsystems so the window can be drawn first.
+Vi = VisaIO(SessionPool(cfg['analyzer']['health_interval']), visaLock)
 Motor = MotorIO(0, 0)
 Relay = SerialIO()
 
 Front_End = FrontEnd(root, Vi, Motor, Relay)
+root.update()   # Show the root window before the plots are generated
+logStartup('Front end drawn')
 Spec_An = SpecAn(Vi, Front_End.spectrumFrame)
 Azi_Ele = AziElePlot(Motor, Front_End.directionFrame)
+logStartup('Plots drawn')
 
-statusMonitorThread = threading.Thread(target=statusMonitor, args = (Front_End, Vi, Motor, Relay, Azi_Ele), daemon=True)
-statusMonitorThread.start()
-automation.scheduler.start(paused=True)
+# Each supervisor has its own adapter so its checks are serialized with the display loops by the device lock, not by a shared executor
+visaSupervisor = VisaSupervisor(core, AsyncVisa(core, Vi, visaLock), cfg['supervisor'], save=Spec_An.saveSession, restore=Spec_An.restoreSession, onRestored=Spec_An.resumeSession)
+motorSupervisor = MotorSupervisor(core, AsyncMotor(core, Motor, motorLock), cfg['supervisor'], save=Azi_Ele.saveSession, restore=Azi_Ele.restoreSession, onRestored=Azi_Ele.resumeSession)
+plcSupervisor = PLCSupervisor(core, AsyncPLC(core, Relay, plcLock), cfg['supervisor'])
+if cfg['supervisor']['enabled']:
+    for supervisor in (visaSupervisor, motorSupervisor, plcSupervisor):
+        core.submit(supervisor.run(), name=f'{supervisor.name} supervisor')
+discovery = DeviceDiscovery(core, Vi, cfg['discovery'], onChange=bindDiscoveredDevices)
+
+core.submit(statusTask(Front_End, Vi, Motor, Relay, Azi_Ele), name='statusMonitor')
+initSubsystemsThread = threading.Thread(target=initSubsystems, args=(Vi,), daemon=True)
+initSubsystemsThread.start()
 
 # Bind FrontEnd buttons to methods
 Front_End.standbyButton.configure(command = lambda: Azi_Ele.setState(state.IDLE))
@@ -1952,7 +2672,14 @@ menuFile.add_command(label='Exit', command=Front_End.onExit)
 tkLoggingLevel = IntVar()
 tkLoggingLevel.set(1)
 menuOptions.add_command(label='Configure...', command = Front_End.openConfig)
+menuOptions.add_command(label='Analyzers...', command = openAnalyzersWindow)
 menuOptions.add_command(label='Change plot color', command = Spec_An.setPlotThreadHandler)
+menuOptions.add_command(label='Wideband survey', command = lambda: threading.Thread(target=saveSurvey, args=(automation.filePath, True)).start())
+menuOptions.add_command(label='I/O statistics...', command = openStatsWindow)
+menuOptions.add_command(label='Lock profile...', command = openLockProfileWindow)
+menuOptions.add_separator()
+menuOptions.add_command(label='Attach to service...', command = attachServiceDialog)
+menuOptions.add_command(label='Detach from service', command = detachService)
 menuOptions.add_separator()
 menuOptions.add_radiobutton(label='Logging: Standard', variable = tkLoggingLevel, command = lambda: loggingLevelHandler(tkLoggingLevel.get()), value = 1)
 menuOptions.add_radiobutton(label='Logging: Verbose', variable = tkLoggingLevel, command = lambda: loggingLevelHandler(tkLoggingLevel.get()), value = 2)
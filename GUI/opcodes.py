@@ -71,4 +71,41 @@ class opcodes(Enum):
     DFS_CHAIN13            = (0b11011100)
     DFS_CHAIN14            = (0b11011101)
     DFS_CHAIN15            = (0b11011110)
-    DFS_CHAIN16            = (0b11011111)
\ No newline at end of file
+    DFS_CHAIN16            = (0b11011111)
+
+def chainName(status):
+    """Converts a status returned by the PLC to the name of the selected RF chain (e.g. opcodes.DFS_CHAIN1.value returns 'DFS1').
+
+    Args:
+        status (int): Status returned by the PLC in response to opcodes.QUERY_STATUS.
+
+    Returns:
+        string: Name of the RF chain, or 'SLEEP' if the status does not correspond to an RF chain.
+    """
+    try:
+        name = opcodes(status).name
+    except ValueError:
+        return 'SLEEP'
+    if '_CHAIN' not in name:
+        return 'SLEEP'
+    return name.replace('_CHAIN', '')
+
+def chainOpcode(name):
+    """Converts the name of an RF chain to its selection opcode (e.g. 'DFS1' returns opcodes.DFS_CHAIN1). Inverse of chainName().
+
+    Args:
+        name (string): Name of the RF chain.
+
+    Raises:
+        ValueError: If there is no RF chain with this name.
+
+    Returns:
+        opcodes: Selection opcode of the RF chain.
+    """
+    for prefix in ('DFS', 'EMS'):
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            try:
+                return opcodes[f'{prefix}_CHAIN{name[len(prefix):]}']
+            except KeyError:
+                break
+    raise ValueError(f'Unknown RF chain: {name}')
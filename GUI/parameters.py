@@ -0,0 +1,225 @@
+"""Module that contains spectrum analyzer parameters, their associated SCPI commands, and methods to apply them. This module does not depend on tkinter so it can be used by the headless service.
+"""
+
+import logging
+
+from instrumentation import timed
+
+class Parameter:
+    instances = []
+    def __init__(self, name, command, log = True):
+        """Spectrum analyzer parameter and associated SCPI command.
+
+        Args:
+            name (string): Full name to be used in trace csv.
+            command (string): SCPI command used to query/set parameter.
+            log (bool): Determines whether or not to save the parameter to trace csv. Defaults to True.
+        """
+        Parameter.instances.append(self)
+        self.name = name
+        self.command = command
+        self.log = log
+        self.arg = None
+        self.widget = None
+        self.value = None
+
+    def update(self, arg = None, widget = None, value=None):
+        """Update the argument/value and tkinter widget associated with the parameter.
+
+        Args:
+            arg (any, optional): Parameter argument. Defaults to None.
+            widget (ttk.Widget or Tkinter_variable, optional): Associated tkinter widget. Defaults to None.
+            value(any, optional): Parameter value. Defaults to None.
+        """
+        if arg is not None:
+            self.arg = arg
+        if widget is not None:
+            self.widget = widget
+        if value is not None:
+            self.value = value
+
+    def valueString(self):
+        """Returns the parameter value as a string with brackets, whitespace, and other characters returned by the instrument stripped.
+
+        Returns:
+            string: Parameter value.
+        """
+        if isinstance(self.value, (list,)):
+            try:
+                return self.value[0].strip("[]{}()#* \n\t")
+            except:
+                return str(self.value).strip("[]{}()#* \n\t")
+        return str(self.value).strip("[]{}()#* \n\t")
+
+    def floatValue(self):
+        """Returns the parameter value as a float.
+
+        Returns:
+            float: Parameter value, or None if it cannot be converted.
+        """
+        try:
+            return float(self.valueString())
+        except ValueError:
+            return None
+
+CenterFreq      = Parameter('Center Frequency', ':SENS:FREQ:CENTER', log=False)
+Span            = Parameter('Span', ':SENS:FREQ:SPAN', log=False)
+StartFreq       = Parameter('Start Frequency', ':SENS:FREQ:START')
+StopFreq        = Parameter('Stop Frequency', ':SENS:FREQ:STOP')
+SweepTime       = Parameter('Sweep Time', ':SWE:TIME')
+Rbw             = Parameter('RBW', ':SENS:BANDWIDTH:RESOLUTION')
+Vbw             = Parameter('VBW', ':SENS:BANDWIDTH:VIDEO')
+BwRatio         = Parameter('VBW:3 dB RBW', ':SENS:BANDWIDTH:VIDEO:RATIO', log=False)
+Ref             = Parameter('Ref Level', ':DISP:WINDOW:TRACE:Y:RLEVEL', log=False)
+NumDiv          = Parameter('Number of Divisions', ':DISP:WINDOW:TRACE:Y:NDIV', log=False)
+YScale          = Parameter('Scale/Div', ':DISP:WINDOW:TRACE:Y:PDIV', log=False)
+Atten           = Parameter('Attenuation', ':SENS:POWER:RF:ATTENUATION')
+SweepPoints     = Parameter('Sweep Points', ':SENS:SWE:POIN')
+SpanType        = Parameter('Swept Span', ':SENS:FREQ:SPAN', log=False)
+SweepType       = Parameter('Auto Sweep Time', ':SWE:TIME:AUTO', log=False)
+RbwType         = Parameter('Auto RBW', ':SENS:BAND:RES:AUTO', log=False)
+VbwType         = Parameter('Auto VBW', ':SENS:BAND:VID:AUTO', log=False)
+BwRatioType     = Parameter('Auto VBW:RBW Ratio', ':SENS:BAND:VID:RATIO', log=False)
+RbwFilterShape  = Parameter('RBW Filter', ':SENS:BAND:SHAP')
+RbwFilterType   = Parameter('RBW Filter BW', ':SENS:BAND:TYPE')
+AttenType       = Parameter('Auto Attenuation', ':SENS:POWER:ATT:AUTO', log=False)
+XAxisUnit       = Parameter('X Axis Units', None)
+XAxisUnit.update(value='Hz')
+YAxisUnit       = Parameter('Y Axis Units', ':UNIT:POW')
+TraceType       = Parameter('Trace Type', 'TRACE:TYPE')
+
+# Keyword arguments accepted by SpecAn.setAnalyzerValue and the service API, mapped to their respective parameter
+KEYWORDS = {
+    'centerfreq': CenterFreq,
+    'span': Span,
+    'startfreq': StartFreq,
+    'stopfreq': StopFreq,
+    'sweeptime': SweepTime,
+    'rbw': Rbw,
+    'vbw': Vbw,
+    'bwratio': BwRatio,
+    'ref': Ref,
+    'numdiv': NumDiv,
+    'yscale': YScale,
+    'atten': Atten,
+    'points': SweepPoints,
+    'spantype': SpanType,
+    'sweeptype': SweepType,
+    'rbwtype': RbwType,
+    'vbwtype': VbwType,
+    'bwratiotype': BwRatioType,
+    'rbwfiltershape': RbwFilterShape,
+    'rbwfiltertype': RbwFilterType,
+    'attentype': AttenType,
+    'tracetype': TraceType,
+}
+
+# Keywords restored after the analyzer reconnects, in the order they are written. Center frequency and span are restored instead of start and stop so zero span is preserved, and each auto setting is written after its value so a manual value is kept only if auto was off.
+RESTORE_KEYWORDS = ('centerfreq', 'span', 'points', 'sweeptime', 'sweeptype', 'rbw', 'rbwtype', 'vbw', 'vbwtype', 'atten', 'attentype', 'ref', 'numdiv', 'yscale', 'rbwfiltershape', 'rbwfiltertype', 'tracetype')
+
+def parameterPreset(keywords=RESTORE_KEYWORDS):
+    """Returns the last queried value of each parameter as a preset, e.g. to restore the settings of the analyzer after it reconnects with writePreset(). Parameters which have not been queried are omitted.
+
+    Args:
+        keywords (tuple, optional): Keywords in KEYWORDS to include. Defaults to RESTORE_KEYWORDS.
+
+    Returns:
+        dict: Keywords mapped to their values as strings.
+    """
+    return {key: KEYWORDS[key].valueString() for key in keywords if KEYWORDS[key].value is not None}
+
+@timed('applyParameters')
+def applyParameters(Vi):
+    """Issues each parameter's command with its argument to the open resource if the argument is not None, then queries the resource to update every parameter's value. Parameters with arguments are moved to the front of Parameter.instances so write commands are executed first. Should be called with the VISA lock held.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+
+    Returns:
+        list: Parameter.instances in the order that they were executed.
+    """
+    _list = Parameter.instances
+    # Sort the list so dictionaries with 'arg': None are placed (and executed) after write commands
+    for index in range(len(_list)):
+        if _list[index].arg is not None:
+            _list.insert(0, _list.pop(index))
+
+    logging.debug(f"applyParameters generated list of parameters '_list' with value {_list}")
+    for parameter in _list:
+        if parameter.command is None:
+            continue
+        # Issue command with argument
+        if parameter.arg is not None:
+            Vi.openRsrc.write(f'{parameter.command} {parameter.arg}')
+        try:
+            buffer = Vi.openRsrc.query_ascii_values(f'{parameter.command}?') # Default converter is float
+        except:
+            buffer = Vi.openRsrc.query_ascii_values(f'{parameter.command}?', converter='s')
+        logging.verbose(f"Command {parameter.command}? returned {buffer}")
+        parameter.update(value=buffer)
+    return _list
+
+def clearArguments(parameters=None):
+    """Sets the argument of each parameter to None so it is not written again by the next call to applyParameters().
+
+    Args:
+        parameters (list, optional): Instances of Parameter to clear. Defaults to None (every parameter).
+    """
+    for parameter in (Parameter.instances if parameters is None else parameters):
+        parameter.arg = None
+
+def setParameters(Vi, **kwargs):
+    """Sets the argument of each parameter passed as a keyword, then applies every parameter with applyParameters(). Unlike applyPreset(), the arguments are kept so they are written again by later calls, as they are when set from the widgets. Arguments which are None are not changed. This is the VISA part of SpecAn.setAnalyzerValue(). Should be called with the VISA lock held.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        **kwargs: Keyword arguments in KEYWORDS and their arguments, e.g. centerfreq=1e9.
+
+    Raises:
+        ValueError: If a keyword is not in KEYWORDS.
+
+    Returns:
+        list: Parameter.instances in the order that they were executed.
+    """
+    for key in kwargs:
+        if key not in KEYWORDS:
+            raise ValueError(f'Unknown parameter: {key}')
+    for key, value in kwargs.items():
+        KEYWORDS[key].update(arg=value)
+    return applyParameters(Vi)
+
+def applyPreset(Vi, preset):
+    """Applies a set of parameters to the analyzer and queries the value of every parameter. The arguments of the preset's parameters are cleared afterwards so the preset is only written once, while arguments set from the widgets are kept. Should be called with the VISA lock held.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        preset (dict): Keyword arguments in KEYWORDS and their arguments, e.g. {'startfreq': 1e9}.
+
+    Raises:
+        ValueError: If a keyword is not in KEYWORDS.
+    """
+    for key in preset:
+        if key not in KEYWORDS:
+            raise ValueError(f'Unknown parameter: {key}')
+    try:
+        for key, value in preset.items():
+            KEYWORDS[key].update(arg=value)
+        applyParameters(Vi)
+    finally:
+        clearArguments([KEYWORDS[key] for key in preset])
+
+def writePreset(Vi, preset):
+    """Writes a set of parameters to an analyzer without querying them, so the values of the parameters shown in the widgets are not changed, e.g. for an additional analyzer bound with SpecAn.bindAnalyzer(). Should be called with the lock of the analyzer held.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        preset (dict): Keyword arguments in KEYWORDS and their arguments, e.g. {'startfreq': 1e9}.
+
+    Raises:
+        ValueError: If a keyword is not in KEYWORDS.
+    """
+    for key in preset:
+        if key not in KEYWORDS:
+            raise ValueError(f'Unknown parameter: {key}')
+    for key, value in preset.items():
+        Vi.openRsrc.write(f'{KEYWORDS[key].command} {value}')
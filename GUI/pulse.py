@@ -0,0 +1,171 @@
+"""Module that contains pulse parameter extraction for zero span traces. Pulse edges are found with vectorized threshold crossings, interpolated between sweep points, and summarized per trace as pulse width, pulse repetition interval (PRI), duty cycle, and burst count.
+Pulse reports are appended to a csv log instead of saving the raw traces.
+"""
+
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+class PulseReport():
+    def __init__(self, timestamp, chain, widths, intervals, bursts, peak, noise, threshold, sweepTime):
+        """Pulse descriptors of a single zero span trace.
+
+        Args:
+            timestamp (datetime): Time of acquisition of the trace.
+            chain (string): Name of the selected RF chain.
+            widths (numpy.ndarray): Width of each complete pulse in seconds.
+            intervals (numpy.ndarray): Time between consecutive rising edges in seconds.
+            bursts (numpy.ndarray): Number of pulses in each burst.
+            peak (float): Maximum amplitude of the trace in dBm.
+            noise (float): Median amplitude of the trace in dBm.
+            threshold (float): Amplitude used to detect edges in dBm.
+            sweepTime (float): Duration of the trace in seconds.
+        """
+        self.timestamp = timestamp
+        self.chain = chain
+        self.widths = widths
+        self.intervals = intervals
+        self.bursts = bursts
+        self.peak = peak
+        self.noise = noise
+        self.threshold = threshold
+        self.sweepTime = sweepTime
+
+    @property
+    def count(self):
+        return self.widths.size
+
+    @property
+    def width(self):
+        """Mean pulse width in seconds, or None if no complete pulses were found.
+        """
+        return float(self.widths.mean()) if self.widths.size else None
+
+    @property
+    def pri(self):
+        """Median pulse repetition interval in seconds, or None if fewer than two pulses were found.
+        """
+        return float(np.median(self.intervals)) if self.intervals.size else None
+
+    @property
+    def dutyCycle(self):
+        """Mean pulse width divided by the mean PRI, or None if fewer than two pulses were found.
+        """
+        if not self.widths.size or not self.intervals.size:
+            return None
+        return float(self.widths.mean() / self.intervals.mean())
+
+    FIELDS = ('Time', 'Chain', 'Pulses', 'Bursts', 'Pulses/Burst', 'Width (s)', 'Width Min (s)', 'Width Max (s)', 'PRI (s)', 'PRF (Hz)', 'Duty Cycle', 'Peak (dBm)', 'Noise (dBm)', 'Threshold (dBm)')
+
+    def row(self):
+        """Returns the report as a tuple of strings in the order of PulseReport.FIELDS.
+        """
+        def _format(value):
+            return '' if value is None else f'{value:.6g}'
+        pri = self.pri
+        return (
+            self.timestamp.isoformat(),
+            self.chain,
+            str(self.count),
+            str(self.bursts.size),
+            _format(float(self.bursts.mean()) if self.bursts.size else None),
+            _format(self.width),
+            _format(float(self.widths.min()) if self.widths.size else None),
+            _format(float(self.widths.max()) if self.widths.size else None),
+            _format(pri),
+            _format(1 / pri if pri else None),
+            _format(self.dutyCycle),
+            _format(self.peak),
+            _format(self.noise),
+            _format(self.threshold),
+        )
+
+    def __repr__(self):
+        return f'PulseReport({self.count} pulses, {self.bursts.size} bursts, width {self.width}, PRI {self.pri}, duty cycle {self.dutyCycle}, {self.chain})'
+
+def crossings(amplitude, threshold):
+    """Finds the rising and falling threshold crossings of a trace, linearly interpolated between sweep points.
+
+    Args:
+        amplitude (numpy.ndarray): Amplitude values of the trace.
+        threshold (float): Threshold amplitude.
+
+    Returns:
+        tuple: (rising, falling) arrays of fractional point indices.
+    """
+    above = amplitude > threshold
+    edges = np.flatnonzero(above[1:] != above[:-1])     # Crossing between point i and i + 1
+    y0 = amplitude[edges]
+    y1 = amplitude[edges + 1]
+    position = edges + (threshold - y0) / (y1 - y0)
+    rising = above[edges + 1]
+    return position[rising], position[~rising]
+
+def analyzePulses(trace, threshold=6.0, minSnr=10.0, burstGap=2.0):
+    """Extracts pulse descriptors from a zero span trace. Edges are detected at threshold dB below the peak of the trace (6 dB is the half voltage point). Pulses which are cut off by the start or end of the trace are not included in the widths.
+
+    Args:
+        trace (Trace): Zero span trace (trace.xunit must be 's').
+        threshold (float, optional): Edge threshold in dB below the peak. Defaults to 6.0.
+        minSnr (float, optional): Minimum peak amplitude above the median of the trace in dB. Traces below this only contain noise and return a report with no pulses. Defaults to 10.0.
+        burstGap (float, optional): A new burst starts when the time between rising edges is more than burstGap times the median PRI. Defaults to 2.0.
+
+    Raises:
+        ValueError: If the trace is not zero span.
+
+    Returns:
+        PulseReport: Pulse descriptors of the trace.
+    """
+    if trace.xunit != 's':
+        raise ValueError('Pulse analysis requires a zero span trace.')
+    amplitude = trace.amplitude
+    dt = (trace.stop - trace.start) / (trace.points - 1) if trace.points > 1 else 0.0
+    peak = float(amplitude.max())
+    noise = float(np.median(amplitude))
+    level = peak - threshold
+    empty = np.empty(0)
+    if peak - noise < minSnr:
+        return PulseReport(trace.timestamp, trace.chain, empty, empty, np.empty(0, dtype=np.intp), peak, noise, level, trace.stop - trace.start)
+
+    rising, falling = crossings(amplitude, level)
+    # Pair each rising edge with the next falling edge
+    if falling.size and rising.size and falling[0] < rising[0]:
+        falling = falling[1:]
+    pairs = min(rising.size, falling.size)
+    widths = (falling[:pairs] - rising[:pairs]) * dt
+    intervals = np.diff(rising) * dt
+
+    if intervals.size:
+        breaks = np.flatnonzero(intervals > burstGap * np.median(intervals))
+        bursts = np.diff(np.concatenate(([0], breaks + 1, [rising.size])))
+    elif rising.size:
+        bursts = np.array([1])
+    else:
+        bursts = np.empty(0, dtype=np.intp)
+    return PulseReport(trace.timestamp, trace.chain, widths, intervals, bursts, peak, noise, level, trace.stop - trace.start)
+
+class PulseLog():
+    def __init__(self, filePath):
+        """Appends pulse reports to a daily csv file in the format pulses-[date].csv. The header is written when a file is created.
+
+        Args:
+            filePath (string): Directory of the log files.
+        """
+        self.filePath = filePath
+        self.lock = threading.Lock()
+
+    def write(self, report):
+        """Appends a report to the log file of the current date.
+
+        Args:
+            report (PulseReport): Report to append.
+        """
+        fileName = os.path.join(self.filePath, 'pulses-' + datetime.now().strftime('%Y-%m-%d') + '.csv')
+        with self.lock:
+            newFile = not os.path.exists(fileName)
+            with open(fileName, 'a') as f:
+                if newFile:
+                    f.write(','.join(PulseReport.FIELDS) + '\n')
+                f.write(','.join(report.row()) + '\n')
@@ -0,0 +1,477 @@
+"""Module that runs the acquisition engines (VisaIO, MotorIO, SerialIO) and the automation task scheduler without a display, and exposes them through a JSON API over HTTP on localhost.
+Start the service with 'python service.py'. The front end can attach to a running service from Options > Attach to service..., after which automation jobs are scheduled on the service instead of the front end so they continue if the front end is closed.
+"""
+
+# PRIVATE LIBRARIES
+from loggingsetup import *
+import defaultconfig
+from frontendio import *
+from opcodes import *
+from parameters import *
+from tracedata import *
+from automation import *
+from detection import *
+from sweepplan import *
+from correction import *
+from campaign import *
+from jobstore import *
+from writer import *
+
+# OTHER MODULES
+import argparse
+import functools
+import json
+import logging
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib import request as urlrequest
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode
+
+class AcquisitionService():
+    def __init__(self, cfg):
+        """Contains the IO objects and task scheduler of the headless service. Each method is exposed through the HTTP API in ServiceRequestHandler.ROUTES and returns a JSON-serializable object.
+
+        Args:
+            cfg (dict): Loaded configuration (See defaultconfig.py).
+        """
+        self.cfg = cfg
+        self.Vi = VisaIO()
+        self.Motor = MotorIO(0, 0)
+        self.PLC = SerialIO()
+        self.visaLock = threading.RLock()
+        self.motorLock = threading.RLock()
+        self.plcLock = threading.RLock()
+        self.filePath = os.getcwd()
+        self.traceHistory = TraceHistory(cfg['trace']['history_length'])
+        self.writer = TraceWriter(cfg['writer'])
+        self.scheduler = createScheduler(cfg)
+        self.store = JobStore(defaultconfig.configPath(cfg['service']['job_store']), legacyFile=defaultconfig.configPath('service_campaigns.json'))
+        self.gainCorrection = None
+        if cfg['correction']['enabled']:
+            self.gainCorrection = GainCorrection(cfg['correction']['chains'])
+        self.detector = None
+        if cfg['detection']['enabled']:
+            self.detector = Detector(cfg['detection'])
+
+    def start(self):
+        """Opens the VISA resource manager and starts the task scheduler. Campaigns which were scheduled when the service stopped are resumed.
+        """
+        try:
+            self.Vi.openResourceManager(self.cfg['analyzer']['visa_backend'])
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+        if self.gainCorrection is not None:
+            self.gainCorrection.checkChains()
+        if self.detector is not None:
+            self.detector.start()
+        self.writer.start()
+        self.scheduler.start()
+        self.store.recoverInterrupted()
+        campaigns = self.store.load()
+        if self.store.active and campaigns:
+            logging.info(f'Resuming {len(campaigns)} campaigns from {self.store.fileName}')
+            self.scheduleCampaigns(campaigns)
+
+    def shutdown(self):
+        """Stops the task scheduler and closes all connections.
+        """
+        self.scheduler.shutdown(wait=False)
+        self.writer.close()
+        if self.Vi.isSessionOpen():
+            self.Vi.closeSession()
+        self.Motor.closeSerial()
+        self.PLC.close()
+
+    def status(self):
+        """Returns the connection status of each device, the selected RF chain, the number of scheduled jobs, and the metrics of the trace writer.
+        """
+        lastSweep = None
+        trace = self.traceHistory.latest()
+        if trace is not None:
+            lastSweep = trace.timestamp.isoformat()
+        return {
+            'visa': self.Vi.isSessionOpen(),
+            'motor': self.Motor.ser.is_open,
+            'plc': self.PLC.serial.is_open,
+            'plcStatus': self.PLC.status,
+            'chain': chainName(self.PLC.status),
+            'jobs': len(self.scheduler.get_jobs()),
+            'lastSweep': lastSweep,
+            'writer': self.writer.metrics(),
+        }
+
+    def resources(self):
+        """Returns the VISA resources available to the resource manager.
+        """
+        return list(self.Vi.listResources())
+
+    def connect(self, device, port):
+        """Connects to a device.
+
+        Args:
+            device (string): Can be 'visa', 'motor', or 'plc'.
+            port (string): Name of the VISA ID or serial port to connect to.
+        """
+        if device == 'visa':
+            with self.visaLock:
+                if self.Vi.connectToRsrc(port) == RETURN_ERROR:
+                    raise ConnectionError(f'Could not open a session to {port}.')
+                return self.Vi.identify()
+        elif device == 'motor':
+            with self.motorLock:
+                self.Motor.openSerial(port)
+        elif device == 'plc':
+            self.PLC.openSerial(port)
+            self.PLC.threadHandler(self.PLC.queryStatus)
+        else:
+            raise ValueError(f'Unknown device: {device}')
+        return port
+
+    def disconnect(self, device):
+        """Disconnects from a device.
+
+        Args:
+            device (string): Can be 'visa', 'motor', or 'plc'.
+        """
+        match device:
+            case 'visa':
+                with self.visaLock:
+                    self.Vi.closeSession()
+            case 'motor':
+                with self.motorLock:
+                    self.Motor.closeSerial()
+            case 'plc':
+                self.PLC.close()
+            case _:
+                raise ValueError(f'Unknown device: {device}')
+        return device
+
+    def initialize(self):
+        """Resets the analyzer state and queries the value of every parameter.
+        """
+        with self.visaLock:
+            self.Vi.resetAnalyzerState()
+            self.Vi.queryPowerUpErrors()
+            if self.cfg['analyzer']['acquisition'] == 'trace':
+                self.Vi.setTraceFormat(self.cfg['analyzer']['data_format'] == 'real32')
+            return self.parameters()
+
+    def parameters(self, **kwargs):
+        """Applies the parameters passed in kwargs to the analyzer and returns the value of every parameter.
+
+        Args:
+            kwargs: Keyword arguments in parameters.KEYWORDS and their arguments, e.g. startfreq=1e9.
+        """
+        with self.visaLock:
+            applyPreset(self.Vi, kwargs)
+        return {parameter.name: parameter.valueString() for parameter in Parameter.instances}
+
+    def sweep(self):
+        """Initiates a sweep and appends it to the trace history.
+        """
+        with self.visaLock:
+            trace = acquireTrace(self.Vi, chainName(self.PLC.status), self.cfg['analyzer']['acquisition'], self.cfg['analyzer']['data_format'] == 'real32')
+        if self.gainCorrection is not None:
+            trace = self.gainCorrection.correct(trace)
+        self.traceHistory.append(trace)
+        if self.detector is not None:
+            self.detector.submit(trace)
+        return {'timestamp': trace.timestamp.isoformat(), 'points': trace.points}
+
+    def trace(self):
+        """Returns the most recently acquired trace.
+        """
+        trace = self.traceHistory.latest()
+        if trace is None:
+            raise ValueError('No sweep has been acquired.')
+        return {'timestamp': trace.timestamp.isoformat(), 'chain': trace.chain, 'parameters': trace.parameters, 'x': trace.frequency.tolist(), 'y': trace.amplitude.tolist()}
+
+    def detections(self):
+        """Returns the stored detections from oldest to newest.
+        """
+        if self.detector is None:
+            return []
+        return [detection.asDict() for detection in self.detector.list()]
+
+    def save(self, path=None, wait=False):
+        """Initiates a sweep and saves it as csv. Also used as the target of scheduled jobs.
+
+        Args:
+            path (string, optional): Directory to save to. Defaults to self.filePath.
+            wait (bool, optional): Waits until the files are written, as scheduled jobs do. Defaults to False.
+        """
+        if path is None:
+            path = self.filePath
+        self.sweep()
+        trace = self.traceHistory.latest()
+        fileName = self.writer.write(trace, path) if wait else self.writer.save(trace, path)
+        logging.info(f'Saved trace to {fileName}')
+        return fileName
+
+    def survey(self, path=None, wait=False):
+        """Acquires a wideband survey planned from the [survey] configuration and saves it as csv. Also used as the target of scheduled jobs in survey mode.
+
+        Args:
+            path (string, optional): Directory to save to. Defaults to self.filePath.
+            wait (bool, optional): Waits until the files are written, as scheduled jobs do. Defaults to False.
+        """
+        if path is None:
+            path = self.filePath
+        binary = self.cfg['analyzer']['data_format'] == 'real32'
+        with self.visaLock:
+            self.Vi.setTraceFormat(binary)
+            try:
+                trace = runSurvey(self.Vi, planFromConfig(self.cfg['survey']), chainName(self.PLC.status), binary)
+            finally:
+                if self.cfg['analyzer']['acquisition'] != 'trace':
+                    self.Vi.setTraceFormat(False)
+        if self.gainCorrection is not None:
+            trace = self.gainCorrection.correct(trace)
+        self.traceHistory.append(trace)
+        fileName = self.writer.write(trace, path) if wait else self.writer.save(trace, path)
+        logging.info(f'Saved survey of {trace.points} points to {fileName}')
+        return fileName
+
+    def chains(self, path=None, wait=False):
+        """Sweeps each RF chain in the [chains] configuration and saves one csv per chain. Also used as the target of scheduled jobs in chains mode.
+
+        Args:
+            path (string, optional): Directory to save to. Defaults to self.filePath.
+            wait (bool, optional): Waits until the files are written, as scheduled jobs do. Defaults to False.
+        """
+        if path is None:
+            path = self.filePath
+        return sweepChains(self.Vi, self.PLC, self.visaLock, self.plcLock, self.cfg['chains'], path, self.cfg['analyzer']['acquisition'], self.cfg['analyzer']['data_format'] == 'real32', self.gainCorrection, self.traceHistory, self.writer, wait)
+
+    def plc(self, opcode):
+        """Issues an opcode to the PLC in a new thread.
+
+        Args:
+            opcode (string): Name of the opcode in opcodes, e.g. 'DFS_CHAIN1'.
+        """
+        def _query(value):
+            with self.plcLock:
+                self.PLC.query(value)
+        threading.Thread(target=_query, args=(opcodes[opcode].value,), daemon=True).start()
+        return opcode
+
+    def motor(self, command):
+        """Issues a command to the motor controller and returns its response.
+
+        Args:
+            command (string): Command to send to the motor controller.
+        """
+        with self.motorLock:
+            return self.Motor.query(command)
+
+    def schedule(self, campaigns, path=None):
+        """Adds a job for each campaign, replacing any scheduled campaigns.
+
+        Args:
+            campaigns (list): Campaigns as dictionaries (See Campaign.asDict()).
+            path (string, optional): Directory to save to for campaigns without a file path. Defaults to self.filePath.
+        """
+        if path is not None:
+            self.filePath = path
+        campaigns = [Campaign.fromDict(campaign) for campaign in campaigns]
+        for campaign in campaigns:
+            if campaign.filePath is None:
+                campaign.filePath = self.filePath
+        self.scheduler.remove_all_jobs()
+        self.scheduleCampaigns(campaigns)
+        return self.jobs()
+
+    def scheduleCampaigns(self, campaigns):
+        """Adds a job for each campaign and saves them as active.
+
+        Args:
+            campaigns (list): Instances of Campaign.
+        """
+        targets = {'survey': self.survey, 'chains': self.chains}
+        for campaign in campaigns:
+            target = functools.partial(targets.get(campaign.mode, self.save), wait=True)
+            scheduleCampaign(self.scheduler, campaign, target, self.cfg['automation']['misfire_grace_time'], self.store)
+        self.store.save(campaigns, active=True)
+
+    def runs(self, campaign=None, limit=100):
+        """Returns the most recent campaign runs recorded in the job store, newest first.
+
+        Args:
+            campaign (string, optional): Name of the campaign, or None for every campaign. Defaults to None.
+            limit (int, optional): Maximum number of runs. Defaults to 100.
+        """
+        return self.store.runs(campaign, int(limit))
+
+    def unschedule(self):
+        """Removes all scheduled jobs. The campaigns are kept in the campaign file but are not resumed on restart.
+        """
+        self.scheduler.remove_all_jobs()
+        self.store.save(active=False)
+        return self.jobs()
+
+    def jobs(self):
+        """Returns the next run time of each scheduled job.
+        """
+        return [str(job.next_run_time) for job in self.scheduler.get_jobs()]
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Maps HTTP requests to the methods of an AcquisitionService. POST request bodies are passed to the method as keyword arguments and the return value is sent as JSON in the format {"result": value} or {"error": message}.
+    """
+    service = None
+    ROUTES = {
+        ('GET', '/status'): 'status',
+        ('GET', '/resources'): 'resources',
+        ('GET', '/trace'): 'trace',
+        ('GET', '/jobs'): 'jobs',
+        ('GET', '/detections'): 'detections',
+        ('GET', '/runs'): 'runs',
+        ('POST', '/connect'): 'connect',
+        ('POST', '/disconnect'): 'disconnect',
+        ('POST', '/initialize'): 'initialize',
+        ('POST', '/parameters'): 'parameters',
+        ('POST', '/sweep'): 'sweep',
+        ('POST', '/save'): 'save',
+        ('POST', '/survey'): 'survey',
+        ('POST', '/chains'): 'chains',
+        ('POST', '/plc'): 'plc',
+        ('POST', '/motor'): 'motor',
+        ('POST', '/schedule'): 'schedule',
+        ('POST', '/unschedule'): 'unschedule',
+    }
+
+    def do_GET(self):
+        self.handle_route('GET')
+
+    def do_POST(self):
+        self.handle_route('POST')
+
+    def handle_route(self, method):
+        """Calls the service method routed to the request path and sends its response.
+
+        Args:
+            method (string): 'GET' or 'POST'.
+        """
+        path, _, query = self.path.partition('?')
+        route = self.ROUTES.get((method, path))
+        if route is None:
+            self.send_json(404, {'error': f'No route for {method} {path}'})
+            return
+        try:
+            kwargs = dict(parse_qsl(query))
+            length = int(self.headers.get('Content-Length', 0))
+            if length:
+                kwargs.update(json.loads(self.rfile.read(length)))
+            result = getattr(self.service, route)(**kwargs)
+        except Exception as e:
+            logging.error(f'{type(e).__name__}: {e}')
+            self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+        else:
+            self.send_json(200, {'result': result})
+
+    def send_json(self, code, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f'{self.address_string()} {format % args}')
+
+class ServiceClient():
+    def __init__(self, host, port, timeout=30.0):
+        """Client for the HTTP API of a running AcquisitionService.
+
+        Args:
+            host (string): Host name or IP address of the service.
+            port (int): Port of the service.
+            timeout (float, optional): Timeout in seconds for each request. Defaults to 30.0.
+        """
+        self.url = f'http://{host}:{port}'
+        self.timeout = timeout
+
+    def request(self, method, path, **kwargs):
+        """Sends a request to the service and returns the result.
+
+        Args:
+            method (string): 'GET' or 'POST'.
+            path (string): Route of the request, e.g. '/status'.
+            kwargs: Keyword arguments passed to the service method, as a JSON body for POST or as a query string for GET. Arguments which are None are not sent with GET.
+
+        Raises:
+            RuntimeError: If the service returns an error.
+
+        Returns:
+            Any: Return value of the service method.
+        """
+        data = None
+        if method == 'POST':
+            data = json.dumps(kwargs).encode('utf-8')
+        elif kwargs:
+            path += '?' + urlencode({key: value for key, value in kwargs.items() if value is not None})
+        req = urlrequest.Request(self.url + path, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read())['result']
+        except HTTPError as e:
+            raise RuntimeError(json.loads(e.read()).get('error', str(e)))
+
+    def status(self):
+        return self.request('GET', '/status')
+
+    def trace(self):
+        return self.request('GET', '/trace')
+
+    def sweep(self):
+        return self.request('POST', '/sweep')
+
+    def detections(self):
+        return self.request('GET', '/detections')
+
+    def save(self, path=None):
+        return self.request('POST', '/save', path=path)
+
+    def survey(self, path=None):
+        return self.request('POST', '/survey', path=path)
+
+    def chains(self, path=None):
+        return self.request('POST', '/chains', path=path)
+
+    def schedule(self, campaigns, path=None):
+        return self.request('POST', '/schedule', campaigns=campaigns, path=path)
+
+    def runs(self, campaign=None, limit=100):
+        return self.request('GET', '/runs', campaign=campaign, limit=limit)
+
+    def unschedule(self):
+        return self.request('POST', '/unschedule')
+
+def main():
+    cfg, missingHeaders, missingKeys, cfg_error = defaultconfig.loadConfig()
+    if missingHeaders or missingKeys or cfg_error is not None:
+        logging.warning('Error loading config.toml, loading default configuration.')
+
+    parser = argparse.ArgumentParser(description='Headless RF-DFS acquisition service.')
+    parser.add_argument('--host', default=cfg['service']['host'], help='Address to bind to.')
+    parser.add_argument('--port', default=cfg['service']['port'], type=int, help='Port to bind to.')
+    args = parser.parse_args()
+
+    service = AcquisitionService(cfg)
+    service.start()
+    ServiceRequestHandler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), ServiceRequestHandler)
+    logging.info(f'Service listening on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        logging.info("Service exited with exit code: 0")
+
+if __name__ == '__main__':
+    main()
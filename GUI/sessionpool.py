@@ -0,0 +1,185 @@
+"""Module that contains the pool of VISA sessions shared by every VisaIO object. Sessions stay open when a different resource is selected, so switching back to a resource or binding several analyzers at once does not reopen a session each time, which can take several seconds.
+Idle sessions are checked with *OPC? by check(), and sessions which do not respond are closed and removed from the pool.
+"""
+
+import logging
+import threading
+import time
+
+from instrumentation import instrumentVisaLibrary
+from lockprofiler import ProfiledLock
+
+class SessionPool():
+    def __init__(self, healthInterval=30.0):
+        """Open VISA sessions keyed by resource name, each with its own lock. The resource manager is opened by VisaIO.openResourceManager().
+
+        Args:
+            healthInterval (float, optional): Minimum time in seconds between health checks of a session. Defaults to 30.0.
+        """
+        self.rm = None
+        self.healthInterval = healthInterval
+        self.sessions = {}      # Resource name mapped to its pyvisa resource
+        self.locks = {}         # Resource name mapped to the lock held while using its session, which is never replaced
+        self.selected = {}      # Resource name mapped to the lock of the VisaIO object which selected it (See select())
+        self.checked = {}       # Resource name mapped to the time of its last health check
+        self.lock = threading.Lock()
+
+    def openResourceManager(self, backend=''):
+        """Opens the VISA resource manager. Does nothing if it is already open.
+
+        Args:
+            backend (string, optional): VISA library passed to pyvisa.highlevel.ResourceManager(), e.g. '@py' for pyvisa-py. Defaults to '' (NI-VISA).
+
+        Returns:
+            pyvisa.ResourceManager: The resource manager.
+        """
+        with self.lock:
+            if self.rm is None:
+                import pyvisa as visa
+                self.rm = visa.ResourceManager(backend)
+                instrumentVisaLibrary(self.rm.visalib)
+            return self.rm
+
+    def lockOf(self, resourceName):
+        """Returns the lock of a resource, creating it if needed. The same lock is returned for the lifetime of the pool, so an adapter holding it (See asynccore.AsyncVisa) stays in sync with the pool.
+
+        Args:
+            resourceName (string): VISA resource name.
+
+        Returns:
+            ProfiledLock: Lock of the resource.
+        """
+        with self.lock:
+            if resourceName not in self.locks:
+                self.locks[resourceName] = ProfiledLock(f'visaLock[{resourceName}]')
+            return self.locks[resourceName]
+
+    def select(self, resourceName, lock):
+        """Records that a VisaIO object uses a resource under its own lock, e.g. the visaLock of the front end for the analyzer selected in Options > Configure..., so check() also holds that lock. A resource previously selected under the same lock is released.
+
+        Args:
+            resourceName (string): VISA resource name.
+            lock (threading.RLock): Lock of the VisaIO object.
+        """
+        with self.lock:
+            for name in [name for name, other in self.selected.items() if other is lock]:
+                del self.selected[name]
+            self.selected[resourceName] = lock
+
+    def locksOf(self, resourceName):
+        """Returns the locks to hold while using a resource, in the order they are acquired: the lock it was selected under if any, then its own lock.
+        """
+        lock = self.lockOf(resourceName)
+        with self.lock:
+            selected = self.selected.get(resourceName)
+        return [lock] if selected is None else [selected, lock]
+
+    def open(self, resourceName):
+        """Returns the open session to a resource, or opens one and adds it to the pool.
+
+        Args:
+            resourceName (string): VISA resource name.
+
+        Raises:
+            RuntimeError: If the resource manager is not open.
+
+        Returns:
+            pyvisa.resources.Resource: Open session.
+        """
+        with self.lock:
+            session = self.sessions.get(resourceName)
+            if session is not None:
+                if isOpen(session):
+                    logging.info(f'Reusing open session to {resourceName}')
+                    return session
+                del self.sessions[resourceName]
+            if self.rm is None:
+                raise RuntimeError('VISA resource manager is not open.')
+            logging.info(f'Connecting to resource: {resourceName}')
+            session = self.rm.open_resource(resourceName)
+            if resourceName.upper().endswith('::SOCKET'):
+                # Raw sockets have no END indicator, so messages must be terminated by a newline
+                session.read_termination = '\n'
+                session.write_termination = '\n'
+            self.sessions[resourceName] = session
+            self.checked[resourceName] = time.monotonic()
+            return session
+
+    def close(self, resourceName):
+        """Closes the session to a resource and removes it from the pool. Does nothing if the resource is not in the pool.
+        """
+        with self.lock:
+            session = self.sessions.pop(resourceName, None)
+            self.checked.pop(resourceName, None)
+        if session is not None:
+            try:
+                session.close()
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+
+    def closeAll(self):
+        """Closes every session in the pool.
+        """
+        for resourceName in self.names():
+            self.close(resourceName)
+
+    def names(self):
+        """Returns the resource names of the open sessions.
+        """
+        with self.lock:
+            return list(self.sessions)
+
+    def check(self):
+        """Checks every session which has not been checked for healthInterval seconds by querying *OPC?. Sessions whose lock, or the lock they were selected under, is held are in use and are skipped. Sessions which do not respond are closed and removed from the pool.
+
+        Returns:
+            dict: Resource names of the checked sessions mapped to True if the session responded.
+        """
+        results = {}
+        now = time.monotonic()
+        for resourceName in self.names():
+            if now - self.checked.get(resourceName, 0.0) < self.healthInterval:
+                continue
+            locks = self.locksOf(resourceName)
+            if not acquireAll(locks):
+                continue
+            try:
+                session = self.sessions.get(resourceName)
+                if session is None:
+                    continue
+                try:
+                    session.query('*OPC?')
+                    results[resourceName] = True
+                    self.checked[resourceName] = time.monotonic()
+                except Exception as e:
+                    logging.warning(f'{type(e).__name__}: {e}. Closing unresponsive session to {resourceName}.')
+                    results[resourceName] = False
+                    self.close(resourceName)
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+        return results
+
+def acquireAll(locks):
+    """Acquires each lock without blocking. If a lock is held elsewhere, the locks acquired so far are released.
+
+    Returns:
+        bool: True if every lock was acquired.
+    """
+    acquired = []
+    for lock in locks:
+        if not lock.acquire(blocking=False):
+            for other in reversed(acquired):
+                other.release()
+            return False
+        acquired.append(lock)
+    return True
+
+def isOpen(session):
+    """Returns whether a pyvisa resource has an open session.
+    """
+    try:
+        session.session
+        return True
+    except Exception:
+        return False
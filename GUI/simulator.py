@@ -0,0 +1,665 @@
+"""Module that contains a simulated spectrum analyzer which implements the subset of SCPI used by the front end and the headless service, served over a raw TCP socket like the SOCKET interface (port 5025) of Keysight X-Series analyzers.
+Start the simulator with 'python simulator.py', set visa_backend = "@py" in the [analyzer] configuration, and connect to TCPIP0::127.0.0.1::5025::SOCKET. Sweep timing, point counts, synthetic signals, and response latency are set in the [simulator] configuration so the acquisition path can be benchmarked without an instrument.
+SimulatedMotor and SimulatedPLC are in-process stand-ins for the serial ports of the motor controller and PLC (See benchmark.py).
+"""
+
+import argparse
+import logging
+import math
+import re
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+from opcodes import opcodes
+
+IDENTITY = 'Keysight Technologies,N9040B,SIM0000001,A.00.00'
+VOWELS = 'AEIOU'
+OPTIONAL_NODES = ('SENS', 'SCAL', 'IMM')    # Default nodes which may be omitted from a header
+UNITS = {'HZ': 1.0, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9, 'S': 1.0, 'MS': 1e-3, 'US': 1e-6, 'NS': 1e-9, 'DB': 1.0, 'DBM': 1.0}
+OPER_SWEEPING = 0b00001000
+OPER_MEASURING = 0b00010000
+
+def shortForm(node):
+    """Returns the SCPI short form of a header node: the first four characters, or three if the fourth is a vowel. Numeric suffixes (e.g. WINDow1) are removed.
+    """
+    node = node.upper().rstrip('0123456789')
+    if len(node) <= 4:
+        return node
+    return node[:3] if node[3] in VOWELS else node[:4]
+
+def normalizeHeader(header):
+    """Converts a SCPI command header in long or short form to a key of SimulatedAnalyzer.HANDLERS, e.g. ':SENSe:BANDwidth:RESolution' and 'BAND:RES' both return 'BAND:RES'.
+    """
+    if header.startswith('*'):
+        return header.upper()
+    nodes = [shortForm(node) for node in header.strip(':').split(':')]
+    return ':'.join(node for node in nodes if node not in OPTIONAL_NODES)
+
+def parseNumber(arg):
+    """Parses a numeric SCPI argument with an optional unit suffix, e.g. '1.5 GHz' or '10ms'.
+
+    Raises:
+        ValueError: If the argument is not a number.
+    """
+    match = re.fullmatch(r'\s*([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)\s*([A-Za-z]*)\s*', arg)
+    if match is None:
+        raise ValueError(f'Invalid number: {arg}')
+    unit = match.group(2).upper()
+    if unit and unit not in UNITS:
+        raise ValueError(f'Invalid unit: {unit}')
+    return float(match.group(1)) * UNITS.get(unit, 1.0)
+
+def parseBool(arg):
+    arg = arg.strip().upper()
+    if arg in ('ON', '1'):
+        return True
+    if arg in ('OFF', '0'):
+        return False
+    raise ValueError(f'Invalid boolean: {arg}')
+
+def formatNumber(value):
+    """Formats a number like the N9040B, e.g. +1.00000000E+009.
+    """
+    mantissa, exponent = f'{value:+.8E}'.split('E')
+    return f'{mantissa}E{int(exponent):+04d}'
+
+class SimulatedAnalyzer():
+    def __init__(self, cfg):
+        """State and SCPI command execution of a simulated spectrum analyzer. Commands are executed by execute(), which is independent of the transport so the simulator can also be driven directly.
+
+        Args:
+            cfg (dict): [simulator] section of the loaded configuration (See defaultconfig.py).
+        """
+        self.cfg = cfg
+        self.rng = np.random.default_rng(cfg['seed'] if cfg['seed'] >= 0 else None)
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Restores the preset state (*RST).
+        """
+        with self.lock:
+            self.center = 13.255e9
+            self.span = 26.49e9
+            self.points = self.cfg['points']
+            self.rbw = 3e6
+            self.rbwAuto = True
+            self.vbw = 3e6
+            self.vbwAuto = True
+            self.ratio = 1.0
+            self.sweepTime = 0.0
+            self.sweepTimeAuto = True
+            self.zeroSpanTime = 1e-3
+            self.atten = 10.0
+            self.attenAuto = True
+            self.ref = 0.0
+            self.ndiv = 10
+            self.pdiv = 10.0
+            self.unit = 'DBM'
+            self.traceType = 'WRIT'
+            self.filterShape = 'GAUS'
+            self.filterType = 'DB3'
+            self.binary = False
+            self.swapped = False
+            self.continuous = True
+            self.sweepEnd = 0.0             # time.monotonic() at which the current sweep completes
+            self.esr = 0
+            self.errors = []
+            self.trace = None
+            self.couple()
+
+    # Frequency and bandwidth coupling
+    @property
+    def start(self):
+        return self.center - self.span / 2
+
+    @property
+    def stop(self):
+        return self.center + self.span / 2
+
+    def couple(self):
+        """Updates the auto-coupled settings (RBW, VBW, attenuation, and sweep time) from the span.
+        """
+        if self.rbwAuto:
+            # Approximately span/RBW = 106 with the 1-3-10 sequence of RBW values, as on X-Series analyzers
+            target = max(self.span / 106, 1.0) if self.span > 0 else 8e6
+            decade = 10 ** math.floor(math.log10(target))
+            self.rbw = min((step * decade for step in (1, 3, 10) if step * decade >= target), default=10 * decade)
+            self.rbw = min(self.rbw, 8e6)
+        if self.vbwAuto:
+            self.vbw = self.rbw * self.ratio
+        if self.attenAuto:
+            self.atten = 10.0
+        if self.sweepTimeAuto:
+            if self.span > 0:
+                self.sweepTime = max(1e-3, 2.5 * self.span / (self.rbw * min(self.rbw, self.vbw)))
+            else:
+                self.sweepTime = self.zeroSpanTime
+
+    def setFrequency(self, start=None, stop=None, center=None, span=None):
+        if start is not None:
+            stopFreq = self.stop
+            self.center = (start + max(stopFreq, start)) / 2
+            self.span = max(stopFreq, start) - start
+        if stop is not None:
+            startFreq = self.start
+            self.center = (min(startFreq, stop) + stop) / 2
+            self.span = stop - min(startFreq, stop)
+        if center is not None:
+            self.center = center
+        if span is not None:
+            self.span = max(span, 0.0)
+        self.couple()
+
+    # Sweep and trace generation
+    @property
+    def operationRegister(self):
+        if time.monotonic() < self.sweepEnd:
+            return OPER_SWEEPING | OPER_MEASURING
+        return 0
+
+    def initiate(self):
+        """Starts a sweep. The trace is generated immediately and becomes available when the sweep time (scaled by time_scale) has elapsed.
+        """
+        self.trace = self.generateTrace()
+        self.sweepEnd = time.monotonic() + self.sweepTime * self.cfg['time_scale']
+
+    def waitForSweep(self):
+        remaining = self.sweepEnd - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def xdata(self):
+        if self.span == 0:
+            return np.linspace(0.0, self.sweepTime, self.points)
+        return np.linspace(self.start, self.stop, self.points)
+
+    def generateTrace(self):
+        """Generates a sweep of the configured signals over the noise floor. The noise floor is set by the noise density, RBW, and attenuation, and its variance decreases as the VBW is reduced below the RBW. Each signal is shaped by the Gaussian RBW filter, and pulsed signals are on for pulse_width of every pri seconds.
+
+        Returns:
+            numpy.ndarray: Amplitude of each point in dBm.
+        """
+        noiseLevel = self.cfg['noise_density'] + 10 * math.log10(self.rbw) + (self.atten - 10.0)
+        averages = max(1.0, self.rbw / max(self.vbw, 1.0))
+        power = 10 ** (noiseLevel / 10) * self.rng.gamma(averages, 1 / averages, self.points)
+        x = self.xdata()
+        for signal in self.cfg['signals']:
+            signalFreq, level, bandwidth, pulseWidth, pri = signal
+            width = math.hypot(self.rbw, bandwidth)
+            if bandwidth > self.rbw:
+                level += 10 * math.log10(self.rbw / bandwidth)
+            if self.span == 0:
+                shape = 10 ** (-0.301 * ((self.center - signalFreq) / (width / 2)) ** 2)
+            else:
+                shape = 10 ** (-0.301 * ((x - signalFreq) / (width / 2)) ** 2)
+            if pulseWidth > 0 and pri > 0:
+                # Pulses start at a random phase in each sweep. In swept span, each point is on if the pulse is on when the sweep passes it
+                t = x if self.span == 0 else np.linspace(0.0, self.sweepTime, self.points)
+                shape = shape * (((t + self.rng.uniform(0, pri)) % pri) < pulseWidth)
+            power = power + 10 ** (level / 10) * shape
+        return (10 * np.log10(power)).astype(np.float32)
+
+    def traceData(self):
+        """Returns the last sweep in the format set by :FORMat, as an IEEE 488.2 definite length block for REAL,32.
+        """
+        self.waitForSweep()
+        if self.trace is None:
+            self.initiate()
+            self.waitForSweep()
+        return self.formatData(self.trace)
+
+    def sweepAndAxis(self):
+        """Returns the last sweep as interleaved X and Y values in the format set by :FORMat, as returned by :READ:SAN? and :FETCh:SAN?.
+        """
+        self.waitForSweep()
+        if self.trace is None:
+            self.initiate()
+            self.waitForSweep()
+        data = np.empty(2 * self.points)
+        data[0::2] = self.xdata()
+        data[1::2] = self.trace
+        return self.formatData(data)
+
+    def formatData(self, values):
+        """Formats values as comma separated ASCII, or as an IEEE 488.2 definite length block of 32-bit floats if the format is REAL,32.
+        """
+        if self.binary:
+            data = np.asarray(values).astype('<f4' if self.swapped else '>f4').tobytes()
+            length = str(len(data))
+            return f'#{len(length)}{length}'.encode() + data
+        return ','.join(formatNumber(value) for value in values)
+
+    # Command execution
+    def error(self, code, message):
+        self.errors.append(f'{code:+d},"{message}"')
+        self.esr |= 0b00100000 if code <= -100 and code > -200 else 0b00010000
+
+    def execute(self, message):
+        """Executes a program message, which may contain several commands separated by semicolons.
+
+        Args:
+            message (string): Program message without its termination character.
+
+        Returns:
+            bytes: Response to the queries in the message, or None if there are no queries.
+        """
+        responses = []
+        with self.lock:
+            for command in message.split(';'):
+                command = command.strip()
+                if not command:
+                    continue
+                header, _, arg = command.partition(' ')
+                query = header.endswith('?')
+                key = normalizeHeader(header.rstrip('?'))
+                handler = self.HANDLERS.get(key)
+                if handler is None:
+                    self.error(-113, f'Undefined header;{header}')
+                    continue
+                try:
+                    response = handler(self, arg.strip(), query)
+                except ValueError as e:
+                    self.error(-224, f'Illegal parameter value;{e}')
+                    continue
+                if query and response is not None:
+                    responses.append(response if isinstance(response, bytes) else str(response).encode())
+        if not responses:
+            return None
+        return b';'.join(responses)
+
+    def _numeric(attribute, couple=False, minimum=None):
+        """Generates a handler which sets or queries a numeric attribute. Setting a value disables the auto state of attributes with one (e.g. rbw and rbwAuto).
+        """
+        def handler(self, arg, query):
+            if query:
+                return formatNumber(getattr(self, attribute))
+            value = parseNumber(arg)
+            if minimum is not None:
+                value = max(value, minimum)
+            setattr(self, attribute, value)
+            if hasattr(self, attribute + 'Auto'):
+                setattr(self, attribute + 'Auto', False)
+            if couple:
+                self.couple()
+        return handler
+
+    def _boolean(attribute):
+        def handler(self, arg, query):
+            if query:
+                return '1' if getattr(self, attribute) else '0'
+            setattr(self, attribute, parseBool(arg))
+            self.couple()
+        return handler
+
+    def _choice(attribute):
+        def handler(self, arg, query):
+            if query:
+                return getattr(self, attribute)
+            setattr(self, attribute, arg.upper()[:4])
+        return handler
+
+    def _frequency(name):
+        def handler(self, arg, query):
+            if query:
+                return formatNumber(getattr(self, name))
+            self.setFrequency(**{name: parseNumber(arg)})
+        return handler
+
+    def _sweepTime(self, arg, query):
+        if query:
+            return formatNumber(self.sweepTime)
+        self.sweepTime = max(parseNumber(arg), 1e-6)
+        self.sweepTimeAuto = False
+        if self.span == 0:
+            self.zeroSpanTime = self.sweepTime
+
+    def _points(self, arg, query):
+        if query:
+            if arg.upper() == 'MAX':
+                return str(self.cfg['max_points'])
+            return str(self.points)
+        points = int(parseNumber(arg))
+        if not 1 <= points <= self.cfg['max_points']:
+            raise ValueError(f'{points} points')
+        self.points = points
+        self.trace = None
+
+    def _ratio(self, arg, query):
+        if query:
+            return formatNumber(self.ratio)
+        self.ratio = parseNumber(arg)
+        self.couple()
+
+    def _formatData(self, arg, query):
+        if query:
+            return 'REAL,32' if self.binary else 'ASC,8'
+        self.binary = arg.upper().replace(' ', '').startswith('REAL')
+
+    def _byteOrder(self, arg, query):
+        if query:
+            return 'SWAP' if self.swapped else 'NORM'
+        self.swapped = arg.upper().startswith('SWAP')
+
+    def _initiate(self, arg, query):
+        self.initiate()
+
+    def _continuous(self, arg, query):
+        if query:
+            return '1' if self.continuous else '0'
+        self.continuous = parseBool(arg)
+
+    def _opc(self, arg, query):
+        self.waitForSweep()
+        if query:
+            return '1'
+
+    def _wai(self, arg, query):
+        self.waitForSweep()
+
+    def _rst(self, arg, query):
+        self.reset()
+
+    def _cls(self, arg, query):
+        self.esr = 0
+        self.errors.clear()
+
+    def _idn(self, arg, query):
+        return IDENTITY
+
+    def _esr(self, arg, query):
+        esr, self.esr = self.esr, 0
+        return f'+{esr}'
+
+    def _operation(self, arg, query):
+        return f'+{self.operationRegister}'
+
+    def _calibration(self, arg, query):
+        return '+0'
+
+    def _systemError(self, arg, query):
+        if self.errors:
+            return self.errors.pop(0)
+        return '+0,"No error"'
+
+    def _powerUpErrors(self, arg, query):
+        return '"No error"'
+
+    def _traceData(self, arg, query):
+        return self.traceData()
+
+    def _read(self, arg, query):
+        self.initiate()
+        return self.sweepAndAxis()
+
+    def _fetch(self, arg, query):
+        return self.sweepAndAxis()
+
+    HANDLERS = {
+        '*IDN': _idn,
+        '*RST': _rst,
+        '*CLS': _cls,
+        '*WAI': _wai,
+        '*OPC': _opc,
+        '*ESR': _esr,
+        'FREQ:CENT': _frequency('center'),
+        'FREQ:SPAN': _frequency('span'),
+        'FREQ:STAR': _frequency('start'),
+        'FREQ:STOP': _frequency('stop'),
+        'SWE:TIME': _sweepTime,
+        'SWE:TIME:AUTO': _boolean('sweepTimeAuto'),
+        'SWE:POIN': _points,
+        'BAND:RES': _numeric('rbw', couple=True, minimum=1.0),
+        'BAND:RES:AUTO': _boolean('rbwAuto'),
+        'BAND:VID': _numeric('vbw', couple=True, minimum=1.0),
+        'BAND:VID:AUTO': _boolean('vbwAuto'),
+        'BAND:VID:RAT': _ratio,
+        'BAND:SHAP': _choice('filterShape'),
+        'BAND:TYPE': _choice('filterType'),
+        'POW:RF:ATT': _numeric('atten', couple=True, minimum=0.0),
+        'POW:ATT': _numeric('atten', couple=True, minimum=0.0),
+        'POW:ATT:AUTO': _boolean('attenAuto'),
+        'POW:RF:ATT:AUTO': _boolean('attenAuto'),
+        'DISP:WIND:TRAC:Y:RLEV': _numeric('ref'),
+        'DISP:WIND:TRAC:Y:NDIV': _numeric('ndiv'),
+        'DISP:WIND:TRAC:Y:PDIV': _numeric('pdiv'),
+        'UNIT:POW': _choice('unit'),
+        'TRAC:TYPE': _choice('traceType'),
+        'FORM:TRAC:DATA': _formatData,
+        'FORM:DATA': _formatData,
+        'FORM:BORD': _byteOrder,
+        'INIT': _initiate,
+        'INIT:CONT': _continuous,
+        'STAT:OPER:COND': _operation,
+        'STAT:QUES:CAL:COND': _calibration,
+        'SYST:ERR': _systemError,
+        'SYST:ERR:NEXT': _systemError,
+        'SYST:ERR:PUP': _powerUpErrors,
+        'TRAC:DATA': _traceData,
+        'TRAC': _traceData,
+        'READ:SAN': _read,
+        'FETC:SAN': _fetch,
+    }
+
+class SimulatorHandler(socketserver.StreamRequestHandler):
+    """Reads newline terminated program messages from a client and writes each response followed by a newline.
+    """
+    analyzer = None
+    latency = 0.0
+
+    def handle(self):
+        logging.info(f'Simulator client connected from {self.client_address[0]}:{self.client_address[1]}')
+        for line in self.rfile:
+            message = line.decode('ascii', errors='replace').strip()
+            if not message:
+                continue
+            response = self.analyzer.execute(message)
+            if response is not None:
+                if self.latency > 0:
+                    time.sleep(self.latency)
+                self.wfile.write(response + b'\n')
+                self.wfile.flush()
+        logging.info(f'Simulator client {self.client_address[0]}:{self.client_address[1]} disconnected')
+
+class SimulatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, cfg, host=None, port=None):
+        """TCP server of a SimulatedAnalyzer. Every client shares the same analyzer state, like the SOCKET interface of an instrument.
+
+        Args:
+            cfg (dict): [simulator] section of the loaded configuration (See defaultconfig.py).
+            host (string, optional): Address to bind to. Defaults to cfg['host'].
+            port (int, optional): Port to bind to, or 0 for any free port. Defaults to cfg['port'].
+        """
+        self.analyzer = SimulatedAnalyzer(cfg)
+        handler = type('Handler', (SimulatorHandler,), {'analyzer': self.analyzer, 'latency': cfg['latency']})
+        super().__init__((cfg['host'] if host is None else host, cfg['port'] if port is None else port), handler)
+
+    @property
+    def resourceName(self):
+        """VISA resource name to connect to the simulator with pyvisa-py.
+        """
+        host, port = self.server_address[:2]
+        return f'TCPIP0::{host}::{port}::SOCKET'
+
+    def startThread(self):
+        """Serves in a daemon thread and returns the thread, e.g. to run the simulator inside a benchmark.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+class SimulatedSerial():
+    """In-process stand-in for serial.Serial which answers each newline terminated line written to it. Responses become readable after latency seconds, so polling readers such as MotorIO.query() and SerialIO.read() behave as they do with a device.
+    Assign an instance to MotorIO.ser or SerialIO.serial in place of an open port.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.is_open = True
+        self.lock = threading.Lock()
+        self.partial = b''
+        self.pending = []       # (time.monotonic() at which the response is readable, response bytes)
+        self.buffer = b''
+
+    def respond(self, line):
+        """Returns the response to a line as a string, or None for no response. Overridden by each device.
+        """
+        return None
+
+    def _collect(self):
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            self.buffer += self.pending.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            self._collect()
+            return len(self.buffer)
+
+    def write(self, data):
+        with self.lock:
+            self.partial += data
+            *lines, self.partial = self.partial.split(b'\n')
+        for line in lines:
+            response = self.respond(line.decode('utf-8', errors='replace').strip())
+            if response is not None:
+                with self.lock:
+                    self.pending.append((time.monotonic() + self.latency, response.encode('utf-8')))
+        return len(data)
+
+    def read(self, size=1):
+        with self.lock:
+            self._collect()
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self):
+        timer = time.monotonic()
+        while time.monotonic() - timer < self.latency + 1.0:
+            with self.lock:
+                self._collect()
+                if b'\n' in self.buffer:
+                    data, self.buffer = self.buffer.split(b'\n', 1)
+                    return data + b'\n'
+            time.sleep(0.001)
+        return self.read(self.in_waiting)
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.pending.clear()
+            self.buffer = b''
+
+    def reset_output_buffer(self):
+        with self.lock:
+            self.partial = b''
+
+    def close(self):
+        self.is_open = False
+
+class SimulatedMotor(SimulatedSerial):
+    def __init__(self, latency=0.0, xEncoder=0, yEncoder=0):
+        """Stand-in for the motor controller which answers the queries of the bearing display loop (Prog 0, DRIVE, and PRINT P6144/P6160) followed by the P00> prompt.
+
+        Args:
+            latency (float, optional): Delay in seconds before each response. Defaults to 0.0.
+            xEncoder (int, optional): Azimuth encoder position in counts. Defaults to 0.
+            yEncoder (int, optional): Elevation encoder position in counts. Defaults to 0.
+        """
+        super().__init__(latency)
+        self.encoders = {'P6144': xEncoder, 'P6160': yEncoder}
+        self.drives = {'X': False, 'Y': False}
+
+    def respond(self, line):
+        words = line.upper().split()
+        if not words:
+            return 'P00>'
+        match words:
+            case ['PRINT', variable] if variable in self.encoders:
+                return f'{self.encoders[variable]}\r\nP00>'
+            case ['DRIVE', ('ON' | 'OFF') as state, *axes]:
+                for axis in axes:
+                    self.drives[axis] = state == 'ON'
+                return 'P00>'
+            case ['DRIVE', axis] if axis in self.drives:
+                return f'DRIVE {"ON" if self.drives[axis] else "OFF"}\r\nP00>'
+            case _:
+                return 'P00>'
+
+class SimulatedPLC(SimulatedSerial):
+    def __init__(self, latency=0.0, switchTime=0.0, firmware='16777472'):
+        """Stand-in for the P1AM-100 PLC. Opcodes are written as binary strings (See SerialIO.write()). A selection or sleep opcode is confirmed with a line of text like the firmware and becomes the status switchTime seconds after it is written, opcodes.QUERY_STATUS is answered with the status as an integer, and opcodes.GET_FW_VERSION with the firmware version unless the base controller was disabled with opcodes.P1_DISABLE.
+
+        Args:
+            latency (float, optional): Delay in seconds before each response. Defaults to 0.0.
+            switchTime (float, optional): Time in seconds for the relays to switch to a new chain. Defaults to 0.0.
+            firmware (string, optional): Firmware version, which the base controller reports as a number. Defaults to '16777472'.
+        """
+        super().__init__(latency)
+        self.switchTime = switchTime
+        self.firmware = firmware
+        self.status = opcodes.SLEEP.value
+        self.requested = self.status
+        self.switchEnd = 0.0
+        self.baseActive = True
+
+    def respond(self, line):
+        try:
+            opcode = int(line, 2)
+        except ValueError:
+            return f'Unknown input: {line}\r\n'
+        if time.monotonic() >= self.switchEnd:
+            self.status = self.requested
+        if opcode == opcodes.QUERY_STATUS.value:
+            return f'{self.status}\r\n'
+        if opcode == opcodes.GET_FW_VERSION.value:
+            return f'{self.firmware}\r\n' if self.baseActive else None
+        if opcode == opcodes.P1_DISABLE.value:
+            self.baseActive = False
+            self.status = self.requested = opcode
+            return 'Disabling P1AM-100 Module\r\n'
+        if opcode == opcodes.P1_INIT.value:
+            self.baseActive = True
+            self.status = self.requested = opcodes.SLEEP.value
+            return 'Initializing...\r\n'
+        if opcode & 0b01000000 or opcode == opcodes.SLEEP.value:     # Selection or sleep
+            self.requested = opcode
+            self.switchEnd = time.monotonic() + self.switchTime
+            return f'{opcodes(opcode).name} selected.\r\n'
+        return None
+
+def main():
+    import defaultconfig
+    from loggingsetup import loggingLevelHandler     # Also configures the log format
+
+    cfg, missingHeaders, missingKeys, cfg_error = defaultconfig.loadConfig()
+    if missingHeaders or missingKeys or cfg_error is not None:
+        logging.warning('Error loading config.toml, loading default configuration.')
+
+    parser = argparse.ArgumentParser(description='Simulated spectrum analyzer served over a raw TCP socket.')
+    parser.add_argument('--host', default=cfg['simulator']['host'], help='Address to bind to.')
+    parser.add_argument('--port', default=cfg['simulator']['port'], type=int, help='Port to bind to.')
+    parser.add_argument('--points', default=cfg['simulator']['points'], type=int, help='Number of sweep points after *RST.')
+    parser.add_argument('--time-scale', default=cfg['simulator']['time_scale'], type=float, help='Multiplier of the simulated sweep time, 0 for instant sweeps.')
+    parser.add_argument('--latency', default=cfg['simulator']['latency'], type=float, help='Delay in seconds before each response.')
+    parser.add_argument('--log-level', default=1, type=int, choices=(1, 2, 3), help='1 for INFO, 2 for VERBOSE, 3 for DEBUG.')
+    args = parser.parse_args()
+    loggingLevelHandler(args.log_level)
+
+    simulatorCfg = dict(cfg['simulator'], points=args.points, time_scale=args.time_scale, latency=args.latency)
+    server = SimulatorServer(simulatorCfg, args.host, args.port)
+    logging.info(f'Simulator listening on {server.resourceName}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Module that contains the connection supervisors of the analyzer, motor controller, and PLC. Each supervisor runs as a task on the asyncio core (See asynccore.py), checks its device every check_interval seconds while it is connected, and reconnects it with exponential backoff after a disconnect, e.g. when a USB serial adapter glitches or the analyzer reboots.
+Before a reconnected device is used, its identity is compared with the identity at the first connection (*IDN? for the analyzer, the firmware version for the PLC, and the P00> prompt of the motor controller), and the state saved when the connection was lost is restored (See the [supervisor] configuration).
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+
+from frontendio import RETURN_ERROR
+from opcodes import opcodes
+
+IDLE = 'idle'
+CONNECTED = 'connected'
+RECONNECTING = 'reconnecting'
+
+class IdentityError(Exception):
+    """Raised when a reconnected device does not have the identity it had at the first connection.
+    """
+
+class Backoff():
+    def __init__(self, initial=1.0, factor=2.0, maximum=60.0):
+        """Delay between reconnection attempts which is multiplied by factor after each attempt, up to maximum.
+
+        Args:
+            initial (float, optional): First delay in seconds. Defaults to 1.0.
+            factor (float, optional): Multiplier of the delay after each attempt. Defaults to 2.0.
+            maximum (float, optional): Maximum delay in seconds. Defaults to 60.0.
+        """
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.delay = initial
+
+    def next(self):
+        """Returns the current delay and increases it for the next attempt.
+        """
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+    def reset(self):
+        self.delay = self.initial
+
+class Supervisor(ABC):
+    def __init__(self, core, device, name, cfg, save=None, restore=None, onRestored=None):
+        """Watches the connection of one device and reconnects it after a disconnect. Subclasses implement check(), connect(), and identify().
+
+        Args:
+            core (AsyncCore): Core which runs the supervisor task (See run()).
+            device (AsyncDevice): Adapter of the device, whose executor runs every blocking call with the device lock held.
+            name (string): Name of the device in the log.
+            cfg (dict): [supervisor] section of the loaded configuration (See defaultconfig.py).
+            save (callable, optional): Called on the loop thread when the connection is lost. Its result is passed to restore and onRestored. Defaults to None.
+            restore (callable, optional): Called in the executor of the device with the saved state after the device is reconnected and verified, to restore its settings. Defaults to None.
+            onRestored (callable, optional): Called on the loop thread with the saved state after the device is restored, e.g. to resume a display loop. Defaults to None.
+        """
+        self.core = core
+        self.device = device
+        self.name = name
+        self.checkInterval = cfg['check_interval']
+        self.verifyIdentity = cfg['verify_identity']
+        self.backoff = Backoff(cfg['backoff_initial'], cfg['backoff_factor'], cfg['backoff_max'])
+        self.save = save
+        self.restore = restore
+        self.onRestored = onRestored
+        self.target = None          # Resource name or port to keep connected, or None if the device is not supervised
+        self.identity = None        # Identity at the first connection to target
+        self.state = IDLE
+        self.attempts = 0
+        self.reconnects = 0
+        self.wakeEvent = asyncio.Event()
+
+    def watch(self, target):
+        """Starts supervising the connection to target. Called after the device is connected by the user, which also resets the identity of the device. Can be called from any thread.
+
+        Args:
+            target (string): VISA resource name or serial port.
+        """
+        self.target = target
+        self.identity = None
+        self.state = CONNECTED
+        self.core.signal(self.wakeEvent)
+
+    def retarget(self, target):
+        """Moves a reconnection in progress to a different target, e.g. when the USB serial adapter of the device comes back under a different port name (See DeviceDiscovery). Unlike watch(), the identity is kept so the device at the new target is verified, and the state saved when the connection was lost is restored. Does nothing unless the device is reconnecting. Can be called from any thread.
+
+        Args:
+            target (string): VISA resource name or serial port.
+        """
+        if self.state != RECONNECTING:
+            return
+        self.target = target
+        self.core.signal(self.wakeEvent)
+
+    def unwatch(self):
+        """Stops supervising the device, e.g. when the user disconnects it. A reconnection in progress is abandoned. Can be called from any thread.
+        """
+        self.target = None
+        self.state = IDLE
+        self.core.signal(self.wakeEvent)
+
+    @property
+    def reconnecting(self):
+        return self.state == RECONNECTING
+
+    @abstractmethod
+    async def check(self):
+        """Returns whether the device is connected and responding.
+        """
+
+    @abstractmethod
+    async def connect(self, target):
+        """Closes the connection to the device if it is open and connects to target.
+        """
+
+    @abstractmethod
+    async def identify(self):
+        """Returns the identity of the connected device, which must be equal on reconnection if verify_identity is enabled, or None if it cannot be read in the current state of the device, in which case it is not verified.
+        """
+
+    async def run(self):
+        """Supervisor task. Checks the device every checkInterval seconds while it is supervised and reconnects it if the check fails.
+        """
+        while True:
+            target = self.target
+            if target is None:
+                await self.core.waitFor(self.wakeEvent, self.checkInterval)
+                continue
+            try:
+                healthy = await self.check()
+                if healthy and self.identity is None:
+                    self.identity = await self.identify()
+                    if self.identity is not None:
+                        logging.info(f'Supervising {self.name} at {target}: {self.identity}')
+            except Exception as e:
+                logging.debug(f'{type(e).__name__}: {e}')
+                healthy = False
+            if target != self.target:
+                continue            # Changed by the user during the check
+            if healthy:
+                await self.core.waitFor(self.wakeEvent, self.checkInterval)
+                continue
+            logging.warning(f'Lost connection to {self.name} at {target}, reconnecting.')
+            self.state = RECONNECTING
+            saved = None
+            if self.save is not None:
+                try:
+                    saved = self.save()
+                except Exception as e:
+                    logging.error(f'{type(e).__name__}: {e}')
+            await self.reconnect(target, saved)
+
+    async def reconnect(self, target, saved=None):
+        """Attempts to reconnect to target until it succeeds or supervision is changed by watch() or unwatch(), waiting between attempts with exponential backoff. After connecting, verifies the identity of the device and restores the saved state. If the target is moved by retarget(), the next attempt connects to the new target.
+
+        Args:
+            target (string): VISA resource name or serial port.
+            saved (Any, optional): State returned by save. Defaults to None.
+
+        Returns:
+            bool: True if the device was reconnected.
+        """
+        self.backoff.reset()
+        self.attempts = 0
+        while self.state == RECONNECTING and self.target is not None:
+            if self.target != target:
+                logging.info(f'Reconnecting to {self.name} at {self.target} instead of {target}.')
+                target = self.target
+                self.backoff.reset()
+            self.attempts += 1
+            try:
+                await self.connect(target)
+                identity = await self.identify()
+                if self.verifyIdentity and None not in (identity, self.identity) and identity != self.identity:
+                    raise IdentityError(f'{self.name} at {target} identified as {identity}, expected {self.identity}')
+                if self.identity is None:
+                    self.identity = identity
+                if self.restore is not None:
+                    await self.device.call(self.restore, saved)
+            except Exception as e:
+                delay = self.backoff.next()
+                log = logging.error if isinstance(e, IdentityError) else logging.warning
+                log(f'{type(e).__name__}: {e}. Attempt {self.attempts} to reconnect to {self.name} failed, retrying in {delay:g} s.')
+                await self.core.waitFor(self.wakeEvent, delay)
+                continue
+            if self.target != target:
+                continue            # Moved by retarget() during the attempt
+            self.state = CONNECTED
+            self.reconnects += 1
+            logging.info(f'Reconnected to {self.name} at {target} on attempt {self.attempts}.')
+            if self.onRestored is not None:
+                try:
+                    self.onRestored(saved)
+                except Exception as e:
+                    logging.error(f'{type(e).__name__}: {e}')
+            return True
+        return False
+
+class VisaSupervisor(Supervisor):
+    def __init__(self, core, visa, cfg, **kwargs):
+        """Supervisor of the analyzer. The session is checked with *OPC? and the analyzer is identified by the manufacturer, model, and serial number returned by *IDN?.
+
+        Args:
+            core (AsyncCore): Core which runs the supervisor task.
+            visa (AsyncVisa): Adapter of the analyzer.
+            cfg (dict): [supervisor] section of the loaded configuration.
+            kwargs: save, restore, and onRestored (See Supervisor).
+        """
+        super().__init__(core, visa, 'analyzer', cfg, **kwargs)
+        self.Vi = visa.Vi
+
+    def _check(self):
+        if not self.Vi.isSessionOpen():
+            return False
+        self.Vi.openRsrc.query('*OPC?')
+        return True
+
+    async def check(self):
+        return await self.device.call(self._check)
+
+    def _connect(self, target):
+        self.Vi.pool.close(target)
+        if self.Vi.connectToRsrc(target) == RETURN_ERROR:
+            raise ConnectionError(f'Could not open a session to {target}.')
+
+    async def connect(self, target):
+        await self.device.call(self._connect, target)
+
+    async def identify(self):
+        idn = await self.device.call(self.Vi.identify)
+        return ', '.join(str(field).strip() for field in list(idn)[:3])
+
+class MotorSupervisor(Supervisor):
+    def __init__(self, core, motor, cfg, **kwargs):
+        """Supervisor of the motor controller. The controller is checked by the prompt it returns for an empty line, and identified by the P00> prompt returned when program 0 is selected, which is the program used by the bearing loop (See AziElePlot.bearingDisplayTask()).
+
+        Args:
+            core (AsyncCore): Core which runs the supervisor task.
+            motor (AsyncMotor): Adapter of the motor controller.
+            cfg (dict): [supervisor] section of the loaded configuration.
+            kwargs: save, restore, and onRestored (See Supervisor).
+        """
+        super().__init__(core, motor, 'motor controller', cfg, **kwargs)
+        self.Motor = motor.Motor
+
+    async def prompt(self, msg='\n'):
+        """Writes a message to the controller and returns the prompt at the end of its response, e.g. 'SYS>' or 'P00>'.
+
+        Raises:
+            ConnectionError: If the port is closed or the response does not end with a prompt.
+        """
+        if not self.Motor.ser.is_open:
+            raise ConnectionError('Serial port is closed.')
+        lines = (await self.device.query(msg, timeout=2.0)).split()
+        if not lines or not lines[-1].endswith('>'):
+            raise ConnectionError(f'Unexpected response from motor controller: {lines}')
+        return lines[-1]
+
+    async def check(self):
+        await self.prompt()
+        return True
+
+    async def connect(self, target):
+        await self.device.call(self.Motor.openSerial, target)
+
+    async def identify(self):
+        prompt = await self.prompt('Prog 0')
+        if 'P00' not in prompt:
+            raise ConnectionError(f'Motor controller did not select program 0: {prompt}')
+        return prompt
+
+class PLCSupervisor(Supervisor):
+    def __init__(self, core, plc, cfg, **kwargs):
+        """Supervisor of the PLC. The PLC is checked with opcodes.QUERY_STATUS, which it answers in every state, and identified by its firmware version (opcodes.GET_FW_VERSION), which is not reported while the base controller is disabled. Unless restore is passed, the chain which was selected when the connection was lost is selected again.
+
+        Args:
+            core (AsyncCore): Core which runs the supervisor task.
+            plc (AsyncPLC): Adapter of the PLC.
+            cfg (dict): [supervisor] section of the loaded configuration.
+            kwargs: save, restore, and onRestored (See Supervisor).
+        """
+        kwargs.setdefault('save', lambda: plc.PLC.status)
+        kwargs.setdefault('restore', self.reselect)
+        super().__init__(core, plc, 'PLC', cfg, **kwargs)
+        self.PLC = plc.PLC
+
+    def reselect(self, status):
+        """Selects the chain (or sleep) which was the status of the PLC when the connection was lost.
+        """
+        if status == opcodes.SLEEP.value or status & 0b01000000:
+            if not self.PLC.selectChain(status):
+                raise ConnectionError(f'PLC did not confirm selection of {opcodes(status).name}.')
+
+    async def check(self):
+        if not self.PLC.serial.is_open:
+            return False
+        await self.device.call(self.PLC.getStatus)
+        return True
+
+    async def connect(self, target):
+        await self.device.call(self.PLC.openSerial, target)
+
+    async def identify(self):
+        if await self.device.call(self.PLC.getStatus) == opcodes.P1_DISABLE.value:
+            return None
+        return await self.device.call(self.PLC.getFirmwareVersion)
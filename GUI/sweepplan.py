@@ -0,0 +1,252 @@
+"""Module that contains the segmented sweep planner. A wide band is split into overlapping segments which are narrow enough for a useful RBW, each with its own RBW/VBW/attenuation. Segments with the same settings are acquired consecutively, in the order which requires the fewest setting writes, with the commands for each segment sent in one batched write (See VisaIO.writeBatch()), and are then stitched into one trace.
+"""
+
+import itertools
+import logging
+import math
+from datetime import datetime
+
+import numpy as np
+
+from parameters import *
+from tracedata import Trace, parameterSnapshot
+
+MAX_EXACT_GROUPS = 7        # Every order of at most this many groups of segments with the same settings is compared by orderSegments()
+
+class Segment():
+    def __init__(self, start, stop, rbw=None, vbw=None, atten=None, points=None):
+        """Sub-span of a survey and its analyzer settings.
+
+        Args:
+            start (float): Start frequency in Hz.
+            stop (float): Stop frequency in Hz.
+            rbw (float, optional): Resolution bandwidth in Hz, or None for auto. Defaults to None.
+            vbw (float, optional): Video bandwidth in Hz, or None for auto. Defaults to None.
+            atten (float, optional): Mechanical attenuation in dB, or None for auto. Defaults to None.
+            points (int, optional): Number of sweep points, or None to leave unchanged. Defaults to None.
+        """
+        self.start = start
+        self.stop = stop
+        self.rbw = rbw
+        self.vbw = vbw
+        self.atten = atten
+        self.points = points
+
+    def settings(self):
+        """Returns the commands and arguments of every setting of the segment except the frequency range.
+
+        Returns:
+            dict: SCPI commands mapped to their argument.
+        """
+        _settings = {SweepType.command: 'ON'}
+        if self.atten is None:
+            _settings[AttenType.command] = 'ON'
+        else:
+            _settings[Atten.command] = self.atten
+        if self.rbw is None:
+            _settings[RbwType.command] = 'ON'
+        else:
+            _settings[Rbw.command] = self.rbw
+        if self.vbw is None:
+            _settings[VbwType.command] = 'ON'
+        else:
+            _settings[Vbw.command] = self.vbw
+        if self.points is not None:
+            _settings[SweepPoints.command] = self.points
+        return _settings
+
+    def commands(self, previous=None):
+        """Generates the commands to switch the analyzer from the previous segment to this segment. Settings which are the same as the previous segment are not written.
+
+        Args:
+            previous (Segment, optional): Segment which was acquired last, or None to write every setting. Defaults to None.
+
+        Returns:
+            list: SCPI commands.
+        """
+        previousSettings = previous.settings() if previous is not None else {}
+        _commands = [f'{command} {arg}' for command, arg in self.settings().items() if previousSettings.get(command) != arg]
+        _commands.append(f'{StartFreq.command} {self.start}')
+        _commands.append(f'{StopFreq.command} {self.stop}')
+        return _commands
+
+    def settingsKey(self):
+        """Returns the settings of the segment as a hashable key, which is equal for segments with the same settings.
+        """
+        return tuple(sorted(self.settings().items()))
+
+    def parameters(self):
+        """Returns the frequency range and settings of the segment in the format of tracedata.parameterSnapshot().
+        """
+        def _auto(value):
+            return 'Auto' if value is None else str(value)
+        _parameters = {StartFreq.name: str(self.start), StopFreq.name: str(self.stop), Rbw.name: _auto(self.rbw), Vbw.name: _auto(self.vbw), Atten.name: _auto(self.atten)}
+        if self.points is not None:
+            _parameters[SweepPoints.name] = str(self.points)
+        return _parameters
+
+    def __repr__(self):
+        return f'Segment({self.start:.6g}, {self.stop:.6g}, rbw={self.rbw}, vbw={self.vbw}, atten={self.atten}, points={self.points})'
+
+def planSurvey(start, stop, maxSpan, overlap=0.0, points=None, rbw=None, vbw=None, atten=None, bands=()):
+    """Splits a band into equal segments no wider than maxSpan (excluding overlap).
+
+    Args:
+        start (float): Start frequency of the survey in Hz.
+        stop (float): Stop frequency of the survey in Hz.
+        maxSpan (float): Maximum span of each segment in Hz.
+        overlap (float, optional): Fraction of the segment span added to each side of a segment so neighbouring segments overlap. Defaults to 0.0.
+        points (int, optional): Number of sweep points of every segment. Defaults to None.
+        rbw (float, optional): Default RBW of each segment, or None for auto. Defaults to None.
+        vbw (float, optional): Default VBW of each segment, or None for auto. Defaults to None.
+        atten (float, optional): Default attenuation of each segment, or None for auto. Defaults to None.
+        bands (list, optional): Overrides as a list of (start, stop, rbw, vbw, atten). Segments whose center is within a band use its settings. Defaults to ().
+
+    Returns:
+        list: Instances of Segment ordered by frequency.
+    """
+    count = max(1, math.ceil((stop - start) / maxSpan))
+    width = (stop - start) / count
+    edges = start + width * np.arange(count + 1)
+    margin = overlap * width
+    segments = []
+    for index in range(count):
+        center = (edges[index] + edges[index + 1]) / 2
+        settings = (rbw, vbw, atten)
+        for band in bands:
+            if band[0] <= center < band[1]:
+                settings = band[2:5]
+                break
+        segments.append(Segment(float(max(start, edges[index] - margin)), float(min(stop, edges[index + 1] + margin)), *settings, points=points))
+    return segments
+
+def orderSegments(segments):
+    """Orders segments so those with the same settings are acquired consecutively, in order of frequency within each group, and the groups are acquired in the order with the fewest setting writes between them.
+    Every order of the groups is compared if there are at most MAX_EXACT_GROUPS, otherwise each group is followed by the remaining group with the fewest different settings. Frequency writes are the same in any order, so a plan whose segments all have the same settings is acquired in order of frequency.
+
+    Args:
+        segments (list): Instances of Segment.
+
+    Returns:
+        list: Instances of Segment in acquisition order.
+    """
+    groups = {}
+    for segment in sorted(segments, key=lambda segment: segment.start):
+        groups.setdefault(segment.settingsKey(), []).append(segment)
+    groups = list(groups.values())
+    if len(groups) <= MAX_EXACT_GROUPS:
+        # Ties keep the order of the first segment of each group, since permutations() starts with the original order
+        order = min(itertools.permutations(groups), key=lambda order: countWrites([group[0] for group in order]))
+    else:
+        order = [groups.pop(0)]
+        while groups:
+            nearest = min(groups, key=lambda group: len(group[0].commands(order[-1][0])))
+            groups.remove(nearest)
+            order.append(nearest)
+    return [segment for group in order for segment in group]
+
+def countWrites(segments):
+    """Returns the number of commands required to acquire the segments in the order given.
+    """
+    previous = None
+    count = 0
+    for segment in segments:
+        count += len(segment.commands(previous))
+        previous = segment
+    return count
+
+def stitch(traces):
+    """Stitches segment traces into one trace. Where neighbouring segments overlap, each keeps the points on its side of the middle of the overlap. The parameters of the lowest segment are kept, with the frequency range replaced by the range of the survey.
+
+    Args:
+        traces (list): Instances of Trace of each segment in any order.
+
+    Returns:
+        Trace: Stitched trace with an explicit X axis.
+    """
+    traces = sorted(traces, key=lambda trace: trace.start)
+    xdata = []
+    ydata = []
+    for index, trace in enumerate(traces):
+        lower = trace.start
+        upper = trace.stop
+        if index > 0:
+            lower = max(lower, (traces[index - 1].stop + trace.start) / 2)
+        if index < len(traces) - 1:
+            upper = min(upper, (trace.stop + traces[index + 1].start) / 2)
+        frequency = trace.frequency
+        if index < len(traces) - 1:
+            keep = (frequency >= lower) & (frequency < upper)
+        else:
+            keep = (frequency >= lower) & (frequency <= upper)
+        xdata.append(frequency[keep])
+        ydata.append(trace.amplitude[keep])
+    first, last = traces[0], traces[-1]
+    parameters = dict(first.parameters)
+    parameters.update({'Segments': str(len(traces)), StartFreq.name: str(first.start), StopFreq.name: str(last.stop)})
+    return Trace(np.concatenate(ydata), first.start, last.stop, timestamp=first.timestamp, parameters=parameters, chain=first.chain, xdata=np.concatenate(xdata))
+
+def restoreCommands():
+    """Generates the commands to restore the analyzer settings changed by a survey from the parameter values last queried by applyParameters().
+
+    Returns:
+        list: SCPI commands.
+    """
+    _commands = []
+    for parameter, auto in ((Atten, AttenType), (Rbw, RbwType), (Vbw, VbwType), (SweepTime, SweepType)):
+        if auto.value is None or parameter.value is None:
+            continue
+        if auto.floatValue() == 1:
+            _commands.append(f'{auto.command} ON')
+        else:
+            _commands.append(f'{parameter.command} {parameter.valueString()}')
+    for parameter in (SweepPoints, StartFreq, StopFreq):
+        if parameter.value is not None:
+            _commands.append(f'{parameter.command} {parameter.valueString()}')
+    return _commands
+
+def runSurvey(Vi, segments, chain='SLEEP', binary=True):
+    """Acquires each segment and returns the stitched trace. The analyzer settings are restored afterwards. Should be called with the VISA lock held, and the trace format must have been set by VisaIO.setTraceFormat().
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        segments (list): Instances of Segment.
+        chain (string, optional): Name of the selected RF chain. Defaults to 'SLEEP'.
+        binary (bool, optional): Passed to VisaIO.readTrace(). Defaults to True.
+
+    Returns:
+        Trace: Stitched trace.
+    """
+    ordered = orderSegments(segments)
+    logging.info(f'Surveying {len(ordered)} segments from {min(segment.start for segment in ordered):.6g} to {max(segment.stop for segment in ordered):.6g} Hz with {countWrites(ordered)} parameter writes')
+    restore = restoreCommands()
+    traces = []
+    previous = None
+    try:
+        for segment in ordered:
+            Vi.writeBatch(segment.commands(previous))
+            previous = segment
+            ydata = Vi.readTrace(binary)
+            parameters = parameterSnapshot()
+            parameters.update(segment.parameters())
+            traces.append(Trace(ydata, segment.start, segment.stop, timestamp=datetime.now(), parameters=parameters, chain=chain))
+    finally:
+        Vi.writeBatch(restore)
+    return stitch(traces)
+
+def planFromConfig(cfg):
+    """Plans a survey from the [survey] configuration.
+
+    Args:
+        cfg (dict): [survey] section of the loaded configuration (See defaultconfig.py).
+
+    Returns:
+        list: Instances of Segment ordered by frequency.
+    """
+    # Bandwidths and points of 0 and negative attenuation are auto
+    def _optional(value):
+        return value if value > 0 else None
+    def _atten(value):
+        return value if value >= 0 else None
+    bands = [(band[0], band[1], _optional(band[2]), _optional(band[3]), _atten(band[4])) for band in cfg['bands']]
+    return planSurvey(cfg['start'], cfg['stop'], cfg['max_span'], cfg['overlap'], _optional(cfg['points']), _optional(cfg['rbw']), _optional(cfg['vbw']), _atten(cfg['atten']), bands)
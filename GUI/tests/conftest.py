@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules of the front end are imported by name from the GUI folder, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
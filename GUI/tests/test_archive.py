@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import zipfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import defaultconfig
+from archive import INDEX_FILE, TraceArchive
+from capture import writeCapture
+from tracedata import Trace, writeTrace
+
+START = datetime(2025, 1, 23, 8, 0, 0)
+
+def makeTrace(index, chain='DFS1', start=1e9, stop=2e9, signal=None, points=201):
+    amplitude = np.random.default_rng(index).normal(-100.0, 0.5, points)
+    if signal is not None:
+        amplitude[signal] = -50.0
+    return Trace(amplitude, start, stop, START + timedelta(minutes=index), {'RBW': '1000'}, chain)
+
+def save(directory, name, trace, mtime=None):
+    path = os.path.join(directory, name)
+    writeTrace(open(path, 'w'), trace)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+@pytest.fixture
+def archive(tmp_path):
+    return TraceArchive(str(tmp_path / 'archive'), defaultconfig.cfg['detection'])
+
+@pytest.fixture
+def traces(tmp_path):
+    directory = tmp_path / 'traces'
+    directory.mkdir()
+    traces = [makeTrace(0), makeTrace(1, signal=100), makeTrace(2, 'EMS1', 3e9, 4e9), makeTrace(3, 'EMS1', 3e9, 4e9, signal=50)]
+    for index, trace in enumerate(traces):
+        save(str(directory), f'{trace.chain}-{index}.csv', trace)
+    return str(directory), traces
+
+def test_import_path_skips_unmodified_files(archive, traces):
+    directory, expected = traces
+    assert archive.importPath(directory) == 4
+    assert archive.importPath(directory) == 0
+    records = archive.query()
+    assert [record['timestamp'] for record in records] == [trace.timestamp.isoformat(timespec='microseconds') for trace in expected]
+    for record, trace in zip(records, expected):
+        np.testing.assert_array_equal(archive.trace(record).amplitude, trace.amplitude)
+        np.testing.assert_allclose(archive.trace(record).frequency, trace.frequency)
+
+def test_import_zip_file(archive, traces, tmp_path):
+    directory, expected = traces
+    zipPath = str(tmp_path / 'traces.zip')
+    with zipfile.ZipFile(zipPath, 'w') as f:
+        for fileName in sorted(os.listdir(directory)):
+            f.write(os.path.join(directory, fileName), fileName)
+    assert archive.importPath(zipPath) == 4
+    assert archive.importPath(zipPath) == 0
+
+def test_reimport_replaces_sweeps_and_reuses_payload_rows(archive, tmp_path):
+    directory = str(tmp_path)
+    path = save(directory, 'DFS1-0.csv', makeTrace(0), mtime=1000)
+    save(directory, 'DFS1-1.csv', makeTrace(1), mtime=1000)
+    archive.importPath(directory)
+    payload = archive.payloadPath(archive.query()[0]['grp'])
+    for version in range(2, 8):
+        trace = makeTrace(version)
+        save(directory, 'DFS1-0.csv', trace, mtime=1000 + version)
+        assert archive.importPath(directory) == 1
+        records = archive.query(chain='DFS1')
+        assert len(records) == 2
+        record, = [record for record in records if record['source'] == path]
+        np.testing.assert_array_equal(archive.trace(record).amplitude, trace.amplitude)
+    # One row of each file, and the row of the replaced import of DFS1-0.csv
+    assert os.path.getsize(payload) == 3 * 201 * 8
+
+def test_collects_orphaned_rows_of_version_1_archives(archive, tmp_path):
+    directory = str(tmp_path)
+    save(directory, 'DFS1-0.csv', makeTrace(0), mtime=1000)
+    archive.importPath(directory)
+    save(directory, 'DFS1-0.csv', makeTrace(1), mtime=1001)
+    archive.importPath(directory)
+    with sqlite3.connect(os.path.join(archive.directory, INDEX_FILE)) as db:
+        db.execute('DELETE FROM free')
+        db.execute('PRAGMA user_version = 1')
+    reopened = TraceArchive(archive.directory)
+    with reopened.connect() as db:
+        assert [tuple(row) for row in db.execute('SELECT grp, row FROM free')] == [(1, 0)]
+
+def test_query_filters(archive, traces):
+    directory, expected = traces
+    archive.importPath(directory)
+    assert len(archive.query()) == 4
+    assert [record['chain'] for record in archive.query(chain='EMS1')] == ['EMS1', 'EMS1']
+    assert len(archive.query(start=START + timedelta(minutes=1), end=START + timedelta(minutes=2))) == 2
+    assert len(archive.query(fmin=3.5e9)) == 2
+    assert len(archive.query(fmax=1.5e9)) == 2
+    assert len(archive.query(fmin=2.5e9, fmax=2.6e9)) == 0
+    detected = archive.query(detected=True)
+    assert [record['timestamp'] for record in detected] == [expected[index].timestamp.isoformat(timespec='microseconds') for index in (1, 3)]
+    assert len(archive.query(detected=False)) == 2
+    signal = expected[1].frequency[100]
+    record, = archive.query(signal=(signal - 1e6, signal + 1e6))
+    assert archive.detections(record['id'])[0]['frequency'] == pytest.approx(signal)
+    assert len(archive.query(limit=3)) == 3
+
+def test_slice(archive, traces):
+    directory, expected = traces
+    archive.importPath(directory)
+    frequency = expected[0].frequency[100] + 1e3
+    records, xvalues, amplitudes = archive.slice(frequency)
+    assert len(records) == 2
+    np.testing.assert_allclose(xvalues, expected[0].frequency[100])
+    np.testing.assert_array_equal(amplitudes, [expected[0].amplitude[100], expected[1].amplitude[100]])
+    records, xvalues, amplitudes = archive.slice(frequency, chain='EMS1')
+    assert len(records) == 0
+
+def test_import_capture_file(archive, tmp_path):
+    traces = [makeTrace(index, signal=100 if index == 1 else None) for index in range(3)]
+    path = str(tmp_path / 'DFS1-capture-2025-01-23-080100-0.csv')
+    writeCapture(open(path, 'w'), traces, ['test'], 1)
+    assert archive.importPath(path) == 3
+    records = archive.query()
+    assert [record['chain'] for record in records] == ['DFS1'] * 3
+    assert [record['detections'] > 0 for record in records] == [False, True, False]
+    np.testing.assert_array_equal(archive.trace(records[2]).amplitude, traces[2].amplitude)
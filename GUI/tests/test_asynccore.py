@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+import pytest
+
+from asynccore import AsyncCore, AsyncMotor
+from frontendio import MotorIO
+from simulator import SimulatedMotor
+
+@pytest.fixture
+def core():
+    core = AsyncCore().start()
+    yield core
+    core.stop()
+
+def test_gathered_motor_queries_do_not_interleave(core):
+    Motor = MotorIO(0, 0)
+    Motor.ser = SimulatedMotor(0.05, 100, 200)
+    motor = AsyncMotor(core, Motor, threading.RLock())
+
+    async def _queries():
+        return await asyncio.gather(motor.query('PRINT P6144'), motor.query('PRINT P6160'), motor.queryBearing((0, 0), (1, 1)))
+
+    x, y, bearing = core.run(_queries(), 10)
+    assert MotorIO.parseEncoder(x) == 100
+    assert MotorIO.parseEncoder(y) == 200
+    assert bearing == (100.0, 200.0)
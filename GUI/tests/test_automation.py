@@ -0,0 +1,21 @@
+import threading
+
+from automation import sweepChains
+from opcodes import opcodes
+
+class StubPLC():
+    def __init__(self, lock):
+        self.lock = lock
+        self.selections = []
+
+    def selectChain(self, opcode, timeout=None, interval=None):
+        # Not confirmed, so sweepChains() skips acquiring the chain
+        self.selections.append((opcode, self.lock._is_owned()))
+        return False
+
+def test_sweep_chains_holds_the_plc_lock_while_selecting():
+    plcLock = threading.RLock()
+    PLC = StubPLC(plcLock)
+    cfg = {'sequence': ['DFS1', 'EMS1'], 'presets': {}, 'timeout': 0.1, 'status_interval': 0.05, 'sleep_after': True}
+    assert sweepChains(None, PLC, threading.RLock(), plcLock, cfg, '.') == []
+    assert PLC.selections == [(opcodes.DFS_CHAIN1.value, True), (opcodes.EMS_CHAIN1.value, True), (opcodes.SLEEP.value, True)]
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from averaging import MaxHold, PercentileSketch, TraceAccumulator
+from tracedata import Trace
+
+def test_percentile_sketch_estimates_the_median_in_chunks():
+    sketch = PercentileSketch(50, -100, 0, 1)
+    sketch.CHUNK_POINTS = 3
+    for level in (-80, -60, -40, -20, -10):
+        sketch.update(np.full(10, level + 0.2))
+    assert np.array_equal(sketch.result(), np.full(10, -39.5))
+    assert np.array_equal(sketch.result(100), np.full(10, -9.5))
+
+def test_percentile_sketch_rejects_a_histogram_larger_than_max_cells():
+    sketch = PercentileSketch(50, -170, 30, 0.5, maxCells=100000)
+    with pytest.raises(ValueError):
+        sketch.update(np.zeros(100001))
+    assert sketch.counts is None
+
+def test_trace_accumulator_disables_an_accumulator_which_cannot_accumulate():
+    accumulator = TraceAccumulator({'Max Hold': MaxHold(), 'Median': PercentileSketch(50, -170, 30, 0.5, maxCells=1000)})
+    accumulator.setEnabled('Max Hold', True)
+    accumulator.setEnabled('Median', True)
+    accumulator.update(Trace(np.zeros(1001), 1e9, 2e9))
+    assert list(accumulator.results()) == ['Max Hold']
+    assert not accumulator.enabled['Median']
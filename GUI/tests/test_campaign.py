@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from campaign import Campaign, localTime, scheduleCampaign
+from jobstore import JobStore
+
+class StubScheduler():
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, func, trigger=None, args=(), id=None, **kwargs):
+        self.jobs[id] = (func, args)
+
+    def run(self, id):
+        func, args = self.jobs[id]
+        func(*args)
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'automation.db'))
+
+def daily(**kwargs):
+    return Campaign('daily', crontab='30 8 * * *', start=datetime(2025, 1, 1), end=datetime(2025, 1, 3, 23, 59), **kwargs)
+
+def test_next_runs_stop_at_the_end():
+    runs = daily().nextRuns(5, datetime(2025, 1, 1, 9, 0))
+    assert runs == [localTime(datetime(2025, 1, 2, 8, 30)), localTime(datetime(2025, 1, 3, 8, 30))]
+
+def test_previous_run():
+    campaign = daily()
+    assert campaign.previousRun(datetime(2025, 1, 2, 9, 0)) == localTime(datetime(2025, 1, 2, 8, 30))
+    assert campaign.previousRun(datetime(2025, 1, 2, 8, 30)) == localTime(datetime(2025, 1, 2, 8, 30))
+    assert campaign.previousRun(datetime(2025, 1, 1, 8, 0)) is None
+
+def test_missed_run():
+    assert daily().missedRun(datetime(2025, 1, 3, 9, 0)) is None
+    campaign = daily(lastRun=datetime(2025, 1, 1, 8, 30))
+    assert campaign.missedRun(datetime(2025, 1, 3, 9, 0)) == localTime(datetime(2025, 1, 3, 8, 30))
+    assert campaign.missedRun(datetime(2025, 1, 1, 9, 0)) is None
+
+def test_interval_campaign_without_start_is_anchored():
+    campaign = Campaign('interval', trigger='interval', interval=5)
+    assert campaign.start is not None
+    start = localTime(campaign.start)
+    assert campaign.nextRuns(2, start + timedelta(minutes=12)) == [start + timedelta(minutes=15), start + timedelta(minutes=20)]
+    assert campaign.previousRun(start + timedelta(minutes=12)) == start + timedelta(minutes=10)
+    campaign.lastRun = start + timedelta(minutes=5)
+    assert campaign.missedRun(start + timedelta(minutes=12)) == start + timedelta(minutes=10)
+    assert Campaign.fromDict(campaign.asDict()).start == campaign.start
+
+def test_schedule_campaign_catches_up_once(store):
+    scheduler = StubScheduler()
+    saved = []
+    campaign = daily(lastRun=datetime(2025, 1, 1, 8, 30))
+    scheduleCampaign(scheduler, campaign, lambda filePath: saved.append(filePath) or 'trace.csv', store=store, now=datetime(2025, 1, 3, 9, 0))
+    assert set(scheduler.jobs) == {'daily', 'daily-catchup'}
+    scheduler.run('daily-catchup')
+    scheduler.run('daily-catchup')
+    assert len(saved) == 1
+    assert campaign.lastRun == localTime(datetime(2025, 1, 3, 8, 30))
+    run, = [run for run in store.runs('daily') if run['state'] == 'completed']
+    assert run['files'] == ['trace.csv']
+
+def test_schedule_campaign_records_failed_runs(store):
+    scheduler = StubScheduler()
+    campaign = daily(lastRun=datetime(2025, 1, 1, 8, 30))
+    scheduleCampaign(scheduler, campaign, lambda filePath: None, store=store, now=datetime(2025, 1, 3, 9, 0))
+    scheduler.run('daily-catchup')
+    assert campaign.lastRun == datetime(2025, 1, 1, 8, 30)
+    run, = [run for run in store.runs('daily') if run['state'] == 'failed']
+    assert 'No files were saved' in run['error']
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import defaultconfig
+from capture import CaptureRecord, DeltaOverBaseline, TriggeredCapture, formatCapture
+from tracedata import Trace
+from writer import TraceWriter
+
+START = datetime(2025, 1, 23, 8, 0, 0)
+
+def sweeps(count, carrier=None, points=101, offset=0, start=1e9):
+    rng = np.random.default_rng(offset)
+    for index in range(count):
+        amplitude = rng.normal(-100.0, 0.5, points)
+        if carrier is not None:
+            amplitude[50] = carrier
+        yield Trace(amplitude, start, 2e9, START + timedelta(seconds=offset + index))
+
+@pytest.fixture
+def cfg():
+    return dict(defaultconfig.cfg['capture'], pre_trigger=2, post_trigger=2, bands=[], new_peak=False)
+
+def test_constant_carrier_fires_once():
+    rule = DeltaOverBaseline(15.0, 0.05, 0.01, 3.0)
+    fired = [rule.check(trace, []) for trace in sweeps(5)]
+    fired += [rule.check(trace, []) for trace in sweeps(200, carrier=-70.0, offset=5)]
+    assert sum(reason is not None for reason in fired) == 1
+    assert fired[5] is not None
+
+def test_latched_point_fires_again_after_falling_below_hysteresis():
+    rule = DeltaOverBaseline(15.0, 0.05, 0.01, 3.0)
+    fired = [rule.check(trace, []) for trace in sweeps(5)]
+    fired += [rule.check(trace, []) for trace in sweeps(1, carrier=-70.0, offset=5)]
+    fired += [rule.check(trace, []) for trace in sweeps(5, offset=6)]
+    fired += [rule.check(trace, []) for trace in sweeps(1, carrier=-70.0, offset=11)]
+    assert [index for index, reason in enumerate(fired) if reason is not None] == [5, 11]
+
+def test_constant_carrier_saves_one_record(cfg, tmp_path):
+    capture = TriggeredCapture(cfg)
+    capture.arm(str(tmp_path))
+    for trace in sweeps(5):
+        capture.update(trace, [])
+    for trace in sweeps(50, carrier=-70.0, offset=5):
+        capture.update(trace, [])
+    capture.disarm()
+    assert capture.captures == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_axis_change_saves_the_record_being_captured(cfg, tmp_path):
+    writer = TraceWriter(defaultconfig.cfg['writer']).start()
+    capture = TriggeredCapture(cfg, writer)
+    capture.arm(str(tmp_path))
+    for trace in sweeps(3):
+        capture.update(trace, [])
+    for trace in sweeps(1, carrier=-70.0, offset=3):
+        capture.update(trace, [])
+    for trace in sweeps(3, points=201, offset=4):
+        capture.update(trace, [])
+    capture.disarm()
+    assert writer.flush(5)
+    writer.close()
+    assert capture.captures == 1
+    fileName, = os.listdir(tmp_path)
+    with open(os.path.join(tmp_path, fileName)) as f:
+        lines = f.read().splitlines()
+    assert 'Pre-Trigger Sweeps,2' in lines
+    assert 'Post-Trigger Sweeps,0' in lines
+    assert len(lines[lines.index('DATA') + 1].split(',')) == 4
+    assert len(lines) - lines.index('DATA') - 2 == 101
+
+def test_format_capture_skips_sweeps_with_a_different_axis():
+    traces = list(sweeps(3))
+    traces[0] = Trace(traces[0].amplitude, 1e9, 2e9, traces[0].timestamp, xdata=np.geomspace(1e9, 2e9, 101))
+    lines = formatCapture(CaptureRecord(traces, ['test'], 1)).splitlines()
+    assert 'Pre-Trigger Sweeps,0' in lines
+    assert 'Post-Trigger Sweeps,1' in lines
+    assert 'Skipped Sweeps,1' in lines
+    assert len(lines[-1].split(',')) == 3
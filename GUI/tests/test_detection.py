@@ -0,0 +1,74 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import defaultconfig
+from detection import Detector, detect, findRegions, noiseFloor, regionPeaks
+from tracedata import Trace
+
+def test_find_regions_merges_runs_separated_by_merge_gap():
+    mask = np.array([0, 1, 1, 0, 1, 0, 0, 0, 1, 1], dtype=bool)
+    starts, stops = findRegions(mask)
+    assert starts.tolist() == [1, 4, 8]
+    assert stops.tolist() == [3, 5, 10]
+    starts, stops = findRegions(mask, mergeGap=1)
+    assert starts.tolist() == [1, 8]
+    assert stops.tolist() == [5, 10]
+
+def test_find_regions_without_runs():
+    starts, stops = findRegions(np.zeros(5, dtype=bool))
+    assert starts.size == 0 and stops.size == 0
+
+def test_region_peaks_returns_the_maximum_of_each_region():
+    amplitude = np.array([0, 5, 3, 0, 1, 9, 2, 0, 4])
+    peaks = regionPeaks(amplitude, np.array([1, 4, 8]), np.array([3, 7, 9]))
+    assert peaks.tolist() == [1, 5, 8]
+    assert regionPeaks(amplitude, np.array([], dtype=np.intp), np.array([], dtype=np.intp)).size == 0
+
+def test_noise_floor_ignores_narrow_signals():
+    amplitude = np.full(1000, -100.0)
+    amplitude[500:503] = -40.0
+    assert np.allclose(noiseFloor(amplitude, 64), -100.0)
+
+def test_detect_reports_each_signal_above_the_threshold():
+    amplitude = np.random.default_rng(0).normal(-100.0, 0.5, 1001)
+    amplitude[200:205] = -60.0
+    amplitude[203] = -50.0
+    amplitude[700] = -70.0
+    trace = Trace(amplitude, 1e9, 2e9, chain='DFS1')
+    detections = detect(trace, 10.0, 64, mergeGap=2)
+    assert [round(d.frequency) for d in detections] == [1203000000, 1700000000]
+    assert detections[0].level == -50.0
+    assert detections[0].bandwidth == pytest.approx(5e6)
+    assert detections[0].snr == pytest.approx(50.0, abs=1.0)
+    assert detections[0].chain == 'DFS1'
+    assert detect(trace, 10.0, 64, minWidth=2)[0].frequency == detections[0].frequency
+    assert len(detect(trace, 10.0, 64, minWidth=2)) == 1
+
+def test_detector_waits_instead_of_dropping_traces():
+    release = threading.Event()
+    received = []
+
+    def _callback(trace, detections):
+        release.wait(5)
+        received.append(trace)
+
+    detector = Detector(dict(defaultconfig.cfg['detection'], queue_size=1), _callback)
+    with pytest.raises(RuntimeError):
+        detector.submit(Trace(np.zeros(11), 1e9, 2e9))
+    detector.start()
+    traces = [Trace(np.full(11, float(i)), 1e9, 2e9) for i in range(4)]
+    submitter = threading.Thread(target=lambda: [detector.submit(trace) for trace in traces])
+    submitter.start()
+    submitter.join(0.5)
+    assert submitter.is_alive()
+    release.set()
+    submitter.join(5)
+    for _ in range(100):
+        if len(received) == len(traces):
+            break
+        time.sleep(0.05)
+    assert received == traces
+    assert detector.blocked >= 1
@@ -0,0 +1,64 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from campaign import Campaign, localTime
+from jobstore import JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'automation.db'))
+
+def states(store):
+    return {run['scheduled']: (run['state'], run['error']) for run in store.runs()}
+
+def test_recover_interrupted_marks_running_and_missed_runs_as_failed(store):
+    now = datetime.now().replace(microsecond=0)
+    running = store.startRun('a', now - timedelta(minutes=10))
+    store.planRun('a', now - timedelta(minutes=5))
+    store.planRun('a', now + timedelta(minutes=5))
+    completed = store.startRun('a', now - timedelta(minutes=20))
+    store.finishRun(completed, 'completed', ['trace.csv'])
+    assert running is not None
+
+    # A new process opening the same database after a crash
+    recovered = JobStore(store.fileName)
+    assert recovered.recoverInterrupted() == 2
+    result = sorted(states(recovered).values())
+    assert result == [('completed', None), ('failed', 'Interrupted'), ('failed', 'Missed'), ('planned', None)]
+    assert recovered.recoverInterrupted() == 0
+
+def test_start_run_skips_completed_runs_and_retries_failed_runs(store):
+    scheduled = datetime(2025, 1, 2, 8, 30)
+    runId = store.startRun('a', scheduled)
+    store.finishRun(runId, 'failed', error='RuntimeError: No files were saved.')
+    assert store.startRun('a', scheduled) == runId
+    store.finishRun(runId, 'completed', ['trace.csv'])
+    assert store.startRun('a', scheduled) is None
+    run, = store.runs('a')
+    assert run['state'] == 'completed' and run['error'] is None and run['files'] == ['trace.csv']
+
+def test_load_restores_last_run_from_completed_runs(store):
+    campaigns = [Campaign('a', crontab='30 8 * * *'), Campaign('b', trigger='interval', interval=5)]
+    store.save(campaigns, active=True)
+    for day, state in ((1, 'completed'), (2, 'completed'), (3, 'failed')):
+        store.finishRun(store.startRun('a', datetime(2025, 1, day, 8, 30)), state)
+
+    loaded = JobStore(store.fileName).load()
+    assert [campaign.name for campaign in loaded] == ['a', 'b']
+    assert loaded[0].lastRun == localTime(datetime(2025, 1, 2, 8, 30))
+    assert loaded[1].lastRun is None
+    assert loaded[1].start == campaigns[1].start
+    assert store.active
+
+def test_migrate_imports_the_last_run_as_completed(tmp_path):
+    legacyFile = str(tmp_path / 'campaigns.json')
+    with open(legacyFile, 'w') as f:
+        json.dump({'active': True, 'campaigns': [Campaign('a', crontab='30 8 * * *', lastRun=datetime(2025, 1, 2, 8, 31)).asDict()]}, f)
+    store = JobStore(str(tmp_path / 'automation.db'), legacyFile)
+    assert os.path.exists(legacyFile + '.migrated')
+    campaign, = store.load()
+    assert campaign.lastRun == localTime(datetime(2025, 1, 2, 8, 30))
+    assert store.startRun('a', datetime(2025, 1, 2, 8, 30)) is None
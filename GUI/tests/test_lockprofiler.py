@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from lockprofiler import LockProfiler, ProfiledLock
+import lockprofiler
+
+@pytest.fixture
+def profiler(monkeypatch):
+    profiler = LockProfiler()
+    monkeypatch.setattr(lockprofiler, 'profiler', profiler)
+    profiler.enable()
+    return profiler
+
+def test_locks_with_the_same_name_are_held_separately(profiler):
+    first = ProfiledLock('SerialIO.serialLock')
+    second = ProfiledLock('SerialIO.serialLock')
+    acquired, release = threading.Event(), threading.Event()
+
+    def _hold():
+        with second:
+            acquired.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=_hold)
+    with first:
+        thread.start()
+        acquired.wait(5)
+        assert len(profiler.owners()) == 2
+        release.set()
+        thread.join(5)
+        assert list(profiler.owners()) == ['SerialIO.serialLock']
+    assert profiler.owners() == {}
+    assert profiler.locks['SerialIO.serialLock'].hold.count == 2
+    assert profiler.inversions == {}
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from asynccore import AsyncCore, AsyncDevice
+from supervisor import CONNECTED, RECONNECTING, Supervisor
+
+CFG = {'check_interval': 0.05, 'backoff_initial': 0.05, 'backoff_factor': 2.0, 'backoff_max': 0.1, 'verify_identity': True}
+
+class PortSupervisor(Supervisor):
+    """Supervisor of a device which is only present at the ports in 'available'.
+    """
+    def __init__(self, core, available, **kwargs):
+        super().__init__(core, AsyncDevice(core, 'PortDevice', threading.RLock()), 'device', CFG, **kwargs)
+        self.available = available
+        self.port = None
+
+    async def check(self):
+        return self.port in self.available
+
+    async def connect(self, target):
+        if target not in self.available:
+            raise ConnectionError(f'{target} is not available.')
+        self.port = target
+
+    async def identify(self):
+        return self.available[self.port]
+
+@pytest.fixture
+def core():
+    core = AsyncCore().start()
+    yield core
+
+    async def _cancel():
+        tasks = list(core.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    core.run(_cancel(), 5)
+    core.stop()
+    core.thread.join(1)
+
+def test_retarget_keeps_identity_and_saved_state(core):
+    restored = []
+    reconnected = threading.Event()
+    supervisor = PortSupervisor(core, {'/dev/ttyUSB0': 'PLC 1'}, save=lambda: 'DFS_CHAIN1', restore=restored.append, onRestored=lambda saved: reconnected.set())
+    core.submit(supervisor.run())
+    core.run(supervisor.connect('/dev/ttyUSB0'))
+    supervisor.watch('/dev/ttyUSB0')
+    while supervisor.identity is None:
+        threading.Event().wait(0.01)
+
+    supervisor.available.clear()
+    while not supervisor.reconnecting:
+        threading.Event().wait(0.01)
+    assert supervisor.identity == 'PLC 1'
+    supervisor.available['/dev/ttyUSB1'] = 'PLC 1'
+    supervisor.retarget('/dev/ttyUSB1')
+    assert supervisor.state == RECONNECTING
+    assert reconnected.wait(2)
+    assert supervisor.state == CONNECTED
+    assert supervisor.port == '/dev/ttyUSB1'
+    assert supervisor.identity == 'PLC 1'
+    assert restored == ['DFS_CHAIN1']
+
+def test_retarget_does_not_accept_a_different_device(core):
+    supervisor = PortSupervisor(core, {'/dev/ttyUSB0': 'PLC 1'})
+    core.submit(supervisor.run())
+    core.run(supervisor.connect('/dev/ttyUSB0'))
+    supervisor.watch('/dev/ttyUSB0')
+    while supervisor.identity is None:
+        threading.Event().wait(0.01)
+
+    supervisor.available.clear()
+    while not supervisor.reconnecting:
+        threading.Event().wait(0.01)
+    supervisor.available['/dev/ttyUSB1'] = 'PLC 2'
+    supervisor.retarget('/dev/ttyUSB1')
+    threading.Event().wait(0.3)
+    assert supervisor.state == RECONNECTING
+    assert supervisor.identity == 'PLC 1'
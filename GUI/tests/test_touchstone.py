@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pytest
+
+import touchstone
+from touchstone import Touchstone, cascade, interpolate, loadTouchstone, readTouchstone, stability
+
+MATLAB = os.path.join(os.path.dirname(__file__), '..', '..', 'MATLAB')
+REVC_6G = os.path.join(MATLAB, 'RF-DFS-RevC-6G.s2p')
+
+@pytest.fixture
+def cacheDirectory(tmp_path, monkeypatch):
+    monkeypatch.setattr(touchstone, 'CACHE_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(touchstone, '_cache', {})
+    return tmp_path
+
+def test_read_revc_6g():
+    network = readTouchstone(REVC_6G)
+    assert network.s.shape == (801, 2, 2)
+    assert network.z0 == 50.0
+    assert network.frequency[0] == 10e6
+    assert np.all(np.diff(network.frequency) > 0)
+    # First data row: S11, S21, S12, S22 as dB and angle pairs
+    assert 20 * np.log10(abs(network.s[0, 0, 0])) == pytest.approx(1.145685, abs=1e-5)
+    assert network.gain()[0] == pytest.approx(-3.391499, abs=1e-5)
+    assert np.degrees(np.angle(network.s21[0])) == pytest.approx(-139.6668, abs=1e-3)
+    assert 20 * np.log10(abs(network.s[0, 0, 1])) == pytest.approx(-47.12714, abs=1e-5)
+    assert 20 * np.log10(abs(network.s[0, 1, 1])) == pytest.approx(0.05652237, abs=1e-5)
+
+def test_interpolate_revc_6g():
+    network = readTouchstone(REVC_6G)
+    # At the measured frequencies the measured values are returned
+    measured = interpolate(network, network.frequency[:50])
+    np.testing.assert_allclose(measured.s, network.s[:50], rtol=1e-9, atol=1e-12)
+    # Between two measured frequencies the gain in dB is interpolated linearly
+    middle = (network.frequency[10] + network.frequency[11]) / 2
+    gain = interpolate(network, [middle]).gain()[0]
+    assert gain == pytest.approx((network.gain()[10] + network.gain()[11]) / 2)
+    # Outside of the measured range the nearest measured point is used
+    outside = interpolate(network, [network.frequency[0] / 2, network.frequency[-1] * 2])
+    np.testing.assert_allclose(outside.gain(), network.gain()[[0, -1]])
+
+def test_cascade_single_network():
+    network = readTouchstone(REVC_6G)
+    np.testing.assert_allclose(cascade([network]).s, network.s, rtol=1e-9, atol=1e-12)
+
+def randomNetwork(rng, points, name):
+    s = rng.uniform(0.05, 0.9, (points, 2, 2)) * np.exp(1j * rng.uniform(-np.pi, np.pi, (points, 2, 2)))
+    return Touchstone(np.linspace(1e9, 2e9, points), s, name=name)
+
+def test_cascade_two_networks():
+    rng = np.random.default_rng(0)
+    a, b = randomNetwork(rng, 11, 'a'), randomNetwork(rng, 11, 'b')
+    network = cascade([a, b])
+    # Signal flow graph of port 2 of a connected to port 1 of b
+    loop = 1 - a.s[:, 1, 1] * b.s[:, 0, 0]
+    np.testing.assert_allclose(network.s21, a.s21 * b.s21 / loop)
+    np.testing.assert_allclose(network.s[:, 0, 1], a.s[:, 0, 1] * b.s[:, 0, 1] / loop)
+    np.testing.assert_allclose(network.s[:, 0, 0], a.s[:, 0, 0] + a.s[:, 0, 1] * a.s21 * b.s[:, 0, 0] / loop)
+    np.testing.assert_allclose(network.s[:, 1, 1], b.s[:, 1, 1] + b.s[:, 0, 1] * b.s21 * a.s[:, 1, 1] / loop)
+    assert network.name == 'a + b'
+
+def test_cascade_matched_attenuators_adds_gain():
+    s = np.zeros((3, 2, 2), dtype=np.complex128)
+    s[:, 0, 1] = s[:, 1, 0] = 10 ** (-3 / 20) * np.exp(-0.5j)
+    attenuator = Touchstone(np.array([1e9, 2e9, 3e9]), s)
+    network = cascade([attenuator, attenuator, attenuator])
+    np.testing.assert_allclose(network.gain(), -9.0)
+    np.testing.assert_allclose(np.angle(network.s21), np.angle(np.exp(-1.5j)))
+    np.testing.assert_allclose(np.abs(network.s[:, 0, 0]), 0.0, atol=1e-15)
+
+def test_stability_of_matched_attenuator():
+    a = 0.5
+    s = np.array([[[0, a], [a, 0]]], dtype=np.complex128)
+    k, delta, mu, muPrime = stability(s)
+    assert k[0] == pytest.approx((1 + a ** 4) / (2 * a ** 2))
+    assert delta[0] == pytest.approx(a ** 2)
+    assert mu[0] == pytest.approx(1 / a ** 2)
+    assert muPrime[0] == pytest.approx(1 / a ** 2)
+
+def test_stability_of_unstable_amplifier():
+    # K > 1 but |delta| > 1, so the amplifier is not unconditionally stable and mu < 1
+    s = np.array([[[0, 0.2], [10, 0]]], dtype=np.complex128)
+    k, delta, mu, muPrime = stability(s)
+    assert k[0] == pytest.approx(1.25)
+    assert delta[0] == pytest.approx(2.0)
+    assert mu[0] == pytest.approx(0.5)
+    assert muPrime[0] == pytest.approx(0.5)
+
+def test_stability_mu_agrees_with_k_and_delta():
+    rng = np.random.default_rng(1)
+    s = rng.uniform(0, 1.2, (2000, 2, 2)) * np.exp(1j * rng.uniform(-np.pi, np.pi, (2000, 2, 2)))
+    s[:, 1, 0] *= 4
+    k, delta, mu, muPrime = stability(s)
+    stable = (k > 1) & (delta < 1)
+    # Only compare away from the boundary, where rounding could disagree
+    clear = (np.abs(mu - 1) > 1e-9) & (np.abs(k - 1) > 1e-9) & (np.abs(delta - 1) > 1e-9)
+    assert stable[clear].any() and not stable[clear].all()
+    np.testing.assert_array_equal(mu[clear] > 1, stable[clear])
+    np.testing.assert_array_equal(muPrime[clear] > 1, stable[clear])
+
+def test_load_uses_cache_outside_of_data_directory(cacheDirectory):
+    network = loadTouchstone(REVC_6G)
+    assert [name for name in os.listdir(cacheDirectory) if name.startswith('RF-DFS-RevC-6G.s2p.')]
+    assert not os.path.exists(os.path.join(MATLAB, '.touchstone_cache'))
+    touchstone._cache.clear()
+    cached = loadTouchstone(REVC_6G)
+    np.testing.assert_array_equal(cached.frequency, network.frequency)
+    np.testing.assert_array_equal(cached.s, network.s)
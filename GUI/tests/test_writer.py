@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+import pytest
+
+import defaultconfig
+from tracedata import Trace
+from writer import TraceWriter
+
+@pytest.fixture
+def writer():
+    writer = TraceWriter(dict(defaultconfig.cfg['writer'], wait_timeout=5.0)).start()
+    yield writer
+    writer.close()
+
+def trace():
+    return Trace(np.zeros(11), 1e9, 2e9, chain='DFS1')
+
+def test_write_raises_if_the_trace_is_not_written(writer, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        writer.write(trace(), str(tmp_path / 'missing'))
+    assert os.path.exists(writer.write(trace(), str(tmp_path)))
+    assert writer.metrics()['errors'] == 1
+
+def test_wait_returns_only_written_files(writer, tmp_path):
+    futures = [writer.submit(trace(), str(path))[1] for path in (tmp_path, tmp_path / 'missing', tmp_path)]
+    written = writer.wait(futures)
+    assert len(written) == 2
+    assert all(os.path.dirname(name) == str(tmp_path) for name in written)
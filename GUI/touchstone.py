@@ -0,0 +1,283 @@
+"""Module that contains the Touchstone (.s2p) file reader and 2-port network calculations (interpolation, cascade, and stability factors) vectorized over frequency.
+Parsed files are cached in memory by path and modification time, and in a binary cache in the GUI folder (next to config.toml) so later runs skip parsing the text without writing to the folder of the data.
+Run 'python touchstone.py file1.s2p file2.s2p ...' to print the cascaded gain and stability of a chain.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+FREQUENCY_UNITS = {'HZ': 1.0, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+
+class Touchstone():
+    def __init__(self, frequency, s, z0=50.0, name=''):
+        """2-port network data.
+
+        Args:
+            frequency (numpy.ndarray): Frequencies in Hz, in increasing order.
+            s (numpy.ndarray): Complex S-parameters of shape (points, 2, 2), where s[:, 1, 0] is S21.
+            z0 (float, optional): Reference impedance in ohms. Defaults to 50.0.
+            name (string, optional): Name of the network, e.g. the file name. Defaults to ''.
+        """
+        self.frequency = frequency
+        self.s = s
+        self.z0 = z0
+        self.name = name
+
+    @property
+    def s21(self):
+        return self.s[:, 1, 0]
+
+    def gain(self):
+        """Returns the magnitude of S21 in dB.
+        """
+        with np.errstate(divide='ignore'):
+            return 20.0 * np.log10(np.abs(self.s21))
+
+    def __repr__(self):
+        return f'Touchstone({self.name}, {self.frequency.size} points, {self.frequency[0]:.6g} to {self.frequency[-1]:.6g} Hz)'
+
+def readTouchstone(path):
+    """Parses a 2-port Touchstone file. Comments (!) are ignored and the option line (#) sets the frequency unit, data format (DB, MA, or RI), and reference impedance.
+
+    Args:
+        path (string): Path to the .s2p file.
+
+    Raises:
+        ValueError: If the file is not S-parameter data or the number of values is not a multiple of 9.
+
+    Returns:
+        Touchstone: Parsed network with read-only arrays.
+    """
+    unit, parameter, form, z0 = 'GHZ', 'S', 'MA', 50.0
+    values = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('!', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                options = line[1:].upper().split()
+                for index, option in enumerate(options):
+                    if option in FREQUENCY_UNITS:
+                        unit = option
+                    elif option in ('S', 'Y', 'Z', 'H', 'G'):
+                        parameter = option
+                    elif option in ('DB', 'MA', 'RI'):
+                        form = option
+                    elif option == 'R' and index + 1 < len(options):
+                        z0 = float(options[index + 1])
+                continue
+            values.append(line)
+    if parameter != 'S':
+        raise ValueError(f'{path} contains {parameter}-parameters, only S-parameters are supported.')
+
+    data = np.array(' '.join(values).split(), dtype=np.float64)
+    if data.size % 9:
+        raise ValueError(f'{path} does not contain 2-port data ({data.size} values is not a multiple of 9).')
+    data = data.reshape(-1, 9)
+    frequency = data[:, 0] * FREQUENCY_UNITS[unit]
+    a, b = data[:, 1::2], data[:, 2::2]
+    match form:
+        case 'DB':
+            s = np.power(10.0, a / 20.0) * np.exp(1j * np.deg2rad(b))
+        case 'MA':
+            s = a * np.exp(1j * np.deg2rad(b))
+        case 'RI':
+            s = a + 1j * b
+    # Data is ordered S11, S21, S12, S22, so reshaping into rows of 2 and transposing gives [[S11, S12], [S21, S22]]
+    s = np.ascontiguousarray(s.reshape(-1, 2, 2).transpose(0, 2, 1))
+    frequency.flags.writeable = False
+    s.flags.writeable = False
+    return Touchstone(frequency, s, z0, os.path.basename(path))
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.touchstone_cache')
+
+def cachePrefix(path):
+    """Returns the prefix of the binary cache files of a Touchstone file. The hash of its directory is part of the prefix so files with the same name in different directories have separate caches.
+    """
+    directory = hashlib.sha1(os.path.dirname(os.path.abspath(path)).encode()).hexdigest()[:12]
+    return f'{os.path.basename(path)}.{directory}.'
+
+def cachePath(path, mtime):
+    """Returns the path of the binary cache of a Touchstone file. The modification time is part of the name so a modified file is parsed again.
+    """
+    return os.path.join(CACHE_DIRECTORY, f'{cachePrefix(path)}{int(mtime * 1e6)}.npz')
+
+def readCache(path, mtime):
+    """Reads a Touchstone file from its binary cache.
+
+    Returns:
+        Touchstone: Parsed network, or None if there is no cache for this modification time.
+    """
+    fileName = cachePath(path, mtime)
+    if not os.path.exists(fileName):
+        return None
+    with np.load(fileName) as data:
+        frequency = data['frequency']
+        s = data['s']
+        z0 = float(data['z0'])
+    frequency.flags.writeable = False
+    s.flags.writeable = False
+    return Touchstone(frequency, s, z0, os.path.basename(path))
+
+def writeCache(path, mtime, network):
+    """Writes a parsed Touchstone file to its binary cache, replacing caches of previous modification times. Errors are logged and ignored since the cache is optional (e.g. on a read-only drive).
+    """
+    fileName = cachePath(path, mtime)
+    try:
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+        prefix = cachePrefix(path)
+        for old in os.listdir(os.path.dirname(fileName)):
+            if old.startswith(prefix) and old.endswith('.npz'):
+                os.remove(os.path.join(os.path.dirname(fileName), old))
+        np.savez(fileName, frequency=network.frequency, s=network.s, z0=network.z0)
+    except OSError as e:
+        logging.debug(f'Could not write Touchstone cache {fileName}: {e}')
+
+_cache = {}
+_cacheLock = threading.Lock()
+
+def loadTouchstone(path):
+    """Returns the parsed Touchstone file from the memory cache, the binary cache, or by parsing the file, in that order. Caches are only used if the file has not been modified since they were written.
+
+    Args:
+        path (string): Path to the .s2p file.
+
+    Returns:
+        Touchstone: Parsed network. Its arrays are shared between callers and are read-only.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _cacheLock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    network = readCache(path, mtime)
+    if network is None:
+        network = readTouchstone(path)
+        writeCache(path, mtime, network)
+    with _cacheLock:
+        _cache[path] = (mtime, network)
+    return network
+
+def interpolate(network, frequency):
+    """Interpolates a network onto new frequencies. Magnitude (in dB) and unwrapped phase are interpolated linearly, which follows measured data more closely than interpolating real and imaginary parts. Frequencies outside of the measured range use the nearest measured point.
+
+    Args:
+        network (Touchstone): Network to interpolate.
+        frequency (numpy.ndarray): Frequencies in Hz, in increasing order.
+
+    Returns:
+        Touchstone: Network at the new frequencies.
+    """
+    frequency = np.asarray(frequency, dtype=np.float64)
+    s = network.s.reshape(-1, 4)
+    with np.errstate(divide='ignore'):
+        magnitude = 20.0 * np.log10(np.abs(s))
+    phase = np.unwrap(np.angle(s), axis=0)
+    result = np.empty((frequency.size, 4), dtype=np.complex128)
+    for index in range(4):
+        result[:, index] = np.power(10.0, np.interp(frequency, network.frequency, magnitude[:, index]) / 20.0) * np.exp(1j * np.interp(frequency, network.frequency, phase[:, index]))
+    return Touchstone(frequency, result.reshape(-1, 2, 2), network.z0, network.name)
+
+def sToT(s):
+    """Converts S-parameters to T (transfer scattering) parameters, defined by [b1, a1] = T [a2, b2] so that cascaded networks multiply.
+
+    Args:
+        s (numpy.ndarray): S-parameters of shape (points, 2, 2).
+
+    Returns:
+        numpy.ndarray: T-parameters of shape (points, 2, 2).
+    """
+    s11, s12, s21, s22 = s[:, 0, 0], s[:, 0, 1], s[:, 1, 0], s[:, 1, 1]
+    t = np.empty_like(s, dtype=np.complex128)
+    t[:, 0, 0] = s12 - s11 * s22 / s21
+    t[:, 0, 1] = s11 / s21
+    t[:, 1, 0] = -s22 / s21
+    t[:, 1, 1] = 1 / s21
+    return t
+
+def tToS(t):
+    """Converts T-parameters (See sToT()) to S-parameters.
+
+    Args:
+        t (numpy.ndarray): T-parameters of shape (points, 2, 2).
+
+    Returns:
+        numpy.ndarray: S-parameters of shape (points, 2, 2).
+    """
+    t11, t12, t21, t22 = t[:, 0, 0], t[:, 0, 1], t[:, 1, 0], t[:, 1, 1]
+    s = np.empty_like(t, dtype=np.complex128)
+    s[:, 0, 0] = t12 / t22
+    s[:, 0, 1] = t11 - t12 * t21 / t22
+    s[:, 1, 0] = 1 / t22
+    s[:, 1, 1] = -t21 / t22
+    return s
+
+def cascade(networks, frequency=None):
+    """Cascades 2-port networks in order (port 2 of each network connected to port 1 of the next).
+
+    Args:
+        networks (list): Instances of Touchstone, from input to output.
+        frequency (numpy.ndarray, optional): Frequencies to calculate the cascade at. Defaults to the frequencies of the first network within the range measured by every network.
+
+    Returns:
+        Touchstone: Cascaded network.
+    """
+    if frequency is None:
+        lower = max(network.frequency[0] for network in networks)
+        upper = min(network.frequency[-1] for network in networks)
+        frequency = networks[0].frequency
+        frequency = frequency[(frequency >= lower) & (frequency <= upper)]
+    t = None
+    for network in networks:
+        if network.frequency.shape != frequency.shape or not np.array_equal(network.frequency, frequency):
+            network = interpolate(network, frequency)
+        t = sToT(network.s) if t is None else np.matmul(t, sToT(network.s))
+    return Touchstone(np.asarray(frequency), np.ascontiguousarray(tToS(t)), networks[0].z0, ' + '.join(network.name for network in networks))
+
+def stability(s):
+    """Calculates the Rollett stability factor K and the Edwards-Sinsky stability factors mu (input) and mu' (output) at each frequency. The network is unconditionally stable where K > 1 and |delta| < 1, or equivalently where mu > 1.
+
+    Args:
+        s (numpy.ndarray): S-parameters of shape (points, 2, 2).
+
+    Returns:
+        tuple: (k, delta, mu, muPrime) arrays, where delta is the magnitude of the determinant of S.
+    """
+    s11, s12, s21, s22 = s[:, 0, 0], s[:, 0, 1], s[:, 1, 0], s[:, 1, 1]
+    delta = s11 * s22 - s12 * s21
+    loop = np.abs(s12 * s21)
+    k = (1 - np.abs(s11) ** 2 - np.abs(s22) ** 2 + np.abs(delta) ** 2) / (2 * loop)
+    mu = (1 - np.abs(s11) ** 2) / (np.abs(s22 - delta * np.conj(s11)) + loop)
+    muPrime = (1 - np.abs(s22) ** 2) / (np.abs(s11 - delta * np.conj(s22)) + loop)
+    return k, np.abs(delta), mu, muPrime
+
+def main():
+    parser = argparse.ArgumentParser(description='Cascade 2-port Touchstone files and print the gain and stability of the chain.')
+    parser.add_argument('files', nargs='+', help='Touchstone files from input to output.')
+    parser.add_argument('--frequency', type=float, action='append', default=[], help='Frequency in Hz to print the gain at. Can be repeated.')
+    args = parser.parse_args()
+
+    chain = cascade([loadTouchstone(path) for path in args.files])
+    gain = chain.gain()
+    k, delta, mu, muPrime = stability(chain.s)
+    print(chain)
+    print(f'Gain: {gain.min():.2f} to {gain.max():.2f} dB (max at {chain.frequency[np.argmax(gain)]:.6g} Hz)')
+    for frequency in args.frequency:
+        print(f'Gain at {frequency:.6g} Hz: {np.interp(frequency, chain.frequency, gain):.2f} dB')
+    index = np.argmin(mu)
+    print(f'Minimum mu: {mu[index]:.3f} at {chain.frequency[index]:.6g} Hz (K = {k[index]:.3f}, |delta| = {delta[index]:.3f})')
+    unstable = chain.frequency[mu <= 1]
+    if unstable.size:
+        print(f'Potentially unstable at {unstable.size} points from {unstable[0]:.6g} to {unstable[-1]:.6g} Hz')
+    else:
+        print('Unconditionally stable at every point')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Module that contains the trace data model. A Trace is created when a sweep is acquired and is consumed by saving, analysis, and plotting, so none of them depend on the state of the matplotlib plot.
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from parameters import *
+from instrumentation import timed
+
+@lru_cache(maxsize=32)
+def frequencyAxis(start, stop, points):
+    """Generates an evenly spaced X axis. The result is cached and read-only so traces with the same sweep parameters share one array.
+
+    Args:
+        start (float): First X axis value (start frequency, or 0 for zero span).
+        stop (float): Last X axis value (stop frequency, or sweep time for zero span).
+        points (int): Number of sweep points.
+
+    Returns:
+        numpy.ndarray: Read-only array of X axis values.
+    """
+    axis = np.linspace(start, stop, points)
+    axis.flags.writeable = False
+    return axis
+
+class Trace():
+    def __init__(self, amplitude, start, stop, timestamp=None, parameters=None, chain='SLEEP', xunit='Hz', xdata=None):
+        """Single acquired sweep. The X axis is not stored and is instead generated from start, stop, and the number of points, unless xdata is passed for traces without evenly spaced points (e.g. stitched segments).
+
+        Args:
+            amplitude (array_like): Y axis values. Stored as a read-only float64 array.
+            start (float): First X axis value.
+            stop (float): Last X axis value.
+            timestamp (datetime, optional): Time of acquisition. Defaults to datetime.now().
+            parameters (dict, optional): Snapshot of the analyzer parameters at the time of acquisition (See parameterSnapshot()). Defaults to {}.
+            chain (string, optional): Name of the selected RF chain. Defaults to 'SLEEP'.
+            xunit (string, optional): Unit of the X axis, 'Hz' for swept span or 's' for zero span. Defaults to 'Hz'.
+            xdata (array_like, optional): X axis values, must have the same size as amplitude. Defaults to None.
+        """
+        self.amplitude = np.array(amplitude, dtype=np.float64)
+        self.amplitude.flags.writeable = False
+        self.start = float(start)
+        self.stop = float(stop)
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        self.parameters = parameters if parameters is not None else {}
+        self.chain = chain
+        self.xunit = xunit
+        self.xdata = None
+        if xdata is not None:
+            self.xdata = np.array(xdata, dtype=np.float64)
+            self.xdata.flags.writeable = False
+
+    @property
+    def points(self):
+        return self.amplitude.size
+
+    @property
+    def frequency(self):
+        """X axis values passed as xdata, or generated by frequencyAxis().
+        """
+        if self.xdata is not None:
+            return self.xdata
+        return frequencyAxis(self.start, self.stop, self.points)
+
+class TraceHistory():
+    def __init__(self, length):
+        """Thread-safe history of the most recently acquired traces. Once full, the oldest trace is discarded when a new trace is appended.
+
+        Args:
+            length (int): Maximum number of traces to keep.
+        """
+        self.traces = deque(maxlen=length)
+        self.lock = threading.Lock()
+
+    def append(self, trace):
+        with self.lock:
+            self.traces.append(trace)
+
+    def latest(self):
+        """Returns the most recently acquired trace, or None if the history is empty.
+        """
+        with self.lock:
+            if not self.traces:
+                return None
+            return self.traces[-1]
+
+    def list(self):
+        """Returns a list of the traces in the history from oldest to newest.
+        """
+        with self.lock:
+            return list(self.traces)
+
+    def clear(self):
+        with self.lock:
+            self.traces.clear()
+
+    def __len__(self):
+        return len(self.traces)
+
+def parameterSnapshot():
+    """Returns the current value of every logged parameter.
+
+    Returns:
+        dict: Parameter names and their values as strings.
+    """
+    return {parameter.name: parameter.valueString() for parameter in Parameter.instances if parameter.log}
+
+@timed('acquireTrace')
+def acquireTrace(Vi, chain='SLEEP', acquisition='trace', binary=True):
+    """Initiates a sweep on the analyzer and returns it as a Trace. Should be called with the VISA lock held.
+    With acquisition 'trace', only amplitude values are transferred and the X axis is generated from the start/stop frequency (or sweep time for zero span) which were last queried by applyParameters(). If they have not been queried, 'san' is used instead.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        chain (string, optional): Name of the selected RF chain. Defaults to 'SLEEP'.
+        acquisition (string, optional): 'trace' for :TRACe:DATA? TRACE1 or 'san' for :READ:SAN?. Defaults to 'trace'.
+        binary (bool, optional): Passed to VisaIO.readTrace(), must match the format set by VisaIO.setTraceFormat(). Defaults to True.
+
+    Returns:
+        Trace: The acquired sweep.
+    """
+    zeroSpan = Span.floatValue() == 0
+    xunit = 's' if zeroSpan else 'Hz'
+    if zeroSpan:
+        start, stop = 0.0, SweepTime.floatValue()
+    else:
+        start, stop = StartFreq.floatValue(), StopFreq.floatValue()
+
+    if acquisition == 'trace' and start is not None and stop is not None:
+        ydata = Vi.readTrace(binary)
+    else:
+        xdata, ydata = Vi.readSweep(binary and acquisition == 'trace')
+        start, stop = xdata[0], xdata[-1]
+    timestamp = datetime.now()
+    return Trace(ydata, start, stop, timestamp=timestamp, parameters=parameterSnapshot(), chain=chain, xunit=xunit)
+
+@timed('acquireSweep')
+def acquireSweep(Vi, chain='SLEEP'):
+    """Initiates a sweep on an analyzer with :READ:SAN? and returns it as a Trace with the X axis read from the analyzer, so the parameters of the analyzer shown in the widgets are not used. For additional analyzers bound with SpecAn.bindAnalyzer(). Should be called with the lock of the analyzer held.
+
+    Args:
+        Vi (VisaIO): Object of VisaIO with an open session to the analyzer.
+        chain (string, optional): Name of the RF chain connected to the analyzer. Defaults to 'SLEEP'.
+
+    Returns:
+        Trace: The acquired sweep.
+    """
+    xdata, ydata = Vi.readSweep()
+    return Trace(ydata, xdata[0], xdata[-1], timestamp=datetime.now(), parameters={'Resource': Vi.openRsrc.resource_name}, chain=chain, xdata=xdata)
+
+def uniqueTracePath(filePath, chain, reserved=()):
+    """Generates a trace file path in the format [chain]-[date]-[index].csv. The index is iterated until an unused file name is found.
+
+    Args:
+        filePath (string): Directory to save to.
+        chain (string): Name of the selected RF chain.
+        reserved (set, optional): Paths which are considered used although they do not exist yet, e.g. traces queued in a TraceWriter. Defaults to ().
+
+    Returns:
+        string: Path to an unused file.
+    """
+    x=0
+    fileExists = True
+    fileJoined = ''
+    while fileExists:
+        fileName = chain + '-' + datetime.now().strftime('%Y-%m-%d') + '-' + str(x) +'.csv'
+        fileJoined = os.path.join(filePath, fileName)
+        fileExists = fileJoined in reserved or os.path.exists(fileJoined)
+        x += 1
+    return fileJoined
+
+def formatTrace(trace, delimiter=','):
+    """Formats the time of acquisition, RF chain, and parameter snapshot of a trace followed by its data, as written by writeTrace().
+
+    Args:
+        trace (Trace): Trace to format.
+        delimiter (string, optional): Delimiter between names and values. Defaults to ','.
+
+    Returns:
+        string: Contents of the trace file.
+    """
+    lines = ['Timestamp' + delimiter + trace.timestamp.isoformat(), 'Chain' + delimiter + trace.chain]
+    lines.extend(name + delimiter + value for name, value in trace.parameters.items())
+    lines.append('DATA')
+    xdata = trace.frequency
+    ydata = trace.amplitude
+    for index in range(trace.points):
+        lines.append(str(xdata[index]) + delimiter + str(ydata[index]))
+    return '\n'.join(lines) + '\n'
+
+@timed('writeTrace')
+def writeTrace(f, trace):
+    """Writes the time of acquisition, RF chain, and parameter snapshot of the trace followed by its data to the file object f and closes it. The file is tab delimited if its name contains '.txt', otherwise it is comma delimited.
+
+    Args:
+        f (file): File object to write to.
+        trace (Trace): Trace to save.
+    """
+    if '.txt' in f.name:
+        delimiter = '\t'
+    else:
+        delimiter = ','
+    f.write(formatTrace(trace, delimiter))
+    f.close()
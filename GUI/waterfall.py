@@ -0,0 +1,100 @@
+"""Module that contains the waterfall (spectrogram) display of recent traces. Traces are stored in a fixed-size ring buffer so memory use does not grow with runtime, and the display is a single image artist whose data is updated in place and blitted.
+"""
+
+import numpy as np
+
+class RingBuffer():
+    def __init__(self, rows, points):
+        """Fixed-size ring buffer of traces (rows x points). Each row is written twice, at index i and i + rows, so that view() can return the rows in order from oldest to newest as a contiguous slice without copying.
+
+        Args:
+            rows (int): Number of traces to keep.
+            points (int): Number of points in each trace.
+        """
+        self.rows = rows
+        self.points = points
+        self.storage = np.full((2 * rows, points), np.nan, dtype=np.float32)
+        self.index = 0          # Index of the next row to write
+
+    def append(self, amplitude):
+        """Writes a trace over the oldest row.
+
+        Args:
+            amplitude (numpy.ndarray): Amplitude values of the trace. Must have self.points values.
+        """
+        self.storage[self.index] = amplitude
+        self.storage[self.index + self.rows] = amplitude
+        self.index = (self.index + 1) % self.rows
+
+    def view(self):
+        """Returns a view of every row ordered from oldest to newest. Rows which have not been written are NaN.
+
+        Returns:
+            numpy.ndarray: Array of shape (rows, points).
+        """
+        return self.storage[self.index:self.index + self.rows]
+
+    def clear(self):
+        self.storage.fill(np.nan)
+        self.index = 0
+
+class Waterfall():
+    def __init__(self, ax, canvas, rows, cmap='viridis'):
+        """Waterfall display of the most recent traces drawn on ax, with the newest trace at the top.
+
+        Args:
+            ax (matplotlib.axes.Axes): Axis to draw on. It should be the only axis on its canvas since the whole axis is blitted on each update.
+            canvas (FigureCanvasTkAgg): Canvas that contains ax.
+            rows (int): Number of traces to display.
+            cmap (string, optional): Matplotlib colormap. Defaults to 'viridis'.
+        """
+        self.ax = ax
+        self.canvas = canvas
+        self.rows = rows
+        self.cmap = cmap
+        self.buffer = None
+        self.image = None
+        self.axis = None
+        self.clim = (None, None)
+
+    def update(self, trace):
+        """Appends a trace to the ring buffer and updates the display. If the X axis of the trace changed, the buffer is cleared and the canvas is redrawn, otherwise only the image is redrawn and blitted.
+
+        Args:
+            trace (Trace): Acquired trace.
+        """
+        axis = (trace.start, trace.stop, trace.points, trace.xunit)
+        if axis != self.axis or self.image is None:
+            self.axis = axis
+            self.buffer = RingBuffer(self.rows, trace.points)
+            self.buffer.append(trace.amplitude)
+            if self.image is not None:
+                self.image.remove()
+            self.image = self.ax.imshow(self.buffer.view(), aspect='auto', origin='lower', interpolation='nearest', cmap=self.cmap, extent=(trace.start, trace.stop, -self.rows, 0), vmin=self.clim[0], vmax=self.clim[1])
+            self.ax.set_xlim(trace.start, trace.stop)
+            self.ax.set_ylim(-self.rows, 0)
+            self.ax.set_xlabel("Time (s)" if trace.xunit == 's' else "Frequency (Hz)")
+            self.canvas.draw()
+            return
+        self.buffer.append(trace.amplitude)
+        self.image.set_data(self.buffer.view())
+        self.ax.draw_artist(self.image)
+        self.canvas.blit(self.ax.bbox)
+
+    def setColorLimits(self, vmin, vmax):
+        """Sets the amplitude range of the colormap and redraws the canvas.
+
+        Args:
+            vmin (float): Amplitude at the bottom of the colormap.
+            vmax (float): Amplitude at the top of the colormap.
+        """
+        self.clim = (vmin, vmax)
+        if self.image is not None:
+            self.image.set_clim(vmin, vmax)
+            self.canvas.draw_idle()
+
+    def clear(self):
+        if self.buffer is not None:
+            self.buffer.clear()
+            self.image.set_data(self.buffer.view())
+            self.canvas.draw_idle()
@@ -0,0 +1,294 @@
+"""Module that contains the background trace writer. Acquisition enqueues traces, which are immutable (See tracedata.Trace), and a writer thread formats and writes them in batches with large buffered writes, so a slow disk or network share does not stall acquisition or the interface.
+Files are synced to disk according to the fsync policy of the [writer] configuration, and backpressure (queue depth and the time spent waiting for space in the queue) is reported by TraceWriter.metrics().
+Callers which must know that a trace was written, e.g. a campaign run before it is recorded as completed, use TraceWriter.submit() or TraceWriter.write() instead of TraceWriter.save().
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from instrumentation import stats, timed
+from tracedata import formatTrace, uniqueTracePath
+
+FSYNC_POLICIES = ('always', 'batch', 'never')
+
+class TraceWriter():
+    def __init__(self, cfg):
+        """Queue of traces to save and the thread which writes them. The thread is started by start().
+
+        Args:
+            cfg (dict): [writer] section of the loaded configuration (See defaultconfig.py).
+
+        Raises:
+            ValueError: If the fsync policy is not in FSYNC_POLICIES.
+        """
+        if cfg['fsync'] not in FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy: {cfg["fsync"]}')
+        self.queue = queue.Queue(cfg['queue_size'])
+        self.batchSize = cfg['batch_size']
+        self.bufferSize = cfg['buffer_size']
+        self.fsync = cfg['fsync']
+        self.waitTimeout = cfg['wait_timeout']
+        self.reserved = set()       # Paths of queued traces, which do not exist yet but must not be returned by reservePath()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='TraceWriter', daemon=True)
+        self.written = 0
+        self.errors = 0
+        self.batches = 0
+        self.bytes = 0
+        self.maxDepth = 0
+        self.blocked = 0            # Number of traces which waited for space in the queue
+        self.blockedTime = 0.0      # Total time in seconds spent waiting for space in the queue
+
+    def start(self):
+        """Starts the writer thread. Does nothing if it is already running.
+        """
+        if not self.thread.is_alive():
+            self.thread.start()
+        return self
+
+    def reservePath(self, filePath, chain):
+        """Returns an unused trace file path like uniqueTracePath(), which is also not the path of a queued trace.
+
+        Args:
+            filePath (string): Directory to save to.
+            chain (string): Name of the selected RF chain.
+
+        Returns:
+            string: Path to an unused file, reserved until the trace is written.
+        """
+        with self.lock:
+            path = uniqueTracePath(filePath, chain, self.reserved)
+            self.reserved.add(path)
+            return path
+
+    def save(self, trace, filePath=None, f=None, formatter=formatTrace):
+        """Queues a trace to be saved to a new file in the directory filePath, or to the open file object f, which is closed once written. If the queue is full, waits for the writer to make space.
+
+        Args:
+            trace (Trace): Trace to save, or another record formatted by formatter.
+            filePath (string, optional): Directory to save to. Defaults to None.
+            f (file, optional): File object to save to instead of a new file in filePath. Defaults to None.
+            formatter (function, optional): Called in the writer thread with trace and the delimiter, returns the contents of the file. Defaults to formatTrace().
+
+        Raises:
+            AttributeError: If both f and filePath is None.
+
+        Returns:
+            string: Name of the file the trace will be saved to.
+        """
+        return self._enqueue(trace, filePath, f, formatter)[0]
+
+    def submit(self, trace, filePath=None, f=None):
+        """Queues a trace like save() and also returns the completion of its write, e.g. to record a campaign run as completed only once its traces are written (See wait()).
+
+        Args:
+            trace (Trace): Trace to save.
+            filePath (string, optional): Directory to save to. Defaults to None.
+            f (file, optional): File object to save to instead of a new file in filePath. Defaults to None.
+
+        Raises:
+            AttributeError: If both f and filePath is None.
+
+        Returns:
+            tuple: Name of the file the trace will be saved to, and a concurrent.futures.Future whose result is the name once the trace is written, or the exception which prevented writing it.
+        """
+        return self._enqueue(trace, filePath, f)
+
+    def write(self, trace, filePath=None, f=None, timeout=None):
+        """Queues a trace like save() and waits until it is written.
+
+        Args:
+            trace (Trace): Trace to save.
+            filePath (string, optional): Directory to save to. Defaults to None.
+            f (file, optional): File object to save to instead of a new file in filePath. Defaults to None.
+            timeout (float, optional): Maximum time in seconds to wait. Defaults to the wait_timeout of the [writer] configuration.
+
+        Raises:
+            AttributeError: If both f and filePath is None.
+            TimeoutError: If the trace is not written within the timeout.
+            Exception: The exception which prevented writing the trace, e.g. PermissionError.
+
+        Returns:
+            string: Name of the written file.
+        """
+        return self.submit(trace, filePath, f)[1].result(self.waitTimeout if timeout is None else timeout)
+
+    def wait(self, futures, timeout=None):
+        """Waits until the traces queued with submit() are written. Traces which could not be written are logged by the writer and omitted.
+
+        Args:
+            futures (list): Futures returned by submit().
+            timeout (float, optional): Maximum time in seconds to wait for all of them. Defaults to the wait_timeout of the [writer] configuration.
+
+        Returns:
+            list: Names of the written files.
+        """
+        deadline = time.monotonic() + (self.waitTimeout if timeout is None else timeout)
+        names = []
+        for future in futures:
+            try:
+                names.append(future.result(max(deadline - time.monotonic(), 0)))
+            except TimeoutError:
+                logging.error('Timed out waiting for a trace to be written.')
+            except Exception:
+                pass            # Logged by writeBatch()
+        return names
+
+    def _enqueue(self, trace, filePath, f, formatter=formatTrace):
+        if f is None and filePath is None:
+            raise AttributeError('TraceWriter.save did not receive a file or directory.')
+        target = f if f is not None else self.reservePath(filePath, trace.chain)
+        future = Future()
+        try:
+            self.queue.put_nowait((trace, target, future, formatter))
+        except queue.Full:
+            timer = time.perf_counter()
+            with stats.measure('TraceWriter.enqueue'):
+                self.queue.put((trace, target, future, formatter))
+            with self.lock:
+                self.blocked += 1
+                self.blockedTime += time.perf_counter() - timer
+        with self.lock:
+            self.maxDepth = max(self.maxDepth, self.queue.qsize())
+        return (target if f is None else f.name), future
+
+    def flush(self, timeout=None):
+        """Waits until every queued trace is written.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if the queue was emptied within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Writes the queued traces and stops the writer thread, e.g. when the program exits.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait for the queue to be written, and for space in the queue for the stop signal. Defaults to 10.0.
+        """
+        if not self.thread.is_alive():
+            return
+        if not self.flush(timeout):
+            logging.warning(f'{self.queue.qsize()} traces were not saved before the writer stopped.')
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logging.warning('Trace writer queue is full, the writer thread was not stopped.')
+            return
+        self.thread.join(timeout)
+
+    def metrics(self):
+        """Returns the throughput and backpressure of the writer.
+
+        Returns:
+            dict: Current and maximum queue 'depth', traces 'written', write 'errors', 'batches', 'bytes' written, and the number and total seconds of saves 'blocked' by a full queue.
+        """
+        with self.lock:
+            return {
+                'depth': self.queue.qsize(),
+                'maxDepth': self.maxDepth,
+                'capacity': self.queue.maxsize,
+                'written': self.written,
+                'errors': self.errors,
+                'batches': self.batches,
+                'bytes': self.bytes,
+                'blocked': self.blocked,
+                'blockedTime': self.blockedTime,
+            }
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Take every trace queued while the previous batch was written, up to batchSize
+            while len(batch) < self.batchSize:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [record for record in batch if record is not None]
+            try:
+                if batch:
+                    self.writeBatch(batch)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}')
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self.queue.task_done()
+            if stop:
+                return
+
+    @timed('TraceWriter.writeBatch')
+    def writeBatch(self, batch):
+        """Formats and writes a batch of traces. With the 'batch' fsync policy, files are synced once the whole batch is written, so the disk can coalesce the writes.
+
+        Args:
+            batch (list): Tuples of (trace, path or file object, concurrent.futures.Future of the write, formatter).
+        """
+        pending = []        # (file, path, future) of each file to sync once the batch is written
+        for trace, target, future, formatter in batch:
+            path = target if isinstance(target, str) else target.name
+            f = target if not isinstance(target, str) else None
+            deferred = False
+            try:
+                if f is None:
+                    f = open(target, 'w', buffering=self.bufferSize)
+                delimiter = '\t' if '.txt' in path else ','
+                data = formatter(trace, delimiter)
+                f.write(data)
+                stats.recordBytes(sent=len(data))
+                f.flush()
+                if self.fsync == 'always':
+                    os.fsync(f.fileno())
+                    f.close()
+                elif self.fsync == 'batch':
+                    pending.append((f, path, future))
+                    deferred = True
+                else:
+                    f.close()
+                with self.lock:
+                    self.written += 1
+                    self.bytes += len(data)
+                if not deferred:
+                    future.set_result(path)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}. Could not save trace to {path}.')
+                with self.lock:
+                    self.errors += 1
+                if not deferred:
+                    if f is not None:
+                        f.close()
+                    future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.reserved.discard(path)
+        for f, path, future in pending:
+            try:
+                os.fsync(f.fileno())
+                future.set_result(path)
+            except Exception as e:
+                logging.error(f'{type(e).__name__}: {e}. Could not sync {path}.')
+                with self.lock:
+                    self.errors += 1
+                future.set_exception(e)
+            finally:
+                f.close()
+        with self.lock:
+            self.batches += 1